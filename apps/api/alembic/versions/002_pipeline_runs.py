@@ -0,0 +1,36 @@
+"""pipeline runs
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('pipeline_runs',
+        sa.Column('run_id', sa.String(), nullable=False),
+        sa.Column('target_date', sa.Date(), nullable=False),
+        sa.Column('trigger', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.Column('stages_json', sa.JSON(), nullable=True),
+        sa.Column('message', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('run_id')
+    )
+    op.create_index(op.f('ix_pipeline_runs_target_date'), 'pipeline_runs', ['target_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_pipeline_runs_target_date'), table_name='pipeline_runs')
+    op.drop_table('pipeline_runs')
@@ -0,0 +1,32 @@
+"""feature partitions
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('feature_partitions',
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('definition_hashes', sa.JSON(), nullable=False),
+        sa.Column('input_fingerprint', sa.String(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['symbol'], ['symbols.symbol'], ),
+        sa.PrimaryKeyConstraint('symbol', 'period')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('feature_partitions')
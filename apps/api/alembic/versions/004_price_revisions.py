@@ -0,0 +1,36 @@
+"""price revisions
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('price_revisions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('changes', sa.JSON(), nullable=False),
+        sa.Column('source', sa.String(), nullable=True),
+        sa.Column('detected_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_price_revisions_symbol'), 'price_revisions', ['symbol'], unique=False)
+    op.create_index(op.f('ix_price_revisions_processed_at'), 'price_revisions', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_price_revisions_processed_at'), table_name='price_revisions')
+    op.drop_index(op.f('ix_price_revisions_symbol'), table_name='price_revisions')
+    op.drop_table('price_revisions')
@@ -0,0 +1,23 @@
+"""backtest run checkpoint
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('backtest_runs', sa.Column('checkpoint_json', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('backtest_runs', 'checkpoint_json')
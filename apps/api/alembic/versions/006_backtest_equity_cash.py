@@ -0,0 +1,23 @@
+"""backtest equity curve cash
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('backtest_equity_curve', sa.Column('cash', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('backtest_equity_curve', 'cash')
@@ -0,0 +1,39 @@
+"""csv imports
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('csv_imports',
+        sa.Column('import_id', sa.String(), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('fingerprint', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('byte_offset', sa.BigInteger(), nullable=True),
+        sa.Column('chunks', sa.Integer(), nullable=True),
+        sa.Column('rows_read', sa.BigInteger(), nullable=True),
+        sa.Column('rows_written', sa.BigInteger(), nullable=True),
+        sa.Column('rows_revised', sa.BigInteger(), nullable=True),
+        sa.Column('rows_rejected', sa.BigInteger(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('message', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('import_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('csv_imports')
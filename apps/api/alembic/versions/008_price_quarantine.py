@@ -0,0 +1,47 @@
+"""price quarantine
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('price_quarantine',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('open', sa.Float(), nullable=True),
+        sa.Column('high', sa.Float(), nullable=True),
+        sa.Column('low', sa.Float(), nullable=True),
+        sa.Column('close', sa.Float(), nullable=True),
+        sa.Column('volume', sa.Float(), nullable=True),
+        sa.Column('turnover_tl', sa.Float(), nullable=True),
+        sa.Column('adj_close', sa.Float(), nullable=True),
+        sa.Column('reasons', sa.JSON(), nullable=False),
+        sa.Column('detail', sa.JSON(), nullable=True),
+        sa.Column('source', sa.String(), nullable=True),
+        sa.Column('detected_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        sa.Column('resolution', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_price_quarantine_symbol'), 'price_quarantine', ['symbol'], unique=False)
+    op.create_index(op.f('ix_price_quarantine_resolved_at'), 'price_quarantine', ['resolved_at'], unique=False)
+    op.add_column('csv_imports', sa.Column('rows_quarantined', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('csv_imports', 'rows_quarantined')
+    op.drop_index(op.f('ix_price_quarantine_resolved_at'), table_name='price_quarantine')
+    op.drop_index(op.f('ix_price_quarantine_symbol'), table_name='price_quarantine')
+    op.drop_table('price_quarantine')
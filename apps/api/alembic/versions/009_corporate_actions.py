@@ -0,0 +1,47 @@
+"""corporate actions and adjustment factors
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('corporate_actions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('ex_date', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('ratio', sa.Float(), nullable=True),
+        sa.Column('cash', sa.Float(), nullable=True),
+        sa.Column('source', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['symbol'], ['symbols.symbol'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_corporate_actions_symbol'), 'corporate_actions', ['symbol'], unique=False)
+    op.create_table('adjustment_factors',
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('ex_date', sa.Date(), nullable=False),
+        sa.Column('factor', sa.Float(), nullable=False),
+        sa.Column('volume_factor', sa.Float(), nullable=False),
+        sa.Column('cumulative', sa.Float(), nullable=False),
+        sa.Column('volume_cumulative', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['symbol'], ['symbols.symbol'], ),
+        sa.PrimaryKeyConstraint('symbol', 'ex_date')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('adjustment_factors')
+    op.drop_index(op.f('ix_corporate_actions_symbol'), table_name='corporate_actions')
+    op.drop_table('corporate_actions')
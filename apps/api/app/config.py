@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import List
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "BorsaTakip API"
@@ -19,11 +20,78 @@ class Settings(BaseSettings):
     API_PORT: int = 8000
     TIMEZONE: str = "Europe/Istanbul"
     LOG_LEVEL: str = "INFO"
+    # Schema comes from `alembic upgrade head`. Set true for throwaway dev DBs
+    # to let the app create missing tables on boot (slower start).
+    DB_CREATE_ALL_ON_STARTUP: bool = False
     
     # Finance Defaults
     DEFAULT_FEE_BPS: int = 10
     DEFAULT_SLIPPAGE_BPS: int = 8
     MIN_LIQUIDITY_TURNOVER: float = 10_000_000.0
+    
+    # Feature history: unseeded EMAs load span * EMA_WARMUP_SPANS trading days of warm-up
+    EMA_WARMUP_SPANS: float = 1.5
+    
+    # Profiling (admin only)
+    # Requests carrying one of PROFILING_TOKENS (X-Profile-Token header or ?profile_token=)
+    # are profiled and the result stored under PROFILE_DIR.
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKENS: List[str] = []
+    PROFILE_DIR: str = "/tmp/borsatakip/profiles"
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    
+    # End-of-day scheduler (runs in TIMEZONE, weekdays)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_HOUR: int = 18
+    SCHEDULER_MINUTE: int = 30
+    EOD_IMPORT_DAYS: int = 10 # Yahoo look-back per daily run, covers missed days
+    # Provisional intraday Top10 (services/intraday.py) from a bar feed: "file:/path/bars.csv"
+    # (replayed, REPLAY_SPEED x real time, 0 = unpaced) or "socket:host:port". Empty = off.
+    # Runs weekdays from INTRADAY_START_HOUR:MINUTE until the EOD run, re-ranking every REFRESH_SECONDS
+    INTRADAY_FEED: str = ""
+    INTRADAY_REFRESH_SECONDS: float = 60.0
+    INTRADAY_REPLAY_SPEED: float = 0.0
+    INTRADAY_START_HOUR: int = 9
+    INTRADAY_START_MINUTE: int = 55
+    
+    # Price import stages (services/ingest.py): concurrent fetches, symbols per
+    # normalize/write batch, fetched symbols buffered before fetching waits
+    IMPORT_FETCH_CONCURRENCY: int = 8
+    IMPORT_BATCH_SYMBOLS: int = 25
+    IMPORT_QUEUE_SIZE: int = 50
+    # Streaming CSV price import (services/csv_import.py); POST /data/import/csv reads
+    # files under CSV_IMPORT_DIR only
+    CSV_IMPORT_DIR: str = "/app/data/import"
+    CSV_CHUNK_ROWS: int = 100_000
+    CSV_DATE_FORMAT: str = "ISO8601" # pandas to_datetime format, e.g. "%d.%m.%Y"
+    # Import validation (services/validation.py): a bar moving more than RETURN_SIGMAS x its
+    # rolling VOL_WINDOW-bar volatility is quarantined; the threshold is kept within
+    # MIN_MOVE..MAX_MOVE (log returns, BIST daily limit is ~0.095), MAX_MOVE with no history
+    VALIDATION_VOL_WINDOW: int = 60
+    VALIDATION_RETURN_SIGMAS: float = 8.0
+    VALIDATION_MIN_MOVE: float = 0.25
+    VALIDATION_MAX_MOVE: float = 0.5
+    
+    # Response cache / warm-up (Redis if reachable, in-process otherwise)
+    RESPONSE_CACHE_TTL_SECONDS: int = 86400
+    WARMUP_TOP_SYMBOLS: int = 10
+    SNAPSHOT_DIR: str = "/tmp/borsatakip/snapshots"
+    
+    # Nightly compute: COMPUTE_SHARDS > 1 splits the symbols' feature computation across
+    # local worker processes ("local") or nodes serving the Redis job queue ("queue",
+    # run `python -m app.services.sharding` on each), see services/sharding.py
+    COMPUTE_SHARDS: int = 1
+    COMPUTE_SHARD_MODE: str = "local"
+    COMPUTE_SHARD_TIMEOUT_SECONDS: int = 900
+
+    # Working-set budget for backtests and feature compute (app/utils/memory.py): above it
+    # backtests run in date windows and features in symbol batches. 0 = load everything
+    # at once. ~192 fits a 512 MB instance next to the app itself.
+    MEMORY_BUDGET_MB: int = 0
+
+    # Parameter search (services/tuning.py): one JSONL evaluation log per search
+    TUNING_DIR: str = "/tmp/borsatakip/tuning"
+    TUNING_WORKERS: int = 0 # backtest processes, 0 = one per CPU
 
     class Config:
         env_file = ".env"
@@ -1,9 +1,14 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
 from app.utils.logging import setup_logging
-from app.routers import health, data, signals, backtest
+from app.utils.metrics import MetricsMiddleware, instrument_engine, APP_STARTUP
+from app.database import engine
+from app.routers import health, data, signals, backtest, metrics, admin
 
 settings = get_settings()
 setup_logging()
@@ -18,14 +23,31 @@ async def lifespan(app: FastAPI):
     
     log = structlog.get_logger()
     log.info("Application starting up...", version=settings.VERSION)
+    lifespan_started = time.perf_counter()
     
-    async with engine.begin() as conn:
-        # Create tables
-        # In production with Alembic, we might not want this, but for MVP it's fine.
-        await conn.run_sync(Base.metadata.create_all)
+    # Schema is managed by Alembic (`alembic upgrade head`); create_all is a dev convenience
+    if settings.DB_CREATE_ALL_ON_STARTUP:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        
+    scheduler = None
+    if settings.SCHEDULER_ENABLED:
+        from app.services.scheduler import create_scheduler
+        scheduler = create_scheduler()
+        scheduler.start()
+        log.info("EOD scheduler started", hour=settings.SCHEDULER_HOUR, minute=settings.SCHEDULER_MINUTE, timezone=settings.TIMEZONE)
         
+    APP_STARTUP.labels("lifespan").set(time.perf_counter() - lifespan_started)
+    log.info(
+        "Application ready",
+        import_ms=round(import_seconds * 1000, 2),
+        lifespan_ms=round((time.perf_counter() - lifespan_started) * 1000, 2),
+        create_all=settings.DB_CREATE_ALL_ON_STARTUP
+    )
     yield
     # Shutdown
+    if scheduler:
+        scheduler.shutdown(wait=False)
     log.info("Application shutting down...")
 
 app = FastAPI(
@@ -52,13 +74,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics: per-route latency + DB round-trip counting
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
 # Routers
 app.include_router(health.router, tags=["Health"])
+app.include_router(metrics.router, tags=["Metrics"])
 app.include_router(data.router, prefix=f"{settings.API_V1_STR}/data", tags=["Data"])
 app.include_router(signals.router, prefix=f"{settings.API_V1_STR}/signals", tags=["Signals"])
 app.include_router(backtest.router, prefix=f"{settings.API_V1_STR}/backtest", tags=["Backtest"])
+app.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["Admin"])
 
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
 
+# Module import cost (routers + deps). Heavy libs (pandas, numpy, yfinance) are
+# deferred to the first compute request, see utils.metrics.timed_import.
+import_seconds = time.perf_counter() - _import_started
+APP_STARTUP.labels("import").set(import_seconds)
+
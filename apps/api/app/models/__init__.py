@@ -1,7 +1,8 @@
 from .symbol import Symbol
-from .price import PriceDaily
+from .price import PriceDaily, PriceRevision, PriceQuarantine, CorporateAction, AdjustmentFactor
 from .index import IndexDaily
-from .feature import FeatureDaily
+from .feature import FeatureDaily, FeaturePartition
 from .score import ScoreDaily
 from .top10 import Top10Daily
 from .backtest import BacktestRun, BacktestTrade, BacktestEquity
+from .pipeline import PipelineRun, CsvImport
@@ -8,6 +8,8 @@ class BacktestRun(Base):
     created_at = Column(DateTime, server_default=func.now())
     params_json = Column(JSON, nullable=False)
     status = Column(String, default="PENDING") # PENDING, RUNNING, COMPLETED, FAILED
+    # End-of-run engine state (BacktestEngine "checkpoint"); lets the run be extended to a later end date
+    checkpoint_json = Column(JSON, nullable=True)
 
 class BacktestTrade(Base):
     __tablename__ = "backtest_trades"
@@ -31,3 +33,4 @@ class BacktestEquity(Base):
     date = Column(Date, nullable=False)
     equity = Column(Float, nullable=False)
     benchmark_equity = Column(Float, nullable=True)
+    cash = Column(Float, nullable=True) # for exposure; NULL on curves saved before it was stored
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Date, Float, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy import Column, String, Date, Float, Integer, JSON, DateTime, ForeignKey, PrimaryKeyConstraint, func
 from app.database import Base
 
 class FeatureDaily(Base):
@@ -21,3 +21,22 @@ class FeatureDaily(Base):
     __table_args__ = (
         PrimaryKeyConstraint('symbol', 'date'),
     )
+
+class FeaturePartition(Base):
+    """
+    Bookkeeping for features_daily, one row per (symbol, month).
+    A partition is fresh while the feature definitions and the input prices
+    it was computed from are unchanged (see services/feature_store.py).
+    """
+    __tablename__ = "feature_partitions"
+
+    symbol = Column(String, ForeignKey("symbols.symbol"), nullable=False)
+    period = Column(Date, nullable=False) # first day of the month
+    definition_hashes = Column(JSON, nullable=False) # {feature: hash}
+    input_fingerprint = Column(String, nullable=False)
+    rows = Column(Integer, default=0)
+    computed_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint('symbol', 'period'),
+    )
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, Date, Float, Integer, BigInteger, JSON, DateTime, func
+from app.database import Base
+
+class PipelineRun(Base):
+    __tablename__ = "pipeline_runs"
+
+    run_id = Column(String, primary_key=True)
+    target_date = Column(Date, nullable=False, index=True)
+    trigger = Column(String, nullable=False) # SCHEDULER, MANUAL
+    status = Column(String, default="RUNNING") # RUNNING, COMPLETED, SKIPPED, FAILED
+    started_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    stages_json = Column(JSON, nullable=True) # [{stage, duration_ms, status, detail}]
+    message = Column(String, nullable=True)
+
+class CsvImport(Base):
+    """
+    Progress of a streaming CSV price import (services/csv_import.py).
+    byte_offset is the end of the last committed chunk, written in the same
+    transaction as its rows, so an interrupted import resumes from there.
+    """
+    __tablename__ = "csv_imports"
+
+    import_id = Column(String, primary_key=True)
+    path = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False) # size:mtime of the file, a changed file starts over
+    status = Column(String, default="RUNNING") # RUNNING, COMPLETED, FAILED
+    byte_offset = Column(BigInteger, default=0)
+    chunks = Column(Integer, default=0)
+    rows_read = Column(BigInteger, default=0)
+    rows_written = Column(BigInteger, default=0)
+    rows_revised = Column(BigInteger, default=0)
+    rows_rejected = Column(BigInteger, default=0)
+    rows_quarantined = Column(BigInteger, default=0)
+    started_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    message = Column(String, nullable=True)
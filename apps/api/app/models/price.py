@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Date, Float, BigInteger, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy import Column, String, Date, Float, Integer, BigInteger, JSON, DateTime, ForeignKey, PrimaryKeyConstraint, func
 from app.database import Base
 
 class PriceDaily(Base):
@@ -17,3 +17,81 @@ class PriceDaily(Base):
     __table_args__ = (
         PrimaryKeyConstraint('symbol', 'date'),
     )
+
+class PriceRevision(Base):
+    """
+    A past bar that changed on re-import (Yahoo revision, late split adjustment).
+    symbol is the index code (XU100) for index_daily revisions.
+    Pending until services.revisions.apply_price_revisions recomputes what it affects.
+    """
+    __tablename__ = "price_revisions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String, nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    changes = Column(JSON, nullable=False) # {field: [old, new]}
+    source = Column(String, nullable=True) # YAHOO, CSV
+    detected_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime, nullable=True, index=True)
+
+class PriceQuarantine(Base):
+    """
+    An incoming bar that failed import validation (services/validation.py) and
+    was kept out of prices_daily. Values as received, NULL where missing/unparsable.
+    Pending until resolved with POST /data/quarantine/resolve: RELEASE into prices_daily or DISCARD.
+    """
+    __tablename__ = "price_quarantine"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String, nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=True)
+    volume = Column(Float, nullable=True)
+    turnover_tl = Column(Float, nullable=True)
+    adj_close = Column(Float, nullable=True)
+    reasons = Column(JSON, nullable=False) # e.g. ["ohlc", "return_outlier"]
+    detail = Column(JSON, nullable=True) # {"return": .., "threshold": ..} for outliers
+    source = Column(String, nullable=True) # YAHOO, CSV
+    detected_at = Column(DateTime, server_default=func.now())
+    resolved_at = Column(DateTime, nullable=True, index=True)
+    resolution = Column(String, nullable=True) # RELEASED, DISCARDED
+
+class CorporateAction(Base):
+    """
+    A split / bonus issue (ratio = shares after per share before, 2.0 for 2-for-1)
+    or cash dividend (cash per share) going ex on ex_date. prices_daily stays
+    raw; services/adjustments.py turns these into adjustment_factors.
+    """
+    __tablename__ = "corporate_actions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String, ForeignKey("symbols.symbol"), nullable=False, index=True)
+    ex_date = Column(Date, nullable=False)
+    kind = Column(String, nullable=False) # SPLIT, DIVIDEND
+    ratio = Column(Float, nullable=True)
+    cash = Column(Float, nullable=True)
+    source = Column(String, nullable=True) # MANUAL, CSV, ...
+    created_at = Column(DateTime, server_default=func.now())
+
+class AdjustmentFactor(Base):
+    """
+    A symbol's cumulative adjustment factor series, one row per ex-date:
+    bars before ex_date (back to the previous ex-date) are multiplied by
+    cumulative (prices) / volume_cumulative (volume) to be comparable with
+    today's. factor / volume_factor are this ex-date's own step.
+    """
+    __tablename__ = "adjustment_factors"
+
+    symbol = Column(String, ForeignKey("symbols.symbol"), nullable=False)
+    ex_date = Column(Date, nullable=False)
+    factor = Column(Float, nullable=False)
+    volume_factor = Column(Float, nullable=False)
+    cumulative = Column(Float, nullable=False)
+    volume_cumulative = Column(Float, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('symbol', 'ex_date'),
+    )
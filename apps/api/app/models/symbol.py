@@ -9,3 +9,4 @@ class Symbol(Base):
     sector = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     list_start_date = Column(Date, nullable=True)
+    price_source = Column(String, nullable=True) # ingest source of the stored bars (YAHOO, CSV, ...)
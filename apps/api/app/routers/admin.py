@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from app.utils.profiling import require_admin, list_profiles, profile_path
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profiles")
+def get_profiles():
+    """
+    List stored profiles (newest first).
+    """
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("txt", description="txt (pstats summary), prof (cProfile stats file), collapsed (flamegraph stacks), json (metadata)")
+):
+    """
+    Download a stored profile.
+    """
+    if format not in ("txt", "prof", "collapsed", "json"):
+        raise HTTPException(status_code=400, detail="Unknown format")
+        
+    path = profile_path(profile_id, format)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+        
+    media_type = "application/octet-stream" if format == "prof" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}.{format}")
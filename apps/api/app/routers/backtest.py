@@ -1,22 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Response, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
-from typing import List
+from sqlalchemy import desc, insert
+from typing import List, Optional
 import uuid
 import json
-import pandas as pd
+import asyncio
+import structlog
 from datetime import date
 
 from app.database import get_db, AsyncSessionLocal
-from app.models import BacktestRun, BacktestTrade, BacktestEquity, Top10Daily, FeatureDaily, PriceDaily, IndexDaily
-from app.schemas.backtest import BacktestCreate, BacktestResultResponse, BacktestTradeResponse, BacktestEquityPoint
-from app.services.backtest_engine import BacktestEngine
+from app.models import BacktestRun, BacktestTrade, BacktestEquity
+from app.schemas.backtest import BacktestCreate, BacktestResultResponse, BacktestTradeResponse, BacktestEquityPoint, BacktestExtend, WeightSweepRequest, TuneRequest, RobustnessRequest
+from app.services.pipeline import load_backtest_inputs, plan_backtest_windows
+from app.utils.metrics import stage_timer
+from app.utils.cache import get_cache, BACKTEST_NS
+from app.utils.progress import get_broker
+from app.utils.profiling import profile_request, profile_session, reserve_profile, release_profile, PROFILE_ID_HEADER
 
 router = APIRouter()
+logger = structlog.get_logger()
 
-async def run_backtest_task(run_id: str, params: dict):
+# Latest progress event per run, shared through the response cache so a stream
+# served by another worker/replica can follow the run too
+PROGRESS_TTL_SECONDS = 86400
+STREAM_POLL_SECONDS = 1.0
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+MAX_ROBUSTNESS_PATHS = 20_000
+
+def progress_key(run_id: str) -> str:
+    # Not generation-versioned: a daily cache bump must not hide in-flight runs
+    return f"{BACKTEST_NS}:progress:{run_id}"
+
+async def publish_progress(run_id: str, event: dict):
+    """Fan out to local stream subscribers; the shared snapshot drops the per-event deltas."""
+    event = {"run_id": run_id, "final": False, **event}
+    get_broker().publish(run_id, event)
+    snapshot = {k: v for k, v in event.items() if k not in ("equity_points", "trades")}
+    await get_cache().set(progress_key(run_id), snapshot, ttl=PROGRESS_TTL_SECONDS)
+
+async def run_performance(db: AsyncSession, run_id: str, params: dict) -> dict:
+    from app.services.performance import performance_metrics, trade_array
+    trades = (await db.execute(
+        select(BacktestTrade).where(BacktestTrade.run_id == run_id).order_by(BacktestTrade.date, BacktestTrade.id)
+    )).scalars().all()
+    curve = (await db.execute(
+        select(BacktestEquity.equity, BacktestEquity.cash, BacktestEquity.benchmark_equity)
+        .where(BacktestEquity.run_id == run_id).order_by(BacktestEquity.date)
+    )).all()
+    cash = [c for _, c, _ in curve]
+    return performance_metrics(
+        [e for e, _, _ in curve], trade_array(trades),
+        float(params.get('initial_capital', 100_000.0)),
+        date.fromisoformat(str(params['start_date'])[:10]), date.fromisoformat(str(params['end_date'])[:10]),
+        cash=None if None in cash else cash,
+        benchmark=[b if b is not None else 0.0 for _, _, b in curve],
+    )
+
+async def save_backtest_results(db: AsyncSession, run_id: str, results: dict) -> int:
+    """Insert a run's (or window's) trades and equity points. Core inserts, nothing stays in the session."""
+    trades = [
+        {'run_id': run_id, 'date': t['date'], 'symbol': t['symbol'], 'action': t['action'], 'qty': t['qty'],
+         'price': t['price'], 'fee': t['fee'], 'slippage': t['slippage'], 'reason': t['reason']}
+        for t in results['trades']
+    ]
+    equity = [
+        {'run_id': run_id, 'date': e['date'], 'equity': e['equity'],
+         'benchmark_equity': e.get('benchmark_equity'), 'cash': e.get('cash')}
+        for e in results['equity_curve']
+    ]
+    if trades:
+        await db.execute(insert(BacktestTrade), trades)
+    if equity:
+        await db.execute(insert(BacktestEquity), equity)
+    return len(trades) + len(equity)
+
+async def run_backtest_task(run_id: str, params: dict, profile: Optional[dict] = None,
+                            checkpoint: Optional[dict] = None):
+    # Profile the whole job (load + engine + save) when requested by an admin
+    with profile_session(profile, f"backtest:{run_id}"):
+        await _run_backtest_job(run_id, params, checkpoint)
+
+async def _run_backtest_job(run_id: str, params: dict, checkpoint: Optional[dict] = None):
+    # With a checkpoint the run continues from its last simulated day to params['end_date']
     # Create new session
+    get_broker().start(run_id)
     async with AsyncSessionLocal() as db:
         try:
             # Update status to RUNNING
@@ -24,119 +94,58 @@ async def run_backtest_task(run_id: str, params: dict):
             if run:
                 run.status = "RUNNING"
                 await db.commit()
+            await publish_progress(run_id, {"status": "RUNNING", "pct": 0.0})
             
-            # 1. Load Data
-            # This can be heavy. Optimization needed for Prod.
-            # Loading ALL history for backtest period.
-            
-            start = pd.to_datetime(params['start_date']).date()
-            end = pd.to_datetime(params['end_date']).date()
+            # 1. Plan: one window, or date windows under MEMORY_BUDGET_MB (each
+            # continues from the previous window's checkpoint, see plan_backtest_windows)
+            start = date.fromisoformat(str(params['start_date'])[:10])
+            end = date.fromisoformat(str(params['end_date'])[:10])
+            if checkpoint is not None:
+                # Only the new days, plus the checkpoint day they read signals and stops from
+                start = date.fromisoformat(checkpoint['last_date'])
             
-            # Prices
-            # optimization: load only needed columns
-            # For massive data, convert to parquet or lazy load. 
-            # For MVP with seed data, SELECT ALL is fine.
-            stmt = select(PriceDaily).where(PriceDaily.date >= start, PriceDaily.date <= end)
-            res = await db.execute(stmt)
-            prices_rows = res.scalars().all()
+            with stage_timer("backtest", "plan", run_id=run_id) as st:
+                windows, atr = await plan_backtest_windows(db, start, end)
+                st.rows = len(windows)
             
-            price_history = {}
-            # Convert to dict of DFs
-            # Group by symbol
-            data = [
-                {'symbol': p.symbol, 'date': p.date, 'open': p.open, 'close': p.close, 'high': p.high, 'low': p.low}
-                for p in prices_rows
-            ]
-            if not data:
-                raise ValueError("No price data found")
+            state = checkpoint
+            for k, (window_start, window_end) in enumerate(windows):
+                # 2. Load Data
+                with stage_timer("backtest", "load", run_id=run_id) as st:
+                    df_top, df_feat, price_history, df_index = await load_backtest_inputs(db, window_start, window_end, atr=atr)
+                    st.rows = sum(len(df) for df in price_history.values()) + len(df_feat) + len(df_top) + len(df_index)
                 
-            df_all = pd.DataFrame(data)
-            df_all['date'] = pd.to_datetime(df_all['date'])
-            df_all.set_index('date', inplace=True)
-            
-            for sym, group in df_all.groupby('symbol'):
-                price_history[str(sym)] = group
+                # 3. Run Engine (a fresh one per window: its panel cache would pin the previous window)
+                with stage_timer("backtest", "simulate", run_id=run_id) as st:
+                    from app.services.backtest_engine import BacktestEngine
+                    engine = BacktestEngine()
+                    results = await engine.run_backtest(
+                        {**params, 'end_date': window_end.isoformat()}, 
+                        df_top, 
+                        df_feat, 
+                        price_history, 
+                        df_index,
+                        checkpoint=state,
+                        progress=lambda event, k=k: publish_progress(run_id, {
+                            "status": "RUNNING", **event,
+                            "pct": round((100.0 * k + event["pct"]) / len(windows), 1),
+                        })
+                    )
+                    st.rows = len(results.get('equity_curve', []))
+                del df_top, df_feat, price_history, df_index, engine
                 
-            # Features
-            stmt = select(FeatureDaily).where(FeatureDaily.date >= start, FeatureDaily.date <= end)
-            res = await db.execute(stmt)
-            feat_rows = res.scalars().all()
-            
-            f_data = [
-                {'symbol': f.symbol, 'date': f.date, 'ema50': f.ema50, 'atr14_pct': f.atr14_pct} # Add needed columns
-                for f in feat_rows
-            ]
-            df_feat = pd.DataFrame(f_data)
-            if not df_feat.empty:
-                df_feat['date'] = pd.to_datetime(df_feat['date'])
-                df_feat.set_index(['date', 'symbol'], inplace=True)
-                df_feat.sort_index(inplace=True)
-            
-            # Top10
-            stmt = select(Top10Daily).where(Top10Daily.date >= start, Top10Daily.date <= end)
-            res = await db.execute(stmt)
-            top_rows = res.scalars().all()
-            
-            t_data = [
-                {'date': t.date, 'rank': t.rank, 'symbol': t.symbol, 'final_score': t.final_score}
-                for t in top_rows
-            ]
-            df_top = pd.DataFrame(t_data)
-            if not df_top.empty:
-                df_top['date'] = pd.to_datetime(df_top['date'])
-                df_top.set_index(['date', 'rank'], inplace=True)
-                df_top.sort_index(inplace=True)
+                if "error" in results:
+                    raise ValueError(results["error"])
                 
-            # Index
-            stmt = select(IndexDaily).where(IndexDaily.date >= start, IndexDaily.date <= end)
-            res = await db.execute(stmt)
-            idx_rows = res.scalars().all()
-            
-            i_data = [{'date': i.date, 'close': i.close, 'ema50': i.ema50} for i in idx_rows]
-            df_index = pd.DataFrame(i_data)
-            if not df_index.empty:
-                df_index['date'] = pd.to_datetime(df_index['date'])
-                df_index.set_index('date', inplace=True)
+                # 4. Save Results
+                with stage_timer("backtest", "save", run_id=run_id) as st:
+                    st.rows = await save_backtest_results(db, run_id, results)
+                state = results['checkpoint']
             
-            # 2. Run Engine
-            engine = BacktestEngine()
-            results = await engine.run_backtest(
-                params, 
-                df_top, 
-                df_feat, 
-                price_history, 
-                df_index
-            )
+            if checkpoint is not None or len(windows) > 1:
+                # The engine only saw the last window's days; statistics over the whole stored run
+                results['metrics'].update(await run_performance(db, run_id, params))
             
-            if "error" in results:
-                raise ValueError(results["error"])
-                
-            # 3. Save Results
-            # Trades
-            for t in results['trades']:
-                trade = BacktestTrade(
-                    run_id=run_id,
-                    date=t['date'],
-                    symbol=t['symbol'],
-                    action=t['action'],
-                    qty=t['qty'],
-                    price=t['price'],
-                    fee=t['fee'],
-                    slippage=t['slippage'],
-                    reason=t['reason']
-                )
-                db.add(trade)
-                
-            # Equity
-            for e in results['equity_curve']:
-                eq = BacktestEquity(
-                    run_id=run_id,
-                    date=e['date'],
-                    equity=e['equity'],
-                    benchmark_equity=e.get('benchmark_equity')
-                )
-                db.add(eq)
-                
             # Update Run
             run = await db.get(BacktestRun, run_id)
             if run:
@@ -145,25 +154,35 @@ async def run_backtest_task(run_id: str, params: dict):
                 # For now puts in params_json['metrics']
                 p = run.params_json.copy()
                 p['metrics'] = results['metrics']
+                p['end_date'] = params['end_date']
                 run.params_json = p
-                
+                run.checkpoint_json = results['checkpoint']
+            
             await db.commit()
+            await publish_progress(run_id, {"status": "COMPLETED", "pct": 100.0, "final": True, "metrics": results['metrics']})
             
         except Exception as e:
-            # Log error
-            print(f"Backtest failed: {e}")
+            logger.error("Backtest failed", run_id=run_id, error=str(e))
+            await db.rollback()
             run = await db.get(BacktestRun, run_id)
             if run:
-                run.status = "FAILED"
+                # A failed extension leaves the run as it was before
+                run.status = "COMPLETED" if checkpoint is not None else "FAILED"
                 await db.commit()
+            await publish_progress(run_id, {"status": run.status if run else "FAILED", "final": True, "error": str(e)})
 
 @router.post("/run", response_model=BacktestResultResponse)
 async def create_backtest(
     params: BacktestCreate,
     background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    profile: Optional[dict] = Depends(profile_request)
 ):
     run_id = str(uuid.uuid4())
+    # The job runs after the response: take the cProfile slot now (409 when busy)
+    # instead of failing inside the task and leaving the run PENDING
+    reserve_profile(profile)
     
     # Create Record
     run_rec = BacktestRun(
@@ -172,16 +191,208 @@ async def create_backtest(
         status="PENDING"
     )
     db.add(run_rec)
-    await db.commit()
+    try:
+        await db.commit()
+    except Exception:
+        release_profile(profile)
+        raise
     
     # Trigger Task
-    background_tasks.add_task(run_backtest_task, run_id, params.model_dump(mode='json'))
+    background_tasks.add_task(run_backtest_task, run_id, params.model_dump(mode='json'), profile)
+    if profile:
+        response.headers[PROFILE_ID_HEADER] = profile["id"]
     
     return BacktestResultResponse(
         run_id=run_id,
         status="PENDING"
     )
 
+@router.post("/sweep")
+async def sweep_scoring_weights(params: WeightSweepRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Score and select Top10 over [start_date, end_date] for many scoring weight
+    sets in one batched pass, optionally backtesting each resulting history.
+    """
+    from app.services.research import sweep_weights
+    if params.start_date > params.end_date:
+        raise HTTPException(status_code=400, detail="start_date is after end_date")
+    try:
+        return await sweep_weights(
+            db, params.start_date, params.end_date,
+            [ws.model_dump(exclude_none=True) for ws in params.weight_sets],
+            min_adv=params.min_adv, horizon=params.horizon_days,
+            backtest=params.backtest,
+            backtest_params=params.model_dump(include={'initial_capital', 'fee_bps', 'slippage_bps'}),
+            include_top10=params.include_top10,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def run_search_task(search_id: str, start: date, end: date, config: dict):
+    from app.services.tuning import run_search
+    async with AsyncSessionLocal() as db:
+        try:
+            await run_search(db, search_id, start, end, config)
+        except Exception as e:
+            logger.error("Parameter search failed", search_id=search_id, error=str(e))
+
+@router.post("/tune")
+async def start_parameter_search(params: TuneRequest, background_tasks: BackgroundTasks):
+    """
+    Successive-halving search over scoring weights and stop rules.
+    Runs in the background; poll GET /tune/{search_id}.
+    """
+    from app.services.tuning import OBJECTIVES
+    if params.start_date > params.end_date:
+        raise HTTPException(status_code=400, detail="start_date is after end_date")
+    if params.objective not in OBJECTIVES:
+        raise HTTPException(status_code=400, detail=f"Unknown objective. Use one of {list(OBJECTIVES)}")
+    search_id = uuid.uuid4().hex
+    config = params.model_dump(exclude={'start_date', 'end_date'})
+    background_tasks.add_task(run_search_task, search_id, params.start_date, params.end_date, config)
+    return {"search_id": search_id, "status": "PENDING"}
+
+@router.post("/tune/{search_id}/resume")
+async def resume_parameter_search(search_id: str, background_tasks: BackgroundTasks):
+    """Continue a stopped search from its log, with its original config."""
+    from app.services.tuning import search_status
+    status = search_status(search_id)
+    if status is None or status["config"] is None:
+        raise HTTPException(status_code=404, detail="Search not found")
+    config = dict(status["config"])
+    start = date.fromisoformat(config.pop("start_date"))
+    end = date.fromisoformat(config.pop("end_date"))
+    background_tasks.add_task(run_search_task, search_id, start, end, config)
+    return {"search_id": search_id, "status": "PENDING", "evaluations": status["evaluations"]}
+
+@router.get("/tune/{search_id}")
+async def get_parameter_search(search_id: str):
+    from app.services.tuning import search_status
+    status = search_status(search_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Search not found")
+    return status
+
+@router.post("/{run_id}/extend", response_model=BacktestResultResponse)
+async def extend_backtest(
+    run_id: str,
+    params: BacktestExtend,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Continue a completed run to a later end date from its checkpoint.
+    Only the new days are simulated; trades and equity are appended.
+    """
+    run = await db.get(BacktestRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status != "COMPLETED" or not run.checkpoint_json:
+        raise HTTPException(status_code=409, detail="Run has no checkpoint to continue from")
+    if params.end_date <= date.fromisoformat(run.checkpoint_json['last_date']):
+        raise HTTPException(status_code=400, detail="end_date must be after the run's last simulated day")
+    
+    job_params = {k: v for k, v in run.params_json.items() if k != 'metrics'}
+    job_params['end_date'] = params.end_date.isoformat()
+    run.status = "PENDING"
+    await db.commit()
+    
+    background_tasks.add_task(run_backtest_task, run_id, job_params, None, run.checkpoint_json)
+    return BacktestResultResponse(run_id=run_id, status="PENDING")
+
+@router.post("/{run_id}/robustness")
+async def backtest_robustness(run_id: str, params: RobustnessRequest, db: AsyncSession = Depends(get_db)):
+    """
+    CAGR / max drawdown / Sharpe distributions of a completed run under
+    block-bootstrap resampling of its daily returns and random entry-day and
+    slippage perturbations of its trades.
+    """
+    from app.services.robustness import analyze_run
+    if not 1 <= params.n_paths <= MAX_ROBUSTNESS_PATHS:
+        raise HTTPException(status_code=400, detail=f"n_paths must be between 1 and {MAX_ROBUSTNESS_PATHS}")
+    if params.block_days < 1 or params.entry_shift_days < 0 or params.slippage_bps < 0:
+        raise HTTPException(status_code=400, detail="block_days must be >= 1, entry_shift_days and slippage_bps >= 0")
+    try:
+        result = await analyze_run(db, run_id, **params.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return result
+
+@router.get("/presets/{name}")
+async def get_backtest_preset(name: str, db: AsyncSession = Depends(get_db)):
+    """
+    Standard backtest window (1M/3M/6M/1Y) ending at the latest computed date.
+    Precomputed by the daily warm-up; computed and cached on a miss.
+    """
+    from app.services.warmup import BACKTEST_PRESETS, get_backtest_preset as load_preset
+    if name not in BACKTEST_PRESETS:
+        raise HTTPException(status_code=404, detail=f"Unknown preset. Use one of {list(BACKTEST_PRESETS)}")
+        
+    summary = await load_preset(db, name)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No computed data yet")
+    return summary
+
+def _sse(event: dict) -> str:
+    kind = "done" if event.get("final") else "progress"
+    return f"event: {kind}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def _progress_events(run_id: str, status: str, metrics: Optional[dict], request: Request):
+    broker = get_broker()
+    if status in ("COMPLETED", "FAILED") and not broker.is_active(run_id):
+        yield _sse({"run_id": run_id, "status": status, "final": True, "metrics": metrics})
+        return
+    
+    cache = get_cache()
+    last = None
+    waited = 0.0
+    while not await request.is_disconnected():
+        # Running in this process: push every event as the engine emits it
+        if broker.is_active(run_id):
+            async for event in broker.subscribe(run_id):
+                yield _sse(event)
+            return
+        
+        # Running elsewhere (or not started yet): follow the shared snapshot
+        snapshot = await cache.get(progress_key(run_id))
+        if snapshot is not None and snapshot != last:
+            last = snapshot
+            waited = 0.0
+            yield _sse(snapshot)
+            if snapshot.get("final"):
+                return
+        
+        if waited >= STREAM_KEEPALIVE_SECONDS:
+            waited = 0.0
+            yield ": keep-alive\n\n"
+            # The run may have ended without a snapshot (worker restarted)
+            async with AsyncSessionLocal() as db:
+                run = await db.get(BacktestRun, run_id)
+            if run is None or run.status in ("COMPLETED", "FAILED"):
+                yield _sse({"run_id": run_id, "status": run.status if run else "FAILED", "final": True,
+                            "metrics": run.params_json.get('metrics') if run else None})
+                return
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+        waited += STREAM_POLL_SECONDS
+
+@router.get("/{run_id}/stream")
+async def stream_backtest(run_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Server-Sent Events for a run: "progress" events (pct, equity, cash,
+    trade count, plus the equity points and trades since the previous event)
+    and a final "done" event with the status and metrics.
+    """
+    run = await db.get(BacktestRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return StreamingResponse(
+        _progress_events(run_id, run.status, run.params_json.get('metrics'), request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{run_id}", response_model=BacktestResultResponse)
 async def get_backtest_result(run_id: str, db: AsyncSession = Depends(get_db)):
     run = await db.get(BacktestRun, run_id)
@@ -198,9 +409,14 @@ async def get_backtest_result(run_id: str, db: AsyncSession = Depends(get_db)):
     res = await db.execute(stmt)
     equity = res.scalars().all()
     
+    progress = None
+    if run.status in ("PENDING", "RUNNING"):
+        progress = await get_cache().get(progress_key(run_id))
+    
     return BacktestResultResponse(
         run_id=run.run_id,
         status=run.status,
+        progress=progress,
         metrics=run.params_json.get('metrics'),
         trades=[BacktestTradeResponse(
             date=t.date,
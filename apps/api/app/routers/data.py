@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.database import get_db
-from app.services.data_provider import CSVDataProvider
-from app.models import Symbol, PriceDaily, IndexDaily
+from app.models import Symbol, IndexDaily
 from app.schemas.common import Message
+from app.schemas.pipeline import PipelineRunResponse, CsvImportResponse, QuarantinedBarResponse, CorporateActionResponse
+from app.utils.metrics import stage_timer
+from app.utils.profiling import profile_request, profile_session, PROFILE_ID_HEADER
+from typing import List, Optional
 import os
 
 router = APIRouter()
@@ -27,384 +30,308 @@ async def import_seed_data(db: AsyncSession = Depends(get_db)):
         # try default docker path
         pass 
     
+    from app.services.data_provider import CSVDataProvider
     provider = CSVDataProvider(CSV_DIR)
     
     # 1. Symbols
-    symbols = provider.get_symbols()
-    for s_info in symbols:
-        # Upsert
-        stmt = select(Symbol).where(Symbol.symbol == s_info.symbol)
-        result = await db.execute(stmt)
-        existing = result.scalars().first()
+    with stage_timer("import_seed", "symbols") as st:
+        symbols = provider.get_symbols()
+        for s_info in symbols:
+            # Upsert
+            stmt = select(Symbol).where(Symbol.symbol == s_info.symbol)
+            result = await db.execute(stmt)
+            existing = result.scalars().first()
+            
+            if not existing:
+                new_sym = Symbol(
+                    symbol=s_info.symbol,
+                    name=s_info.name,
+                    sector=s_info.sector,
+                    is_active=s_info.is_active,
+                    list_start_date=s_info.list_start_date
+                )
+                db.add(new_sym)
         
-        if not existing:
-            new_sym = Symbol(
-                symbol=s_info.symbol,
-                name=s_info.name,
-                sector=s_info.sector,
-                is_active=s_info.is_active,
-                list_start_date=s_info.list_start_date
-            )
-            db.add(new_sym)
-    
-    await db.commit()
-    
-    # 2. Prices
-    # Since we can't easily iterate ALL dates without a massive loop,
-    # and CSVDataProvider gets by symbol...
-    # We iterate all symbols we just saved.
+        await db.commit()
+        st.rows = len(symbols)
     
-    stmt = select(Symbol).where(Symbol.is_active == True)
-    result = await db.execute(stmt)
-    all_symbols = result.scalars().all()
+    # 2. Prices (streamed in chunks, see services/csv_import.py)
+    from app.services.csv_import import import_price_csv
+    prices_path = os.path.join(CSV_DIR, "prices_sample.csv")
+    count = 0
+    with stage_timer("import_seed", "prices") as st:
+        if os.path.exists(prices_path):
+            count = (await import_price_csv(db, prices_path))["rows_written"]
+        st.rows = count
     
-    import pandas as pd
     from datetime import date
     start_date = date(2020, 1, 1)
     end_date = date.today()
     
-    count = 0
-    for sym in all_symbols:
-        df = provider.get_daily_ohlcv(sym.symbol, start_date, end_date)
-        if df.empty: continue
-        
-        # Batch insert? Or simple loop for MVP
-        for dt, row in df.iterrows():
-            # Check exist
-            # Optimization: Delete all and rewrite? Or ignore conflict?
-            # For MVP seed, let's just Try/Except or Check
-            # Check if exists
-            exists_stmt = select(PriceDaily).where(
-                (PriceDaily.symbol == sym.symbol) &
-                (PriceDaily.date == dt.date())
-            )
+    # 3. Index
+    with stage_timer("import_seed", "index") as st:
+        df_idx = provider.get_index_daily("XU100", start_date, end_date)
+        for dt, row in df_idx.iterrows():
+            exists_stmt = select(IndexDaily).where(IndexDaily.date == dt.date())
             res = await db.execute(exists_stmt)
             if res.scalars().first(): continue
-
-            p = PriceDaily(
-                symbol=sym.symbol,
+            
+            i = IndexDaily(
                 date=dt.date(),
-                open=row['open'],
-                high=row['high'],
-                low=row['low'],
-                close=row['close'],
-                volume=int(row['volume']),
-                turnover_tl=row.get('turnover_tl'),
-                adj_close=row.get('adj_close')
+                close=row['close']
+                # EMAs will be computed by feature engine later
             )
-            db.add(p)
-            count += 1
+            db.add(i)
+            st.rows += 1
             
-    await db.commit()
-    
-    # 3. Index
-    df_idx = provider.get_index_daily("XU100", start_date, end_date)
-    for dt, row in df_idx.iterrows():
-        exists_stmt = select(IndexDaily).where(IndexDaily.date == dt.date())
-        res = await db.execute(exists_stmt)
-        if res.scalars().first(): continue
-        
-        i = IndexDaily(
-            date=dt.date(),
-            close=row['close']
-            # EMAs will be computed by feature engine later
-        )
-        db.add(i)
-        
-    await db.commit()
+        await db.commit()
     
     return {"message": f"Import complete. Imported {len(symbols)} symbols and {count} price rows."}
 
+@router.post("/import/csv", response_model=Message)
+async def import_csv_prices(
+    background_tasks: BackgroundTasks,
+    path: str = Query(..., description="CSV file, relative to Settings.CSV_IMPORT_DIR"),
+    restart: bool = False
+):
+    """
+    Stream a large price CSV into prices_daily in the background.
+    Re-posting an interrupted import resumes it from its last committed chunk.
+    Poll GET /import/csv/{import_id}.
+    """
+    from app.config import get_settings
+    from app.services.csv_import import csv_import_id, read_header, run_import_task
+    root = os.path.realpath(get_settings().CSV_IMPORT_DIR)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep):
+        raise HTTPException(status_code=400, detail="path is outside CSV_IMPORT_DIR")
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        read_header(full_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    background_tasks.add_task(run_import_task, full_path, restart)
+    return {"message": f"CSV import {csv_import_id(full_path)} scheduled"}
+
+@router.get("/import/csv/{import_id}", response_model=CsvImportResponse)
+async def get_csv_import(import_id: str, db: AsyncSession = Depends(get_db)):
+    from app.models import CsvImport
+    from app.services.csv_import import csv_import_status
+    job = await db.get(CsvImport, import_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return csv_import_status(job)
+
 @router.post("/import/yahoo", response_model=Message)
 async def import_yahoo_data(
     days: int = 365, 
+    rebaseline: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Import last N days of data from Yahoo Finance for all active symbols in DB.
+    rebaseline=true rewrites changed bars without logging revisions: run it once
+    over the whole history of a database filled by an older build, then
+    /features/refresh over the same range (see services.pipeline.import_yahoo_prices).
     """
     import traceback
     try:
-        from datetime import date, timedelta
-        from app.services.data_provider import YahooFinanceProvider
-        from app.models import Symbol, PriceDaily, IndexDaily
-        
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days)
-        
-        provider = YahooFinanceProvider()
-        
-        # 1. Get Symbols from DB
-        # If DB is empty, maybe try to seed symbols first?
-        stmt = select(Symbol).where(Symbol.is_active == True)
-        result = await db.execute(stmt)
-        db_symbols = result.scalars().all()
-        
-        if not db_symbols:
-            # Fallback: Try to load from CSV seed to get symbol list, then fetch prices
-            # Or return error
-            return {"message": "No symbols found in DB. Please run /import/seed first to populate symbol list."}
-
-        count = 0
-        updated_symbols = 0
-        
-        import pandas as pd
-        
-        # Process symbols
-        errors = []
-        for sym in db_symbols:
-            try:
-                df = provider.get_daily_ohlcv(sym.symbol, start_date, end_date)
-                if df.empty:
-                    errors.append(f"{sym.symbol}: Empty DataFrame (Ticker: {sym.symbol}.IS)")
-                    continue
-                    
-                # Save to DB
-                existing_dates_stmt = select(PriceDaily.date).where(
-                    (PriceDaily.symbol == sym.symbol) & 
-                    (PriceDaily.date >= start_date)
-                )
-                res = await db.execute(existing_dates_stmt)
-                existing_dates = set(res.scalars().all())
-                
-                rows_to_add = []
-                for dt, row in df.iterrows():
-                    if dt.date() in existing_dates:
-                        continue
-                        
-                    p = PriceDaily(
-                        symbol=sym.symbol,
-                        date=dt.date(),
-                        open=row['open'],
-                        high=row['high'],
-                        low=row['low'],
-                        close=row['close'],
-                        volume=int(row['volume']),
-                        turnover_tl=row.get('turnover_tl'),
-                        adj_close=row.get('adj_close')
-                    )
-                    rows_to_add.append(p)
-                
-                if rows_to_add:
-                    db.add_all(rows_to_add)
-                    count += len(rows_to_add)
-                    updated_symbols += 1
-                else:
-                    errors.append(f"{sym.symbol}: No new rows to add")
-                    
-            except Exception as e:
-                errors.append(f"{sym.symbol}: {str(e)}")
-                continue
-
-        await db.commit()
-        
-        # 2. Update Index (XU100)
-        index_status = "Skipped"
-        try:
-            df_idx = provider.get_index_daily("XU100", start_date, end_date)
-            if not df_idx.empty:
-                existing_dates_stmt = select(IndexDaily.date).where(IndexDaily.date >= start_date)
-                res = await db.execute(existing_dates_stmt)
-                existing_dates = set(res.scalars().all())
-                
-                rows_to_add = []
-                for dt, row in df_idx.iterrows():
-                    if dt.date() in existing_dates:
-                        continue
-                        
-                    i = IndexDaily(
-                        date=dt.date(),
-                        close=row['close']
-                    )
-                    rows_to_add.append(i)
-                    
-                if rows_to_add:
-                    db.add_all(rows_to_add)
-                    await db.commit()
-                    index_status = f"Updated {len(rows_to_add)} rows"
-                else:
-                    index_status = "No new rows"
-            else:
-                index_status = "Empty DataFrame"
-        except Exception as e:
-            index_status = f"Error: {e}"
-
-        return {
-            "message": f"Yahoo Import complete. Updated {updated_symbols} symbols, added {count} price rows.",
-            "debug_errors": errors[:20], # Show first 20 errors
-            "index_status": index_status
-        }
+        from app.services.pipeline import import_yahoo_prices
+        return await import_yahoo_prices(db, days, rebaseline=rebaseline)
     except Exception as e:
         error_msg = traceback.format_exc()
         raise HTTPException(status_code=500, detail=error_msg)
 
 
 @router.post("/compute", response_model=Message)
-async def compute_daily_pipeline(date_str: str = Query(..., description="Date to compute for YYYY-MM-DD"), db: AsyncSession = Depends(get_db)):
+async def compute_daily_pipeline(
+    response: Response,
+    date_str: str = Query(..., description="Date to compute for YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_db),
+    profile: Optional[dict] = Depends(profile_request)
+):
     """
     Manually trigger compute pipeline for a specific date.
-    1. Load prices
-    2. Feature Engine
-    3. Scoring Engine
-    4. Save
+    See services.pipeline.compute_for_date.
+    
+    Admins can profile the run (see app.utils.profiling); the profile id is returned in X-Profile-Id.
     """
     from datetime import datetime
+    from app.services.pipeline import compute_for_date
     target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     
-    # Imports here to avoid circular deps if any, or just convenience
-    from sqlalchemy import select, delete
-    from app.models import PriceDaily, IndexDaily, FeatureDaily, ScoreDaily, Top10Daily, Symbol
-    from app.services.feature_engine import FeatureEngine
-    from app.services.scoring_engine import ScoringEngine
-    import pandas as pd
-    
-    # 1. Load Data (Prices for target_date and enough history for features)
-    # We need at least 200 days history for EMA200
-    start_hist = target_date - pd.Timedelta(days=400) # Safe buffer
-    
-    # Symbols
-    stmt = select(Symbol).where(Symbol.is_active == True)
-    res = await db.execute(stmt)
-    symbols_list = res.scalars().all()
-    symbols_map = {s.symbol: s for s in symbols_list}
-    
-    # Prices
-    stmt = select(PriceDaily).where(PriceDaily.date >= start_hist, PriceDaily.date <= target_date)
-    res = await db.execute(stmt)
-    prices = res.scalars().all()
-    
-    if not prices:
-        return {"message": "No price data found"}
+    with profile_session(profile, "compute") as profile_id:
+        result = await compute_for_date(db, target_date)
         
-    df_prices = pd.DataFrame([
-        {'symbol': p.symbol, 'date': p.date, 'open': p.open, 'close': p.close, 'high': p.high, 'low': p.low, 'volume': p.volume}
-        for p in prices
-    ])
-    df_prices['date'] = pd.to_datetime(df_prices['date'])
-    df_prices.set_index('date', inplace=True)
-    
-    # Index
-    stmt = select(IndexDaily).where(IndexDaily.date >= start_hist, IndexDaily.date <= target_date)
-    res = await db.execute(stmt)
-    indexes = res.scalars().all()
-    
-    df_index = pd.DataFrame([{'date': i.date, 'close': i.close} for i in indexes])
-    if df_index.empty:
-         return {"message": "No index data found"}
-         
-    df_index['date'] = pd.to_datetime(df_index['date'])
-    df_index.set_index('date', inplace=True)
-    
-    # Pre-compute Index Features (EMA50) for Regime
-    # Simple calculation for index
-    df_index['ema50'] = df_index['close'].ewm(span=50, adjust=False).mean()
-    
-    # 2. Features & Scores
-    fe = FeatureEngine()
-    se = ScoringEngine()
-    
-    # Detect Regime (using Index history up to target_date)
-    regime = se.detect_regime(df_index)
-    
-    ready_scores = []
-    ready_features = []
-    
-    # Process each symbol
-    # This is inefficient loop for all symbols, but okay for MVP.
-    # ideally we run vectorized on all symbols if aligned. FeatureEngine handles one DF.
-    
-    for sym in symbols_map.keys():
-        d = df_prices[df_prices['symbol'] == sym]
-        if d.empty: continue
-        
-        # Compute Features
-        f_df = fe.compute_features(d, df_index)
-        if f_df.empty: continue
-        
-        # Get target row
-        if pd.to_datetime(target_date) not in f_df.index:
-            continue
-            
-        # We need to normalize across universe.
-        # So we collect raw features for target date first.
-        row = f_df.loc[pd.to_datetime(target_date)]
-        # Add symbol
-        row_dict = row.to_dict()
-        row_dict['symbol'] = sym
-        ready_features.append(row_dict)
+    if profile_id:
+        response.headers[PROFILE_ID_HEADER] = profile_id
+    return result
 
-    if not ready_features:
-        return {"message": f"No features computed for {target_date}"}
-        
-    # Create DF for today
-    df_today_features = pd.DataFrame(ready_features)
-    df_today_features.set_index('symbol', inplace=True)
-    
-    # Normalize
-    df_norm = fe.normalize_cross_sectional(df_today_features)
-    
-    # Score
-    df_scored = se.calculate_scores(df_norm, regime)
-    
-    # Select Top 10
-    # Need symbol info DF
-    df_sym_info = pd.DataFrame([
-        {'symbol': s.symbol, 'sector': s.sector, 'is_active': s.is_active} 
-        for s in symbols_list
-    ])
-    df_sym_info.set_index('symbol', inplace=True)
-    
-    df_top10 = se.select_top10(df_scored, df_sym_info, min_adv=10_000, regime=regime) # Low min_adv for test
+@router.post("/features/refresh", response_model=Message)
+async def refresh_feature_cache(
+    start_date: str = Query(..., description="YYYY-MM-DD"),
+    end_date: str = Query(..., description="YYYY-MM-DD"),
+    symbols: Optional[List[str]] = Query(None),
+    force: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Backfill features_daily for a date range. Only (symbol, month) partitions
+    whose prices or feature definitions changed are recomputed.
+    See services.feature_store.refresh_features.
+    """
+    from datetime import datetime
+    from app.services.feature_store import refresh_features
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if end < start:
+        raise HTTPException(status_code=400, detail="end_date before start_date")
     
-    # 3. Save to DB
-    # Delete existing for date
-    # await db.execute(delete(Top10Daily).where(Top10Daily.date == target_date))
-    # await db.execute(delete(ScoreDaily).where(ScoreDaily.date == target_date))
-    # await db.execute(delete(FeatureDaily).where(FeatureDaily.date == target_date))
+    result = await refresh_features(db, start, end, symbols=symbols, force=force)
+    return {"message": result["message"]}
+
+@router.post("/revisions/apply", response_model=Message)
+async def apply_revisions(db: AsyncSession = Depends(get_db)):
+    """
+    Recompute features, scores and Top10 affected by pending price revisions
+    (past bars changed on re-import). See services.revisions.
+    """
+    from app.services.revisions import apply_price_revisions
+    result = await apply_price_revisions(db)
+    return {"message": result["message"]}
+
+@router.get("/quarantine", response_model=List[QuarantinedBarResponse])
+async def list_quarantined_bars(
+    symbol: Optional[str] = None,
+    limit: int = Query(100, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Pending bars that failed import validation (see services.validation), newest first.
+    """
+    from sqlalchemy import desc
+    from app.models import PriceQuarantine
+    stmt = select(PriceQuarantine).where(PriceQuarantine.resolved_at.is_(None))
+    if symbol:
+        stmt = stmt.where(PriceQuarantine.symbol == symbol)
+    res = await db.execute(stmt.order_by(desc(PriceQuarantine.id)).limit(limit))
+    return [QuarantinedBarResponse(
+        id=q.id, symbol=q.symbol, date=q.date,
+        open=q.open, high=q.high, low=q.low, close=q.close, volume=q.volume,
+        reasons=q.reasons or [], detail=q.detail, source=q.source, detected_at=q.detected_at
+    ) for q in res.scalars().all()]
+
+@router.post("/quarantine/resolve", response_model=Message)
+async def resolve_quarantined_bars(
+    ids: List[int] = Query(...),
+    action: str = Query(..., pattern="^(RELEASE|DISCARD)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    RELEASE quarantined bars into prices_daily as they are, or DISCARD them.
+    """
+    from app.services.validation import resolve_quarantine
+    result = await resolve_quarantine(db, ids, action)
+    message = f"{result['resolved']} bars {action.lower()}d"
+    if result["skipped"]:
+        message += f", {len(result['skipped'])} missing values left pending: {result['skipped']}"
+    return {"message": message}
+
+@router.post("/corporate-actions", response_model=Message)
+async def add_corporate_action_entry(
+    symbol: str,
+    ex_date: str = Query(..., description="Ex-date YYYY-MM-DD"),
+    kind: str = Query(..., pattern="^(SPLIT|DIVIDEND)$"),
+    ratio: Optional[float] = Query(None, description="SPLIT: shares after per share before (2.0 for 2-for-1)"),
+    cash: Optional[float] = Query(None, description="DIVIDEND: cash per share"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record a split or dividend. Updates the symbol's adjustment factors; the
+    features around the ex-date are recomputed by /revisions/apply.
+    """
+    from datetime import datetime
+    from app.services.adjustments import add_corporate_action
+    if await db.get(Symbol, symbol) is None:
+        raise HTTPException(status_code=404, detail="Symbol not found")
+    try:
+        result = await add_corporate_action(db, symbol, datetime.strptime(ex_date, "%Y-%m-%d").date(), kind,
+                                            ratio=ratio, cash=cash)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"{kind} for {symbol} on {ex_date} recorded (factor {result['factor']:.6f})"}
+
+@router.get("/corporate-actions", response_model=List[CorporateActionResponse])
+async def list_corporate_actions(symbol: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Recorded corporate actions with the cumulative price factor applied to the bars before each.
+    """
+    from app.models import CorporateAction, AdjustmentFactor
+    stmt = select(CorporateAction).order_by(CorporateAction.symbol, CorporateAction.ex_date)
+    factors = select(AdjustmentFactor.symbol, AdjustmentFactor.ex_date, AdjustmentFactor.cumulative)
+    if symbol:
+        stmt = stmt.where(CorporateAction.symbol == symbol)
+        factors = factors.where(AdjustmentFactor.symbol == symbol)
+    cumulative = {(s, d): c for s, d, c in (await db.execute(factors)).all()}
+    return [CorporateActionResponse(
+        id=a.id, symbol=a.symbol, ex_date=a.ex_date, kind=a.kind, ratio=a.ratio, cash=a.cash,
+        source=a.source, factor=cumulative.get((a.symbol, a.ex_date))
+    ) for a in (await db.execute(stmt)).scalars().all()]
+
+@router.post("/pipeline/run", response_model=Message)
+async def trigger_eod_pipeline(
+    background_tasks: BackgroundTasks,
+    date_str: Optional[str] = Query(None, description="Date YYYY-MM-DD, defaults to today in Settings.TIMEZONE"),
+    force: bool = False
+):
+    """
+    Run the end-of-day pipeline (import -> compute -> warm-up) now, in the background.
+    Same job the scheduler runs after the close.
+    """
+    from datetime import datetime
+    from app.services.scheduler import run_end_of_day_pipeline
+    target_date = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else None
     
-    # Save Features
-    for sym, row in df_today_features.iterrows():
-        # Check exist
-        existing = await db.scalar(select(FeatureDaily).where((FeatureDaily.symbol == sym) & (FeatureDaily.date == target_date)))
-        if not existing:
-            f = FeatureDaily(
-                symbol=sym, date=target_date,
-                ema50=row.get('ema50'), ema200=row.get('ema200'),
-                atr14_pct=row.get('atr14_pct'), dd60=row.get('dd60'),
-                rs_3m=row.get('rs_3m'), rs_6m=row.get('rs_6m'),
-                bo_120=row.get('bo_120'), vol_surge=row.get('vol_surge'),
-                up_ratio_20=row.get('up_ratio_20'), adv20_tl=row.get('adv20_tl')
-            )
-            db.add(f)
-            
-    # Save Scores
-    for sym, row in df_scored.iterrows():
-        existing = await db.scalar(select(ScoreDaily).where((ScoreDaily.symbol == sym) & (ScoreDaily.date == target_date)))
-        if not existing:
-            s = ScoreDaily(
-                symbol=sym, date=target_date,
-                potential_score=row['potential_score'],
-                risk_score=row['risk_score'],
-                final_score=row['final_score'],
-                explain_json=row['explain_json'] # JSON string? need to check model. Model says JSON type.
-                # ScoringEngine returns string in make_explain.
-                # PG JSON accepts string or dict. 
-            )
-            db.add(s)
+    background_tasks.add_task(run_end_of_day_pipeline, target_date, "MANUAL", force)
+    return {"message": f"EOD pipeline scheduled for {date_str or 'today'}"}
 
-    # Save Top 10
-    for _, row in df_top10.iterrows():
-        existing = await db.scalar(select(Top10Daily).where((Top10Daily.date == target_date) & (Top10Daily.top10_rank == row['rank']))) # Wait model has 'rank' col
-        # Check logic
-        t = Top10Daily(
-            date=target_date,
-            rank=row['rank'],
-            symbol=row['symbol'],
-            final_score=row['final_score'],
-            universe_tag=row['universe_tag']
-        )
-        db.add(t)
-        
-    await db.commit()
-    return {"message": f"Computed for {target_date}. Regime: {regime}, Candidates: {len(df_scored)}, Top10: {len(df_top10)}"}
+@router.post("/intraday/run", response_model=Message)
+async def trigger_intraday_session(background_tasks: BackgroundTasks):
+    """
+    Start today's provisional scoring from INTRADAY_FEED now, in the background
+    (e.g. after a restart mid-session). Poll GET /signals/top10/provisional.
+    """
+    from app.config import get_settings
+    from app.services.intraday import get_bar_feed
+    from app.services.scheduler import run_intraday_session
+    try:
+        get_bar_feed()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    background_tasks.add_task(run_intraday_session)
+    return {"message": f"Intraday session scheduled from {get_settings().INTRADAY_FEED}"}
 
+@router.get("/pipeline/runs", response_model=List[PipelineRunResponse])
+async def list_pipeline_runs(limit: int = 20, db: AsyncSession = Depends(get_db)):
+    """
+    Recent pipeline runs with per-stage durations.
+    """
+    from sqlalchemy import desc
+    from app.models import PipelineRun
+    stmt = select(PipelineRun).order_by(desc(PipelineRun.started_at)).limit(limit)
+    res = await db.execute(stmt)
+    
+    return [PipelineRunResponse(
+        run_id=r.run_id,
+        target_date=r.target_date,
+        trigger=r.trigger,
+        status=r.status,
+        started_at=r.started_at,
+        finished_at=r.finished_at,
+        duration_ms=r.duration_ms,
+        stages=r.stages_json or [],
+        message=r.message
+    ) for r in res.scalars().all()]
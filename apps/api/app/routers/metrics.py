@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+from app.database import engine
+from app.utils.metrics import render_metrics, update_pool_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    update_pool_metrics(engine)
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
@@ -4,40 +4,29 @@ from sqlalchemy.future import select
 from sqlalchemy import desc
 from typing import List, Optional
 from datetime import date
+import json
 from app.database import get_db
 from app.models import Top10Daily, ScoreDaily, FeatureDaily
-from app.schemas.signals import SignalResponse, Top10Item, ScoreDetail
+from app.schemas.signals import SignalResponse, ProvisionalSignalResponse, Top10Item, ScoreDetail
+from app.utils.cache import get_cache, SIGNALS_NS
 
 router = APIRouter()
 
-@router.get("/top10", response_model=SignalResponse)
-async def get_top10(
-    date: Optional[date] = None,
-    mode: str = Query("RISK_ON", description="Regime mode filter if applicable"),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Get Top 10 signals for a specific date. Defaults to today.
-    """
-    if date is None:
-        from datetime import date as dt_date
-        date = dt_date.today()
-    # Validate date?
-    
+async def build_top10(db: AsyncSession, date: date, mode: str) -> SignalResponse:
     # Get Top 10
     stmt = select(Top10Daily).where(Top10Daily.date == date).order_by(Top10Daily.rank)
     result = await db.execute(stmt)
     items = result.scalars().all()
-    
+
     if not items:
         # Fallback or 404? Return empty for now
         return SignalResponse(date=date, regime="UNKNOWN", top10=[])
-        
-    # Get Regime from scores or store it? 
-    # Current Top10 table doesn't have regime. 
+
+    # Get Regime from scores or store it?
+    # Current Top10 table doesn't have regime.
     # Use ScoreDaily of first item to find regime from explain_json?
     # Or just return what we have.
-    
+
     top10_list = []
     for item in items:
         top10_list.append(Top10Item(
@@ -45,26 +34,18 @@ async def get_top10(
             symbol=item.symbol,
             final_score=item.final_score
         ))
-        
+
     return SignalResponse(
         date=date,
         regime=mode, # Placeholder, we should store regime daily
         top10=top10_list
     )
 
-@router.get("/stock/{symbol}", response_model=List[ScoreDetail])
-async def get_stock_scores(
-    symbol: str, 
-    limit: int = 30,
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Get score history for a stock.
-    """
+async def build_stock_scores(db: AsyncSession, symbol: str, limit: int) -> List[ScoreDetail]:
     stmt = select(ScoreDaily).where(ScoreDaily.symbol == symbol).order_by(desc(ScoreDaily.date)).limit(limit)
     result = await db.execute(stmt)
     items = result.scalars().all()
-    
+
     res = []
     for i in items:
         res.append(ScoreDetail(
@@ -73,6 +54,77 @@ async def get_stock_scores(
             potential_score=i.potential_score,
             risk_score=i.risk_score,
             final_score=i.final_score,
-            explain_json=i.explain_json
+            # ScoringEngine stores explain as a JSON string
+            explain_json=json.loads(i.explain_json) if isinstance(i.explain_json, str) else i.explain_json
         ))
     return res
+
+@router.get("/top10", response_model=SignalResponse)
+async def get_top10(
+    date: Optional[date] = None,
+    mode: str = Query("RISK_ON", description="Regime mode filter if applicable"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get Top 10 signals for a specific date. Defaults to today.
+    """
+    if date is None:
+        from datetime import date as dt_date
+        date = dt_date.today()
+    # Validate date?
+
+    cache = get_cache()
+    key = await cache.key(SIGNALS_NS, "top10", date, mode)
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = await build_top10(db, date, mode)
+    await cache.set(key, response.model_dump(mode='json'))
+    return response
+
+@router.get("/top10/provisional", response_model=ProvisionalSignalResponse)
+async def get_provisional_top10(date: Optional[date] = None):
+    """
+    Latest intraday Top10 for a session (defaults to today), re-ranked from the
+    bar feed every INTRADAY_REFRESH_SECONDS. Gone once the day's EOD compute ran.
+    """
+    from app.services.intraday import provisional_key
+    if date is None:
+        from datetime import date as dt_date
+        date = dt_date.today()
+    result = await get_cache().get(await provisional_key(date))
+    if result is None:
+        raise HTTPException(status_code=404, detail="No provisional Top10 for this date")
+    return result
+
+@router.get("/stock/{symbol}", response_model=List[ScoreDetail])
+async def get_stock_scores(
+    symbol: str,
+    limit: int = 30,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get score history for a stock.
+    """
+    cache = get_cache()
+    key = await cache.key(SIGNALS_NS, "stock", symbol, limit)
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached
+
+    res = await build_stock_scores(db, symbol, limit)
+    await cache.set(key, [r.model_dump(mode='json') for r in res])
+    return res
+
+@router.get("/snapshot")
+async def get_snapshot():
+    """
+    Precomputed bundle for the web app's first paint (Top10, top symbols' score
+    histories, backtest presets), written by the post-compute warm-up.
+    """
+    from app.services.warmup import load_snapshot
+    snapshot = await load_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No snapshot yet")
+    return snapshot
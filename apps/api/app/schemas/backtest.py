@@ -8,7 +8,13 @@ class BacktestCreate(BaseModel):
     initial_capital: float = 100000.0
     fee_bps: float = 10.0
     slippage_bps: float = 8.0
+    atr_stop_mult: float = 2.0
+    time_stop_days: int = 56
+    top_n: int = 10
     
+class BacktestExtend(BaseModel):
+    end_date: date
+
 class BacktestTradeResponse(BaseModel):
     date: date
     symbol: str
@@ -25,6 +31,46 @@ class BacktestEquityPoint(BaseModel):
 class BacktestResultResponse(BaseModel):
     run_id: str
     status: str
+    progress: Optional[Dict[str, Any]] = None # latest progress event while PENDING/RUNNING
     metrics: Optional[Dict[str, Any]] = None
     trades: List[BacktestTradeResponse] = []
     equity_curve: List[BacktestEquityPoint] = []
+
+class ScoringWeights(BaseModel):
+    # Overrides of ScoringEngine's defaults; omitted entries keep them
+    potential: Optional[Dict[str, float]] = None
+    risk: Optional[Dict[str, float]] = None
+    risk_lambda: Optional[Dict[str, float]] = None
+
+class WeightSweepRequest(BaseModel):
+    start_date: date
+    end_date: date
+    weight_sets: List[ScoringWeights]
+    min_adv: float = 10_000
+    horizon_days: int = 5
+    include_top10: bool = False
+    # Run every weight set's Top10 history through the backtester (slow)
+    backtest: bool = False
+    initial_capital: float = 100000.0
+    fee_bps: float = 10.0
+    slippage_bps: float = 8.0
+
+class TuneRequest(BaseModel):
+    start_date: date
+    end_date: date
+    n_candidates: int = 81
+    eta: int = 3 # keep the best 1/eta per rung, next window eta times longer
+    min_days: int = 60 # shortest evaluation window (trading days)
+    objective: str = "sharpe"
+    seed: int = 0
+    min_adv: float = 10_000
+    initial_capital: float = 100000.0
+    fee_bps: float = 10.0
+    slippage_bps: float = 8.0
+
+class RobustnessRequest(BaseModel):
+    n_paths: int = 2000
+    block_days: int = 10 # bootstrap block length (trading days)
+    entry_shift_days: int = 2 # BUYs moved up to this many days earlier/later
+    slippage_bps: float = 10.0 # extra slippage per trade, drawn from U(0, slippage_bps)
+    seed: int = 0
@@ -0,0 +1,54 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import List, Optional, Dict, Any
+
+class PipelineRunResponse(BaseModel):
+    run_id: str
+    target_date: date
+    trigger: str
+    status: str
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    stages: List[Dict[str, Any]] = []
+    message: Optional[str] = None
+
+class CsvImportResponse(BaseModel):
+    import_id: str
+    path: str
+    status: str
+    byte_offset: Optional[int] = None
+    chunks: Optional[int] = None
+    rows_read: Optional[int] = None
+    rows_written: Optional[int] = None
+    rows_revised: Optional[int] = None
+    rows_rejected: Optional[int] = None
+    rows_quarantined: Optional[int] = None
+    started_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    message: Optional[str] = None
+
+class QuarantinedBarResponse(BaseModel):
+    id: int
+    symbol: str
+    date: date
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    close: Optional[float] = None
+    volume: Optional[float] = None
+    reasons: List[str] = []
+    detail: Optional[Dict[str, Any]] = None
+    source: Optional[str] = None
+    detected_at: Optional[datetime] = None
+
+class CorporateActionResponse(BaseModel):
+    id: int
+    symbol: str
+    ex_date: date
+    kind: str
+    ratio: Optional[float] = None
+    cash: Optional[float] = None
+    source: Optional[str] = None
+    factor: Optional[float] = None # cumulative price factor for the bars before ex_date
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
 from typing import Optional, Dict
 
 class SymbolResponse(BaseModel):
@@ -26,3 +26,11 @@ class SignalResponse(BaseModel):
     date: date
     regime: str
     top10: list[Top10Item]
+
+class ProvisionalSignalResponse(SignalResponse):
+    as_of: Optional[datetime] = None # last bar folded in
+    provisional: bool = True
+    ranked: int
+    traded: int # symbols with a bar today
+    updated_symbols: int # re-evaluated by the last refresh
+    refresh_ms: float
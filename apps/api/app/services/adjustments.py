@@ -0,0 +1,230 @@
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import structlog
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Symbol, PriceDaily, PriceRevision, CorporateAction, AdjustmentFactor
+from app.utils.metrics import timed_import
+
+logger = structlog.get_logger()
+
+# Corporate-action adjustment. prices_daily keeps the raw bars; splits and
+# dividends become one cumulative factor series per symbol (adjustment_factors,
+# a handful of rows) that is multiplied into price panels as they are built:
+# a bar's factor is the cumulative of the symbol's first ex-date after it.
+# A new action rewrites its symbol's series, never the price history.
+#
+# So prices_daily must hold unadjusted bars: YahooFinanceProvider downloads with
+# auto_adjust=False (Yahoo's dividend-adjusted close goes to adj_close, which no
+# computation reads), CSV imports are expected as traded. Yahoo does restate its
+# unadjusted close for splits, though: the bars before a split's ex-date come (and
+# are rewritten on re-import) already divided by the ratio. Symbols whose bars
+# come from such a source (symbols.price_source, SPLIT_ADJUSTED_SOURCES) take
+# dividends only; add_corporate_action refuses a SPLIT for them and
+# rebuild_factors skips recorded ones, so a split is never applied twice.
+# Databases filled by older builds (auto_adjust=True, dividends adjusted too) are
+# rewritten once with import_yahoo_prices(rebaseline=True).
+#
+# Units: the backtester works in today's units (adjust_prices(frame, factors)).
+# features_daily rows hold each date's own units (as_of=that date), so a
+# stored row only depends on actions that went ex on or before its date and
+# its EMAs compare directly with that day's raw close. A new action then only
+# moves the features whose windows span its ex-date, which is what a
+# PriceRevision on the ex-date recomputes (services/revisions.py).
+
+ACTION_KINDS = ('SPLIT', 'DIVIDEND')
+
+# Price sources whose bars are already split-adjusted (see above)
+SPLIT_ADJUSTED_SOURCES = ('YAHOO',)
+
+# Columns in price units, scaled by the price factor (volume by the volume factor)
+PRICE_VALUED = ('open', 'high', 'low', 'close', 'ema50', 'ema200')
+
+
+def action_factors(kind: str, ratio: Optional[float] = None, cash: Optional[float] = None,
+                   prev_close: Optional[float] = None) -> Tuple[float, float]:
+    """
+    (price factor, volume factor) of one action for the bars before its
+    ex-date. SPLIT: ratio shares after per share before (bonus issues too);
+    DIVIDEND: cash per share against the last close before the ex-date.
+    """
+    if kind == 'SPLIT':
+        if not ratio or ratio <= 0:
+            raise ValueError("SPLIT needs a positive ratio")
+        return 1.0 / ratio, ratio
+    if kind == 'DIVIDEND':
+        if cash is None or cash <= 0:
+            raise ValueError("DIVIDEND needs a positive cash amount")
+        if not prev_close or cash >= prev_close:
+            raise ValueError("DIVIDEND needs a close before the ex-date above the cash amount")
+        return 1.0 - cash / prev_close, 1.0
+    raise ValueError(f"Unknown corporate action kind {kind}")
+
+
+def factor_series(steps) -> "pd.DataFrame":
+    """
+    steps [ex_date, factor, volume_factor] (several per ex-date allowed) as one
+    row per ex-date with the cumulative products over it and every later one.
+    """
+    s = steps.groupby('ex_date')[['factor', 'volume_factor']].prod().sort_index(ascending=False)
+    s['cumulative'] = s['factor'].cumprod()
+    s['volume_cumulative'] = s['volume_factor'].cumprod()
+    return s.sort_index().reset_index()
+
+
+def factor_lookup(factors, symbols, dates, column: str = 'cumulative'):
+    """`column` of each (symbol, date)'s first ex-date after date, 1.0 where there is none."""
+    np = timed_import("numpy")
+    pd = timed_import("pandas")
+    out = np.ones(len(symbols))
+    if factors is None or factors.empty or not len(symbols):
+        return out
+    left = pd.DataFrame({'symbol': np.asarray(symbols, dtype=object), 'date': pd.to_datetime(np.asarray(dates)),
+                         'pos': np.arange(len(symbols))})
+    left = left[left['symbol'].isin(factors['symbol'])]
+    if left.empty:
+        return out
+    right = factors[['symbol', 'ex_date', column]].assign(ex_date=lambda f: pd.to_datetime(f['ex_date']))
+    merged = pd.merge_asof(left.sort_values('date'), right.sort_values('ex_date'), left_on='date', right_on='ex_date',
+                           by='symbol', direction='forward', allow_exact_matches=False)
+    out[merged['pos'].to_numpy()] = merged[column].fillna(1.0).to_numpy()
+    return out
+
+
+def _relative(factors, symbols, dates, as_of: Optional[date], column: str = 'cumulative'):
+    np = timed_import("numpy")
+    f = factor_lookup(factors, symbols, dates, column)
+    if as_of is not None:
+        f = f / factor_lookup(factors, symbols, np.full(len(symbols), as_of), column)
+    return f
+
+
+def adjust_prices(frame, factors, as_of: Optional[date] = None):
+    """
+    frame back-adjusted: PRICE_VALUED columns times each row's price factor,
+    volume times its volume factor. as_of: in that date's units instead of
+    today's. frame has a symbol column and date as column or index; returned
+    as is when no factor applies.
+    """
+    if factors is None or factors.empty or frame.empty:
+        return frame
+    dates = frame['date'] if 'date' in frame.columns else frame.index
+    symbols = frame['symbol'].to_numpy()
+    price = _relative(factors, symbols, dates, as_of)
+    volume = _relative(factors, symbols, dates, as_of, 'volume_cumulative') if 'volume' in frame.columns else None
+    if (price == 1).all() and (volume is None or (volume == 1).all()):
+        return frame
+    frame = frame.copy()
+    for col in PRICE_VALUED:
+        if col in frame.columns:
+            frame[col] = frame[col].to_numpy(dtype=float) * price
+    if volume is not None:
+        frame['volume'] = frame['volume'].to_numpy(dtype=float) * volume
+    return frame
+
+
+def to_own_units(features, factors, as_of: date):
+    """
+    Features computed from an adjust_prices(as_of) panel (index symbol, date)
+    with the price-valued ones converted to each row's own date's units, as
+    features_daily stores them.
+    """
+    if factors is None or factors.empty or features.empty:
+        return features
+    symbols = features.index.get_level_values('symbol').to_numpy()
+    dates = features.index.get_level_values('date')
+    scale = 1.0 / _relative(factors, symbols, dates, as_of)
+    columns = [c for c in PRICE_VALUED if c in features.columns]
+    if (scale == 1).all() or not columns:
+        return features
+    features = features.copy()
+    for col in columns:
+        features[col] = features[col].to_numpy(dtype=float) * scale
+    return features
+
+
+async def load_factors(db: AsyncSession, symbols: Optional[List[str]] = None, after: Optional[date] = None):
+    """adjustment_factors rows [symbol, ex_date, cumulative, volume_cumulative]; ex_date > after is all bars from after on need."""
+    pd = timed_import("pandas")
+    cols = ['symbol', 'ex_date', 'cumulative', 'volume_cumulative']
+    stmt = select(*[getattr(AdjustmentFactor, c) for c in cols])
+    if symbols is not None:
+        stmt = stmt.where(AdjustmentFactor.symbol.in_(list(symbols)))
+    if after is not None:
+        stmt = stmt.where(AdjustmentFactor.ex_date > after)
+    return pd.DataFrame((await db.execute(stmt)).all(), columns=cols)
+
+
+async def _prev_close(db: AsyncSession, symbol: str, ex_date: date) -> Optional[float]:
+    return (await db.execute(
+        select(PriceDaily.close).where(PriceDaily.symbol == symbol, PriceDaily.date < ex_date)
+        .order_by(PriceDaily.date.desc()).limit(1)
+    )).scalar()
+
+
+async def splits_in_prices(db: AsyncSession, symbol: str) -> bool:
+    """True when the symbol's stored bars are already split-adjusted by their source."""
+    return await db.scalar(select(Symbol.price_source).where(Symbol.symbol == symbol)) in SPLIT_ADJUSTED_SOURCES
+
+
+async def rebuild_factors(db: AsyncSession, symbol: str):
+    """
+    Rewrite a symbol's adjustment_factors from its corporate_actions (SPLITs
+    left out when splits_in_prices). Returns the series. Does not commit.
+    """
+    pd = timed_import("pandas")
+    actions = (await db.execute(
+        select(CorporateAction).where(CorporateAction.symbol == symbol).order_by(CorporateAction.ex_date)
+    )).scalars().all()
+    skip_splits = any(a.kind == 'SPLIT' for a in actions) and await splits_in_prices(db, symbol)
+    steps = []
+    for a in actions:
+        if skip_splits and a.kind == 'SPLIT':
+            logger.warning("Split skipped, bars are split-adjusted by their source", symbol=symbol,
+                           ex_date=str(a.ex_date))
+            continue
+        prev_close = await _prev_close(db, symbol, a.ex_date) if a.kind == 'DIVIDEND' else None
+        try:
+            factor, volume_factor = action_factors(a.kind, a.ratio, a.cash, prev_close)
+        except ValueError as e:
+            logger.warning("Corporate action skipped", symbol=symbol, ex_date=str(a.ex_date), error=str(e))
+            continue
+        steps.append({'ex_date': a.ex_date, 'factor': factor, 'volume_factor': volume_factor})
+
+    await db.execute(delete(AdjustmentFactor).where(AdjustmentFactor.symbol == symbol))
+    if not steps:
+        return pd.DataFrame(columns=['ex_date', 'factor', 'volume_factor', 'cumulative', 'volume_cumulative'])
+    series = factor_series(pd.DataFrame(steps))
+    await db.execute(insert(AdjustmentFactor), [{'symbol': symbol, **r} for r in series.to_dict('records')])
+    return series
+
+
+async def add_corporate_action(db: AsyncSession, symbol: str, ex_date: date, kind: str,
+                               ratio: Optional[float] = None, cash: Optional[float] = None,
+                               source: str = "MANUAL") -> dict:
+    """
+    Record a corporate action and rebuild the symbol's factor series. The
+    features it moves are queued as a PriceRevision on the ex-date (applied by
+    apply_price_revisions). ValueError for an invalid action, or a SPLIT of a
+    symbol whose bars are split-adjusted already. Commits.
+    """
+    kind = kind.upper()
+    if kind == 'SPLIT' and await splits_in_prices(db, symbol):
+        raise ValueError(f"{symbol} prices are split-adjusted by their source, a SPLIT would be applied twice")
+    prev_close = await _prev_close(db, symbol, ex_date) if kind == 'DIVIDEND' else None
+    factor, volume_factor = action_factors(kind, ratio, cash, prev_close)
+
+    day_before = ex_date - timedelta(days=1)
+    old = factor_lookup(await load_factors(db, [symbol], day_before), [symbol], [day_before])[0]
+    db.add(CorporateAction(symbol=symbol, ex_date=ex_date, kind=kind, ratio=ratio, cash=cash, source=source))
+    await db.flush()
+    series = await rebuild_factors(db, symbol)
+    new = factor_lookup(series.assign(symbol=symbol), [symbol], [day_before])[0]
+    db.add(PriceRevision(symbol=symbol, date=ex_date, changes={'adjustment': [float(old), float(new)]},
+                         source="CORPORATE_ACTION"))
+    await db.commit()
+    logger.info("Corporate action added", symbol=symbol, ex_date=str(ex_date), kind=kind, factor=factor)
+    return {"symbol": symbol, "ex_date": ex_date, "kind": kind, "factor": factor, "volume_factor": volume_factor,
+            "ex_dates": len(series)}
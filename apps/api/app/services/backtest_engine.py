@@ -1,381 +1,531 @@
 import pandas as pd
 import numpy as np
+from dataclasses import dataclass, replace
 from datetime import timedelta, date
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 # Removing DB imports to keep engine pure logic, will return dicts
 # The service wrapper will save to DB
+from app.services.performance import performance_metrics, TRADE_DTYPE
+from app.services.backtest_kernel import run_days, HAVE_NUMBA
+
+CHECKPOINT_VERSION = 1
+
+BUY, SELL = 1, -1
+REASONS = ("REBALANCE", "TREND_STOP", "ATR_STOP", "TIME_STOP") # trade reason codes
+
+TRADE_LOG_DTYPE = np.dtype([
+    ('day', 'i4'), # timeline index
+    ('symbol', 'i4'), # code into MarketPanels.symbols
+    ('side', 'i1'),
+    ('qty', 'f8'),
+    ('price', 'f8'),
+    ('fee', 'f8'),
+    ('slippage', 'f8'),
+    ('reason', 'i1'),
+])
+
+
+class TradeLog:
+    """Fills as a structured array (TRADE_LOG_DTYPE), grown by doubling."""
+    __slots__ = ('rows', 'n')
+
+    def __init__(self, capacity: int = 256):
+        self.rows = np.empty(capacity, dtype=TRADE_LOG_DTYPE)
+        self.n = 0
+
+    def append(self, day: int, symbol: int, side: int, qty: float, price: float,
+               fee: float, slippage: float, reason: int):
+        self.reserve(1)
+        self.rows[self.n] = (day, symbol, side, qty, price, fee, slippage, reason)
+        self.n += 1
+
+    def reserve(self, n: int):
+        """Room for at least n more rows."""
+        if self.n + n > len(self.rows):
+            grown = np.empty(max(2 * len(self.rows), self.n + n), dtype=TRADE_LOG_DTYPE)
+            grown[:self.n] = self.rows[:self.n]
+            self.rows = grown
+
+    def view(self) -> np.ndarray:
+        return self.rows[:self.n]
+
+    def __len__(self):
+        return self.n
+
+
+@dataclass
+class MarketPanels:
+    """
+    Engine inputs as dense (day, symbol) arrays over the timeline, NaN where
+    there's no data. has_price / has_feature tell a missing row apart from a
+    row with NaN values (a held symbol without a price row isn't stop-checked).
+    """
+    timeline: List[date]
+    days: pd.DatetimeIndex # timeline as Timestamps
+    symbols: List[str]
+    open: np.ndarray
+    close: np.ndarray
+    has_price: np.ndarray
+    ema50: np.ndarray
+    atr14: np.ndarray
+    has_feature: np.ndarray
+    atr_fallback: bool # no atr14 column: stop distance is 5% of the close
+    risk_on: np.ndarray # (D,) index close > ema50
+    benchmark: np.ndarray # (D,) index close, 0 where missing
+    targets: Dict[int, np.ndarray] # day -> Top10 symbol codes by rank
+
+    def target_matrix(self):
+        """Targets as a (day, k) code matrix padded with -1, and the count per day."""
+        n_targets = np.zeros(len(self.timeline), dtype=np.int64)
+        width = max((len(t) for t in self.targets.values()), default=0)
+        matrix = np.full((len(self.timeline), max(width, 1)), -1, dtype=np.int64)
+        for day, picks in self.targets.items():
+            matrix[day, :len(picks)] = picks
+            n_targets[day] = len(picks)
+        return matrix, n_targets
+
+    @classmethod
+    def build(cls, timeline: List[date], top10_history: pd.DataFrame, feature_history: pd.DataFrame,
+              price_history: Dict[str, pd.DataFrame], index_history: pd.DataFrame,
+              extra_symbols=()) -> "MarketPanels":
+        days = pd.DatetimeIndex(timeline)
+        top_symbols = top10_history['symbol'].astype(str).unique() if len(top10_history) else []
+        symbols = sorted(set(price_history) | set(top_symbols) | set(extra_symbols))
+        codes = pd.Index(symbols)
+        shape = (len(days), len(symbols))
+
+        open_, close = np.full(shape, np.nan), np.full(shape, np.nan)
+        has_price = np.zeros(shape, dtype=bool)
+        for sym, df in price_history.items():
+            rows = df.index.get_indexer(days)
+            found = rows >= 0
+            c = codes.get_loc(sym)
+            has_price[found, c] = True
+            open_[found, c] = df['open'].to_numpy(dtype=float)[rows[found]]
+            close[found, c] = df['close'].to_numpy(dtype=float)[rows[found]]
+
+        ema50, atr14 = np.full(shape, np.nan), np.full(shape, np.nan)
+        has_feature = np.zeros(shape, dtype=bool)
+        if len(feature_history):
+            d = days.get_indexer(feature_history.index.get_level_values(0))
+            s = codes.get_indexer(feature_history.index.get_level_values(1))
+            keep = (d >= 0) & (s >= 0)
+            d, s = d[keep], s[keep]
+            has_feature[d, s] = True
+            for col, panel in (('ema50', ema50), ('atr14', atr14)):
+                if col in feature_history.columns:
+                    panel[d, s] = feature_history[col].to_numpy(dtype=float)[keep]
+
+        risk_on = np.zeros(len(days), dtype=bool)
+        benchmark = np.zeros(len(days))
+        if len(index_history):
+            idx = index_history.reindex(days)
+            found = days.isin(index_history.index)
+            benchmark = np.where(found, idx['close'].to_numpy(dtype=float), 0.0)
+            if 'ema50' in idx.columns:
+                ema = idx['ema50'].to_numpy(dtype=float)
+                with np.errstate(invalid='ignore'):
+                    risk_on = found & (idx['close'].to_numpy(dtype=float) > ema)
+
+        panels = cls(
+            timeline=timeline, days=days, symbols=symbols, open=open_, close=close, has_price=has_price,
+            ema50=ema50, atr14=atr14, has_feature=has_feature,
+            atr_fallback='atr14' not in feature_history.columns,
+            risk_on=risk_on, benchmark=benchmark, targets={},
+        )
+        return panels.with_targets(top10_history)
+
+    def with_targets(self, top10_history: pd.DataFrame) -> Optional["MarketPanels"]:
+        """Same market data with another Top10 history; None if it names symbols without a slot."""
+        targets = {}
+        if len(top10_history):
+            d = self.days.get_indexer(top10_history.index.get_level_values(0))
+            ranks = top10_history.index.get_level_values(1).to_numpy()
+            s = pd.Index(self.symbols).get_indexer(top10_history['symbol'].astype(str))
+            keep = d >= 0
+            d, ranks, s = d[keep], ranks[keep], s[keep]
+            if (s < 0).any():
+                return None
+            order = np.lexsort((ranks, d))
+            d, s = d[order], s[order]
+            bounds = np.flatnonzero(np.diff(d)) + 1
+            for day, picks in zip(d[np.r_[0, bounds]] if len(d) else [], np.split(s, bounds)):
+                targets[int(day)] = picks
+        return replace(self, targets=targets)
+
+
+class RunningMetrics:
+    """
+    Equity-curve statistics updated one day at a time, so a run continued
+    from a checkpoint doesn't need its earlier curve: running peak and max
+    drawdown, Welford mean/variance of daily returns, trade count.
+    """
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.last_equity = state.get('last_equity')
+        self.peak = state.get('peak')
+        self.max_dd = state.get('max_dd', 0.0)
+        self.n = state.get('n', 0)
+        self.mean = state.get('mean', 0.0)
+        self.m2 = state.get('m2', 0.0)
+        self.trades = state.get('trades', 0)
+
+    def update(self, equity: float):
+        if self.last_equity:
+            r = equity / self.last_equity - 1
+            self.n += 1
+            delta = r - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (r - self.mean)
+        self.last_equity = equity
+        self.peak = equity if self.peak is None else max(self.peak, equity)
+        if self.peak:
+            self.max_dd = min(self.max_dd, (equity - self.peak) / self.peak)
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "last_equity": self.last_equity, "peak": self.peak, "max_dd": self.max_dd,
+            "n": self.n, "mean": self.mean, "m2": self.m2, "trades": self.trades,
+        }
+
+    def summary(self, initial_capital: float, start_date: date, end_date: date) -> Dict[str, Any]:
+        # CAGR
+        years = (end_date - start_date).days / 365.25
+        final_eq = self.last_equity
+        cagr = (final_eq / initial_capital) ** (1/years) - 1 if years > 0 else 0
+        
+        # Sharpe (Daily returns)
+        std = (self.m2 / (self.n - 1)) ** 0.5 if self.n > 1 else 0
+        sharpe = (self.mean / std) * (252**0.5) if std != 0 else 0
+        
+        return {
+            "cagr": round(cagr * 100, 2),
+            "max_dd": round(self.max_dd * 100, 2),
+            "sharpe": round(sharpe, 2),
+            "final_equity": round(final_eq, 2),
+            "total_trades": self.trades
+        }
+
 
 class BacktestEngine:
-    def __init__(self):
-        pass
+    BACKENDS = ("auto", "numpy", "kernel")
+
+    def __init__(self, backend: str = "auto"):
+        """
+        backend: "numpy" runs the daily loop below; "kernel" runs
+        backtest_kernel.run_days (numba-compiled when installed, plain Python
+        otherwise); "auto" picks the kernel only when numba is available.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend. Use one of {list(self.BACKENDS)}")
+        if backend == "auto":
+            backend = "kernel" if HAVE_NUMBA else "numpy"
+        self.backend = backend
+        # Market panels of the last run, reused while the same input objects come
+        # back with only another Top10 history (weight sweeps, tuning). Inputs are read-only.
+        self._cached = None
+
+    def _panels(self, timeline, top10_history, feature_history, price_history, index_history, extra_symbols):
+        inputs = (feature_history, price_history, index_history)
+        if self._cached is not None:
+            cached_inputs, cached = self._cached
+            if (all(a is b for a, b in zip(inputs, cached_inputs)) and cached.timeline == timeline
+                    and set(extra_symbols) <= set(cached.symbols)):
+                panels = cached.with_targets(top10_history)
+                if panels is not None:
+                    return panels
+        panels = MarketPanels.build(timeline, top10_history, feature_history, price_history, index_history, extra_symbols)
+        self._cached = (inputs, panels)
+        return panels
 
     async def run_backtest(self, params: Dict[str, Any], top10_history: pd.DataFrame, 
                            feature_history: pd.DataFrame, price_history: Dict[str, pd.DataFrame],
-                           index_history: pd.DataFrame) -> Dict[str, Any]:
+                           index_history: pd.DataFrame, checkpoint: Optional[Dict[str, Any]] = None,
+                           progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                           progress_every: Optional[int] = None, records: bool = True) -> Dict[str, Any]:
         """
         Run backtest simulation.
         top10_history: DataFrame with multi-index (date, rank) -> symbol, final_score
-            Should be indexed by DATE. If multi-index, we'll slice.
         feature_history: DataFrame with multi-index (date, symbol) -> ema50, atr14, etc.
         price_history: Dict[symbol] -> DataFrame[date] -> open, close, etc.
         index_history: DataFrame[date] -> ema50, close (for regime)
+        checkpoint: state returned by an earlier run ("checkpoint"); the run then
+            continues after its last day up to params['end_date']. Only the new
+            days are simulated and returned; metrics cover the whole run.
+            Inputs need to start at the checkpoint's last day (stops and
+            rebalances read the previous day).
+        progress: awaited every `progress_every` simulated days (default ~1% of
+            the timeline) and on the last one, with the day count, current
+            equity and the equity points / trades added since the previous event.
+        records: return equity_curve / trades as lists of dicts (API responses,
+            persistence). Sweeps only read metrics and skip them.
+
+        State is kept in arrays over the symbol codes of MarketPanels (holdings,
+        equity per day) and a TradeLog; dicts are only built for the result.
         """
         
-        start_date = pd.to_datetime(params.get('start_date')).date()
-        end_date = pd.to_datetime(params.get('end_date')).date()
+        start_date = date.fromisoformat(str(params.get('start_date'))[:10])
+        end_date = date.fromisoformat(str(params.get('end_date'))[:10])
         initial_capital = float(params.get('initial_capital', 100_000.0))
         fee_bps = float(params.get('fee_bps', 10.0))
         slippage_bps = float(params.get('slippage_bps', 8.0))
+        # Strategy knobs (defaults are the production rules)
+        atr_stop_mult = float(params.get('atr_stop_mult', 2.0))
+        time_stop_days = int(params.get('time_stop_days', 56))
+        top_n = int(params.get('top_n', 10)) # RISK_ON names; RISK_OFF holds 70% of that
+        top_n_risk_off = max(1, round(top_n * 0.7))
+        # Risk ON: 100% invested / 10 = 10% each; Risk OFF: 70% / 7 = 10% each
+        target_weight = 1.0 / top_n
+        buy_mult = 1 + slippage_bps / 10000.0
+        sell_mult = 1 - slippage_bps / 10000.0
+        fee_rate = fee_bps / 10000.0
+
+        cash = initial_capital
+        stats = RunningMetrics()
+        first_day = start_date
+        held_before = {}
         
-        # Helper to get price
-        def get_price_row(sym, dt):
-            if sym not in price_history: return None
-            df = price_history[sym]
-            if dt in df.index:
-                return df.loc[dt]
-            return None
-
-        def get_feature_row(sym, dt):
-            try:
-                # features might serve 'date' as index level 0
-                # We assume features are sorted and aligned
-                return feature_history.loc[(pd.to_datetime(dt), sym)]
-            except KeyError:
-                return None
+        if checkpoint is not None:
+            if checkpoint.get('version') != CHECKPOINT_VERSION:
+                return {"error": "Unsupported checkpoint version"}
+            start_date = date.fromisoformat(checkpoint['start_date'])
+            initial_capital = float(checkpoint['initial_capital'])
+            cash = float(checkpoint['cash'])
+            held_before = checkpoint['holdings']
+            stats = RunningMetrics(checkpoint['metrics'])
+            first_day = date.fromisoformat(checkpoint['last_date'])
 
         # Build timeline from index history (business days)
-        timeline = sorted([d.date() for d in index_history.index if start_date <= d.date() <= end_date])
+        timeline = sorted([d.date() for d in index_history.index if first_day <= d.date() <= end_date])
+        if checkpoint is not None and (not timeline or timeline[0] != first_day):
+            # The checkpoint day is only the "previous day" of the first new one
+            timeline.insert(0, first_day)
         if not timeline:
             return {"error": "No timeline generated from index history within date range"}
 
-        # State
-        cash = initial_capital
-        holdings = {} # symbol -> {qty, entry_price, entry_date, stop_price}
-        equity_curve = []
-        trades = []
-        
-        portfolio_value = initial_capital
+        m = self._panels(timeline, top10_history, feature_history, price_history, index_history, held_before)
+        n_symbols = len(m.symbols)
+        ordinals = np.array([d.toordinal() for d in timeline])
+
+        # Holdings, one slot per symbol code
+        held = np.zeros(n_symbols, dtype=bool)
+        qty = np.zeros(n_symbols)
+        entry_price = np.zeros(n_symbols)
+        entry_ord = np.zeros(n_symbols, dtype=np.int64)
+        stop_price = np.zeros(n_symbols)
+        for sym, h in held_before.items():
+            c = m.symbols.index(sym)
+            held[c] = True
+            qty[c], entry_price[c], stop_price[c] = h['qty'], h['entry_price'], h['stop_price']
+            entry_ord[c] = date.fromisoformat(h['entry_date']).toordinal()
+
+        first_index = 1 if checkpoint is not None else 0
+        n_days = len(timeline) - first_index
+        equity = np.empty(n_days)
+        cash_curve = np.empty(n_days)
+        holdings_count = np.empty(n_days, dtype=np.int32)
+        log = TradeLog()
+
+        every = progress_every or max(1, n_days // 100)
+        reported_equity = reported_trades = 0
+        in_target = np.zeros(n_symbols, dtype=bool)
         
-        for i, today in enumerate(timeline):
-            dt_ts = pd.to_datetime(today)
-            is_monday = today.weekday() == 0
-            
-            # 1. Determine Target Universe (if Rebalance Day)
-            target_symbols = []
-            target_weight = 0.0
-            rebalance_day = False
-            
-            if is_monday:
-                rebalance_day = True
-                # Look at previous valid day (Friday)
-                prev_idx = i - 1
-                if prev_idx >= 0:
-                    prev_date = timeline[prev_idx]
-                    prev_ts = pd.to_datetime(prev_date)
-                    
-                    # Check Regime on Prev Date
-                    regime = "RISK_OFF"
-                    if prev_ts in index_history.index:
-                        idx_row = index_history.loc[prev_ts]
-                        # Assuming index_history is already pre-computed or we classify here?
-                        # Let's rely on 'scores' logic or simple Check
-                        # RISK_ON if close > ema50 AND ema50 > ema50_lag10
-                        # We might not have computed EMA explicitly here if passed raw
-                        # For MVP assume basic risk on/off or check provided logic
-                        # Let's check EMA50
-                        if 'ema50' in idx_row and pd.notnull(idx_row['ema50']):
-                             # We need lag10. Hard to get efficiently in loop without full series.
-                             # Assume RISK_ON for now unless we import ScoringEngine. 
-                             # Simpler: Assume RISK_ON = True for MVP or check simple close > ema50
-                             if idx_row['close'] > idx_row['ema50']:
-                                 regime = "RISK_ON"
-                    
-                    # Load Top 10
-                    # top10_history usually (date, rank) multiindex
-                    # Slice for prev_ts
-                    try:
-                        # top10_history index is (date, rank)
-                        daily_top = top10_history.loc[prev_ts]
-                        # Sort by rank just in case
-                        daily_top = daily_top.sort_index()
-                        
-                        top_n = 10 if regime == "RISK_ON" else 7
-                        top_list = daily_top.iloc[:top_n]
-                        target_symbols = top_list['symbol'].tolist()
-                        
-                        # Weighting
-                        # Risk ON: 100% invest / 10 = 10%
-                        # Risk OFF: 70% invest / 7 = 10%
-                        target_weight = 0.10
-                        
-                    except KeyError:
-                        # No signals for yesterday
-                        pass
-
-            # 2. Check STOPS (based on Yesterday Close)
-            stops_triggered = set() # symbols
-            if i > 0:
-                prev_date = timeline[i-1]
-                prev_ts = pd.to_datetime(prev_date)
-                
-                for sym, h in holdings.items():
-                    p_row = get_price_row(sym, prev_date)
-                    f_row = get_feature_row(sym, prev_date)
-                    
-                    if p_row is None: continue
-                    
-                    close_price = p_row['close']
-                    reason = None
-                    
-                    # Trend Stop: Close < EMA50
-                    if f_row is not None and 'ema50' in f_row:
-                        if close_price < f_row['ema50']:
-                            reason = "TREND_STOP"
-                            
-                    # ATR Stop
-                    if not reason and close_price < h['stop_price']:
-                        reason = "ATR_STOP"
-                        
-                    # Time Stop (8 weeks = 56 days)
-                    if not reason:
-                        days_held = (today - h['entry_date']).days
-                        if days_held >= 56:
-                            reason = "TIME_STOP"
-                            
-                    if reason:
-                        stops_triggered.add(sym)
-                        # Log intent ?
-                        
-            # 3. EXECUTE TRADES at OPEN
-            # Order: Sells first, then Buys
-            
-            # A. Sells
-            # We sell if:
-            # 1. Stop triggered (Force sell)
-            # 2. Rebalance: not in target (Sell all)
-            # 3. Rebalance: in target but weight adjustment? (MVP: Sell/Rebuy logic or simplified)
-            #    Simpler: Sell if not in target. If in target, we ideally hold. 
-            #    But if we want strictly equal weight, we might trim. 
-            #    Let's stick to "Sell if not in target" for MVP to minimize turnover cost, 
-            #    OR "Sell all and Rebuy" (costly).
-            #    "Sell if not in target" + "Buy if new" is better.
-            
-            # List of things to sell
-            to_sell = set()
-            
-            # Stops
-            to_sell.update(stops_triggered)
-            
-            # Rebalance removals
-            if rebalance_day:
-                for sym in holdings.keys():
-                    if sym not in target_symbols:
-                        to_sell.add(sym)
-            
-            # Execute Sells
-            for sym in list(to_sell):
-                if sym not in holdings: continue
-                
-                h = holdings[sym]
-                p_row = get_price_row(sym, today)
-                if p_row is None: continue # Can't trade (halted/no data) -> skip
-                
-                open_price = p_row['open']
-                if np.isnan(open_price): continue
-                
-                qty = h['qty']
-                
-                # Apply slippage
-                exec_price = open_price * (1 - slippage_bps/10000.0)
-                gross_proceeds = qty * exec_price
-                fee = gross_proceeds * (fee_bps/10000.0)
-                net_proceeds = gross_proceeds - fee
-                
-                cash += net_proceeds
-                del holdings[sym]
-                
-                trades.append({
-                    "run_id": params.get('run_id'),
-                    "date": today,
-                    "symbol": sym,
-                    "action": "SELL",
-                    "qty": qty,
-                    "price": exec_price,
-                    "fee": fee,
-                    "slippage": open_price - exec_price,
-                    "reason": "STOP" if sym in stops_triggered else "REBALANCE"
-                })
+        # Days run in segments between progress events (one segment without a callback)
+        segment = max(1, every if progress is not None else n_days)
+        if self.backend == "kernel":
+            targets, n_targets = m.target_matrix()
+            is_monday = np.array([d.weekday() == 0 for d in timeline])
+        for seg_start in range(first_index, len(timeline), segment):
+            seg_stop = min(seg_start + segment, len(timeline))
+            if self.backend == "kernel":
+                i = seg_start
+                while i < seg_stop:
+                    # The kernel returns early when the log may overflow; grow it and go on
+                    log.reserve(n_symbols + top_n)
+                    rows = log.rows
+                    i, log.n, cash = run_days(
+                        i, seg_stop, is_monday, ordinals, m.open, m.close, m.has_price, m.ema50, m.atr14,
+                        m.has_feature, m.atr_fallback, m.risk_on, targets, n_targets, top_n, top_n_risk_off,
+                        target_weight, buy_mult, sell_mult, fee_rate, slippage_bps / 10000.0, atr_stop_mult,
+                        time_stop_days, first_index, cash, held, qty, entry_price, entry_ord, stop_price,
+                        equity, cash_curve, holdings_count,
+                        rows['day'], rows['symbol'], rows['side'], rows['qty'], rows['price'], rows['fee'],
+                        rows['slippage'], rows['reason'], log.n,
+                    )
+            else:
+                for i in range(seg_start, seg_stop):
+                    # 1. Rebalance on Mondays, to the previous day's Top N
+                    rebalance_day = timeline[i].weekday() == 0
+                    target = np.array([], dtype=np.intp)
+                    if rebalance_day and i > 0:
+                        n_names = top_n if m.risk_on[i - 1] else top_n_risk_off
+                        target = m.targets.get(i - 1, target)[:n_names]
+                    in_target[:] = False
+                    in_target[target] = True
 
-            # B. Buys (Only on Rebalance Day)
-            # Cash Stays rule: If we sold a stop mid-week, cash sits until next Monday.
-            
-            if rebalance_day and target_symbols:
-                # Calculate target value per stock
-                # Total Portfolio Value at this moment = Cash + Holdings Value
-                # We want each target to be 10% of TOTAL Value? Or 10% of INITIAL?
-                # Usually % of Current Equity.
-                # Re-calc equity with updated cash
-                current_equity = cash + sum(
-                    holdings[s]['qty'] * get_price_row(s, today)['open'] 
-                    for s in holdings if get_price_row(s, today) is not None
-                )
-                
-                target_per_stock = current_equity * target_weight
+                    # 2. Stops on the previous close: trend (close < EMA50), ATR, time
+                    reason = np.zeros(n_symbols, dtype=np.int8)
+                    if i > 0:
+                        checked = held & m.has_price[i - 1]
+                        prev_close = m.close[i - 1]
+                        with np.errstate(invalid='ignore'):
+                            trend = checked & m.has_feature[i - 1] & (prev_close < m.ema50[i - 1])
+                            atr = checked & ~trend & (prev_close < stop_price)
+                        timed = checked & ~trend & ~atr & ((ordinals[i] - entry_ord) >= time_stop_days)
+                        reason[trend], reason[atr], reason[timed] = 1, 2, 3
+                    stopped = reason > 0
+
+                    # 3. Execute at the open: sells first (stops and names dropped on rebalance)
+                    open_today = m.open[i]
+                    tradable = m.has_price[i] & ~np.isnan(open_today)
+                    to_sell = stopped | (held & ~in_target) if rebalance_day else stopped
+                    for c in np.flatnonzero(to_sell & held & tradable):
+                        exec_price = open_today[c] * sell_mult
+                        gross_proceeds = qty[c] * exec_price
+                        fee = gross_proceeds * fee_rate
+                        cash += gross_proceeds - fee
+                        held[c] = False
+                        log.append(i, c, SELL, qty[c], exec_price, fee, open_today[c] - exec_price, reason[c])
+
+                    # Buys only on rebalance days; cash freed by a mid-week stop waits until Monday
+                    if len(target):
+                        valued = held & tradable
+                        current_equity = cash + float(np.dot(qty[valued], open_today[valued]))
+                        target_per_stock = current_equity * target_weight
                 
-                # Buy new targets
-                for sym in target_symbols:
-                    if sym in holdings:
-                        continue # Already hold, skip re-weighting for MVP to save fees
-                    
-                    if sym in stops_triggered:
-                        continue # Don't buy back immediately if just stopped? (Wash sale/logical)
-                    
-                    # Check price
-                    p_row = get_price_row(sym, today)
-                    f_row = get_feature_row(sym, today) # We need ATR for stop!
-                    # Wait, stop is set at ENTRY. We need ATR from "Yesterday" (Signal day) or Today?
-                    # Usually we use ATR from Signal Day (Friday/Yesterday).
-                    prev_date = timeline[i-1] if i>0 else None
-                    if not prev_date: continue
-                    
-                    f_prev = get_feature_row(sym, prev_date)
-                    p_prev_close = get_price_row(sym, prev_date)
-                    
-                    if p_row is None or f_prev is None or p_prev_close is None: continue
+                        for c in target:
+                            # Held names aren't re-weighted (saves fees); just-stopped ones aren't bought back
+                            if held[c] or stopped[c]:
+                                continue
+                            # Stop distance uses the signal day's (previous) ATR
+                            if not (tradable[c] and m.has_feature[i - 1, c] and m.has_price[i - 1, c]):
+                                continue
+                            open_price = open_today[c]
+                            cost_basis = open_price * buy_mult
                     
-                    open_price = p_row['open']
-                    if np.isnan(open_price): continue
+                            # Target amount, capped by the cash left
+                            amount_to_buy = min(target_per_stock, cash) if cash < target_per_stock * 0.9 else target_per_stock
+                            if amount_to_buy < 100: continue # Min trade size
                     
-                    # Check Cash
-                    cost_basis = open_price * (1 + slippage_bps/10000.0)
+                            n = int(amount_to_buy / cost_basis)
+                            if n <= 0: continue
+                            fee = n * cost_basis * fee_rate
+                            total_outflow = n * cost_basis + fee
+                            if total_outflow > cash:
+                                n = int(cash / (cost_basis * (1 + fee_rate)))
+                                if n <= 0: continue
+                                fee = n * cost_basis * fee_rate
+                                total_outflow = n * cost_basis + fee
+                            cash -= total_outflow
                     
-                    # Max qty we can buy
-                    # target_amount
-                    if cash < (target_per_stock * 0.9): 
-                        # If cash is significantly less than target, maybe we are fully invested?
-                        # With 10% weights, we might have cash spread out.
-                        # Using available cash is safer.
-                        qty = cash / cost_basis
-                        # But if we have 30% cash limit in Risk Off?
-                        # target_weight logic handles the allocation ratio.
-                        # If Risk Off, target_weight=10%, 7 stocks = 70%. 30% left.
-                        # So simply: try to buy target amount, capped by cash.
-                        amount_to_buy = min(target_per_stock, cash)
-                    else:
-                        amount_to_buy = target_per_stock
-
-                    if amount_to_buy < 100: continue # Min trade size?
-                    
-                    qty = int(amount_to_buy / cost_basis)
-                    if qty <= 0: continue
-                    
-                    # Execute Buy
-                    gross_cost = qty * cost_basis
-                    fee = gross_cost * (fee_bps/10000.0)
-                    total_cost = gross_cost # cost_basis already includes slippage? 
-                    # Logic: 
-                    # Buy Price = Open * (1+slip)
-                    # Gross = Qty * BuyPrice
-                    # Fee = Gross * bps
-                    # Cash -= (Gross + Fee)
-                    
-                    # Correct math:
-                    # needed = qty * open * (1+slip) * (1+fee) ~ approx
-                    
-                    total_outflow = (qty * open_price * (1 + slippage_bps/10000.0)) + fee
-                    
-                    if total_outflow > cash:
-                        # adj qty
-                        qty = int(cash / (open_price * (1 + slippage_bps/10000.0) * (1 + fee_bps/10000.0)))
-                        if qty <= 0: continue
-                        total_outflow = (qty * open_price * (1 + slippage_bps/10000.0)) + fee
+                            # ATR stop: entry - mult * ATR14 of the signal day
+                            atr14 = m.close[i - 1, c] * 0.05 if m.atr_fallback else m.atr14[i - 1, c]
+                            held[c] = True
+                            qty[c] = n
+                            entry_price[c] = open_price
+                            entry_ord[c] = ordinals[i]
+                            stop_price[c] = open_price - atr_stop_mult * atr14
+                            log.append(i, c, BUY, n, cost_basis, fee, open_price * (slippage_bps / 10000.0), 0)
 
-                    cash -= total_outflow
-                    
-                    # Set Stop
-                    # ATR Stop: Entry - 2*ATR14(PrevDay)
-                    atr14 = f_prev['atr14'] if 'atr14' in f_prev else (p_prev_close['close']*0.05) # fallback
-                    stop_price = open_price - (2 * atr14)
-                    
-                    holdings[sym] = {
-                        "qty": qty,
-                        "entry_price": open_price, # execution price
-                        "entry_date": today,
-                        "stop_price": stop_price
-                    }
-                    
-                    trades.append({
-                        "run_id": params.get('run_id'),
-                        "date": today,
-                        "symbol": sym,
-                        "action": "BUY",
-                        "qty": qty,
-                        "price": open_price * (1 + slippage_bps/10000.0),
-                        "fee": fee,
-                        "slippage": open_price * (slippage_bps/10000.0),
-                        "reason": "REBALANCE"
-                    })
-
-            # 4. End of Day Reporting
-            # Calculate Close Equity
-            holding_value = 0.0
-            for sym, h in holdings.items():
-                p_row = get_price_row(sym, today)
-                if p_row is None:
-                    # Use last known? OR Entry?
-                    # Use entry if no price (fallback)
-                    price = h['entry_price']
-                else:
-                    price = p_row['close']
-                holding_value += h['qty'] * price
+                    # 4. End of day: holdings at the close (entry price when there's no bar)
+                    mark = np.where(m.has_price[i], m.close[i], entry_price)
+                    total_equity = cash + float(np.dot(qty[held], mark[held]))
             
-            total_equity = cash + holding_value
+                    day = i - first_index
+                    equity[day] = total_equity
+                    cash_curve[day] = cash
+                    holdings_count[day] = held.sum()
+
+            for day in range(seg_start - first_index, seg_stop - first_index):
+                stats.update(float(equity[day]))
             
-            # Benchmark (XU100)
-            bench_val = 0
-            if today in index_history.index:
-                # normalize to initial capital?
-                # simple: just store close value, normalize later in UI
-                bench_val = index_history.loc[today]['close']
-                
-            equity_curve.append({
-                "date": today,
-                "equity": total_equity,
-                "benchmark_equity": bench_val,
-                "cash": cash,
-                "holdings_count": len(holdings)
-            })
+            if progress is not None:
+                day = seg_stop - first_index
+                await progress({
+                    "date": timeline[seg_stop - 1],
+                    "day": day,
+                    "days": n_days,
+                    "pct": round(100.0 * day / n_days, 1),
+                    "equity": float(equity[day - 1]),
+                    "cash": float(cash_curve[day - 1]),
+                    "holdings_count": int(holdings_count[day - 1]),
+                    "total_trades": stats.trades + len(log),
+                    "equity_points": self._equity_records(m, first_index, equity, cash_curve, holdings_count, reported_equity, day),
+                    "trades": self._trade_records(m, log, params.get('run_id'), reported_trades, len(log)),
+                })
+                reported_equity, reported_trades = day, len(log)
 
         # Final Metrics
-        df_eq = pd.DataFrame(equity_curve)
-        if df_eq.empty:
+        if stats.last_equity is None:
             return {"error": "No equity curve generated"}
-            
-        df_eq.set_index('date', inplace=True)
-        
-        # CAGR
-        days = (end_date - start_date).days
-        years = days / 365.25
-        final_eq = df_eq.iloc[-1]['equity']
-        cagr = (final_eq / initial_capital) ** (1/years) - 1 if years > 0 else 0
-        
-        # MaxDD
-        roll_max = df_eq['equity'].cummax()
-        drawdown = (df_eq['equity'] - roll_max) / roll_max
-        max_dd = drawdown.min()
+        stats.trades += len(log)
         
-        # Sharpe (Daily returns)
-        returns = df_eq['equity'].pct_change()
-        sharpe = (returns.mean() / returns.std()) * (252**0.5) if returns.std() != 0 else 0
+        metrics = stats.summary(initial_capital, start_date, end_date)
+        if checkpoint is None:
+            # Full curve at hand: the rest of the statistics in one array pass.
+            # (An extension only has its new days; the caller merges them with the stored run.)
+            metrics.update(performance_metrics(
+                equity, self._performance_trades(m, log), initial_capital, start_date, end_date,
+                cash=cash_curve, benchmark=m.benchmark[first_index:],
+            ))
         
-        return {
-            "metrics": {
-                "cagr": round(cagr * 100, 2),
-                "max_dd": round(max_dd * 100, 2),
-                "sharpe": round(sharpe, 2),
-                "final_equity": round(final_eq, 2),
-                "total_trades": len(trades)
-            },
-            "equity_curve": df_eq.reset_index().to_dict(orient='records'),
-            "trades": trades
+        result = {
+            "metrics": metrics,
+            "checkpoint": {
+                "version": CHECKPOINT_VERSION,
+                "start_date": start_date.isoformat(),
+                "last_date": timeline[-1].isoformat(),
+                "initial_capital": initial_capital,
+                "cash": cash,
+                "holdings": {
+                    m.symbols[c]: {
+                        "qty": int(qty[c]), "entry_price": float(entry_price[c]),
+                        "entry_date": date.fromordinal(int(entry_ord[c])).isoformat(),
+                        "stop_price": float(stop_price[c]),
+                    }
+                    for c in np.flatnonzero(held)
+                },
+                "metrics": stats.state(),
+            }
         }
+        if records:
+            result["equity_curve"] = self._equity_records(m, first_index, equity, cash_curve, holdings_count, 0, n_days)
+            result["trades"] = self._trade_records(m, log, params.get('run_id'), 0, len(log))
+        return result
+
+    @staticmethod
+    def _equity_records(m: MarketPanels, first_index: int, equity: np.ndarray, cash: np.ndarray,
+                        holdings_count: np.ndarray, lo: int, hi: int) -> List[Dict[str, Any]]:
+        return [
+            {"date": d, "equity": e, "benchmark_equity": b, "cash": c, "holdings_count": h}
+            for d, e, b, c, h in zip(
+                m.timeline[first_index + lo:first_index + hi], equity[lo:hi].tolist(),
+                m.benchmark[first_index + lo:first_index + hi].tolist(), cash[lo:hi].tolist(),
+                holdings_count[lo:hi].tolist(),
+            )
+        ]
+
+    @staticmethod
+    def _trade_records(m: MarketPanels, log: TradeLog, run_id: Optional[str], lo: int, hi: int) -> List[Dict[str, Any]]:
+        rows = log.view()[lo:hi]
+        return [
+            {
+                "run_id": run_id, "date": m.timeline[day], "symbol": m.symbols[sym],
+                "action": "BUY" if side == BUY else "SELL", "qty": int(q), "price": p,
+                "fee": fee, "slippage": slip, "reason": REASONS[reason],
+            }
+            for day, sym, side, q, p, fee, slip, reason in rows.tolist()
+        ]
+
+    @staticmethod
+    def _performance_trades(m: MarketPanels, log: TradeLog) -> np.ndarray:
+        rows = log.view()
+        out = np.empty(len(rows), dtype=TRADE_DTYPE)
+        out['date'] = np.array(m.timeline, dtype='datetime64[D]')[rows['day']]
+        out['symbol'] = np.array(m.symbols, dtype=object)[rows['symbol']]
+        out['side'] = rows['side']
+        out['qty'] = rows['qty']
+        out['price'] = rows['price']
+        out['fee'] = rows['fee']
+        out['reason'] = np.array(REASONS, dtype=object)[rows['reason']]
+        return out
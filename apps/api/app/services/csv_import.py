@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Set, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import CsvImport, Symbol
+from app.services.ingest import PRICE_COLUMNS, REQUIRED_COLUMNS, mark_price_source, write_price_batch, _Queue, _DONE
+from app.services.validation import validate_batch, quarantine_bars
+from app.utils.metrics import stage_timer, timed_import
+
+logger = structlog.get_logger()
+
+# Streaming import of large price CSVs (vendor dumps, tens of millions of rows).
+# Columns symbol, date, open, high, low, close, volume (+ optional turnover_tl,
+# adj_close) in any order, one bar per line (no quoted newlines). The file is
+# read CSV_CHUNK_ROWS lines at a time; each chunk is parsed with explicit
+# dtypes, checked by services/validation.py (flagged bars are quarantined) and
+# goes to the bulk writer of services/ingest.py while the next one is parsed,
+# so memory stays flat.
+# Each chunk commits together with its end offset in csv_imports: running the
+# same (unchanged) file again continues after the last committed chunk.
+
+CSV_COLUMNS = ['symbol', 'date', *PRICE_COLUMNS]
+CSV_DTYPES = {'symbol': str, 'date': str, **{c: 'float64' for c in PRICE_COLUMNS}}
+
+
+def csv_import_id(path: str) -> str:
+    return hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+
+
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def read_header(path: str) -> list:
+    """Lower-cased column names; ValueError when a required one is missing."""
+    with open(path, 'rb') as f:
+        columns = [c.strip().lower() for c in f.readline().decode('utf-8-sig').strip().split(',')]
+    missing = [c for c in ('symbol', 'date', *REQUIRED_COLUMNS) if c not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    return columns
+
+
+def iter_chunks(path: str, offset: int, chunk_rows: int):
+    """Yields (chunk bytes, byte offset after it), starting at offset (0 = after the header)."""
+    with open(path, 'rb') as f:
+        f.readline()
+        if offset:
+            f.seek(offset)
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                return
+            yield b"".join(lines), f.tell()
+
+
+def parse_chunk(data: bytes, columns: list, known_symbols: Set[str]) -> Tuple["pd.DataFrame", int, int]:
+    """
+    One chunk as a validation.validate_bars frame, unparsable numbers as NaN.
+    Rows with an unparsable date or an unknown symbol are rejected (there is
+    nothing to file them under). Returns (frame, rows read, rows rejected).
+    """
+    pd = timed_import("pandas")
+    usecols = [c for c in columns if c in CSV_COLUMNS]
+    dtypes = {c: CSV_DTYPES[c] for c in usecols}
+    try:
+        df = pd.read_csv(io.BytesIO(data), header=None, names=columns, usecols=usecols, dtype=dtypes)
+    except ValueError:
+        # A value that isn't a number: parse as text, validation quarantines those rows
+        df = pd.read_csv(io.BytesIO(data), header=None, names=columns, usecols=usecols, dtype=str)
+        for col in usecols:
+            if CSV_DTYPES[col] == 'float64':
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+    n_read = len(df)
+
+    df['symbol'] = df['symbol'].str.strip()
+    df['date'] = pd.to_datetime(df['date'], format=get_settings().CSV_DATE_FORMAT, errors='coerce')
+    if 'turnover_tl' not in df.columns:
+        df['turnover_tl'] = df['close'] * df['volume']
+    if 'adj_close' not in df.columns:
+        df['adj_close'] = df['close']
+
+    valid = df['date'].notna() & df['symbol'].isin(known_symbols)
+    df = df.loc[valid]
+    df['date'] = df['date'].dt.date
+    return df[CSV_COLUMNS], n_read, n_read - int(valid.sum())
+
+
+async def import_price_csv(db: AsyncSession, path: str, source: str = "CSV", restart: bool = False) -> dict:
+    """
+    Stream a price CSV into prices_daily (new bars inserted, changed ones
+    revised, see ingest.write_price_batch; bars failing validation quarantined). Resumes an interrupted import of
+    the same file unless restart; a completed one is not read again.
+    Returns the csv_imports row as a dict.
+    """
+    settings = get_settings()
+    import_id = csv_import_id(path)
+    fingerprint = file_fingerprint(path)
+    columns = read_header(path)
+
+    job = await db.get(CsvImport, import_id)
+    if job is not None and job.status == "COMPLETED" and job.fingerprint == fingerprint and not restart:
+        return csv_import_status(job)
+    if job is None:
+        job = CsvImport(import_id=import_id, path=os.path.abspath(path))
+        db.add(job)
+    if job.fingerprint != fingerprint or restart or job.byte_offset is None:
+        job.fingerprint = fingerprint
+        job.byte_offset = job.chunks = job.rows_read = job.rows_written = job.rows_revised = job.rows_rejected = job.rows_quarantined = 0
+        job.started_at = datetime.utcnow()
+    job.status, job.message, job.finished_at = "RUNNING", None, None
+    await db.commit()
+
+    known_symbols = set((await db.execute(select(Symbol.symbol))).scalars().all())
+    chunks = iter_chunks(path, job.byte_offset, max(1, settings.CSV_CHUNK_ROWS))
+    parsed = _Queue("import_csv", "parsed", 2)
+    started, resumed_rows = time.perf_counter(), job.rows_read
+    logger.info("CSV import started", import_id=import_id, path=path, byte_offset=job.byte_offset)
+
+    def next_chunk():
+        item = next(chunks, None)
+        if item is None:
+            return None
+        data, end = item
+        return (*parse_chunk(data, columns, known_symbols), end)
+
+    async def reader():
+        try:
+            while True:
+                with stage_timer("import_csv", "parse") as st:
+                    item = await asyncio.to_thread(next_chunk)
+                    st.rows = item[1] if item else 0
+                if item is None:
+                    return
+                await parsed.put(item)
+        finally:
+            await parsed.put(_DONE)
+
+    read_task = asyncio.ensure_future(reader())
+    try:
+        while True:
+            item = await parsed.get()
+            if item is _DONE:
+                break
+            frame, n_read, rejected, end = item
+            with stage_timer("import_csv", "validate", import_id=import_id) as st:
+                await mark_price_source(db, frame['symbol'].unique().tolist(), source)
+                frame, flagged, _ = await validate_batch(db, frame)
+                st.rows = n_read
+            with stage_timer("import_csv", "write", import_id=import_id) as st:
+                added, revised = await write_price_batch(db, frame, source)
+                quarantined = await quarantine_bars(db, flagged, source)
+                job.byte_offset = end
+                job.chunks += 1
+                job.rows_read += n_read
+                job.rows_written += sum(added.values())
+                job.rows_revised += revised
+                job.rows_rejected += rejected
+                job.rows_quarantined = (job.rows_quarantined or 0) + quarantined
+                job.updated_at = datetime.utcnow()
+                await db.commit()
+                st.rows = sum(added.values()) + revised + quarantined
+            elapsed = time.perf_counter() - started
+            logger.info("CSV chunk committed", import_id=import_id, chunk=job.chunks, rows_read=job.rows_read,
+                        rows_per_second=round((job.rows_read - resumed_rows) / elapsed, 1) if elapsed else None)
+        await read_task
+    except Exception as e:
+        read_task.cancel()
+        await db.rollback()
+        job = await db.get(CsvImport, import_id)
+        job.status, job.message = "FAILED", str(e)[:500]
+        await db.commit()
+        logger.error("CSV import failed", import_id=import_id, error=str(e), byte_offset=job.byte_offset)
+        raise
+
+    elapsed = time.perf_counter() - started
+    job.status, job.finished_at = "COMPLETED", datetime.utcnow()
+    rate = round((job.rows_read - resumed_rows) / elapsed, 1) if elapsed else None
+    job.message = f"{job.rows_written} rows written, {job.rows_revised} revised, {job.rows_quarantined} quarantined, {job.rows_rejected} rejected ({rate} rows/s)"
+    await db.commit()
+    logger.info("CSV import finished", import_id=import_id, rows_read=job.rows_read, rows_per_second=rate)
+    return {**csv_import_status(job), "rows_per_second": rate}
+
+
+def csv_import_status(job: CsvImport) -> dict:
+    return {
+        "import_id": job.import_id, "path": job.path, "status": job.status,
+        "byte_offset": job.byte_offset, "chunks": job.chunks, "rows_read": job.rows_read,
+        "rows_written": job.rows_written, "rows_revised": job.rows_revised, "rows_rejected": job.rows_rejected,
+        "rows_quarantined": job.rows_quarantined,
+        "started_at": job.started_at, "updated_at": job.updated_at, "finished_at": job.finished_at,
+        "message": job.message,
+    }
+
+
+async def run_import_task(path: str, restart: bool = False):
+    """Background task / CLI entry: own session, errors are recorded on the import row."""
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        try:
+            return await import_price_csv(db, path, restart=restart)
+        except Exception as e:
+            logger.error("CSV import task failed", path=path, error=str(e))
+
+
+if __name__ == "__main__":
+    import sys
+    args = [a for a in sys.argv[1:] if a != "--restart"]
+    if len(args) != 1:
+        sys.exit("usage: python -m app.services.csv_import <file.csv> [--restart]")
+    print(asyncio.run(run_import_task(args[0], restart="--restart" in sys.argv)))
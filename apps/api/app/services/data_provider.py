@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from typing import List, Optional
 import pandas as pd
 import os
-from datetime import date
+from datetime import date, timedelta
 from pydantic import BaseModel
 
 class SymbolInfo(BaseModel):
@@ -108,9 +108,10 @@ class CSVDataProvider(DataProvider):
         return df[['close']].sort_index()
 
 class YahooFinanceProvider(DataProvider):
+    # yfinance's `end` is exclusive; end_date is inclusive like the other providers
     def __init__(self):
-        import yfinance as yf
-        self.yf = yf
+        from app.utils.metrics import timed_import
+        self.yf = timed_import("yfinance")
         
     def get_symbols(self) -> List[SymbolInfo]:
         # Yahoo doesn't provide a "list of all symbols" easily. 
@@ -123,12 +124,14 @@ class YahooFinanceProvider(DataProvider):
         # BIST symbols on Yahoo end with .IS
         ticker = f"{symbol}.IS" if not symbol.endswith(".IS") else symbol
         
-        df = self.yf.download(ticker, start=start_date, end=end_date, progress=False, auto_adjust=True)
+        # No dividend adjustment: that is applied from corporate_actions. Yahoo's
+        # Close is still restated for splits (SPLIT_ADJUSTED_SOURCES, services/adjustments.py)
+        df = self.yf.download(ticker, start=start_date, end=end_date + timedelta(days=1), progress=False, auto_adjust=False)
         
         if df.empty:
             return pd.DataFrame()
             
-        # Yahoo columns: Open, High, Low, Close, Volume
+        # Yahoo columns: Open, High, Low, Close, Adj Close, Volume
         # Rename to lowercase
         df.reset_index(inplace=True)
         df.rename(columns={
@@ -137,6 +140,7 @@ class YahooFinanceProvider(DataProvider):
             'High': 'high',
             'Low': 'low',
             'Close': 'close',
+            'Adj Close': 'adj_close',
             'Volume': 'volume'
         }, inplace=True)
         
@@ -149,10 +153,10 @@ class YahooFinanceProvider(DataProvider):
 
         df.set_index('date', inplace=True)
         
-        # Handle 'Adj Close' if present, but auto_adjust=True usually gives adjusted in Close
         # Let's simulate turnover_tl approx as close * volume
         df['turnover_tl'] = df['close'] * df['volume']
-        df['adj_close'] = df['close']
+        if 'adj_close' not in df.columns:
+            df['adj_close'] = df['close']
         
         return df[['open', 'high', 'low', 'close', 'volume', 'turnover_tl', 'adj_close']].sort_index()
 
@@ -163,7 +167,7 @@ class YahooFinanceProvider(DataProvider):
         else:
             ticker = f"{index_name}.IS"
             
-        df = self.yf.download(ticker, start=start_date, end=end_date, progress=False, auto_adjust=True)
+        df = self.yf.download(ticker, start=start_date, end=end_date + timedelta(days=1), progress=False, auto_adjust=True)
         
         if df.empty:
             return pd.DataFrame()
@@ -1,105 +1,401 @@
+import hashlib
+import inspect
+import math
 import pandas as pd
 import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services import rolling
+
+# Output columns of compute_features, in order
+FEATURE_COLUMNS = [
+    'close', 'ema50', 'ema200', 'trend_gate', 'trend_score', 'quality_trend',
+    'rs_3m', 'rs_6m', 'bo_120', 'vol_surge', 'up_ratio_20',
+    'atr14_pct', 'dd60', 'adv20_tl', 'atr14'
+]
+
+# Ranked 0-100 across the daily universe before scoring (atr14_pct, dd60 are the risk inputs)
+NORMALIZED_COLUMNS = [
+    'rs_3m', 'rs_6m', 'trend_score', 'bo_120', 'vol_surge', 'up_ratio_20', 'quality_trend',
+    'atr14_pct', 'dd60'
+]
+
+# Raw panels built from the price frame (see FeatureEngine.build_panel)
+SOURCE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'turnover_tl')
+
+# Folded into every definition hash. Bump when shared code the nodes call
+# (services/rolling.py, _ema, build_panel) changes results.
+FEATURE_SET_VERSION = 1
+
+
+@dataclass(frozen=True)
+class FeatureNode:
+    """
+    One feature (or shared intermediate) in the feature graph.
+    lookback: bars of history this node reads beyond its dependencies
+    (window - 1 for rolling windows, periods for shifts).
+    ema_span: set for EMAs, which read the whole history; their warm-up is
+    span * ema_warmup bars unless the EMA is seeded from a persisted value.
+    """
+    name: str
+    deps: Tuple[str, ...]
+    lookback: int
+    fn: Callable[["FeatureContext"], np.ndarray]
+    ema_span: int = 0
+
+
+FEATURE_GRAPH: Dict[str, FeatureNode] = {}
+
+
+def feature(name: str, deps: Iterable[str] = (), lookback: int = 0, ema_span: int = 0):
+    def register(fn):
+        FEATURE_GRAPH[name] = FeatureNode(name, tuple(deps), lookback, fn, ema_span)
+        return fn
+    return register
+
+
+class FeatureContext:
+    """Evaluated nodes of one compute() call plus the panel inputs nodes need."""
+
+    def __init__(self, panels: Dict[str, np.ndarray], dates: np.ndarray, df_index: Optional[pd.DataFrame],
+                 seeds: Optional[Dict[str, np.ndarray]] = None):
+        self.values = dict(panels)
+        self.dates = dates
+        self.df_index = df_index
+        self.seeds = seeds or {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values[name]
+
+    def index_returns(self, periods: int) -> np.ndarray:
+        """Index pct_change(periods) on each cell's date, NaN where the index has no bar."""
+        if self.df_index is None or self.df_index.empty:
+            return np.full(self.dates.shape, np.nan)
+        index_close = self.df_index['close'].sort_index()
+        keys = pd.to_datetime(index_close.index).to_numpy(dtype='datetime64[ns]')
+        values = index_close.pct_change(periods).to_numpy(dtype=np.float64)
+        pos = np.clip(np.searchsorted(keys, self.dates), 0, len(keys) - 1)
+        return np.where(keys[pos] == self.dates, values[pos], np.nan)
+
+
+def _ema(ctx: FeatureContext, name: str, source: str, span: int, min_periods: int = 0) -> np.ndarray:
+    """
+    Column-wise EMA (adjust=False); leading padding is skipped like a shorter series.
+    With a seed for `name` (the symbol's EMA on the bar before the loaded window)
+    the EMA continues from it instead of restarting at the first loaded close.
+    Unseeded columns are NaN until they have min_periods bars.
+    """
+    values = ctx[source]
+    seed = ctx.seeds.get(name)
+    warm = np.zeros(values.shape[1], dtype=bool)
+    if seed is None or np.isnan(seed).all():
+        ema = pd.DataFrame(values).ewm(span=span, adjust=False).mean().to_numpy()
+    else:
+        warm = ~np.isnan(seed)
+        ext = np.full((len(values) + 1, values.shape[1]), np.nan)
+        ext[1:] = values
+        # ext row `first` sits just before the symbol's first loaded bar
+        first = np.argmax(~np.isnan(values), axis=0)
+        cols = np.flatnonzero(warm)
+        ext[first[cols], cols] = seed[cols]
+        ema = pd.DataFrame(ext).ewm(span=span, adjust=False).mean().to_numpy()[1:]
+
+    if min_periods:
+        cold = np.cumsum(~np.isnan(values), axis=0) < min_periods
+        cold[:, warm] = False
+        ema[cold] = np.nan
+    return ema
+
+
+# Sources that may be missing from the price frame
+@feature('high', ['close'])
+def _high(ctx):
+    # Bars without a range (close-only feeds) fall back to close
+    return ctx['close']
+
+@feature('low', ['close'])
+def _low(ctx):
+    return ctx['close']
+
+@feature('turnover_tl', ['close', 'volume'])
+def _turnover(ctx):
+    return ctx['close'] * ctx['volume']
+
+# Shared intermediates
+@feature('prev_close', ['close'], lookback=1)
+def _prev_close(ctx):
+    return rolling.lag(ctx['close'], 1)
+
+@feature('ema50_lag10', ['ema50'], lookback=10)
+def _ema50_lag10(ctx):
+    return rolling.lag(ctx['ema50'], 10)
+
+@feature('tr', ['high', 'low', 'prev_close'])
+def _tr(ctx):
+    # max(high-low, |high-prev_close|, |low-prev_close|), fmax skips the missing prev_close
+    tr = ctx['high'] - ctx['low']
+    np.fmax(tr, np.abs(ctx['high'] - ctx['prev_close']), out=tr)
+    np.fmax(tr, np.abs(ctx['low'] - ctx['prev_close']), out=tr)
+    return tr
+
+@feature('hh120', ['close'], lookback=119)
+def _hh120(ctx):
+    return rolling.rolling_max(ctx['close'], 120, min_periods=60)
+
+@feature('peak60', ['close'], lookback=59)
+def _peak60(ctx):
+    return rolling.rolling_max(ctx['close'], 60, min_periods=30)
+
+@feature('vol20', ['volume'], lookback=19)
+def _vol20(ctx):
+    return rolling.rolling_mean(ctx['volume'], 20, min_periods=10)
+
+# 1. EMAs
+@feature('ema50', ['close'], ema_span=50)
+def _ema50(ctx):
+    return _ema(ctx, 'ema50', 'close', 50, min_periods=50)
+
+@feature('ema200', ['close'], ema_span=200)
+def _ema200(ctx):
+    return _ema(ctx, 'ema200', 'close', 200, min_periods=200)
+
+# 2. Trend: TrendGate close > EMA50, TrendScore 0.6*(close > EMA50) + 0.4*(EMA50 > EMA50[D-10])
+@feature('trend_gate', ['close', 'ema50'])
+def _trend_gate(ctx):
+    return np.greater(ctx['close'], ctx['ema50']).astype(np.float64)
+
+@feature('trend_score', ['trend_gate', 'ema50', 'ema50_lag10'])
+def _trend_score(ctx):
+    return 60.0 * ctx['trend_gate'] + 40.0 * np.greater(ctx['ema50'], ctx['ema50_lag10'])
+
+@feature('quality_trend', ['ema50', 'ema200'])
+def _quality_trend(ctx):
+    return 100.0 * np.greater(ctx['ema50'], ctx['ema200'])
+
+# 3. Relative Strength vs index returns on the same date
+@feature('rs_3m', ['close'], lookback=63)
+def _rs_3m(ctx):
+    return ctx['close'] / rolling.lag(ctx['close'], 63) - 1.0 - ctx.index_returns(63)
+
+@feature('rs_6m', ['close'], lookback=126)
+def _rs_6m(ctx):
+    return ctx['close'] / rolling.lag(ctx['close'], 126) - 1.0 - ctx.index_returns(126)
+
+# 4. Breakout proximity: close / HH120
+@feature('bo_120', ['close', 'hh120'])
+def _bo_120(ctx):
+    return ctx['close'] / ctx['hh120']
+
+# 5. Volume surge: volume / SMA20(volume)
+@feature('vol_surge', ['volume', 'vol20'])
+def _vol_surge(ctx):
+    return ctx['volume'] / ctx['vol20']
+
+# 6. Consistency: share of up-closes over the last 20 bars
+@feature('up_ratio_20', ['close', 'prev_close'], lookback=19)
+def _up_ratio_20(ctx):
+    is_up = np.greater(ctx['close'], ctx['prev_close']).astype(np.float64)
+    is_up[np.isnan(ctx['close'])] = np.nan
+    return rolling.rolling_sum(is_up, 20, min_periods=10, out=is_up) / 20.0
+
+# 7. ATR14%
+@feature('atr14', ['tr'], ema_span=14)
+def _atr14(ctx):
+    return _ema(ctx, 'atr14', 'tr', 14)
+
+@feature('atr14_pct', ['atr14', 'close'])
+def _atr14_pct(ctx):
+    return ctx['atr14'] / ctx['close']
+
+# 8. Drawdown from the 60-bar peak
+@feature('dd60', ['close', 'peak60'])
+def _dd60(ctx):
+    return 1.0 - ctx['close'] / ctx['peak60']
+
+# 9. ADV20: median turnover
+@feature('adv20_tl', ['turnover_tl'], lookback=19)
+def _adv20_tl(ctx):
+    return rolling.rolling_median(ctx['turnover_tl'], 20, min_periods=10)
+
+
+def definition_hashes(features: Iterable[str]) -> Dict[str, str]:
+    """
+    Hash per feature of its node (source, deps, windows) and, recursively, of
+    everything it depends on. Editing one node changes the hash of that node
+    and of its consumers only.
+    """
+    memo = {}
+
+    def digest(name):
+        if name not in memo:
+            node = FEATURE_GRAPH.get(name)
+            h = hashlib.sha256(f"v{FEATURE_SET_VERSION}:{name}".encode())
+            if node is not None:
+                h.update(inspect.getsource(node.fn).encode())
+                h.update(repr((node.deps, node.lookback, node.ema_span)).encode())
+                for dep in node.deps:
+                    h.update(digest(dep).encode())
+            memo[name] = h.hexdigest()[:16]
+        return memo[name]
+
+    return {name: digest(name) for name in features}
+
+
+def resolve(features: Iterable[str], sources: Iterable[str] = SOURCE_COLUMNS) -> List[str]:
+    """Nodes needed for `features`, dependencies first. Available sources are leaves."""
+    sources = set(sources)
+    order, seen = [], set()
+
+    def visit(name, path):
+        if name in seen or name in sources:
+            return
+        if name not in FEATURE_GRAPH:
+            raise ValueError(f"Unknown feature: {name}")
+        if name in path:
+            raise ValueError(f"Feature cycle: {' -> '.join(path + (name,))}")
+        for dep in FEATURE_GRAPH[name].deps:
+            visit(dep, path + (name,))
+        seen.add(name)
+        order.append(name)
+
+    for name in features:
+        visit(name, ())
+    return order
+
 
 class FeatureEngine:
-    def compute_features(self, df_prices: pd.DataFrame, df_index: pd.DataFrame) -> pd.DataFrame:
+    def lookback(self, features: Optional[Iterable[str]] = None, ema_warmup: float = 1.0,
+                 seeded: Iterable[str] = ()) -> int:
+        """
+        Bars of history needed before a date for `features` to be fully formed there.
+        EMAs count span * ema_warmup bars, or none when listed in `seeded`.
+        """
+        seeded = set(seeded)
+        memo = {}
+
+        def own(node):
+            if not node.ema_span:
+                return node.lookback
+            return 0 if node.name in seeded else math.ceil(node.ema_span * ema_warmup)
+
+        def total(name):
+            if name not in memo:
+                node = FEATURE_GRAPH.get(name)
+                memo[name] = 0 if node is None else own(node) + max((total(d) for d in node.deps), default=0)
+            return memo[name]
+
+        return max((total(f) for f in (features or FEATURE_COLUMNS)), default=0)
+
+    def compute_features(self, df_prices: pd.DataFrame, df_index: pd.DataFrame,
+                         features: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Compute all features for a single symbol dataframe.
+        Compute features for a single symbol dataframe.
         df_prices: columns [open, high, low, close, volume, turnover_tl]
         df_index: columns [close] (XU100)
         
-        Returns DataFrame with feature columns.
+        Returns DataFrame with feature columns (all of FEATURE_COLUMNS by default).
         """
         if df_prices.empty:
             return pd.DataFrame()
-            
-        df = df_prices.copy()
-        
-        # Ensure index alignment
-        # We need to join with index data to calculate relative strength
-        # But first let's calculate symbol-specific indicators
-        
-        # 1. EMAs
-        df['ema50'] = df['close'].ewm(span=50, adjust=False).mean()
-        df['ema200'] = df['close'].ewm(span=200, adjust=False).mean()
-        
-        # 2. Trend Metrics
-        # TrendGate: close > EMA50
-        df['trend_gate'] = df['close'] > df['ema50']
-        
-        # TrendScore components
-        # Condition 1: close > EMA50
-        c1 = (df['close'] > df['ema50']).astype(int)
-        
-        # Condition 2: EMA50 rising (EMA50[D] > EMA50[D-10])
-        df['ema50_lag10'] = df['ema50'].shift(10)
-        c2 = (df['ema50'] > df['ema50_lag10']).astype(int)
-        
-        df['trend_score'] = (0.6 * c1 + 0.4 * c2) * 100
-        
-        # QualityTrend
-        df['quality_trend'] = np.where(df['ema50'] > df['ema200'], 100, 0)
-        
-        # 3. Relative Strength (RS)
-        # Calculate returns
-        df['ret_63'] = df['close'].pct_change(63)
-        df['ret_126'] = df['close'].pct_change(126)
-        
-        # Index returns (align dates)
-        idx_ret_63 = df_index['close'].pct_change(63)
-        idx_ret_126 = df_index['close'].pct_change(126)
-        
-        # Map index returns to symbol dates
-        df['idx_ret_63'] = df.index.map(idx_ret_63)
-        df['idx_ret_126'] = df.index.map(idx_ret_126)
-        
-        df['rs_3m'] = df['ret_63'] - df['idx_ret_63']
-        df['rs_6m'] = df['ret_126'] - df['idx_ret_126']
-        
-        # 4. Breakout Proximity (BO120)
-        # HH120 = max(close[D-119..D]) -> Rolling max 120
-        df['hh120'] = df['close'].rolling(window=120, min_periods=60).max()
-        df['bo_120'] = df['close'] / df['hh120']
-        
-        # 5. Volume Surge
-        # VOL20 = SMA(volume, 20)
-        df['vol20'] = df['volume'].rolling(window=20, min_periods=10).mean()
-        df['vol_surge'] = df['volume'] / df['vol20']
-        
-        # 6. Consistency (UpRatio20)
-        # count(close[t] > close[t-1]) over last 20
-        df['is_up'] = (df['close'] > df['close'].shift(1)).astype(float)
-        df['up_ratio_20'] = df['is_up'].rolling(window=20, min_periods=10).sum() / 20.0
-        
-        # 7. ATR14%
-        # TR = max(high-low, abs(high-prev_close), abs(low-prev_close))
-        df['prev_close'] = df['close'].shift(1)
-        df['tr1'] = df['high'] - df['low']
-        df['tr2'] = (df['high'] - df['prev_close']).abs()
-        df['tr3'] = (df['low'] - df['prev_close']).abs()
-        df['tr'] = df[['tr1', 'tr2', 'tr3']].max(axis=1)
-        
-        df['atr14'] = df['tr'].ewm(span=14, adjust=False).mean()
-        df['atr14_pct'] = df['atr14'] / df['close']
-        
-        # 8. Drawdown (DD60)
-        # peak60 = max(close[D-59..D])
-        df['peak60'] = df['close'].rolling(window=60, min_periods=30).max()
-        df['dd60'] = 1 - (df['close'] / df['peak60'])
-        
-        # 9. ADV20
-        if 'turnover_tl' not in df.columns:
-            df['turnover_tl'] = df['close'] * df['volume']
-        df['adv20_tl'] = df['turnover_tl'].rolling(window=20, min_periods=10).median()
-
-        # Cleanup intermediate columns
-        keep_cols = [
-            'ema50', 'ema200', 'trend_gate', 'trend_score', 'quality_trend',
-            'rs_3m', 'rs_6m', 'bo_120', 'vol_surge', 'up_ratio_20',
-            'atr14_pct', 'dd60', 'adv20_tl', 'atr14'
-        ]
+
+        df = df_prices.assign(symbol='_').sort_index()
+        out = self.compute(df, df_index, features=features)
+        out.index = df.index
+        return out
+
+    def compute(self, df_prices: pd.DataFrame, df_index: Optional[pd.DataFrame] = None,
+                features: Optional[List[str]] = None, as_of=None,
+                seeds: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Evaluate `features` (default FEATURE_COLUMNS) for every symbol of a long
+        price frame in one vectorized pass. Only the subgraph they depend on is
+        computed; intermediates are shared and freed once their last consumer ran.
+        df_prices: index=date, columns [symbol, open, high, low, close, volume(, turnover_tl)]
+        df_index: XU100 closes, only needed for rs_3m / rs_6m
+        seeds: index=symbol, EMA columns (ema50, ema200, ...) holding each symbol's
+               value on the bar before its first row in df_prices
         
-        return df[keep_cols]
+        Returns a frame indexed by (symbol, date), or only the as_of rows indexed by symbol.
+        """
+        features = list(features or FEATURE_COLUMNS)
+        if df_prices.empty:
+            return pd.DataFrame(columns=features)
+
+        dates, symbols, panels = self.build_panel(df_prices)
+        seed_arrays = None
+        if seeds is not None and not seeds.empty:
+            seed_arrays = {
+                col: seeds[col].reindex(symbols).to_numpy(dtype=np.float64, na_value=np.nan)
+                for col in seeds.columns if col in FEATURE_GRAPH
+            }
+        values = self.compute_panel(panels, dates, df_index, features, seeds=seed_arrays)
+
+        if as_of is not None:
+            rows, cols = np.nonzero(dates == np.datetime64(pd.Timestamp(as_of), 'ns'))
+            index = pd.Index(symbols[cols], name='symbol')
+        else:
+            rows, cols = np.nonzero(~np.isnat(dates))
+            index = pd.MultiIndex.from_arrays([symbols[cols], dates[rows, cols]], names=['symbol', 'date'])
+
+        out = pd.DataFrame({f: values[f][rows, cols] for f in features}, index=index)
+        if 'trend_gate' in out.columns:
+            out['trend_gate'] = out['trend_gate'].astype(bool)
+        return out
+
+    def build_panel(self, df_prices: pd.DataFrame):
+        """
+        Pivot a long (date-indexed, symbol column) frame to time x symbol arrays.
+        Each symbol's bars are end-aligned: its last bar sits on the last row and
+        earlier rows are NaN padding, so a rolling window of N rows is N bars of
+        that symbol even when symbols have different histories or gaps.
+        Returns (dates[T, N] datetime64, symbols[N], {column: float64[T, N]}).
+        """
+        df = df_prices.reset_index().rename(columns={df_prices.index.name or 'index': 'date'})
+        df = df.sort_values(['symbol', 'date'], kind='mergesort')
+
+        codes, symbols = pd.factorize(df['symbol'], sort=True)
+        counts = np.bincount(codes)
+        n_rows = int(counts.max())
+        position = np.arange(len(df)) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = n_rows - counts[codes] + position
+
+        dates = np.full((n_rows, len(symbols)), np.datetime64('NaT'), dtype='datetime64[ns]')
+        dates[rows, codes] = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]')
+
+        panels = {}
+        for col in SOURCE_COLUMNS:
+            if col not in df.columns:
+                continue
+            panel = np.full((n_rows, len(symbols)), np.nan)
+            panel[rows, codes] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            panels[col] = panel
+        return dates, np.asarray(symbols), panels
+
+    def compute_panel(self, panels: Dict[str, np.ndarray], dates: np.ndarray,
+                      df_index: Optional[pd.DataFrame], features: Optional[List[str]] = None,
+                      seeds: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """Evaluate the feature subgraph over time x symbol panels (see build_panel)."""
+        features = list(features or FEATURE_COLUMNS)
+        order = resolve(features, panels.keys())
+
+        # Remaining consumers per node, so intermediates can be dropped early
+        consumers = {}
+        for name in order:
+            for dep in FEATURE_GRAPH[name].deps:
+                consumers[dep] = consumers.get(dep, 0) + 1
+
+        ctx = FeatureContext(panels, dates, df_index, seeds)
+        for name in order:
+            ctx.values[name] = FEATURE_GRAPH[name].fn(ctx)
+            for dep in FEATURE_GRAPH[name].deps:
+                consumers[dep] -= 1
+                if consumers[dep] == 0 and dep not in features:
+                    del ctx.values[dep]
+
+        # Padding rows carry no values
+        padding = np.isnat(dates)
+        return {name: np.where(padding, np.nan, ctx.values[name]) for name in features}
 
     def normalize_cross_sectional(self, df_features: pd.DataFrame) -> pd.DataFrame:
         """
@@ -114,10 +410,7 @@ class FeatureEngine:
         if df_features.empty:
             return df_features
             
-        columns_to_normalize = [
-            'rs_3m', 'rs_6m', 'trend_score', 'bo_120', 'vol_surge', 'up_ratio_20', 'quality_trend',
-            'atr14_pct', 'dd60' # These are risk metrics, still normalize 0-100 rank
-        ]
+        columns_to_normalize = NORMALIZED_COLUMNS
         
         normalized = df_features.copy()
         
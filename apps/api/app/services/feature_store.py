@@ -0,0 +1,199 @@
+import hashlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import PriceDaily, IndexDaily, FeatureDaily, FeaturePartition, AdjustmentFactor
+from app.services.pipeline import trading_days
+from app.utils.db import bulk_upsert
+from app.utils.metrics import stage_timer, timed_import
+
+logger = structlog.get_logger()
+
+# features_daily columns, in table order
+PERSISTED_FEATURES = [
+    'ema50', 'ema200', 'atr14_pct', 'dd60', 'rs_3m', 'rs_6m',
+    'bo_120', 'vol_surge', 'up_ratio_20', 'adv20_tl'
+]
+
+PartitionKey = Tuple[str, date]
+
+
+def month_periods(start: date, end: date) -> List[Tuple[date, date]]:
+    """(first day, last day) of every month overlapping [start, end]."""
+    periods = []
+    current = start.replace(day=1)
+    while current <= end:
+        following = (current + timedelta(days=32)).replace(day=1)
+        periods.append((current, following - timedelta(days=1)))
+        current = following
+    return periods
+
+
+def plan_partitions(existing: Dict[PartitionKey, Tuple[dict, str]], fingerprints: Dict[PartitionKey, str],
+                    hashes: Dict[str, str], force: bool = False) -> Dict[PartitionKey, List[str]]:
+    """
+    Features to recompute per partition. New inputs (or a new partition) need
+    every feature; a changed definition only the features whose hash moved.
+    Partitions missing from the result are fresh.
+    """
+    stale = {}
+    for key, fingerprint in fingerprints.items():
+        previous = existing.get(key)
+        if force or previous is None or previous[1] != fingerprint:
+            stale[key] = list(hashes)
+            continue
+        changed = [f for f, h in hashes.items() if previous[0].get(f) != h]
+        if changed:
+            stale[key] = changed
+    return stale
+
+
+async def input_fingerprints(db: AsyncSession, input_start: Optional[date], period: Tuple[date, date],
+                             symbols: Optional[List[str]] = None) -> Dict[PartitionKey, str]:
+    """
+    Fingerprint of everything a (symbol, month) partition is computed from:
+    the symbol's bars from input_start (lookback) to month end, its adjustment
+    factors going ex in that range, and the index over the same range.
+    Grouped aggregate queries, no rows transferred.
+    """
+    period_start, period_end = period
+    p = PriceDaily
+    stmt = select(
+        p.symbol, func.count(), func.min(p.date), func.max(p.date),
+        func.sum(p.open), func.sum(p.high), func.sum(p.low), func.sum(p.close), func.sum(p.volume)
+    ).where(p.date <= period_end).group_by(p.symbol).having(func.max(p.date) >= period_start)
+    idx = select(func.count(), func.sum(IndexDaily.close)).where(IndexDaily.date <= period_end)
+    # Earlier ex-dates scale the whole window alike, which stored (own-date) units cancel
+    a = AdjustmentFactor
+    adj = select(a.symbol, func.count(), func.sum(a.factor), func.sum(a.volume_factor)).where(
+        a.ex_date <= period_end).group_by(a.symbol)
+    if input_start is not None:
+        stmt = stmt.where(p.date >= input_start)
+        idx = idx.where(IndexDaily.date >= input_start)
+        adj = adj.where(a.ex_date > input_start)
+    if symbols:
+        stmt = stmt.where(p.symbol.in_(symbols))
+        adj = adj.where(a.symbol.in_(symbols))
+
+    index_part = repr(tuple((await db.execute(idx)).one()))
+    adjusted = {row[0]: repr(tuple(row[1:])) for row in (await db.execute(adj)).all()}
+    fingerprints = {}
+    for row in (await db.execute(stmt)).all():
+        # Unadjusted symbols keep the digest they had before adjustments existed
+        adj_part = f"|{adjusted[row[0]]}" if row[0] in adjusted else ""
+        digest = hashlib.sha256(f"{row[1:]!r}|{index_part}{adj_part}".encode()).hexdigest()[:32]
+        fingerprints[(row[0], period_start)] = digest
+    return fingerprints
+
+
+async def refresh_features(db: AsyncSession, start: date, end: date,
+                           symbols: Optional[List[str]] = None, force: bool = False,
+                           existing_only: bool = False) -> dict:
+    """
+    Bring features_daily up to date for [start, end], month by month.
+    Only partitions whose input prices changed (re-import, corrections) or whose
+    feature definitions changed are recomputed, and for a definition change
+    only the affected feature columns are rewritten.
+    existing_only: refresh partitions materialized before, don't backfill new ones.
+    """
+    from app.services.adjustments import load_factors, adjust_prices, to_own_units
+    from app.services.feature_engine import FeatureEngine, definition_hashes
+    pd = timed_import("pandas")
+    np = timed_import("numpy")
+
+    fe = FeatureEngine()
+    hashes = definition_hashes(PERSISTED_FEATURES)
+    lookback = fe.lookback(PERSISTED_FEATURES, get_settings().EMA_WARMUP_SPANS)
+    stats = {"partitions": 0, "fresh": 0, "recomputed": 0, "rows": 0}
+
+    for period in month_periods(start, end):
+        period_start, period_end = period
+        with stage_timer("features", "fingerprint") as st:
+            calendar = await trading_days(db, period_start, lookback + 1)
+            input_start = calendar[-1] if len(calendar) > lookback else None
+            fingerprints = await input_fingerprints(db, input_start, period, symbols)
+            stmt = select(FeaturePartition).where(
+                FeaturePartition.period == period_start,
+                FeaturePartition.symbol.in_(list({s for s, _ in fingerprints}))
+            )
+            existing = {
+                (p.symbol, p.period): (p.definition_hashes or {}, p.input_fingerprint)
+                for p in (await db.execute(stmt)).scalars().all()
+            }
+            if existing_only:
+                fingerprints = {k: v for k, v in fingerprints.items() if k in existing}
+            stale = plan_partitions(existing, fingerprints, hashes, force)
+            st.rows = len(fingerprints)
+
+        stats["partitions"] += len(fingerprints)
+        stats["fresh"] += len(fingerprints) - len(stale)
+        if not stale:
+            continue
+
+        # One compute per distinct feature set (usually one)
+        groups = defaultdict(list)
+        for (sym, _), features in stale.items():
+            groups[tuple(features)].append(sym)
+
+        partition_rows = {}
+        for features, group_symbols in groups.items():
+            with stage_timer("features", "load_inputs") as st:
+                price_cols = ['symbol', 'date', 'open', 'close', 'high', 'low', 'volume']
+                stmt = select(*[getattr(PriceDaily, c) for c in price_cols]).where(
+                    PriceDaily.symbol.in_(group_symbols), PriceDaily.date <= period_end
+                )
+                idx_stmt = select(IndexDaily.date, IndexDaily.close).where(IndexDaily.date <= period_end)
+                if input_start is not None:
+                    stmt = stmt.where(PriceDaily.date >= input_start)
+                    idx_stmt = idx_stmt.where(IndexDaily.date >= input_start)
+                df_prices = pd.DataFrame((await db.execute(stmt)).all(), columns=price_cols)
+                df_index = pd.DataFrame((await db.execute(idx_stmt)).all(), columns=['date', 'close'])
+                df_prices['date'] = pd.to_datetime(df_prices['date'])
+                df_index['date'] = pd.to_datetime(df_index['date'])
+                df_prices.set_index('date', inplace=True)
+                df_index.set_index('date', inplace=True)
+                factors = await load_factors(db, group_symbols, after=input_start)
+                df_prices = adjust_prices(df_prices, factors, as_of=period_end)
+                st.rows = len(df_prices)
+
+            with stage_timer("features", "compute") as st:
+                result = fe.compute(df_prices, df_index, features=list(features))
+                dates = result.index.get_level_values('date')
+                result = result[(dates >= pd.Timestamp(period_start)) & (dates <= pd.Timestamp(period_end))]
+                result = to_own_units(result, factors, period_end)
+                st.rows = len(result)
+
+            with stage_timer("features", "save") as st:
+                values = result.astype(float).replace({np.nan: None})
+                rows = [
+                    {'symbol': sym, 'date': ts.date(), **dict(zip(values.columns, vals))}
+                    for (sym, ts), vals in zip(values.index, values.itertuples(index=False))
+                ]
+                st.rows = await bulk_upsert(db, FeatureDaily, rows, ['symbol', 'date'], update_columns=list(features))
+
+            counts = result.groupby(level='symbol').size()
+            for sym in group_symbols:
+                partition_rows[sym] = {
+                    'symbol': sym, 'period': period_start,
+                    'definition_hashes': hashes,
+                    'input_fingerprint': fingerprints[(sym, period_start)],
+                    'rows': int(counts.get(sym, 0)),
+                    'computed_at': datetime.utcnow(),
+                }
+
+        await bulk_upsert(db, FeaturePartition, list(partition_rows.values()), ['symbol', 'period'])
+        await db.commit()
+        stats["recomputed"] += len(stale)
+        stats["rows"] += sum(r['rows'] for r in partition_rows.values())
+        logger.info("Feature partitions refreshed", period=str(period_start), stale=len(stale),
+                    fresh=len(fingerprints) - len(stale))
+
+    stats["message"] = (f"Features {start}..{end}: {stats['recomputed']} partitions recomputed, "
+                        f"{stats['fresh']} fresh, {stats['rows']} rows written")
+    return stats
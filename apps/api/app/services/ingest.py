@@ -0,0 +1,297 @@
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+import structlog
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import Symbol, PriceDaily, PriceRevision, CorporateAction
+from app.services.revisions import REVISION_FIELDS
+from app.services.validation import validate_batch, quarantine_bars
+from app.utils.db import bulk_upsert
+from app.utils.metrics import stage_timer, timed_import, QUEUE_DEPTH
+
+logger = structlog.get_logger()
+
+# Staged price import: fetch -> normalize -> write, connected by bounded
+# queues. A stage that falls behind fills its input queue and holds the
+# stages before it back (backpressure) instead of the import buffering
+# everything in memory; otherwise all three run at once, so an import takes
+# about as long as its slowest stage rather than the sum of them.
+#   fetch:     IMPORT_FETCH_CONCURRENCY provider calls in threads (network)
+#   normalize: whatever symbols are ready, up to IMPORT_BATCH_SYMBOLS, into one
+#              long frame (CPU, in a thread)
+#   validate:  services/validation.py checks, flagged bars set aside (DB reads +
+#              CPU in a thread; part of the writer task, it sees every earlier commit)
+#   write:     diff against stored bars, bulk insert + revisions + quarantined
+#              bars, commit (DB)
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'turnover_tl', 'adj_close']
+REQUIRED_COLUMNS = ['open', 'high', 'low', 'close', 'volume'] # NOT NULL in prices_daily
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Work done by one stage: items (symbols / batches), rows, seconds spent working (summed over workers)."""
+    items: int = 0
+    rows: int = 0
+    busy_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "rows": self.rows,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "rows_per_second": round(self.rows / self.busy_seconds, 1) if self.busy_seconds else None,
+        }
+
+
+class _Stage:
+    def __init__(self, pipeline: str, name: str):
+        self.pipeline = pipeline
+        self.name = name
+        self.stats = StageStats()
+
+    @contextmanager
+    def timed(self, **log_context):
+        with stage_timer(self.pipeline, self.name, **log_context) as st:
+            try:
+                yield st
+            finally:
+                self.stats.items += 1
+        self.stats.rows += st.rows
+        self.stats.busy_seconds += st.elapsed
+
+
+class _Queue(asyncio.Queue):
+    """Bounded queue reporting its depth to Prometheus."""
+
+    def __init__(self, pipeline: str, name: str, maxsize: int):
+        super().__init__(maxsize)
+        self._gauge = QUEUE_DEPTH.labels(pipeline, name)
+
+    async def put(self, item):
+        await super().put(item)
+        self._gauge.set(self.qsize())
+
+    def get_ready(self):
+        """Next item if one is waiting, else None."""
+        try:
+            item = self.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        self._gauge.set(self.qsize())
+        return item
+
+    async def get(self):
+        item = await super().get()
+        self._gauge.set(self.qsize())
+        return item
+
+
+def normalize_bars(frames: Dict[str, "pd.DataFrame"]) -> "pd.DataFrame":
+    """
+    Provider frames (date index, PRICE_COLUMNS) of several symbols as one long
+    frame [symbol, date, *PRICE_COLUMNS], dates as datetime.date, numbers coerced
+    (NaN when missing). Checking the bars is left to validation.validate_bars.
+    """
+    pd = timed_import("pandas")
+    frame = pd.concat(frames, names=['symbol', 'date']).reset_index()
+    for col in PRICE_COLUMNS:
+        frame[col] = pd.to_numeric(frame[col], errors='coerce') if col in frame.columns else float('nan')
+    frame['date'] = pd.to_datetime(frame['date']).dt.date
+    return frame[['symbol', 'date', *PRICE_COLUMNS]]
+
+
+def _changed(old, new, rel_tol: float = 1e-6):
+    """Vectorized diff_bar test: new present and old missing or not isclose."""
+    np = timed_import("numpy")
+    close = np.abs(old - new) <= rel_tol * np.maximum(np.abs(old), np.abs(new))
+    return new.notna() & (old.isna() | ~close)
+
+
+async def mark_price_source(db: AsyncSession, symbols: List[str], source: str):
+    """
+    Set symbols.price_source for a batch about to be validated and written. A
+    symbol moving to or from a split-adjusted source (adjustments.SPLIT_ADJUSTED_SOURCES)
+    gets its factor series rebuilt first, so validation already judges its bars
+    with the factors they will be adjusted by. Does not commit.
+    """
+    from app.services.adjustments import rebuild_factors, SPLIT_ADJUSTED_SOURCES
+    if not symbols:
+        return
+    previous = dict((await db.execute(
+        select(Symbol.symbol, Symbol.price_source).where(Symbol.symbol.in_(symbols))
+    )).all())
+    moved = [sym for sym, was in previous.items() if was != source]
+    if not moved:
+        return
+    await db.execute(update(Symbol).where(Symbol.symbol.in_(moved)).values(price_source=source))
+    flipped = [sym for sym in moved if (previous[sym] in SPLIT_ADJUSTED_SOURCES) != (source in SPLIT_ADJUSTED_SOURCES)]
+    if flipped:
+        with_splits = (await db.execute(
+            select(CorporateAction.symbol).where(CorporateAction.symbol.in_(flipped), CorporateAction.kind == 'SPLIT')
+            .distinct()
+        )).scalars().all()
+        for sym in with_splits:
+            await rebuild_factors(db, sym)
+
+
+async def write_price_batch(db: AsyncSession, frame, source: str,
+                            log_revisions: bool = True) -> Tuple[Dict[str, int], int]:
+    """
+    Write a validated frame (one bar per symbol/date, required values present):
+    new bars are inserted, stored bars that changed are updated and logged as PriceRevision (same rules as diff_bar).
+    log_revisions=False overwrites changed bars without the PriceRevisions (a one-off re-baseline).
+    Returns ({symbol: new bars}, revised bars). Does not commit.
+    """
+    pd = timed_import("pandas")
+    np = timed_import("numpy")
+    if frame.empty:
+        return {}, 0
+
+    stmt = select(PriceDaily.symbol, PriceDaily.date, *[getattr(PriceDaily, f) for f in REVISION_FIELDS]).where(
+        PriceDaily.symbol.in_(frame['symbol'].unique().tolist()),
+        PriceDaily.date >= frame['date'].min(), PriceDaily.date <= frame['date'].max(),
+    )
+    existing = pd.DataFrame((await db.execute(stmt)).all(), columns=['symbol', 'date', *REVISION_FIELDS])
+    merged = frame.merge(existing, on=['symbol', 'date'], how='left', suffixes=('', '_old'), indicator=True)
+    stored = (merged.pop('_merge') == 'both').to_numpy()
+
+    # New bars
+    new = merged.loc[~stored, ['symbol', 'date', *PRICE_COLUMNS]]
+    # volume is stored as an integer: rounded here, in the diff and in updates alike
+    new = new.assign(volume=new['volume'].round()).astype({'volume': 'int64'}).astype(object).where(new.notna(), None)
+    await bulk_upsert(db, PriceDaily, new.to_dict('records'), ['symbol', 'date'], update_columns=[])
+
+    # Revised bars: changed fields take the new value, the rest keep the stored one
+    old = merged.loc[stored]
+    changed = pd.DataFrame({f: _changed(old[f'{f}_old'], old[f].round() if f == 'volume' else old[f])
+                            for f in REVISION_FIELDS})
+    old, changed = old.loc[changed.any(axis=1).to_numpy()], changed.loc[changed.any(axis=1)]
+    if not old.empty:
+        updates, revisions = [], []
+        for (_, row), (_, mask) in zip(old.iterrows(), changed.iterrows()):
+            values, changes = {}, {}
+            for f in REVISION_FIELDS:
+                new_value = int(round(row[f])) if f == 'volume' else float(row[f])
+                old_value = row[f'{f}_old']
+                old_value = None if pd.isna(old_value) else (int(old_value) if f == 'volume' else float(old_value))
+                values[f] = new_value if mask[f] else old_value
+                if mask[f]:
+                    changes[f] = [old_value, new_value]
+            updates.append({'symbol': row['symbol'], 'date': row['date'], **values})
+            revisions.append({'symbol': row['symbol'], 'date': row['date'], 'changes': changes, 'source': source})
+        await bulk_upsert(db, PriceDaily, updates, ['symbol', 'date'], update_columns=list(REVISION_FIELDS))
+        if log_revisions:
+            await db.execute(insert(PriceRevision), revisions)
+
+    added = new.groupby('symbol').size() if not new.empty else pd.Series(dtype=np.int64)
+    return {str(sym): int(n) for sym, n in added.items()}, len(old)
+
+
+async def ingest_prices(db: AsyncSession, fetch: Callable[[str], "pd.DataFrame"], symbols: List[str],
+                        source: str, pipeline: str = "import_yahoo", log_revisions: bool = True) -> dict:
+    """
+    Run the fetch -> normalize -> validate -> write stages over `symbols`. fetch(symbol)
+    is a blocking provider call returning its bars (date index, PRICE_COLUMNS).
+    A symbol that fails or returns nothing is reported in errors and skipped;
+    a batch that fails to write is rolled back and its symbols reported.
+    Bars failing validation go to price_quarantine instead of prices_daily.
+    log_revisions: see write_price_batch. Each written batch is committed. Returns counts, errors and per-stage stats.
+    """
+    settings = get_settings()
+    batch_size = max(1, settings.IMPORT_BATCH_SYMBOLS)
+    todo = list(symbols)
+    fetched = _Queue(pipeline, "fetched", max(1, settings.IMPORT_QUEUE_SIZE))
+    normalized = _Queue(pipeline, "normalized", 2)
+    stages = {name: _Stage(pipeline, name) for name in ("fetch", "normalize", "validate", "write")}
+    result = {"added": 0, "revised": 0, "quarantined": 0, "gap_days": 0, "updated_symbols": 0, "errors": []}
+    errors = result["errors"]
+
+    async def fetcher():
+        while todo:
+            sym = todo.pop(0)
+            try:
+                with stages["fetch"].timed(symbol=sym) as st:
+                    df = await asyncio.to_thread(fetch, sym)
+                    st.rows = len(df)
+            except Exception as e:
+                errors.append(f"{sym}: {e}")
+                continue
+            if df.empty:
+                errors.append(f"{sym}: Empty DataFrame")
+                continue
+            await fetched.put((sym, df))
+
+    async def fetch_all():
+        try:
+            await asyncio.gather(*[fetcher() for _ in range(max(1, min(settings.IMPORT_FETCH_CONCURRENCY, len(todo))))])
+        finally:
+            await fetched.put(_DONE)
+
+    async def normalizer():
+        done = False
+        while not done:
+            # Block for one symbol, then take what else is ready: batches grow when writing lags
+            batch = {}
+            item = await fetched.get()
+            while item is not None:
+                if item is _DONE:
+                    done = True
+                    break
+                batch[item[0]] = item[1]
+                if len(batch) >= batch_size:
+                    break
+                item = fetched.get_ready()
+            if batch:
+                with stages["normalize"].timed(symbols=len(batch)) as st:
+                    frame = await asyncio.to_thread(normalize_bars, batch)
+                    st.rows = len(frame)
+                await normalized.put((list(batch), frame))
+        await normalized.put(_DONE)
+
+    async def writer():
+        while True:
+            item = await normalized.get()
+            if item is _DONE:
+                return
+            batch, frame = item
+            try:
+                with stages["validate"].timed(symbols=len(batch)) as st:
+                    await mark_price_source(db, batch, source)
+                    frame, flagged, checked = await validate_batch(db, frame)
+                    st.rows = checked['checked']
+                with stages["write"].timed(symbols=len(batch)) as st:
+                    added, revised = await write_price_batch(db, frame, source, log_revisions)
+                    quarantined = await quarantine_bars(db, flagged, source)
+                    await db.commit()
+                    st.rows = sum(added.values()) + revised + quarantined
+            except Exception as e:
+                await db.rollback()
+                errors.extend(f"{sym}: {e}" for sym in batch)
+                continue
+            result["added"] += sum(added.values())
+            result["revised"] += revised
+            result["quarantined"] += quarantined
+            result["gap_days"] += checked.get('gap_days', 0)
+            result["updated_symbols"] += sum(1 for n in added.values() if n)
+            errors.extend(f"{sym}: No new rows to add" for sym in batch if not added.get(sym))
+
+    tasks = [asyncio.ensure_future(t) for t in (fetch_all(), normalizer(), writer())]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    result["stages"] = {name: stage.stats.as_dict() for name, stage in stages.items()}
+    logger.info("Ingest finished", pipeline=pipeline, symbols=len(symbols), added=result["added"],
+                revised=result["revised"], quarantined=result["quarantined"], stages=result["stages"])
+    return result
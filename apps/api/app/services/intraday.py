@@ -0,0 +1,382 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Optional
+
+import structlog
+
+from app.config import get_settings
+from app.services.revisions import INDEX_SYMBOL
+from app.utils.cache import get_cache, SIGNALS_NS
+from app.utils.metrics import timed_import
+
+logger = structlog.get_logger()
+
+# Provisional intraday Top10. A bar feed (minute / 15-minute bars, one CSV line
+# each: timestamp,symbol,open,high,low,close,volume) is folded into one running
+# daily bar per symbol. IntradayScorer holds the end-of-yesterday state as
+# FeatureEngine panels (the planned history window plus the stored EMA seeds)
+# with one extra row for today; a refresh re-evaluates only the symbols with
+# new bars since the last one, over that row, and re-ranks the whole universe
+# from the cached feature rows. Results go to the signals cache, never to the
+# daily tables: the end-of-day compute stays the record.
+
+BAR_COLUMNS = ('timestamp', 'symbol', 'open', 'high', 'low', 'close', 'volume')
+
+# Feed lines read between yields to the event loop when replaying unpaced
+REPLAY_YIELD_EVERY = 1000
+
+
+@dataclass(frozen=True)
+class Bar:
+    timestamp: datetime
+    symbol: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def parse_bar(line: str) -> Optional[Bar]:
+    """One feed line as a Bar; None for blank lines and the header. ValueError if malformed."""
+    parts = [p.strip() for p in line.strip().split(',')]
+    if not parts[0] or parts[0] == BAR_COLUMNS[0]:
+        return None
+    if len(parts) != len(BAR_COLUMNS):
+        raise ValueError(f"Expected {len(BAR_COLUMNS)} fields, got {len(parts)}")
+    o, h, l, c, v = (float(p) for p in parts[2:])
+    return Bar(datetime.fromisoformat(parts[0]), parts[1].upper(), o, h, l, c, v)
+
+
+class BarFeed(ABC):
+    @abstractmethod
+    def bars(self) -> AsyncIterator[Bar]:
+        """Bars in arrival order until the feed ends."""
+        pass
+
+
+def _lines_to_bars(lines):
+    for line in lines:
+        try:
+            bar = parse_bar(line)
+        except ValueError as e:
+            logger.warning("Bad feed line skipped", line=line.strip()[:80], error=str(e))
+            continue
+        if bar is not None:
+            yield bar
+
+
+class FileReplayFeed(BarFeed):
+    """
+    Replays a bar file. speed > 0 paces it by the bar timestamps (1 = real
+    time, 60 = a minute per second); 0 replays as fast as it is consumed.
+    """
+
+    def __init__(self, path: str, speed: float = 0.0):
+        self.path = path
+        self.speed = speed
+
+    async def bars(self) -> AsyncIterator[Bar]:
+        previous = None
+        with open(self.path) as f:
+            for n, bar in enumerate(_lines_to_bars(f)):
+                if self.speed > 0 and previous is not None and bar.timestamp > previous:
+                    await asyncio.sleep((bar.timestamp - previous).total_seconds() / self.speed)
+                elif n % REPLAY_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+                previous = bar.timestamp if previous is None else max(previous, bar.timestamp)
+                yield bar
+
+
+class SocketFeed(BarFeed):
+    """Bar lines from a TCP stream (e.g. serve_replay, or a vendor bridge) until it closes."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    async def bars(self) -> AsyncIterator[Bar]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while line := await reader.readline():
+                for bar in _lines_to_bars([line.decode()]):
+                    yield bar
+        finally:
+            writer.close()
+
+
+async def serve_replay(path: str, host: str = "127.0.0.1", port: int = 0, speed: float = 0.0):
+    """Local stand-in for a live source: a TCP server replaying `path` to every client. Returns the server."""
+
+    async def handle(reader, writer):
+        try:
+            async for bar in FileReplayFeed(path, speed).bars():
+                writer.write((",".join([bar.timestamp.isoformat(), bar.symbol, *[repr(getattr(bar, c)) for c in BAR_COLUMNS[2:]]])
+                              + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def get_bar_feed(spec: Optional[str] = None) -> BarFeed:
+    """BarFeed for an INTRADAY_FEED spec: file:/path/bars.csv or socket:host:port."""
+    settings = get_settings()
+    spec = spec if spec is not None else settings.INTRADAY_FEED
+    kind, _, target = spec.partition(':')
+    if kind == 'file' and target:
+        return FileReplayFeed(target, settings.INTRADAY_REPLAY_SPEED)
+    if kind == 'socket' and target:
+        host, _, port = target.rpartition(':')
+        if host and port.isdigit():
+            return SocketFeed(host, int(port))
+    raise ValueError(f"Unknown intraday feed '{spec}' (file:PATH or socket:HOST:PORT)")
+
+
+class IntradayScorer:
+    """Running daily bars of one session and the provisional Top10 they give."""
+
+    def __init__(self, session_date: date):
+        from app.services.feature_engine import FeatureEngine
+        from app.services.scoring_engine import ScoringEngine
+        self.session_date = session_date
+        self.fe = FeatureEngine()
+        self.se = ScoringEngine()
+        self.bars = {}       # symbol -> [open, high, low, close, volume] so far today
+        self.last_seen = {}  # symbol -> timestamp of its last bar (replays / reconnects repeat some)
+        self.dirty = set()
+        self.accepted = 0
+        self.skipped = 0
+        self.index_close = None
+        self.as_of = None
+
+    async def load(self, db):
+        """End-of-yesterday state from the DB: planned history in today's units, EMA seeds, symbols."""
+        from app.services.feature_engine import FEATURE_COLUMNS
+        from app.services.pipeline import trading_days, plan_history, load_feature_prices, load_index_frame
+        from app.services.adjustments import load_factors, adjust_prices
+        from app.models import Symbol
+        from sqlalchemy import select
+        pd = timed_import("pandas")
+
+        previous = await trading_days(db, self.session_date - timedelta(days=1), 1)
+        if not previous:
+            raise ValueError(f"No trading day before {self.session_date}")
+        prev = previous[0]
+        plan = await plan_history(db, self.fe, FEATURE_COLUMNS, prev)
+
+        symbols = (await db.execute(select(Symbol).where(Symbol.is_active == True))).scalars().all()
+        symbol_info = pd.DataFrame([{'symbol': s.symbol, 'sector': s.sector, 'is_active': s.is_active}
+                                    for s in symbols], columns=['symbol', 'sector', 'is_active']).set_index('symbol')
+        df_index = await load_index_frame(db, prev, plan)
+        if df_index.empty:
+            raise ValueError(f"No index data up to {prev}")
+        df_prices = await load_feature_prices(db, prev, plan, list(symbol_info.index), as_of=self.session_date)
+        if df_prices is None:
+            raise ValueError(f"No price data up to {prev}")
+
+        seeds = plan["seeds"]
+        if seeds is not None:
+            # plan_history has them in prev's units; an ex-date today rescales them once more
+            factors = await load_factors(db, list(symbol_info.index), after=prev)
+            seeds = adjust_prices(seeds.assign(symbol=seeds.index, date=prev), factors, as_of=self.session_date)
+        return self.start(prev, df_prices, df_index, symbol_info, seeds)
+
+    def start(self, previous_date: date, df_prices, df_index, symbol_info, seeds=None):
+        """
+        Set up from yesterday's inputs as compute_for_date would read them:
+        df_prices (index=date, in today's units), df_index (close, ema50),
+        symbol_info (index=symbol: sector, is_active), seeds (index=symbol: EMA columns).
+        """
+        from app.services.feature_engine import FEATURE_COLUMNS
+        from app.services.pipeline import EMA_SEED_COLUMNS
+        np = timed_import("numpy")
+        pd = timed_import("pandas")
+        self.previous_date = previous_date
+        self.index_base = df_index
+        self.symbol_info = symbol_info
+        dates, self.symbols, panels = self.fe.build_panel(df_prices)
+        self.column = {s: i for i, s in enumerate(self.symbols)}
+        self.seeds = None
+        if seeds is not None and not seeds.empty:
+            self.seeds = {col: seeds[col].reindex(self.symbols).to_numpy(dtype=np.float64, na_value=np.nan)
+                          for col in EMA_SEED_COLUMNS}
+
+        # Yesterday's rows start the ranking; symbols are replaced as their bars arrive
+        values = self.fe.compute_panel(panels, dates, df_index, FEATURE_COLUMNS, seeds=self.seeds)
+        traded = np.flatnonzero(dates[-1] == np.datetime64(pd.Timestamp(previous_date), 'ns'))
+        self.features = self._rows(values, traded, self.symbols[traded])
+        self.index_used = pd.Series(np.nan, index=self.features.index)
+
+        # Today's row, filled per symbol by refresh()
+        self.dates = np.vstack([dates, np.full((1, len(self.symbols)), np.datetime64('NaT'), dtype='datetime64[ns]')])
+        self.panels = {col: np.vstack([panel, np.full((1, len(self.symbols)), np.nan)]) for col, panel in panels.items()}
+        logger.info("Intraday state loaded", session_date=str(self.session_date), previous_date=str(previous_date),
+                    symbols=len(self.symbols), ranked=len(self.features), seeded=self.seeds is not None)
+        return self
+
+    @staticmethod
+    def _rows(values: dict, columns, symbols):
+        """Last-row feature values of the panel `columns` (index=symbol)."""
+        from app.services.feature_engine import FEATURE_COLUMNS
+        pd = timed_import("pandas")
+        rows = pd.DataFrame({f: values[f][-1, columns] for f in FEATURE_COLUMNS},
+                            index=pd.Index(symbols, name='symbol'))
+        rows['trend_gate'] = rows['trend_gate'].astype(bool)
+        return rows
+
+    def update(self, bar: Bar) -> bool:
+        """Fold one bar into the symbol's daily bar. False (skipped) for other days, repeats and unknown symbols."""
+        if bar.timestamp.date() != self.session_date:
+            self.skipped += 1
+            return False
+        last = self.last_seen.get(bar.symbol)
+        if last is not None and bar.timestamp <= last:
+            self.skipped += 1
+            return False
+        if bar.symbol == INDEX_SYMBOL:
+            self.index_close = bar.close
+        elif bar.symbol in self.column:
+            daily = self.bars.get(bar.symbol)
+            if daily is None:
+                self.bars[bar.symbol] = [bar.open, bar.high, bar.low, bar.close, bar.volume]
+            else:
+                daily[1] = max(daily[1], bar.high)
+                daily[2] = min(daily[2], bar.low)
+                daily[3] = bar.close
+                daily[4] += bar.volume
+        else:
+            self.skipped += 1
+            return False
+        self.last_seen[bar.symbol] = bar.timestamp
+        self.as_of = bar.timestamp if self.as_of is None else max(self.as_of, bar.timestamp)
+        self.dirty.add(bar.symbol)
+        self.accepted += 1
+        return True
+
+    def index_frame(self):
+        """Index closes and ema50 through today, today at the last index bar (yesterday's close before one)."""
+        pd = timed_import("pandas")
+        last = self.index_base.iloc[-1]
+        close = self.index_close if self.index_close is not None else float(last['close'])
+        alpha = 2.0 / 51.0
+        today = pd.DataFrame({'close': [close], 'ema50': [alpha * close + (1 - alpha) * float(last['ema50'])]},
+                             index=pd.DatetimeIndex([pd.Timestamp(self.session_date)], name=self.index_base.index.name))
+        return pd.concat([self.index_base, today])
+
+    def refresh(self) -> dict:
+        """Re-evaluate the symbols with new bars, re-rank the universe and return the provisional Top10."""
+        from app.services.feature_engine import FEATURE_COLUMNS
+        from app.services.pipeline import TOP10_MIN_ADV
+        np = timed_import("numpy")
+        pd = timed_import("pandas")
+        started = time.perf_counter()
+
+        df_index = self.index_frame()
+        index_now = float(df_index['close'].iloc[-1])
+        changed = sorted(self.dirty - {INDEX_SYMBOL})
+        self.dirty.clear()
+        if changed:
+            cols = np.array([self.column[s] for s in changed])
+            today = np.array([self.bars[s] for s in changed], dtype=np.float64)
+            for i, col in enumerate(('open', 'high', 'low', 'close', 'volume')):
+                self.panels[col][-1, cols] = today[:, i]
+            self.dates[-1, cols] = np.datetime64(pd.Timestamp(self.session_date), 'ns')
+            values = self.fe.compute_panel(
+                {col: panel[:, cols] for col, panel in self.panels.items()}, self.dates[:, cols], df_index,
+                FEATURE_COLUMNS, seeds=None if self.seeds is None else {k: v[cols] for k, v in self.seeds.items()},
+            )
+            rows = self._rows(values, slice(None), changed)
+            self.features = pd.concat([self.features.drop(changed, errors='ignore'), rows])
+            self.index_used = self.index_used.drop(changed, errors='ignore')
+            self.index_used = pd.concat([self.index_used, pd.Series(index_now, index=rows.index)])
+
+        # Symbols evaluated earlier today hold relative strength against the index level
+        # of their last refresh; rs = own return - index return, so only that term moves
+        stale = self.index_used.index[self.index_used.notna() & (self.index_used != index_now)]
+        if len(stale):
+            used = self.index_used[stale].to_numpy()
+            for feature, periods in (('rs_3m', 63), ('rs_6m', 126)):
+                if len(df_index) > periods:
+                    lag = float(df_index['close'].iloc[-1 - periods])
+                    self.features.loc[stale, feature] += (used - index_now) / lag
+            self.index_used[stale] = index_now
+
+        regime = self.se.detect_regime(df_index)
+        df_scored = self.se.calculate_scores(self.fe.normalize_cross_sectional(self.features), regime)
+        df_top10 = self.se.select_top10(df_scored, self.symbol_info, min_adv=TOP10_MIN_ADV, regime=regime)
+        return {
+            "date": self.session_date.isoformat(),
+            "regime": regime,
+            "as_of": self.as_of.isoformat() if self.as_of else None,
+            "provisional": True,
+            "top10": [{"rank": int(r['rank']), "symbol": r['symbol'], "final_score": float(r['final_score'])}
+                      for r in df_top10.to_dict('records')],
+            "ranked": len(df_scored),
+            "traded": len(self.bars),
+            "updated_symbols": len(changed),
+            "refresh_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+async def provisional_key(session_date: date) -> str:
+    return await get_cache().key(SIGNALS_NS, "top10", "provisional", session_date)
+
+
+async def publish_provisional(result: dict):
+    """Store a refresh for GET /signals/top10/provisional. The next EOD compute's generation bump retires it."""
+    await get_cache().set(await provisional_key(date.fromisoformat(result["date"])), result)
+
+
+async def run_intraday(feed: Optional[BarFeed] = None, session_date: Optional[date] = None,
+                       until: Optional[datetime] = None) -> dict:
+    """
+    Consume `feed` (default INTRADAY_FEED) for one session, publishing a
+    provisional Top10 every INTRADAY_REFRESH_SECONDS when bars arrived and once
+    more when the feed ends. Stops at `until` (aware datetime) if given.
+    """
+    from app.database import AsyncSessionLocal
+    from app.services.scheduler import market_today
+    settings = get_settings()
+    feed = feed or get_bar_feed()
+    scorer = IntradayScorer(session_date or market_today())
+    async with AsyncSessionLocal() as db:
+        await scorer.load(db)
+
+    async def consume():
+        async for bar in feed.bars():
+            scorer.update(bar)
+
+    consumer = asyncio.create_task(consume())
+    refreshes, last = 0, None
+    try:
+        while True:
+            done, _ = await asyncio.wait({consumer}, timeout=settings.INTRADAY_REFRESH_SECONDS)
+            if scorer.dirty:
+                last = scorer.refresh()
+                await publish_provisional(last)
+                refreshes += 1
+                logger.info("Provisional Top10 published", as_of=last["as_of"], updated=last["updated_symbols"],
+                            ranked=last["ranked"], refresh_ms=last["refresh_ms"])
+            if done:
+                consumer.result()
+                break
+            if until is not None and datetime.now(until.tzinfo) >= until:
+                break
+    finally:
+        consumer.cancel()
+
+    return {
+        "session_date": scorer.session_date.isoformat(),
+        "bars": scorer.accepted,
+        "skipped": scorer.skipped,
+        "traded": len(scorer.bars),
+        "refreshes": refreshes,
+        "last_refresh_ms": last["refresh_ms"] if last else None,
+    }
@@ -0,0 +1,163 @@
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+# Performance statistics of a backtest from its raw arrays (equity per day,
+# one row per trade). Everything is a handful of NumPy reductions, no pandas,
+# so it's cheap enough to run for every backtest of a sweep.
+# Percentages are rounded like RunningMetrics.summary (cagr/max_dd in %).
+
+ROLLING_WINDOW = 63 # ~3 months of trading days
+TRADING_DAYS = 252
+
+TRADE_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('symbol', object),
+    ('side', 'i1'), # +1 BUY, -1 SELL
+    ('qty', 'f8'),
+    ('price', 'f8'), # execution price, slippage included
+    ('fee', 'f8'),
+    ('reason', object),
+])
+
+
+def trade_array(trades: Iterable[Any]) -> np.ndarray:
+    """
+    Structured array (TRADE_DTYPE) from engine trade dicts or BacktestTrade
+    rows, in execution order (sells before buys within a day).
+    """
+    rows = [
+        (t['date'], t['symbol'], 1 if t['action'] == 'BUY' else -1, t['qty'], t['price'], t.get('fee') or 0.0, t.get('reason'))
+        if isinstance(t, dict) else
+        (t.date, t.symbol, 1 if t.action == 'BUY' else -1, t.qty, t.price, t.fee or 0.0, t.reason)
+        for t in trades
+    ]
+    return np.array(rows, dtype=TRADE_DTYPE)
+
+
+def round_trips(trades: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    SELLs matched with the BUY that opened the position. The engine holds a
+    symbol at most once and always sells the whole position, so the match is
+    the previous trade of the same symbol. Positions still open are left out.
+    """
+    if len(trades) == 0:
+        return {k: np.array([]) for k in ("pnl", "ret", "days", "reason")}
+    _, codes = np.unique(trades['symbol'].astype(str), return_inverse=True)
+    order = np.lexsort((np.arange(len(trades)), codes))
+    t, codes = trades[order], codes[order]
+
+    sells = np.flatnonzero(t['side'] == -1)
+    sells = sells[sells > 0]
+    buys = sells - 1
+    matched = (codes[buys] == codes[sells]) & (t['side'][buys] == 1)
+    sells, buys = sells[matched], buys[matched]
+
+    cost = t['qty'][buys] * t['price'][buys] + t['fee'][buys]
+    pnl = t['qty'][sells] * t['price'][sells] - t['fee'][sells] - cost
+    return {
+        "pnl": pnl,
+        "ret": pnl / cost,
+        "days": (t['date'][sells] - t['date'][buys]).astype(int),
+        "reason": t['reason'][sells].astype(str),
+    }
+
+
+def rolling_ratios(returns: np.ndarray, window: int = ROLLING_WINDOW):
+    """Annualized rolling Sharpe and Sortino, one value per full window (len(returns) - window + 1)."""
+    if len(returns) < window or window < 2:
+        return np.array([]), np.array([])
+    c1 = np.concatenate(([0.0], np.cumsum(returns)))
+    c2 = np.concatenate(([0.0], np.cumsum(returns ** 2)))
+    cd = np.concatenate(([0.0], np.cumsum(np.minimum(returns, 0) ** 2)))
+    mean = (c1[window:] - c1[:-window]) / window
+    var = np.maximum((c2[window:] - c2[:-window]) - window * mean ** 2, 0) / (window - 1)
+    downside = np.sqrt((cd[window:] - cd[:-window]) / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(var > 0, mean / np.sqrt(var), 0.0) * TRADING_DAYS ** 0.5
+        sortino = np.where(downside > 0, mean / downside, 0.0) * TRADING_DAYS ** 0.5
+    return sharpe, sortino
+
+
+def _band(values: np.ndarray, window: int) -> Optional[Dict[str, float]]:
+    if len(values) == 0:
+        return None
+    return {
+        "window": window,
+        "min": round(float(values.min()), 2),
+        "median": round(float(np.median(values)), 2),
+        "last": round(float(values[-1]), 2),
+    }
+
+
+def performance_metrics(equity: np.ndarray, trades: np.ndarray, initial_capital: float,
+                        start_date: date, end_date: date, cash: Optional[np.ndarray] = None,
+                        benchmark: Optional[np.ndarray] = None, window: int = ROLLING_WINDOW) -> Dict[str, Any]:
+    """
+    equity / cash / benchmark: one value per simulated day (benchmark is the
+    index close, 0 or NaN where missing). trades: TRADE_DTYPE array.
+    Exposure needs cash and alpha/beta a benchmark; they're None without.
+    """
+    equity = np.asarray(equity, dtype=float)
+    years = (end_date - start_date).days / 365.25
+    returns = equity[1:] / equity[:-1] - 1
+
+    final = equity[-1]
+    cagr = (final / initial_capital) ** (1 / years) - 1 if years > 0 and final > 0 else 0.0
+    peak = np.maximum.accumulate(equity)
+    max_dd = float(((equity - peak) / peak).min())
+    vol = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2)) if len(returns) else 0.0
+    mean = returns.mean() if len(returns) else 0.0
+    rolling_sharpe, rolling_sortino = rolling_ratios(returns, window)
+
+    notional = trades['qty'] * trades['price']
+    trips = round_trips(trades)
+    reasons, inverse = np.unique(trips['reason'], return_inverse=True)
+    by_reason_pnl = np.bincount(inverse, weights=trips['pnl'], minlength=len(reasons))
+    by_reason_n = np.bincount(inverse, minlength=len(reasons))
+
+    exposure = None
+    if cash is not None:
+        exposure = round(float(np.mean(1 - np.asarray(cash, dtype=float) / equity)) * 100, 2)
+
+    alpha = beta = None
+    if benchmark is not None:
+        bench = np.asarray(benchmark, dtype=float)
+        bench = np.where(bench > 0, bench, np.nan)
+        bench_ret = bench[1:] / bench[:-1] - 1
+        ok = np.isfinite(bench_ret)
+        if ok.sum() > 1:
+            r, rb = returns[ok], bench_ret[ok]
+            var_b = rb.var(ddof=1)
+            if var_b > 0:
+                b = np.cov(r, rb)[0, 1] / var_b
+                beta = round(float(b), 3)
+                alpha = round(float((r.mean() - b * rb.mean()) * TRADING_DAYS) * 100, 2)
+
+    return {
+        "cagr": round(cagr * 100, 2),
+        "max_dd": round(max_dd * 100, 2),
+        "sharpe": round(float(mean / vol * TRADING_DAYS ** 0.5), 2) if vol > 0 else 0,
+        "sortino": round(float(mean / downside * TRADING_DAYS ** 0.5), 2) if downside > 0 else 0,
+        "calmar": round(cagr / -max_dd, 2) if max_dd < 0 else None,
+        "volatility": round(float(vol * TRADING_DAYS ** 0.5) * 100, 2),
+        "rolling_sharpe": _band(rolling_sharpe, window),
+        "rolling_sortino": _band(rolling_sortino, window),
+        "final_equity": round(float(final), 2),
+        "total_trades": len(trades),
+        # Traded notional per year as a multiple of average equity
+        "turnover": round(float(notional.sum() / equity.mean() / years), 2) if years > 0 else None,
+        "exposure": exposure, # avg % of equity invested
+        "round_trips": len(trips['pnl']),
+        "hit_rate": round(float((trips['pnl'] > 0).mean()) * 100, 2) if len(trips['pnl']) else None,
+        "avg_holding_days": round(float(trips['days'].mean()), 1) if len(trips['days']) else None,
+        "avg_trade_return": round(float(trips['ret'].mean()) * 100, 2) if len(trips['ret']) else None,
+        "pnl_by_reason": {
+            reason: {"trades": int(n), "pnl": round(float(p), 2)}
+            for reason, n, p in zip(reasons, by_reason_n, by_reason_pnl)
+        },
+        "alpha": alpha, # annualized, % vs XU100
+        "beta": beta,
+    }
@@ -0,0 +1,569 @@
+import asyncio
+import math
+import structlog
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import select, desc, delete, and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Symbol, PriceDaily, PriceRevision, IndexDaily, FeatureDaily, ScoreDaily, Top10Daily
+from app.services.revisions import diff_bar, INDEX_SYMBOL
+from app.utils.metrics import stage_timer, timed_import
+from app.utils.cache import invalidate_daily_caches
+from app.config import get_settings
+
+logger = structlog.get_logger()
+
+# Pipeline steps shared by the HTTP endpoints (routers/data.py) and the
+# end-of-day scheduler (services/scheduler.py).
+
+async def import_yahoo_prices(db: AsyncSession, days: int = 365, end_date: Optional[date] = None,
+                              rebaseline: bool = False) -> dict:
+    """
+    Import N days of data up to end_date (inclusive, default today in
+    Settings.TIMEZONE) from Yahoo Finance for all active symbols in DB.
+    Existing (symbol, date) rows that changed upstream are updated and logged
+    as PriceRevision for services.revisions to recompute what they affect.
+
+    rebaseline: one-off rewrite of the stored bars (e.g. fully adjusted ones
+    from builds before auto_adjust=False, see services/adjustments.py) without
+    PriceRevisions; features then catch up with /data/features/refresh over the
+    same range, whose partition fingerprints see the rewritten bars.
+    """
+    from app.services.data_provider import YahooFinanceProvider
+    from app.services.scheduler import market_today
+    
+    end_date = end_date or market_today()
+    start_date = end_date - timedelta(days=days)
+
+    provider = YahooFinanceProvider()
+
+    # 1. Get Symbols from DB
+    # If DB is empty, maybe try to seed symbols first?
+    stmt = select(Symbol).where(Symbol.is_active == True)
+    result = await db.execute(stmt)
+    db_symbols = result.scalars().all()
+
+    if not db_symbols:
+        # Fallback: Try to load from CSV seed to get symbol list, then fetch prices
+        # Or return error
+        return {"message": "No symbols found in DB. Please run /import/seed first to populate symbol list."}
+
+    # The index download overlaps the symbol stages
+    def fetch_index():
+        with stage_timer("import_yahoo", "fetch_index"):
+            return provider.get_index_daily("XU100", start_date, end_date)
+    index_fetch = asyncio.ensure_future(asyncio.to_thread(fetch_index))
+
+    # Fetch / normalize / validate / write stages, see services/ingest.py
+    from app.services.ingest import ingest_prices
+    ingest = await ingest_prices(
+        db, lambda symbol: provider.get_daily_ohlcv(symbol, start_date, end_date),
+        [sym.symbol for sym in db_symbols], source="YAHOO", pipeline="import_yahoo", log_revisions=not rebaseline,
+    )
+    count, updated_symbols, revised, errors = ingest["added"], ingest["updated_symbols"], ingest["revised"], ingest["errors"]
+
+    # 2. Update Index (XU100)
+    index_status = "Skipped"
+    try:
+        df_idx = await index_fetch
+        if not df_idx.empty:
+            existing_stmt = select(IndexDaily).where(IndexDaily.date >= start_date)
+            res = await db.execute(existing_stmt)
+            existing_rows = {i.date: i for i in res.scalars().all()}
+
+            rows_to_add = []
+            for dt, row in df_idx.iterrows():
+                existing = existing_rows.get(dt.date())
+                if existing is not None:
+                    changes = diff_bar(existing, row, fields=('close',))
+                    if changes:
+                        existing.close = changes['close'][1]
+                        if not rebaseline:
+                            db.add(PriceRevision(symbol=INDEX_SYMBOL, date=dt.date(), changes=changes, source="YAHOO"))
+                        revised += 1
+                    continue
+
+                i = IndexDaily(
+                    date=dt.date(),
+                    close=row['close']
+                )
+                rows_to_add.append(i)
+
+            if rows_to_add:
+                db.add_all(rows_to_add)
+                index_status = f"Updated {len(rows_to_add)} rows"
+            else:
+                index_status = "No new rows"
+            await db.commit()
+        else:
+            index_status = "Empty DataFrame"
+    except Exception as e:
+        index_status = f"Error: {e}"
+
+    return {
+        "message": f"Yahoo Import complete. Updated {updated_symbols} symbols, added {count} price rows, "
+                   f"{revised} {'rebaselined' if rebaseline else 'revised'} bars, {ingest['quarantined']} quarantined.",
+        "revised": revised,
+        "quarantined": ingest["quarantined"],
+        "debug_errors": errors[:20], # Show first 20 errors
+        "index_status": index_status,
+        "stages": ingest["stages"],
+    }
+
+async def load_backtest_inputs(db: AsyncSession, start: date, end: date, atr=None):
+    """
+    Load everything BacktestEngine.run_backtest needs for [start, end].
+    atr: precomputed atr14 (date x symbol frame, see load_atr_history) used
+    instead of deriving it from the loaded prices, for the windows of a chunked run.
+    Prices and EMAs are split/dividend adjusted to today's units (services/adjustments.py).
+    Returns (top10_history, feature_history, price_history, index_history).
+    """
+    from app.services.adjustments import load_factors, adjust_prices
+    pd = timed_import("pandas")
+    
+    # Prices (plain column tuples, ORM objects cost several times the memory)
+    price_cols = ['symbol', 'date', 'open', 'close', 'high', 'low']
+    stmt = select(*[getattr(PriceDaily, c) for c in price_cols]).where(PriceDaily.date >= start, PriceDaily.date <= end)
+    data = (await db.execute(stmt)).all()
+    if not data:
+        raise ValueError("No price data found")
+
+    df_all = pd.DataFrame(data, columns=price_cols)
+    del data
+    df_all['date'] = pd.to_datetime(df_all['date'])
+    df_all.set_index('date', inplace=True)
+    factors = await load_factors(db, after=start)
+    df_all = adjust_prices(df_all, factors)
+
+    # Group by symbol
+    price_history = {}
+    for sym, group in df_all.groupby('symbol'):
+        price_history[str(sym)] = group
+
+    # Features
+    stmt = select(FeatureDaily.symbol, FeatureDaily.date, FeatureDaily.ema50, FeatureDaily.atr14_pct).where(
+        FeatureDaily.date >= start, FeatureDaily.date <= end
+    )
+    df_feat = pd.DataFrame((await db.execute(stmt)).all(), columns=['symbol', 'date', 'ema50', 'atr14_pct'])
+    if not df_feat.empty:
+        df_feat['date'] = pd.to_datetime(df_feat['date'])
+        df_feat = adjust_prices(df_feat, factors) # stored in each date's own units
+        df_feat.set_index(['date', 'symbol'], inplace=True)
+        df_feat.sort_index(inplace=True)
+
+        # atr14 (stop distance) is not persisted; derive it from the prices, only the ATR subgraph runs
+        if atr is None:
+            from app.services.feature_engine import FeatureEngine
+            atr = FeatureEngine().compute(df_all, features=['atr14']).swaplevel().rename_axis(['date', 'symbol'])
+        else:
+            atr = atr_window(atr, start, end)
+        df_feat = df_feat.join(atr, how='left')
+
+    # Top10
+    stmt = select(Top10Daily.date, Top10Daily.rank, Top10Daily.symbol, Top10Daily.final_score).where(
+        Top10Daily.date >= start, Top10Daily.date <= end
+    )
+    df_top = pd.DataFrame((await db.execute(stmt)).all(), columns=['date', 'rank', 'symbol', 'final_score'])
+    if not df_top.empty:
+        df_top['date'] = pd.to_datetime(df_top['date'])
+        df_top.set_index(['date', 'rank'], inplace=True)
+        df_top.sort_index(inplace=True)
+
+    # Index
+    stmt = select(IndexDaily.date, IndexDaily.close, IndexDaily.ema50).where(IndexDaily.date >= start, IndexDaily.date <= end)
+    df_index = pd.DataFrame((await db.execute(stmt)).all(), columns=['date', 'close', 'ema50'])
+    if not df_index.empty:
+        df_index['date'] = pd.to_datetime(df_index['date'])
+        df_index.set_index('date', inplace=True)
+    
+    return df_top, df_feat, price_history, df_index
+
+
+# Chunked backtests (MEMORY_BUDGET_MB): the run is simulated in date windows,
+# each continuing from the previous window's engine checkpoint, so only one
+# window of prices/features is in memory at a time. atr14 is an EMA over the
+# whole run, so it is computed up front in symbol batches (exactly what the
+# unchunked load derives) and sliced per window.
+
+async def load_atr_history(db: AsyncSession, start: date, end: date, batch_size: Optional[int] = None):
+    """atr14 over [start, end] (adjusted prices) as a date x symbol frame, batch_size symbols at a time."""
+    from app.services.adjustments import load_factors, adjust_prices
+    from app.services.feature_engine import FeatureEngine
+    from app.utils.memory import batched
+    pd = timed_import("pandas")
+
+    in_range = and_(PriceDaily.date >= start, PriceDaily.date <= end)
+    symbols = (await db.execute(
+        select(PriceDaily.symbol).where(in_range).distinct().order_by(PriceDaily.symbol)
+    )).scalars().all()
+    fe = FeatureEngine()
+    factors = await load_factors(db, after=start)
+    parts = []
+    for batch in batched(symbols, batch_size):
+        cols = ['symbol', 'date', 'close', 'high', 'low']
+        rows = (await db.execute(
+            select(*[getattr(PriceDaily, c) for c in cols]).where(in_range, PriceDaily.symbol.in_(batch))
+        )).all()
+        df = pd.DataFrame(rows, columns=cols)
+        df['date'] = pd.to_datetime(df['date'])
+        df.set_index('date', inplace=True)
+        df = adjust_prices(df, factors)
+        parts.append(fe.compute(df, features=['atr14'])['atr14'].unstack(level=0))
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, axis=1).sort_index()
+
+
+def atr_window(atr, start: date, end: date):
+    """Rows of a load_atr_history frame in [start, end], long: (date, symbol) -> atr14."""
+    pd = timed_import("pandas")
+    np = timed_import("numpy")
+    window = atr.loc[pd.Timestamp(start):pd.Timestamp(end)]
+    values = window.to_numpy()
+    rows, cols = np.nonzero(~np.isnan(values))
+    index = pd.MultiIndex.from_arrays([window.index[rows], window.columns[cols]], names=['date', 'symbol'])
+    return pd.DataFrame({'atr14': values[rows, cols]}, index=index)
+
+
+def backtest_windows(start: date, end: date, calendar: list, window_days: Optional[int]) -> list:
+    """
+    Split [start, end] into windows of about window_days trading days. Each
+    window starts on the previous one's last day: a run continued from a
+    checkpoint reads that day's signals and stops.
+    """
+    if not window_days or len(calendar) <= window_days:
+        return [(start, end)]
+    step = max(1, window_days - 1)
+    cuts = calendar[step:-1:step]
+    bounds = [start, *cuts, end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+async def plan_backtest_windows(db: AsyncSession, start: date, end: date):
+    """
+    Windows for a backtest over [start, end] under MEMORY_BUDGET_MB, plus the
+    precomputed atr14 they share (None for a single window, loaded as usual).
+    """
+    from app.utils.memory import rows_per_chunk, BACKTEST_BYTES_PER_ROW
+    budget_rows = rows_per_chunk(BACKTEST_BYTES_PER_ROW)
+    if budget_rows is None:
+        return [(start, end)], None
+
+    calendar = (await db.execute(
+        select(IndexDaily.date).where(IndexDaily.date >= start, IndexDaily.date <= end).order_by(IndexDaily.date)
+    )).scalars().all()
+    n_symbols = await db.scalar(
+        select(func.count(PriceDaily.symbol.distinct())).where(PriceDaily.date >= start, PriceDaily.date <= end)
+    )
+    if not calendar or not n_symbols or len(calendar) * n_symbols <= budget_rows:
+        return [(start, end)], None
+
+    windows = backtest_windows(start, end, calendar, max(2, budget_rows // n_symbols))
+    atr = await load_atr_history(db, start, end, max(1, budget_rows // len(calendar)))
+    logger.info("Chunked backtest", windows=len(windows), days=len(calendar), symbols=n_symbols)
+    return windows, atr
+
+# Top10 liquidity floor (ADV20, TL); low for test
+TOP10_MIN_ADV = 10_000
+
+# EMAs persisted in FeatureDaily; a previous day's row lets them continue without warm-up
+EMA_SEED_COLUMNS = ('ema50', 'ema200')
+
+
+async def trading_days(db: AsyncSession, end: date, count: int) -> list:
+    """Last `count` trading days up to end (inclusive), newest first. The calendar is index_daily."""
+    stmt = select(IndexDaily.date).where(IndexDaily.date <= end).order_by(desc(IndexDaily.date)).limit(count)
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def load_ema_seeds(db: AsyncSession, seed_date: date):
+    """
+    FeatureDaily EMAs on seed_date (index=symbol), plus the symbols that traded
+    that day without a complete EMA row (young listings still warming up).
+    Returns (None, []) if seed_date was never computed.
+    """
+    pd = timed_import("pandas")
+    stmt = select(FeatureDaily.symbol, *[getattr(FeatureDaily, c) for c in EMA_SEED_COLUMNS]).where(FeatureDaily.date == seed_date)
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return None, []
+
+    seeds = pd.DataFrame(rows, columns=['symbol', *EMA_SEED_COLUMNS]).set_index('symbol').astype(float).dropna()
+    traded = (await db.execute(select(PriceDaily.symbol).where(PriceDaily.date == seed_date))).scalars().all()
+    cold = sorted(set(traded) - set(seeds.index))
+    return seeds, cold
+
+
+def index_history_bars(fe, warmup: float) -> int:
+    """Index bars compute_for_date reads: 126-day return for RS, EMA50 + 10 day slope for the regime."""
+    return max(fe.lookback(['rs_6m']), math.ceil(50 * warmup) + 10)
+
+
+async def plan_history(db: AsyncSession, fe, features: list, target_date: date) -> dict:
+    """
+    Smallest price/index history that fully forms `features` on target_date,
+    counted in trading days from the index calendar:
+    - seeded: EMAs continue from the FeatureDaily row of the day before the
+      window, so only the longest window (rs_6m, 126 bars) is loaded. Symbols
+      without a usable row there (cold) get the full warm-up instead.
+    - otherwise EMAs get EMA_WARMUP_SPANS spans of warm-up (ema200 -> 300 bars)
+    Start dates are None when the calendar is shorter (load everything).
+    """
+    warmup = get_settings().EMA_WARMUP_SPANS
+    full = fe.lookback(features, warmup)
+    seeded = fe.lookback(features, warmup, seeded=EMA_SEED_COLUMNS)
+    index_lookback = index_history_bars(fe, warmup)
+
+    calendar = await trading_days(db, target_date, max(full, index_lookback) + 2)
+
+    def day(n) -> Optional[date]:
+        return calendar[n] if n < len(calendar) else None
+
+    plan = {
+        "price_start": day(full), "index_start": day(index_lookback), "lookback": full,
+        "seeds": None, "cold_symbols": [], "cold_start": None,
+    }
+    if seeded < full and day(seeded + 1) is not None:
+        seeds, cold = await load_ema_seeds(db, day(seeded + 1))
+        if seeds is not None and not seeds.empty:
+            # Stored in the seed day's units; an ex-date since then rescales them
+            from app.services.adjustments import load_factors, adjust_prices
+            factors = await load_factors(db, after=day(seeded + 1))
+            seeds = adjust_prices(seeds.assign(symbol=seeds.index, date=day(seeded + 1)), factors,
+                                  as_of=target_date)[list(EMA_SEED_COLUMNS)]
+            plan.update(price_start=day(seeded), lookback=seeded, seeds=seeds,
+                        cold_symbols=cold, cold_start=day(full))
+    return plan
+
+
+async def load_index_frame(db: AsyncSession, target_date: date, plan: dict):
+    """XU100 closes (+ ema50 for the regime) over the planned index window."""
+    pd = timed_import("pandas")
+    stmt = select(IndexDaily.date, IndexDaily.close).where(IndexDaily.date <= target_date)
+    if plan["index_start"] is not None:
+        stmt = stmt.where(IndexDaily.date >= plan["index_start"])
+    df_index = pd.DataFrame((await db.execute(stmt)).all(), columns=['date', 'close'])
+    if df_index.empty:
+        return df_index
+    df_index['date'] = pd.to_datetime(df_index['date'])
+    df_index.set_index('date', inplace=True)
+    df_index['ema50'] = df_index['close'].ewm(span=50, adjust=False).mean()
+    return df_index
+
+
+async def compute_symbol_features(db: AsyncSession, fe, target_date: date, plan: dict, symbols: list,
+                                  df_index, replace: bool = False):
+    """
+    Time-series features of `symbols` on target_date (one row per symbol, all
+    of FEATURE_COLUMNS), written to features_daily with bulk_upsert. Existing
+    rows are kept unless replace. Only reads the symbols' own bars and the
+    index, so any split of the universe gives the same rows: under
+    MEMORY_BUDGET_MB the symbols are loaded and computed in batches.
+    Returns None when the symbols have no prices in the window. Does not commit.
+    """
+    from app.utils.memory import rows_per_chunk, batched, FEATURE_BYTES_PER_ROW
+    pd = timed_import("pandas")
+    budget_rows = rows_per_chunk(FEATURE_BYTES_PER_ROW)
+    batch_size = None if budget_rows is None else max(1, budget_rows // (plan["lookback"] + 1))
+    parts = []
+    for batch in batched(sorted(symbols), batch_size):
+        features = await _compute_feature_batch(db, fe, target_date, plan, batch, df_index, replace)
+        if features is not None:
+            parts.append(features)
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+
+async def load_feature_prices(db: AsyncSession, target_date: date, plan: dict, symbols: list,
+                              as_of: Optional[date] = None):
+    """
+    The symbols' bars a plan_history plan needs up to target_date (index=date),
+    adjusted to as_of's units (default target_date). None when there are none.
+    """
+    from app.services.adjustments import load_factors, adjust_prices
+    pd = timed_import("pandas")
+
+    with stage_timer("compute", "load_prices") as st:
+        price_cols = ['symbol', 'date', 'open', 'close', 'high', 'low', 'volume']
+        stmt = select(*[getattr(PriceDaily, c) for c in price_cols]).where(
+            PriceDaily.date <= target_date, PriceDaily.symbol.in_(symbols)
+        )
+        if plan["price_start"] is not None:
+            window = PriceDaily.date >= plan["price_start"]
+            cold_symbols = sorted(set(plan["cold_symbols"]) & set(symbols))
+            if cold_symbols:
+                cold = PriceDaily.symbol.in_(cold_symbols)
+                if plan["cold_start"] is not None:
+                    cold = and_(cold, PriceDaily.date >= plan["cold_start"])
+                window = or_(window, cold)
+            stmt = stmt.where(window)
+        prices = (await db.execute(stmt)).all()
+        st.rows = len(prices)
+    if not prices:
+        return None
+
+    df_prices = pd.DataFrame(prices, columns=price_cols)
+    df_prices['date'] = pd.to_datetime(df_prices['date'])
+    df_prices.set_index('date', inplace=True)
+    # In target_date's units by default, the units features_daily rows are stored in
+    factors = await load_factors(db, symbols, after=df_prices.index.min().date())
+    return adjust_prices(df_prices, factors, as_of=as_of or target_date)
+
+
+async def _compute_feature_batch(db: AsyncSession, fe, target_date: date, plan: dict, symbols: list,
+                                 df_index, replace: bool):
+    from app.services.feature_engine import FEATURE_COLUMNS
+    from app.services.feature_store import PERSISTED_FEATURES
+    from app.utils.db import bulk_upsert
+    np = timed_import("numpy")
+
+    df_prices = await load_feature_prices(db, target_date, plan, symbols)
+    if df_prices is None:
+        return None
+
+    seeds = plan["seeds"]
+    if seeds is not None:
+        seeds = seeds[seeds.index.isin(symbols)]
+    features = fe.compute(df_prices, df_index, features=FEATURE_COLUMNS, as_of=target_date, seeds=seeds)
+
+    with stage_timer("compute", "save_features") as st:
+        values = features[PERSISTED_FEATURES].astype(float).replace({np.nan: None})
+        rows = [
+            {'symbol': sym, 'date': target_date, **dict(zip(PERSISTED_FEATURES, vals))}
+            for sym, vals in zip(values.index, values.itertuples(index=False))
+        ]
+        st.rows = await bulk_upsert(db, FeatureDaily, rows, ['symbol', 'date'],
+                                    update_columns=PERSISTED_FEATURES if replace else [])
+    return features
+
+
+async def compute_for_date(db: AsyncSession, target_date: date, replace: bool = False) -> dict:
+    """
+    Compute features, scores and Top10 for target_date.
+    replace=True overwrites rows already stored for the date (price revisions).
+    1. Load prices
+    2. Feature Engine
+    3. Scoring Engine
+    4. Save
+    """
+    # Heavy imports deferred to first compute
+    from app.services.feature_engine import FeatureEngine, FEATURE_COLUMNS
+    from app.services.scoring_engine import ScoringEngine
+    pd = timed_import("pandas")
+    
+    fe = FeatureEngine()
+    features = FEATURE_COLUMNS
+    
+    # 1. Load Data (Prices for target_date and just enough history for the features)
+    with stage_timer("compute", "plan_history") as st:
+        plan = await plan_history(db, fe, features, target_date)
+        st.rows = plan["lookback"]
+    
+    # Symbols
+    with stage_timer("compute", "load_symbols") as st:
+        stmt = select(Symbol).where(Symbol.is_active == True)
+        res = await db.execute(stmt)
+        symbols_list = res.scalars().all()
+        symbols_map = {s.symbol: s for s in symbols_list}
+        st.rows = len(symbols_list)
+    
+    # Index
+    with stage_timer("compute", "load_index") as st:
+        df_index = await load_index_frame(db, target_date, plan)
+        st.rows = len(df_index)
+    if df_index.empty:
+         return {"message": "No index data found"}
+    
+    # 2. Features & Scores
+    se = ScoringEngine()
+    
+    # Detect Regime (using Index history up to target_date)
+    regime = se.detect_regime(df_index)
+    
+    # Time-series features per symbol (map; sharded across processes/nodes when
+    # COMPUTE_SHARDS > 1), everything cross-sectional below on the merged rows (reduce)
+    from app.services.sharding import get_shard_runner
+    with stage_timer("compute", "features") as st:
+        runner = get_shard_runner()
+        if runner is None:
+            df_today_features = await compute_symbol_features(db, fe, target_date, plan, list(symbols_map), df_index, replace)
+        else:
+            df_today_features = await runner.compute(target_date, plan, list(symbols_map), replace)
+        if df_today_features is None:
+            return {"message": "No price data found"}
+        st.rows = len(df_today_features)
+
+    if df_today_features.empty:
+        return {"message": f"No features computed for {target_date}"}
+    
+    # Normalize
+    with stage_timer("compute", "normalize") as st:
+        df_norm = fe.normalize_cross_sectional(df_today_features)
+        st.rows = len(df_norm)
+    
+    # Score
+    with stage_timer("compute", "score") as st:
+        df_scored = se.calculate_scores(df_norm, regime)
+        st.rows = len(df_scored)
+    
+    # Select Top 10
+    # Need symbol info DF
+    with stage_timer("compute", "select_top10") as st:
+        df_sym_info = pd.DataFrame([
+            {'symbol': s.symbol, 'sector': s.sector, 'is_active': s.is_active} 
+            for s in symbols_list
+        ])
+        df_sym_info.set_index('symbol', inplace=True)
+        
+        df_top10 = se.select_top10(df_scored, df_sym_info, min_adv=TOP10_MIN_ADV, regime=regime)
+        st.rows = len(df_top10)
+    
+    # 3. Save to DB
+    # Delete existing for date
+    if replace:
+        await db.execute(delete(Top10Daily).where(Top10Daily.date == target_date))
+        await db.execute(delete(ScoreDaily).where(ScoreDaily.date == target_date))
+        # Feature rows were upserted by the map step; drop symbols no longer computed
+        await db.execute(delete(FeatureDaily).where(
+            FeatureDaily.date == target_date, FeatureDaily.symbol.not_in(list(df_today_features.index))
+        ))
+    
+    with stage_timer("compute", "save") as st:
+        # Save Scores
+        for sym, row in df_scored.iterrows():
+            existing = await db.scalar(select(ScoreDaily).where((ScoreDaily.symbol == sym) & (ScoreDaily.date == target_date)))
+            if not existing:
+                s = ScoreDaily(
+                    symbol=sym, date=target_date,
+                    potential_score=row['potential_score'],
+                    risk_score=row['risk_score'],
+                    final_score=row['final_score'],
+                    explain_json=row['explain_json'] # JSON string? need to check model. Model says JSON type.
+                    # ScoringEngine returns string in make_explain.
+                    # PG JSON accepts string or dict. 
+                )
+                db.add(s)
+                st.rows += 1
+
+        # Save Top 10
+        for _, row in df_top10.iterrows():
+            existing = await db.scalar(select(Top10Daily).where((Top10Daily.date == target_date) & (Top10Daily.rank == row['rank'])))
+            if existing:
+                continue
+            t = Top10Daily(
+                date=target_date,
+                rank=row['rank'],
+                symbol=row['symbol'],
+                final_score=row['final_score'],
+                universe_tag=row['universe_tag']
+            )
+            db.add(t)
+            st.rows += 1
+            
+        await db.commit()
+        
+    # Cached signal and backtest responses (e.g. an empty Top10 for today) are stale now
+    await invalidate_daily_caches()
+    return {"message": f"Computed for {target_date}. Regime: {regime}, Candidates: {len(df_scored)}, Top10: {len(df_top10)}"}
+
@@ -0,0 +1,354 @@
+import warnings
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import Symbol, PriceDaily, IndexDaily
+from app.services.adjustments import load_factors, adjust_prices
+from app.services.feature_engine import FeatureEngine, FEATURE_COLUMNS, NORMALIZED_COLUMNS
+from app.services.pipeline import trading_days
+from app.services.scoring_engine import ScoringEngine
+from app.utils.metrics import stage_timer
+
+logger = structlog.get_logger()
+
+# Scoring research: load the normalized feature tensor (date x symbol x feature)
+# once, then score and select Top10 for many weight sets in one batched pass
+# instead of re-running compute_for_date per weighting.
+
+# Same liquidity floor as compute_for_date
+DEFAULT_MIN_ADV = 10_000
+# Cap on scores materialized at once (weight sets x dates x symbols)
+SCORE_CHUNK_CELLS = 4_000_000
+
+
+@dataclass
+class FeatureTensor:
+    dates: pd.DatetimeIndex            # (D,) trading days
+    symbols: List[str]                 # (S,)
+    values: np.ndarray                 # (D, S, F) 0-100 ranks of NORMALIZED_COLUMNS, NaN where no bar
+    eligible: np.ndarray               # (D, S) traded, active, liquid and above the trend gate
+    risk_on: np.ndarray                # (D,) regime of each date
+    sectors: np.ndarray                # (S,) sector code, -1 = no sector (not capped)
+    close: np.ndarray                  # (D, S) raw closes, for forward returns
+    feature_history: pd.DataFrame      # (date, symbol) -> ema50, atr14 for BacktestEngine stops
+    price_history: Dict[str, pd.DataFrame]
+    index_history: pd.DataFrame        # date -> close, ema50
+
+    @property
+    def limits(self) -> np.ndarray:
+        """Top-N size per date, as in select_top10: 10 in RISK_ON, 7 otherwise."""
+        return np.where(self.risk_on, 10, 7)
+
+    def window(self, start: date, end: date) -> "FeatureTensor":
+        """Dates in [start, end] only. Normalization is per date, so nothing is recomputed."""
+        mask = (self.dates >= pd.Timestamp(start)) & (self.dates <= pd.Timestamp(end))
+        return replace(
+            self, dates=self.dates[mask], values=self.values[mask], eligible=self.eligible[mask],
+            risk_on=self.risk_on[mask], close=None if self.close is None else self.close[mask],
+        )
+
+
+def pivot(frame: pd.DataFrame, dates: pd.DatetimeIndex, symbols: Sequence[str], columns: List[str]) -> np.ndarray:
+    """(symbol, date) long frame -> (D, S, len(columns)) array, NaN where missing."""
+    out = np.full((len(dates), len(symbols), len(columns)), np.nan)
+    d = dates.get_indexer(frame.index.get_level_values('date'))
+    s = pd.Index(symbols).get_indexer(frame.index.get_level_values('symbol'))
+    keep = (d >= 0) & (s >= 0)
+    out[d[keep], s[keep]] = frame[columns].to_numpy(dtype=float)[keep]
+    return out
+
+
+def normalize_tensor(raw: np.ndarray) -> np.ndarray:
+    """
+    FeatureEngine.normalize_cross_sectional for every date at once: per date
+    and feature, winsorize at the 2%/98% quantiles then percentile rank (0-100).
+    raw: (D, S, F); NaN cells stay NaN and don't count in the ranks.
+    """
+    with warnings.catch_warnings():
+        # Dates where a feature has no value at all (e.g. before rs_6m forms)
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lower = np.nanquantile(raw, 0.02, axis=1, keepdims=True)
+        upper = np.nanquantile(raw, 0.98, axis=1, keepdims=True)
+    clipped = np.minimum(np.maximum(raw, lower), upper)
+
+    out = np.empty_like(clipped)
+    for f in range(clipped.shape[2]):
+        out[:, :, f] = pd.DataFrame(clipped[:, :, f]).rank(axis=1, pct=True).to_numpy() * 100.0
+    return out
+
+
+def regime_series(df_index: pd.DataFrame) -> pd.Series:
+    """ScoringEngine.detect_regime on every date: close > EMA50 and EMA50 rising over 10 days."""
+    ema50 = df_index['close'].ewm(span=50, adjust=False).mean()
+    risk_on = (df_index['close'] > ema50) & (ema50 > ema50.shift(10))
+    return risk_on & (np.arange(len(df_index)) >= 10)
+
+
+def weight_matrices(weight_sets: Sequence[dict], features: Sequence[str] = NORMALIZED_COLUMNS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Effective (F, K) weight matrices for RISK_ON and RISK_OFF dates:
+    final = potential - lambda * risk = X @ (w_potential - lambda * w_risk).
+    Weight sets use ScoringEngine.calculate_scores' override format; missing
+    entries keep the defaults.
+    """
+    position = {f: i for i, f in enumerate(features)}
+    on = np.zeros((len(features), len(weight_sets)))
+    off = np.zeros_like(on)
+    for k, ws in enumerate(weight_sets):
+        potential = {**ScoringEngine.POTENTIAL_WEIGHTS, **(ws.get('potential') or {})}
+        risk = {**ScoringEngine.RISK_WEIGHTS, **(ws.get('risk') or {})}
+        lambdas = {**ScoringEngine.RISK_LAMBDA, **(ws.get('risk_lambda') or {})}
+        unknown = (set(potential) | set(risk)) - set(position)
+        if unknown:
+            raise ValueError(f"Weight set {k}: unknown features {sorted(unknown)}")
+        for col, w in potential.items():
+            on[position[col], k] += w
+            off[position[col], k] += w
+        for col, w in risk.items():
+            on[position[col], k] -= lambdas['RISK_ON'] * w
+            off[position[col], k] -= lambdas['RISK_OFF'] * w
+    return on, off
+
+
+def score_weight_sets(tensor: FeatureTensor, weight_sets: Sequence[dict],
+                      chunk_size: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Final scores (k, D, S) for consecutive chunks of weight sets, yielded as
+    (first k, scores). Each chunk is one matrix product of the tensor with the
+    per-date weight matrix (RISK_ON or RISK_OFF columns).
+    """
+    on, off = weight_matrices(weight_sets)
+    n_dates, n_symbols, _ = tensor.values.shape
+    if chunk_size is None:
+        chunk_size = max(1, SCORE_CHUNK_CELLS // max(n_dates * n_symbols, 1))
+
+    for k0 in range(0, len(weight_sets), chunk_size):
+        k1 = min(k0 + chunk_size, len(weight_sets))
+        per_date = np.where(tensor.risk_on[:, None, None], on[None, :, k0:k1], off[None, :, k0:k1])
+        yield k0, np.einsum('dsf,dfk->kds', tensor.values, per_date, optimize=True)
+
+
+def select_top(scores: np.ndarray, eligible: np.ndarray, sectors: np.ndarray,
+               limits: np.ndarray, per_sector: int = 2) -> Tuple[np.ndarray, ...]:
+    """
+    ScoringEngine.select_top10 for every (weight set, date) row at once.
+    scores: (K, D, S); eligible: (D, S); sectors: (S,) codes, -1 uncapped; limits: (D,).
+    Rows are ordered by score (NaN scores last, as pandas sorts them), then a
+    name is kept if it is among the first `per_sector` eligible names of its
+    sector in that row, up to the date's limit.
+    Returns flat arrays (k, date index, rank, symbol index).
+    """
+    n_k, n_dates, n_symbols = scores.shape
+    valid = ~np.isnan(scores)
+    tier = np.where(eligible[None], np.where(valid, 0, 1), 2)
+    order = np.lexsort((np.where(valid, -scores, 0.0), tier), axis=-1)
+    selectable = np.take_along_axis(tier, order, axis=-1) < 2
+    sector = sectors[order]
+
+    # Position of each name within its (row, sector) group, in score order.
+    # Ineligible names sort after every eligible one, so they never push an eligible name down.
+    n_rows = n_k * n_dates
+    n_codes = int(sectors.max(initial=-1)) + 2
+    group = (np.arange(n_rows)[:, None] * n_codes + sector.reshape(n_rows, n_symbols) + 1).ravel()
+    perm = np.argsort(group, kind='stable')
+    grouped = group[perm]
+    position = np.arange(grouped.size)
+    first = np.maximum.accumulate(np.where(np.r_[True, grouped[1:] != grouped[:-1]], position, 0))
+    within = np.empty_like(position)
+    within[perm] = position - first
+    within = within.reshape(order.shape)
+
+    passing = selectable & ((sector < 0) | (within < per_sector))
+    rank = np.cumsum(passing, axis=-1)
+    chosen = passing & (rank <= limits[None, :, None])
+    k, d, p = np.nonzero(chosen)
+    return k, d, rank[k, d, p], order[k, d, p]
+
+
+def sweep_top10(tensor: FeatureTensor, weight_sets: Sequence[dict], chunk_size: Optional[int] = None) -> pd.DataFrame:
+    """Top10 history of every weight set: columns weight_set, date, rank, symbol, final_score."""
+    frames = []
+    symbols = np.asarray(tensor.symbols, dtype=object)
+    for k0, scores in score_weight_sets(tensor, weight_sets, chunk_size):
+        k, d, rank, s = select_top(scores, tensor.eligible, tensor.sectors, tensor.limits)
+        frames.append(pd.DataFrame({
+            'weight_set': k + k0, 'date': tensor.dates[d], 'rank': rank,
+            'symbol': symbols[s], 'final_score': scores[k, d, s],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['weight_set', 'date', 'rank', 'symbol', 'final_score'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def forward_returns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """(D, S) return from each date's close to the close `horizon` trading days later."""
+    out = np.full_like(close, np.nan)
+    if horizon < len(close):
+        out[:-horizon] = close[horizon:] / close[:-horizon] - 1.0
+    return out
+
+
+def summarize(tensor: FeatureTensor, picks: pd.DataFrame, n_sets: int, horizon: int) -> List[dict]:
+    """Cheap per-weight-set stats over the pick history: mean forward return of the picks and turnover."""
+    fwd = forward_returns(tensor.close, horizon)
+    d = tensor.dates.get_indexer(picks['date'])
+    s = pd.Index(tensor.symbols).get_indexer(picks['symbol'])
+    returns = fwd[d, s]
+    known = ~np.isnan(returns)
+    k = picks['weight_set'].to_numpy()
+
+    counts = np.bincount(k[known], minlength=n_sets)
+    mean_fwd = np.bincount(k[known], weights=returns[known], minlength=n_sets) / np.maximum(counts, 1)
+    picks_per_set = np.bincount(k, minlength=n_sets)
+
+    # Names entering the list from one date to the next, relative to list size
+    keyed = picks.assign(prev=d - 1)
+    entered = keyed.merge(
+        keyed[['weight_set', 'symbol']].assign(prev=d), on=['weight_set', 'symbol', 'prev'], how='left', indicator=True
+    )
+    new_names = (entered['_merge'] == 'left_only') & (entered['prev'] >= 0)
+    turnover = np.bincount(k[new_names.to_numpy()], minlength=n_sets) / np.maximum(picks_per_set, 1)
+
+    return [
+        {
+            "weight_set": i,
+            "picks": int(picks_per_set[i]),
+            f"avg_fwd_return_{horizon}d": round(float(mean_fwd[i]) * 100, 3) if counts[i] else None,
+            "turnover": round(float(turnover[i]), 3),
+        }
+        for i in range(n_sets)
+    ]
+
+
+async def load_feature_tensor(db: AsyncSession, start: date, end: date,
+                              min_adv: float = DEFAULT_MIN_ADV) -> FeatureTensor:
+    """
+    Features of every active symbol on every trading day in [start, end],
+    normalized per date. trend_score/trend_gate are not persisted in
+    features_daily, so the features come from one FeatureEngine pass over the
+    prices (plus the warm-up lookback) rather than from stored rows.
+    """
+    fe = FeatureEngine()
+    lookback = fe.lookback(FEATURE_COLUMNS, get_settings().EMA_WARMUP_SPANS)
+
+    with stage_timer("research", "load") as st:
+        calendar = await trading_days(db, start, lookback + 1)
+        input_start = calendar[-1] if len(calendar) > lookback else None
+
+        active = (await db.execute(select(Symbol.symbol, Symbol.sector).where(Symbol.is_active == True))).all()
+        sector_of = {sym: sector for sym, sector in active}
+
+        price_cols = ['symbol', 'date', 'open', 'close', 'high', 'low', 'volume']
+        stmt = select(*[getattr(PriceDaily, c) for c in price_cols]).where(
+            PriceDaily.date <= end, PriceDaily.symbol.in_(list(sector_of))
+        )
+        idx_stmt = select(IndexDaily.date, IndexDaily.close).where(IndexDaily.date <= end)
+        if input_start is not None:
+            stmt = stmt.where(PriceDaily.date >= input_start)
+            idx_stmt = idx_stmt.where(IndexDaily.date >= input_start)
+        df_prices = pd.DataFrame((await db.execute(stmt)).all(), columns=price_cols)
+        df_index = pd.DataFrame((await db.execute(idx_stmt)).all(), columns=['date', 'close'])
+        st.rows = len(df_prices)
+
+    if df_prices.empty or df_index.empty:
+        raise ValueError("No price or index data in range")
+
+    df_prices['date'] = pd.to_datetime(df_prices['date'])
+    df_index['date'] = pd.to_datetime(df_index['date'])
+    df_prices.set_index('date', inplace=True)
+    df_index.set_index('date', inplace=True)
+    df_index.sort_index(inplace=True)
+    df_prices = adjust_prices(df_prices, await load_factors(db, after=input_start))
+    df_index['ema50'] = df_index['close'].ewm(span=50, adjust=False).mean()
+
+    with stage_timer("research", "features") as st:
+        result = fe.compute(df_prices, df_index[['close']], features=FEATURE_COLUMNS)
+        st.rows = len(result)
+
+    lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+    dates = df_index.index[(df_index.index >= lo) & (df_index.index <= hi)]
+    if dates.empty:
+        raise ValueError("No trading days in range")
+    symbols = sorted(result.index.get_level_values('symbol').unique())
+
+    with stage_timer("research", "normalize") as st:
+        values = normalize_tensor(pivot(result, dates, symbols, NORMALIZED_COLUMNS))
+        close, adv, gate = np.moveaxis(pivot(result, dates, symbols, ['close', 'adv20_tl', 'trend_gate']), 2, 0)
+        st.rows = values.shape[0] * values.shape[1]
+
+    sector_names = sorted({sector_of[s] for s in symbols if sector_of.get(s)})
+    codes = {name: i for i, name in enumerate(sector_names)}
+
+    in_range = result.index.get_level_values('date')
+    history = result.loc[(in_range >= lo) & (in_range <= hi), ['ema50', 'atr14']]
+    window = df_prices[(df_prices.index >= lo) & (df_prices.index <= hi)]
+
+    with np.errstate(invalid='ignore'):
+        eligible = ~np.isnan(close) & (adv >= min_adv) & (gate == 1)
+
+    return FeatureTensor(
+        dates=dates,
+        symbols=symbols,
+        values=values,
+        eligible=eligible,
+        risk_on=regime_series(df_index).reindex(dates).to_numpy(dtype=bool),
+        sectors=np.array([codes.get(sector_of.get(s), -1) for s in symbols], dtype=np.int64),
+        close=close,
+        feature_history=history.swaplevel().rename_axis(['date', 'symbol']).sort_index(),
+        price_history={str(sym): group for sym, group in window.groupby('symbol')},
+        index_history=df_index[(df_index.index >= lo) & (df_index.index <= hi)],
+    )
+
+
+async def sweep_weights(db: AsyncSession, start: date, end: date, weight_sets: Sequence[dict],
+                        min_adv: float = DEFAULT_MIN_ADV, horizon: int = 5,
+                        backtest: bool = False, backtest_params: Optional[dict] = None,
+                        include_top10: bool = False) -> dict:
+    """
+    Score and select Top10 for every weight set over [start, end] from one
+    feature tensor. backtest=True additionally runs each Top10 history through
+    BacktestEngine (one simulation per set, so much slower than the sweep itself).
+    """
+    if not weight_sets:
+        raise ValueError("No weight sets given")
+    tensor = await load_feature_tensor(db, start, end, min_adv)
+
+    with stage_timer("research", "sweep") as st:
+        picks = sweep_top10(tensor, weight_sets)
+        results = summarize(tensor, picks, len(weight_sets), horizon)
+        st.rows = len(picks)
+
+    if backtest:
+        from app.services.backtest_engine import BacktestEngine
+        engine = BacktestEngine()
+        params = {**(backtest_params or {}), "start_date": str(start), "end_date": str(end)}
+        with stage_timer("research", "backtest") as st:
+            for k, frame in picks.groupby('weight_set'):
+                top = frame.set_index(['date', 'rank'])[['symbol', 'final_score']].sort_index()
+                outcome = await engine.run_backtest(params, top, tensor.feature_history,
+                                                    tensor.price_history, tensor.index_history, records=False)
+                results[k]["backtest"] = outcome.get("metrics", {"error": outcome.get("error")})
+            st.rows = len(weight_sets)
+
+    if include_top10:
+        for k, frame in picks.groupby('weight_set'):
+            results[k]["top10"] = [
+                {"date": ts.date().isoformat(), "rank": int(r), "symbol": sym, "final_score": round(float(score), 4)}
+                for ts, r, sym, score in zip(frame['date'], frame['rank'], frame['symbol'], frame['final_score'])
+            ]
+
+    logger.info("Weight sweep finished", weight_sets=len(weight_sets), dates=len(tensor.dates),
+                symbols=len(tensor.symbols), picks=len(picks))
+    return {
+        "start_date": start, "end_date": end,
+        "dates": len(tensor.dates), "symbols": len(tensor.symbols),
+        "results": results,
+    }
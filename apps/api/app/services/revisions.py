@@ -0,0 +1,132 @@
+import bisect
+import math
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import PriceRevision, IndexDaily, Top10Daily
+from app.utils.metrics import stage_timer
+
+logger = structlog.get_logger()
+
+# PriceRevision.symbol for index_daily (XU100) revisions
+INDEX_SYMBOL = "XU100"
+
+REVISION_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def diff_bar(existing, new, fields: Iterable[str] = REVISION_FIELDS, rel_tol: float = 1e-6) -> Dict[str, list]:
+    """
+    {field: [old, new]} for the fields of a stored bar (ORM row) that differ from
+    a freshly fetched one (mapping / pandas row). Missing or NaN new values are ignored.
+    """
+    changes = {}
+    for field in fields:
+        new_value = new.get(field) if hasattr(new, 'get') else getattr(new, field, None)
+        if new_value is None or new_value != new_value:
+            continue
+        old_value = getattr(existing, field)
+        new_value = int(new_value) if field == 'volume' else float(new_value)
+        if old_value is None or not math.isclose(old_value, new_value, rel_tol=rel_tol):
+            changes[field] = [old_value, new_value]
+    return changes
+
+
+def revision_horizons(fe, features: Iterable[str], warmup: float) -> Dict[str, int]:
+    """
+    Bars after a revised bar that each feature keeps depending on it: its window
+    (lookback), or span * warmup for EMAs, whose influence decays but never ends.
+    """
+    return {f: fe.lookback([f], warmup) for f in features}
+
+
+def affected_ranges(revisions: List[Tuple[str, date]], calendar: List[date],
+                    symbol_horizon: int, index_horizon: int) -> Dict[str, Tuple[date, date]]:
+    """
+    Per symbol, the trading-day range [first revised date, last date its
+    features depend on it]. An index revision affects every symbol (key INDEX_SYMBOL).
+    calendar: trading days ascending, covering the revised dates onwards.
+    """
+    ranges = {}
+    for symbol, revised_date in revisions:
+        horizon = index_horizon if symbol == INDEX_SYMBOL else symbol_horizon
+        pos = bisect.bisect_left(calendar, revised_date)
+        if pos >= len(calendar):
+            continue
+        end = calendar[min(pos + horizon, len(calendar) - 1)]
+        start0, end0 = ranges.get(symbol, (revised_date, end))
+        ranges[symbol] = (min(start0, revised_date), max(end0, end))
+    return ranges
+
+
+async def apply_price_revisions(db: AsyncSession, limit: Optional[int] = None) -> dict:
+    """
+    Recompute what pending PriceRevisions affect, and nothing else:
+    1. features_daily partitions of the revised symbols within each horizon
+       (only partitions that were materialized before)
+    2. scores and Top10 of every computed date within any horizon; the
+       cross-sectional normalization ties each date's scores to all symbols
+    Revisions are marked processed once their dates are recomputed.
+    """
+    from app.services.feature_engine import FeatureEngine, FEATURE_COLUMNS
+    from app.services.feature_store import refresh_features
+    from app.services.pipeline import compute_for_date, index_history_bars
+
+    stmt = select(PriceRevision).where(PriceRevision.processed_at.is_(None)).order_by(PriceRevision.id)
+    if limit:
+        stmt = stmt.limit(limit)
+    pending = (await db.execute(stmt)).scalars().all()
+    if not pending:
+        return {"message": "No pending price revisions", "revisions": 0, "dates": 0}
+
+    fe = FeatureEngine()
+    warmup = get_settings().EMA_WARMUP_SPANS
+    horizons = revision_horizons(fe, FEATURE_COLUMNS, warmup)
+    symbol_horizon = max(horizons.values())
+    index_horizon = index_history_bars(fe, warmup)
+
+    with stage_timer("revisions", "plan") as st:
+        first = min(r.date for r in pending)
+        calendar = (await db.execute(
+            select(IndexDaily.date).where(IndexDaily.date >= first).order_by(IndexDaily.date)
+        )).scalars().all()
+        ranges = affected_ranges([(r.symbol, r.date) for r in pending], list(calendar), symbol_horizon, index_horizon)
+
+        if not ranges:
+            computed = []
+        else:
+            lo = min(s for s, _ in ranges.values())
+            hi = max(e for _, e in ranges.values())
+            computed = (await db.execute(
+                select(Top10Daily.date).where(Top10Daily.date >= lo, Top10Daily.date <= hi).distinct().order_by(Top10Daily.date)
+            )).scalars().all()
+            computed = [d for d in computed if any(s <= d <= e for s, e in ranges.values())]
+        st.rows = len(computed)
+
+    with stage_timer("revisions", "features") as st:
+        refreshed = 0
+        for symbol, (start, end) in ranges.items():
+            symbols = None if symbol == INDEX_SYMBOL else [symbol]
+            result = await refresh_features(db, start, end, symbols=symbols, existing_only=True)
+            refreshed += result["recomputed"]
+        st.rows = refreshed
+
+    # Oldest first: later dates may seed their EMAs from earlier ones
+    with stage_timer("revisions", "recompute_dates") as st:
+        for target_date in computed:
+            await compute_for_date(db, target_date, replace=True)
+        st.rows = len(computed)
+
+    await db.execute(
+        update(PriceRevision).where(PriceRevision.id.in_([r.id for r in pending])).values(processed_at=datetime.utcnow())
+    )
+    await db.commit()
+
+    message = (f"Applied {len(pending)} price revisions: {refreshed} feature partitions, "
+               f"{len(computed)} computed dates recomputed")
+    logger.info("Price revisions applied", revisions=len(pending), partitions=refreshed, dates=len(computed))
+    return {"message": message, "revisions": len(pending), "dates": len(computed)}
@@ -0,0 +1,226 @@
+from datetime import date
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import BacktestRun, BacktestTrade, BacktestEquity, PriceDaily
+from app.services.adjustments import load_factors, adjust_prices
+from app.utils.metrics import stage_timer
+
+logger = structlog.get_logger()
+
+# Robustness of a finished backtest run. Everything is computed on
+# (paths x days) arrays, a chunk of paths at a time:
+# - block bootstrap: daily returns resampled in blocks (keeps short-range
+#   autocorrelation), rebuilt into equity paths
+# - perturbation: every BUY shifted by a few trading days and every trade
+#   charged extra slippage, applied to the run's own equity curve
+# CAGR, max drawdown and Sharpe follow BacktestEngine's definitions.
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Cap on path cells materialized at once (paths x days)
+PATH_CHUNK_CELLS = 4_000_000
+
+
+def path_metrics(equity: np.ndarray, initial_capital: float, years: float) -> Dict[str, np.ndarray]:
+    """(P, T) equity paths -> per-path cagr / max_dd (fractions) and annualized sharpe."""
+    final = equity[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if years > 0:
+            cagr = np.where(final > 0, (final / initial_capital) ** (1 / years) - 1, -1.0)
+        else:
+            cagr = np.zeros(len(equity))
+        peak = np.maximum.accumulate(equity, axis=1)
+        max_dd = ((equity - peak) / peak).min(axis=1)
+
+        returns = equity[:, 1:] / equity[:, :-1] - 1
+        if returns.shape[1] > 1:
+            std = returns.std(axis=1, ddof=1)
+            sharpe = np.where(std > 0, returns.mean(axis=1) / std * 252 ** 0.5, 0.0)
+        else:
+            sharpe = np.zeros(len(equity))
+    return {"cagr": cagr, "max_dd": max_dd, "sharpe": sharpe}
+
+
+def distribution(values: np.ndarray, scale: float = 1.0) -> dict:
+    values = values[np.isfinite(values)] * scale
+    if values.size == 0:
+        return {}
+    out = {"mean": round(float(values.mean()), 3)}
+    for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        out[f"p{q}"] = round(float(v), 3)
+    return out
+
+
+def summarize(metrics: Dict[str, np.ndarray]) -> dict:
+    """Percentile bands per metric, cagr / max_dd in percent like the run metrics."""
+    return {
+        "cagr": {**distribution(metrics["cagr"], 100), "prob_loss": round(float((metrics["cagr"] < 0).mean()), 4)},
+        "max_dd": distribution(metrics["max_dd"], 100),
+        "sharpe": distribution(metrics["sharpe"]),
+    }
+
+
+def chunks(n_paths: int, n_days: int) -> Iterator[Tuple[int, int]]:
+    size = max(1, PATH_CHUNK_CELLS // max(n_days, 1))
+    for start in range(0, n_paths, size):
+        yield start, min(start + size, n_paths)
+
+
+def block_bootstrap_paths(rng: np.random.Generator, returns: np.ndarray, start_equity: float,
+                          n_paths: int, block: int) -> np.ndarray:
+    """
+    (n_paths, len(returns) + 1) equity paths from circular block-bootstrap
+    resamples of the daily returns: random block starts, `block` consecutive
+    days each, wrapped around the end of the series.
+    """
+    n = len(returns)
+    block = max(1, min(block, n))
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(n_paths, n_blocks))
+    idx = ((starts[:, :, None] + np.arange(block)) % n).reshape(n_paths, -1)[:, :n]
+    equity = np.empty((n_paths, n + 1))
+    equity[:, 0] = start_equity
+    np.cumprod(1 + returns[idx], axis=1, out=equity[:, 1:])
+    equity[:, 1:] *= start_equity
+    return equity
+
+
+def day_adjustments(n_paths: int, n_days: int, days: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """
+    (P, T) running total of per-path amounts booked on (P, K) day indices:
+    an amount booked on day d counts from d onwards.
+    """
+    out = np.zeros((n_paths, n_days))
+    rows = np.broadcast_to(np.arange(n_paths)[:, None], days.shape)
+    np.add.at(out, (rows, days), amounts)
+    return np.cumsum(out, axis=1)
+
+
+def perturbed_paths(rng: np.random.Generator, equity: np.ndarray, n_paths: int,
+                    trade_days: np.ndarray, notional: np.ndarray,
+                    buy_days: np.ndarray, buy_qty: np.ndarray, buy_price: np.ndarray,
+                    buy_symbol: np.ndarray, opens: np.ndarray,
+                    entry_shift_days: int, slippage_bps: float) -> np.ndarray:
+    """
+    The run's equity curve under random execution changes, first order
+    (position sizes unchanged, no compounding of the difference):
+    - each BUY executes up to entry_shift_days trading days earlier/later at
+      that day's open; the price difference * qty counts from the later day on
+    - each trade pays U(0, slippage_bps) extra on its notional from its day on
+    opens: (T, symbols) open prices, NaN where unknown (no shift then).
+    """
+    n_days = len(equity)
+    paths = np.broadcast_to(equity, (n_paths, n_days)).copy()
+
+    if slippage_bps > 0 and len(trade_days):
+        extra = rng.uniform(0, slippage_bps, size=(n_paths, len(trade_days))) / 10_000 * notional
+        paths -= day_adjustments(n_paths, n_days, np.broadcast_to(trade_days, extra.shape), extra)
+
+    if entry_shift_days > 0 and len(buy_days):
+        shift = rng.integers(-entry_shift_days, entry_shift_days + 1, size=(n_paths, len(buy_days)))
+        shifted = np.clip(buy_days + shift, 0, n_days - 1)
+        price = opens[shifted, buy_symbol]
+        price = np.where(np.isnan(price), buy_price, price)
+        delta = (buy_price - price) * buy_qty
+        paths += day_adjustments(n_paths, n_days, np.maximum(buy_days, shifted), delta)
+    return paths
+
+
+async def analyze_run(db: AsyncSession, run_id: str, n_paths: int = 2000, block_days: int = 10,
+                      entry_shift_days: int = 2, slippage_bps: float = 10.0, seed: int = 0) -> Optional[dict]:
+    """Bootstrap and perturbation distributions for a completed run. None if the run doesn't exist."""
+    run = await db.get(BacktestRun, run_id)
+    if run is None:
+        return None
+    if run.status != "COMPLETED":
+        raise ValueError(f"Run is {run.status}, not COMPLETED")
+
+    with stage_timer("robustness", "load", run_id=run_id) as st:
+        eq_rows = (await db.execute(
+            select(BacktestEquity.date, BacktestEquity.equity).where(BacktestEquity.run_id == run_id).order_by(BacktestEquity.date)
+        )).all()
+        trades = pd.DataFrame((await db.execute(
+            select(BacktestTrade.date, BacktestTrade.symbol, BacktestTrade.action, BacktestTrade.qty, BacktestTrade.price)
+            .where(BacktestTrade.run_id == run_id)
+        )).all(), columns=['date', 'symbol', 'action', 'qty', 'price'])
+        st.rows = len(eq_rows) + len(trades)
+    if len(eq_rows) < 3:
+        raise ValueError("Equity curve too short")
+
+    dates = pd.DatetimeIndex([pd.Timestamp(d) for d, _ in eq_rows])
+    equity = np.array([e for _, e in eq_rows], dtype=float)
+    params = run.params_json or {}
+    initial_capital = float(params.get('initial_capital', equity[0]))
+    start = date.fromisoformat(str(params.get('start_date', dates[0].date()))[:10])
+    end = date.fromisoformat(str(params.get('end_date', dates[-1].date()))[:10])
+    years = (end - start).days / 365.25
+    rng = np.random.default_rng(seed)
+
+    # Trades on the equity calendar
+    trade_days = dates.get_indexer(pd.to_datetime(trades['date'])) if len(trades) else np.array([], dtype=int)
+    trades = trades[trade_days >= 0]
+    trade_days = trade_days[trade_days >= 0]
+    buys = trades['action'].to_numpy() == 'BUY'
+    symbols = sorted(trades.loc[buys, 'symbol'].unique())
+
+    with stage_timer("robustness", "load_prices", run_id=run_id) as st:
+        opens = np.full((len(dates), len(symbols)), np.nan)
+        if symbols:
+            rows = (await db.execute(
+                select(PriceDaily.date, PriceDaily.symbol, PriceDaily.open).where(
+                    PriceDaily.symbol.in_(symbols), PriceDaily.date >= dates[0].date(), PriceDaily.date <= dates[-1].date()
+                )
+            )).all()
+            # Same (today's) units as the backtest's trade prices
+            prices = adjust_prices(pd.DataFrame(rows, columns=['date', 'symbol', 'open']),
+                                   await load_factors(db, symbols, after=dates[0].date()))
+            d = dates.get_indexer(pd.to_datetime(prices['date']))
+            s = pd.Index(symbols).get_indexer(prices['symbol'])
+            keep = (d >= 0) & (s >= 0)
+            opens[d[keep], s[keep]] = prices['open'].to_numpy(dtype=float)[keep]
+            st.rows = len(rows)
+
+    returns = equity[1:] / equity[:-1] - 1
+    bootstrap = {k: [] for k in ("cagr", "max_dd", "sharpe")}
+    perturbation = {k: [] for k in ("cagr", "max_dd", "sharpe")}
+
+    with stage_timer("robustness", "simulate", run_id=run_id) as st:
+        for lo, hi in chunks(n_paths, len(equity)):
+            paths = block_bootstrap_paths(rng, returns, equity[0], hi - lo, block_days)
+            for k, v in path_metrics(paths, initial_capital, years).items():
+                bootstrap[k].append(v)
+
+            paths = perturbed_paths(
+                rng, equity, hi - lo, trade_days, (trades['qty'] * trades['price']).to_numpy(dtype=float),
+                trade_days[buys], trades.loc[buys, 'qty'].to_numpy(dtype=float),
+                trades.loc[buys, 'price'].to_numpy(dtype=float),
+                pd.Index(symbols).get_indexer(trades.loc[buys, 'symbol']), opens,
+                entry_shift_days, slippage_bps,
+            )
+            for k, v in path_metrics(paths, initial_capital, years).items():
+                perturbation[k].append(v)
+        st.rows = n_paths * len(equity) * 2
+
+    observed = {k: float(v[0]) for k, v in path_metrics(equity[None], initial_capital, years).items()}
+    logger.info("Robustness analysis finished", run_id=run_id, paths=n_paths, days=len(equity))
+    return {
+        "run_id": run_id,
+        "days": len(equity),
+        "paths": n_paths,
+        "observed": {
+            "cagr": round(observed["cagr"] * 100, 2),
+            "max_dd": round(observed["max_dd"] * 100, 2),
+            "sharpe": round(observed["sharpe"], 2),
+        },
+        "bootstrap": summarize({k: np.concatenate(v) for k, v in bootstrap.items()}),
+        "perturbation": summarize({k: np.concatenate(v) for k, v in perturbation.items()}),
+        "settings": {
+            "block_days": block_days, "entry_shift_days": entry_shift_days,
+            "slippage_bps": slippage_bps, "seed": seed,
+        },
+    }
@@ -0,0 +1,119 @@
+import numpy as np
+from typing import Optional
+
+# Rolling-window kernels over 2-D (time x symbol) float arrays.
+# Time runs along axis 0, every column is an independent series and NaN marks a
+# missing observation (e.g. panel padding before a symbol's first bar).
+# Semantics match pandas `rolling(window, min_periods)` column by column.
+
+
+def _buffer(values: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+    if out is None:
+        return np.empty(values.shape, dtype=np.float64)
+    if out.shape != values.shape:
+        raise ValueError(f"out has shape {out.shape}, expected {values.shape}")
+    return out
+
+
+def lag(values: np.ndarray, periods: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """values shifted down by `periods` rows (pandas shift), NaN filled."""
+    out = _buffer(values, out)
+    out[:periods] = np.nan
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def window_count(valid: np.ndarray, window: int) -> np.ndarray:
+    """Number of True cells in each trailing window, via a cumulative sum (O(n))."""
+    counts = np.cumsum(valid, axis=0, dtype=np.int64)
+    counts[window:] -= counts[:-window].copy()
+    return counts
+
+
+def rolling_sum(values: np.ndarray, window: int, min_periods: Optional[int] = None,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Trailing window sum from cumulative sums, NaN where fewer than min_periods observations."""
+    min_periods = window if min_periods is None else min_periods
+    out = _buffer(values, out)
+    valid = ~np.isnan(values)
+
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=out)
+    out[window:] -= out[:-window].copy()
+    out[window_count(valid, window) < max(min_periods, 1)] = np.nan
+    return out
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: Optional[int] = None,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+    min_periods = window if min_periods is None else min_periods
+    out = rolling_sum(values, window, min_periods, out=out)
+    counts = window_count(~np.isnan(values), window)
+    np.divide(out, counts, out=out, where=counts > 0)
+    return out
+
+
+def rolling_max(values: np.ndarray, window: int, min_periods: Optional[int] = None,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Trailing window max in O(n) per column (van Herk / Gil-Werman):
+    the series is cut into blocks of `window` rows; any window spans at most
+    two blocks, so max = max(suffix max of the first block, prefix max of the second).
+    Three comparisons per cell regardless of the window length.
+    """
+    min_periods = window if min_periods is None else min_periods
+    out = _buffer(values, out)
+    n_rows = values.shape[0]
+    if n_rows == 0:
+        return out
+
+    n_blocks = -(-n_rows // window)
+    padded = np.full((n_blocks * window,) + values.shape[1:], -np.inf)
+    padded[:n_rows] = values
+    np.nan_to_num(padded, copy=False, nan=-np.inf)
+    blocks = padded.reshape((n_blocks, window) + values.shape[1:])
+
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+    # Windows that fit in the first block are plain prefix maxima
+    head = min(window, n_rows)
+    out[:head] = prefix[:head]
+    if n_rows > window:
+        np.maximum(suffix[1:n_rows - window + 1], prefix[window:n_rows], out=out[window:])
+
+    out[np.isinf(out)] = np.nan
+    out[window_count(~np.isnan(values), window) < max(min_periods, 1)] = np.nan
+    return out
+
+
+def rolling_median(values: np.ndarray, window: int, min_periods: Optional[int] = None,
+                   out: Optional[np.ndarray] = None, chunk_rows: int = 256) -> np.ndarray:
+    """
+    Trailing window median. Windows are strided views (no copy) sorted a chunk
+    of rows at a time, so scratch memory is chunk_rows * columns * window
+    instead of the full history. NaN sorts last, so the median of the k valid
+    values sits at positions (k-1)//2 and k//2.
+    """
+    min_periods = window if min_periods is None else min_periods
+    out = _buffer(values, out)
+    n_rows = values.shape[0]
+    if n_rows == 0:
+        return out
+
+    # NaN head so the first rows get (partial) windows too
+    padded = np.full((n_rows + window - 1,) + values.shape[1:], np.nan)
+    padded[window - 1:] = values
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+    counts = window_count(~np.isnan(values), window)
+
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        ordered = np.sort(windows[start:stop], axis=-1)
+        k = counts[start:stop]
+        lo = np.take_along_axis(ordered, np.maximum(k - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+        hi = np.take_along_axis(ordered, (k // 2)[..., None], axis=-1)[..., 0]
+        out[start:stop] = (lo + hi) / 2.0
+
+    out[counts < max(min_periods, 1)] = np.nan
+    return out
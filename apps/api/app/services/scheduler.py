@@ -0,0 +1,207 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import structlog
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, engine
+from app.models import PipelineRun, Top10Daily, IndexDaily
+from app.services.pipeline import import_yahoo_prices, compute_for_date
+from app.services.revisions import apply_price_revisions
+from app.utils.metrics import stage_timer
+
+logger = structlog.get_logger()
+
+# Extra stages run after compute, in registration order (e.g. cache warm-up).
+# Each hook is `async fn(db, target_date) -> dict|str` and its result is stored as stage detail.
+PostComputeHook = Callable[[AsyncSession, date], Awaitable[object]]
+POST_COMPUTE_HOOKS: List[Tuple[str, PostComputeHook]] = []
+
+# pg advisory lock keys shared by all API replicas ("BIST", "BISI")
+PIPELINE_LOCK_KEY = 0x42495354
+INTRADAY_LOCK_KEY = 0x42495349
+
+_local_locks = {}
+
+
+def register_post_compute_hook(name: str, hook: PostComputeHook):
+    if name not in [n for n, _ in POST_COMPUTE_HOOKS]:
+        POST_COMPUTE_HOOKS.append((name, hook))
+
+
+@asynccontextmanager
+async def pipeline_lock(key: int = PIPELINE_LOCK_KEY):
+    """
+    Non-blocking cross-replica lock on `key`; yields True if acquired.
+    On Postgres this is a session advisory lock held on a dedicated connection,
+    so it is released even if the replica dies. Other backends (sqlite in dev)
+    fall back to a process-local lock.
+    """
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar()
+            if not acquired:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+    else:
+        lock = _local_locks.setdefault(key, asyncio.Lock())
+        if lock.locked():
+            yield False
+            return
+        async with lock:
+            yield True
+
+
+def market_today() -> date:
+    return datetime.now(ZoneInfo(get_settings().TIMEZONE)).date()
+
+
+async def is_computed(db: AsyncSession, target_date: date) -> bool:
+    existing = await db.scalar(select(Top10Daily.rank).where(Top10Daily.date == target_date).limit(1))
+    return existing is not None
+
+
+async def _run_stage(stages: list, name: str, coro) -> object:
+    entry = {"stage": name, "status": "RUNNING"}
+    stages.append(entry)
+    started = time.perf_counter()
+    try:
+        with stage_timer("eod", name):
+            result = await coro
+        entry["status"] = "COMPLETED"
+        entry["detail"] = result.get("message") if isinstance(result, dict) else result
+        return result
+    except Exception as e:
+        entry["status"] = "FAILED"
+        entry["detail"] = str(e)
+        raise
+    finally:
+        entry["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+async def run_end_of_day_pipeline(target_date: Optional[date] = None, trigger: str = "SCHEDULER", force: bool = False) -> Optional[str]:
+    """
+    import -> revised history -> features -> scores -> Top10 -> post-compute hooks (cache warm).
+    Returns the PipelineRun id, or None if another replica holds the lock.
+    Dates that already have a Top10 are skipped unless force=True.
+    """
+    settings = get_settings()
+    target_date = target_date or market_today()
+
+    async with pipeline_lock() as acquired:
+        if not acquired:
+            logger.info("EOD pipeline already running elsewhere, skipping", target_date=str(target_date))
+            return None
+
+        async with AsyncSessionLocal() as db:
+            run = PipelineRun(run_id=str(uuid.uuid4()), target_date=target_date, trigger=trigger, status="RUNNING")
+            db.add(run)
+            await db.commit()
+
+            started = time.perf_counter()
+            stages = []
+            status, message = "COMPLETED", None
+            try:
+                if not force and await is_computed(db, target_date):
+                    status, message = "SKIPPED", "Already computed"
+                else:
+                    imported = await _run_stage(stages, "import", import_yahoo_prices(db, settings.EOD_IMPORT_DAYS, target_date))
+                    if imported.get("revised"):
+                        await _run_stage(stages, "revisions", apply_price_revisions(db))
+
+                    # No index bar -> market holiday (or feed not updated yet)
+                    has_index = await db.scalar(select(IndexDaily.date).where(IndexDaily.date == target_date))
+                    if has_index is None:
+                        status, message = "SKIPPED", "No index data for date (holiday?)"
+                    else:
+                        result = await _run_stage(stages, "compute", compute_for_date(db, target_date))
+                        message = result.get("message") if isinstance(result, dict) else None
+                        for name, hook in POST_COMPUTE_HOOKS:
+                            await _run_stage(stages, name, hook(db, target_date))
+            except Exception as e:
+                logger.error("EOD pipeline failed", target_date=str(target_date), error=str(e))
+                await db.rollback()
+                status, message = "FAILED", str(e)
+
+            run = await db.get(PipelineRun, run.run_id)
+            run.status = status
+            run.message = message
+            run.stages_json = stages
+            run.finished_at = datetime.utcnow()
+            run.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            await db.commit()
+
+            logger.info("EOD pipeline finished", run_id=run.run_id, target_date=str(target_date),
+                        status=status, duration_ms=run.duration_ms)
+            return run.run_id
+
+
+async def run_intraday_session() -> Optional[dict]:
+    """Provisional Top10 from INTRADAY_FEED until the EOD run; one replica only. None if it runs elsewhere."""
+    from datetime import time as dt_time
+    from app.services.intraday import run_intraday
+    settings = get_settings()
+    session_date = market_today()
+    until = datetime.combine(session_date, dt_time(settings.SCHEDULER_HOUR, settings.SCHEDULER_MINUTE),
+                             ZoneInfo(settings.TIMEZONE))
+
+    async with pipeline_lock(INTRADAY_LOCK_KEY) as acquired:
+        if not acquired:
+            logger.info("Intraday scoring already running elsewhere, skipping", session_date=str(session_date))
+            return None
+        try:
+            result = await run_intraday(session_date=session_date, until=until)
+        except Exception as e:
+            logger.error("Intraday scoring failed", session_date=str(session_date), error=str(e))
+            return None
+        logger.info("Intraday scoring finished", **result)
+        return result
+
+
+def create_scheduler() -> AsyncIOScheduler:
+    """
+    Weekdays at SCHEDULER_HOUR:SCHEDULER_MINUTE in Settings.TIMEZONE
+    (Borsa Istanbul closes 18:00, closing auction ends ~18:10), plus the
+    intraday session from INTRADAY_START_HOUR:MINUTE when INTRADAY_FEED is set.
+    """
+    settings = get_settings()
+    scheduler = AsyncIOScheduler(timezone=settings.TIMEZONE)
+    scheduler.add_job(
+        run_end_of_day_pipeline,
+        CronTrigger(day_of_week="mon-fri", hour=settings.SCHEDULER_HOUR, minute=settings.SCHEDULER_MINUTE,
+                    timezone=settings.TIMEZONE),
+        id="eod_pipeline",
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=3600,
+    )
+    if settings.INTRADAY_FEED:
+        scheduler.add_job(
+            run_intraday_session,
+            CronTrigger(day_of_week="mon-fri", hour=settings.INTRADAY_START_HOUR,
+                        minute=settings.INTRADAY_START_MINUTE, timezone=settings.TIMEZONE),
+            id="intraday_session",
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=3600,
+        )
+    return scheduler
+
+
+# Default post-compute stages
+from app.services.warmup import warm_caches  # noqa: E402
+
+register_post_compute_hook("warm_cache", warm_caches)
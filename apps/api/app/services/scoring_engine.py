@@ -2,6 +2,17 @@ import pandas as pd
 import json
 
 class ScoringEngine:
+    # Default coefficients. Weight sweeps (services/research.py) override them per run.
+    # Potential (0-100): 0.25*RS6M + 0.15*RS3M + 0.15*Trend + 0.15*BO120 + 0.10*Vol + 0.10*UpRatio + 0.10*Quality
+    POTENTIAL_WEIGHTS = {
+        'rs_6m': 0.25, 'rs_3m': 0.15, 'trend_score': 0.15, 'bo_120': 0.15,
+        'vol_surge': 0.10, 'up_ratio_20': 0.10, 'quality_trend': 0.10,
+    }
+    # Risk (0-100): 0.60*ATR14pct + 0.40*DD60
+    RISK_WEIGHTS = {'atr14_pct': 0.60, 'dd60': 0.40}
+    # Risk penalty per regime
+    RISK_LAMBDA = {'RISK_ON': 0.35, 'RISK_OFF': 0.55}
+
     def detect_regime(self, df_index: pd.DataFrame) -> str:
         """
         Detect market regime based on XU100.
@@ -22,38 +33,26 @@ class ScoringEngine:
         
         return "RISK_OFF"
 
-    def calculate_scores(self, df_features: pd.DataFrame, regime: str) -> pd.DataFrame:
+    def calculate_scores(self, df_features: pd.DataFrame, regime: str, weights: dict = None) -> pd.DataFrame:
         """
         Calculate Potential, Risk, and Final scores.
         df_features: Normalized (0-100) feature dataframe with index=symbol.
+        weights: optional overrides of the defaults {'potential': {...}, 'risk': {...}, 'risk_lambda': {regime: ...}}
         """
         if df_features.empty:
             return df_features
             
         df = df_features.copy()
+        weights = weights or {}
+        potential_weights = {**self.POTENTIAL_WEIGHTS, **(weights.get('potential') or {})}
+        risk_weights = {**self.RISK_WEIGHTS, **(weights.get('risk') or {})}
+        lambdas = {**self.RISK_LAMBDA, **(weights.get('risk_lambda') or {})}
         
-        # Coefficients
-        # Potential (0-100)
-        # 0.25*RS6M + 0.15*RS3M + 0.15*Trend + 0.15*BO120 + 0.10*Vol + 0.10*UpRatio + 0.10*Quality
-        df['potential_score'] = (
-            0.25 * df.get('rs_6m', 0) +
-            0.15 * df.get('rs_3m', 0) +
-            0.15 * df.get('trend_score', 0) +
-            0.15 * df.get('bo_120', 0) +
-            0.10 * df.get('vol_surge', 0) +
-            0.10 * df.get('up_ratio_20', 0) +
-            0.10 * df.get('quality_trend', 0)
-        )
-        
-        # Risk (0-100)
-        # 0.60*ATR14pct + 0.40*DD60
-        df['risk_score'] = (
-            0.60 * df.get('atr14_pct', 0) +
-            0.40 * df.get('dd60', 0)
-        )
+        df['potential_score'] = sum(w * df.get(col, 0) for col, w in potential_weights.items())
+        df['risk_score'] = sum(w * df.get(col, 0) for col, w in risk_weights.items())
         
         # Lambda
-        lam = 0.35 if regime == "RISK_ON" else 0.55
+        lam = lambdas['RISK_ON'] if regime == "RISK_ON" else lambdas['RISK_OFF']
         
         # Final Score
         df['final_score'] = df['potential_score'] - (lam * df['risk_score'])
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import multiprocessing
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import List, Optional
+
+import structlog
+
+from app.config import get_settings
+from app.utils.metrics import stage_timer, timed_import
+
+logger = structlog.get_logger()
+
+# Symbol-sharded feature compute for compute_for_date.
+# Map: each shard loads its own symbols' bars, computes the time-series
+# features for the target date and upserts them into features_daily.
+# Reduce (compute_for_date): cross-sectional normalize, score, Top10 over the
+# merged shard rows. Shards run in local worker processes, or on any node
+# running `python -m app.services.sharding` against the same DB and Redis.
+
+SHARD_QUEUE = "compute:shards"
+RESULT_KEY = "compute:shard_results:{job_id}"
+
+
+def shard_symbols(symbols: List[str], n_shards: int) -> List[List[str]]:
+    """Stable symbol -> shard assignment (crc32), so a symbol's bars stay on one shard across runs."""
+    shards = [[] for _ in range(n_shards)]
+    for sym in sorted(symbols):
+        shards[zlib.crc32(sym.encode()) % n_shards].append(sym)
+    return [s for s in shards if s]
+
+
+def shard_task(target_date: date, plan: dict, symbols: List[str], replace: bool) -> dict:
+    """JSON-able task for one shard: the plan is reduced to what its symbols need."""
+    seeds = plan["seeds"]
+    if seeds is not None:
+        seeds = seeds[seeds.index.isin(symbols)]
+        seeds = {sym: row for sym, row in seeds.to_dict(orient="index").items()}
+    cold = set(plan["cold_symbols"])
+    return {
+        "target_date": target_date.isoformat(),
+        "symbols": symbols,
+        "replace": replace,
+        "plan": {
+            "price_start": plan["price_start"].isoformat() if plan["price_start"] else None,
+            "index_start": plan["index_start"].isoformat() if plan["index_start"] else None,
+            "cold_start": plan["cold_start"].isoformat() if plan["cold_start"] else None,
+            "cold_symbols": [s for s in symbols if s in cold],
+            "lookback": plan["lookback"],
+            "seeds": seeds,
+        },
+    }
+
+
+def _plan_from_task(task: dict) -> dict:
+    pd = timed_import("pandas")
+    plan = dict(task["plan"])
+    for key in ("price_start", "index_start", "cold_start"):
+        plan[key] = date.fromisoformat(plan[key]) if plan[key] else None
+    if plan["seeds"] is not None:
+        plan["seeds"] = pd.DataFrame.from_dict(plan["seeds"], orient="index").astype(float)
+    return plan
+
+
+async def run_shard(task: dict) -> dict:
+    """Map step of one shard in its own session. Returns its feature rows as records."""
+    from app.database import AsyncSessionLocal
+    from app.services.feature_engine import FeatureEngine
+    from app.services.pipeline import compute_symbol_features, load_index_frame
+
+    target_date = date.fromisoformat(task["target_date"])
+    plan = _plan_from_task(task)
+    async with AsyncSessionLocal() as db:
+        with stage_timer("compute", "shard", symbols=len(task["symbols"])) as st:
+            df_index = await load_index_frame(db, target_date, plan)
+            features = await compute_symbol_features(
+                db, FeatureEngine(), target_date, plan, task["symbols"], df_index, task["replace"]
+            )
+            await db.commit()
+            st.rows = 0 if features is None else len(features)
+    if features is None:
+        return {"symbols": len(task["symbols"]), "features": None}
+    return {"symbols": len(task["symbols"]), "features": features.reset_index().to_dict(orient="records")}
+
+
+async def _run_shard_in_worker(task: dict) -> dict:
+    from app.database import engine
+    try:
+        return await run_shard(task)
+    finally:
+        # Pooled connections belong to this task's event loop
+        await engine.dispose()
+
+
+def _run_shard_sync(task: dict) -> dict:
+    return asyncio.run(_run_shard_in_worker(task))
+
+
+# Worker processes are kept between runs (spawning one costs a full app import)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+
+
+def _get_pool(size: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size
+    if _pool is None or _pool_size != size:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(size, mp_context=multiprocessing.get_context("spawn"))
+        _pool_size = size
+    return _pool
+
+
+def _merge(results: List[dict]):
+    pd = timed_import("pandas")
+    records = [r for result in results if result["features"] for r in result["features"]]
+    if not records:
+        return None
+    merged = pd.DataFrame.from_records(records).set_index("symbol").sort_index()
+    if "trend_gate" in merged.columns:
+        merged["trend_gate"] = merged["trend_gate"].astype(bool)
+    return merged
+
+
+class LocalShardRunner:
+    """Shards on worker processes of this machine (spawned: no inherited DB connections)."""
+
+    def __init__(self, n_shards: int):
+        self.n_shards = n_shards
+
+    async def map(self, tasks: List[dict]) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        pool = _get_pool(self.n_shards)
+        return await asyncio.gather(*[loop.run_in_executor(pool, _run_shard_sync, t) for t in tasks])
+
+    async def compute(self, target_date: date, plan: dict, symbols: List[str], replace: bool):
+        tasks = [shard_task(target_date, plan, s, replace) for s in shard_symbols(symbols, self.n_shards)]
+        results = await self.map(tasks)
+        logger.info("Feature shards finished", shards=len(tasks), symbols=sum(r["symbols"] for r in results))
+        return _merge(results)
+
+
+class QueueShardRunner(LocalShardRunner):
+    """
+    Shards as jobs on a Redis list, served by `python -m app.services.sharding`
+    on any number of nodes. Results come back on a per-run reply list.
+    """
+
+    async def map(self, tasks: List[dict]) -> List[dict]:
+        import redis.asyncio as aioredis
+        settings = get_settings()
+        client = aioredis.from_url(settings.REDIS_URL)
+        job_id = uuid.uuid4().hex
+        reply = RESULT_KEY.format(job_id=job_id)
+        try:
+            await client.rpush(SHARD_QUEUE, *[json.dumps({**t, "reply": reply, "shard": i}) for i, t in enumerate(tasks)])
+            results = [None] * len(tasks)
+            for _ in tasks:
+                item = await client.blpop([reply], timeout=settings.COMPUTE_SHARD_TIMEOUT_SECONDS)
+                if item is None:
+                    raise TimeoutError(f"Feature shards timed out after {settings.COMPUTE_SHARD_TIMEOUT_SECONDS}s")
+                result = json.loads(item[1])
+                if result.get("error"):
+                    raise RuntimeError(f"Feature shard {result['shard']} failed: {result['error']}")
+                results[result["shard"]] = result
+            return results
+        finally:
+            await client.delete(reply)
+            await client.aclose()
+
+
+def get_shard_runner() -> Optional[LocalShardRunner]:
+    """Runner for COMPUTE_SHARDS > 1, None to compute in-process."""
+    settings = get_settings()
+    if settings.COMPUTE_SHARDS <= 1:
+        return None
+    if settings.COMPUTE_SHARD_MODE == "queue":
+        return QueueShardRunner(settings.COMPUTE_SHARDS)
+    return LocalShardRunner(settings.COMPUTE_SHARDS)
+
+
+async def serve(max_tasks: Optional[int] = None):
+    """Worker loop: take shard tasks off the queue until stopped (or max_tasks done)."""
+    import redis.asyncio as aioredis
+    client = aioredis.from_url(get_settings().REDIS_URL)
+    logger.info("Shard worker started", queue=SHARD_QUEUE)
+    done = 0
+    try:
+        while max_tasks is None or done < max_tasks:
+            item = await client.blpop([SHARD_QUEUE], timeout=5)
+            if item is None:
+                continue
+            task = json.loads(item[1])
+            try:
+                result = await run_shard(task)
+            except Exception as e:
+                logger.error("Shard failed", shard=task.get("shard"), error=str(e))
+                result = {"error": str(e)}
+            await client.rpush(task["reply"], json.dumps({**result, "shard": task["shard"]}, default=str))
+            await client.expire(task["reply"], get_settings().COMPUTE_SHARD_TIMEOUT_SECONDS)
+            done += 1
+    finally:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.backtest_engine import BacktestEngine
+from app.services.research import load_feature_tensor, sweep_top10, DEFAULT_MIN_ADV
+from app.services.scoring_engine import ScoringEngine
+from app.utils.metrics import stage_timer
+
+logger = structlog.get_logger()
+
+# Successive-halving search over scoring weights and backtest stop rules.
+# Every candidate is backtested on a short recent window; the best 1/eta move
+# on to a window eta times longer, until the survivors get the full range.
+# Total cost is about (rungs) full-length backtests instead of one per candidate.
+# Each evaluation is appended to a JSONL log as it completes, so a stopped
+# search resumes where it left off.
+
+TIME_STOP_CHOICES = (28, 42, 56, 84, 112)
+TOP_N_CHOICES = (5, 6, 7, 8, 9, 10)
+OBJECTIVES = ('sharpe', 'cagr', 'max_dd', 'final_equity')
+
+DEFAULT_CONFIG = {
+    "n_candidates": 81, "eta": 3, "min_days": 60, "objective": "sharpe", "seed": 0,
+    "min_adv": DEFAULT_MIN_ADV, "initial_capital": 100_000.0, "fee_bps": 10.0, "slippage_bps": 8.0,
+}
+
+
+def default_candidate() -> dict:
+    """Production settings, always candidate 0 so every search reports the baseline."""
+    return {
+        "weights": {
+            "potential": dict(ScoringEngine.POTENTIAL_WEIGHTS),
+            "risk": dict(ScoringEngine.RISK_WEIGHTS),
+            "risk_lambda": dict(ScoringEngine.RISK_LAMBDA),
+        },
+        "backtest": {"atr_stop_mult": 2.0, "time_stop_days": 56, "top_n": 10},
+    }
+
+
+def sample_candidates(n: int, seed: int) -> List[dict]:
+    """
+    Baseline plus n-1 random candidates, deterministic for a seed (resume
+    regenerates the same list). Potential weights sum to 1 like the defaults.
+    """
+    rng = np.random.default_rng(seed)
+    potential_cols = list(ScoringEngine.POTENTIAL_WEIGHTS)
+    candidates = [default_candidate()]
+    for _ in range(n - 1):
+        potential = rng.dirichlet(np.ones(len(potential_cols)))
+        atr_share = rng.uniform(0.2, 0.8)
+        candidates.append({
+            "weights": {
+                "potential": {c: round(float(w), 4) for c, w in zip(potential_cols, potential)},
+                "risk": {"atr14_pct": round(atr_share, 4), "dd60": round(1 - atr_share, 4)},
+                "risk_lambda": {"RISK_ON": round(rng.uniform(0.1, 0.8), 3), "RISK_OFF": round(rng.uniform(0.2, 1.0), 3)},
+            },
+            "backtest": {
+                "atr_stop_mult": round(rng.uniform(1.0, 4.0), 2),
+                "time_stop_days": int(rng.choice(TIME_STOP_CHOICES)),
+                "top_n": int(rng.choice(TOP_N_CHOICES)),
+            },
+        })
+    return candidates
+
+
+def rung_windows(calendar: List[date], n_candidates: int, eta: int, min_days: int) -> List[Tuple[date, date]]:
+    """
+    (start, end) per rung, all ending on the last trading day. The last rung is
+    the full calendar and each earlier one eta times shorter. Rungs stop where
+    halving would leave a single candidate or a window under min_days.
+    """
+    full = len(calendar)
+    n_rungs = 1
+    while eta ** n_rungs < n_candidates and full // eta ** n_rungs >= min_days:
+        n_rungs += 1
+    return [(calendar[-(full // eta ** (n_rungs - 1 - rung))], calendar[-1]) for rung in range(n_rungs)]
+
+
+def score(metrics: Optional[dict], objective: str) -> Optional[float]:
+    """Objective value of an evaluation (higher is better), None for failed backtests."""
+    value = (metrics or {}).get(objective)
+    if value is None or value != value or math.isinf(value):
+        return None
+    return float(value)
+
+
+def _rank_key(record: dict) -> float:
+    return -math.inf if record["score"] is None else record["score"]
+
+
+def search_path(search_id: str) -> Optional[str]:
+    # Ids are uuid hex; reject anything else so the id can't escape TUNING_DIR
+    if not search_id or not all(c in "0123456789abcdef" for c in search_id):
+        return None
+    path = get_settings().TUNING_DIR
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, f"{search_id}.jsonl")
+
+
+def read_search_log(path: str) -> Tuple[Optional[dict], Dict[Tuple[int, int], dict], Optional[dict]]:
+    """(header, {(rung, candidate): evaluation}, result) from a search log. A torn last line is ignored."""
+    header, evaluations, result = None, {}, None
+    if not os.path.exists(path):
+        return header, evaluations, result
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record["type"] == "search":
+                header = record
+            elif record["type"] == "eval":
+                evaluations[(record["rung"], record["candidate"])] = record
+            elif record["type"] == "result":
+                result = record
+    return header, evaluations, result
+
+
+def _append(path: str, record: dict):
+    with open(path, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+        f.flush()
+
+
+# Backtest inputs of the search, set once per worker process by the pool initializer
+_worker_inputs: dict = {}
+
+
+def _init_worker(feature_history, price_history, index_history):
+    _worker_inputs.update(feature_history=feature_history, price_history=price_history, index_history=index_history,
+                          engine=BacktestEngine())
+
+
+def _evaluate_in_worker(params: dict, top10: pd.DataFrame) -> dict:
+    result = asyncio.run(_worker_inputs["engine"].run_backtest(
+        params, top10, _worker_inputs["feature_history"], _worker_inputs["price_history"], _worker_inputs["index_history"],
+        records=False,
+    ))
+    return result.get("metrics") or {"error": result.get("error")}
+
+
+def _top10_frames(picks: pd.DataFrame, n: int) -> List[pd.DataFrame]:
+    """Per weight set, the (date, rank) -> symbol, final_score frame BacktestEngine reads."""
+    empty = pd.DataFrame(
+        {"symbol": [], "final_score": []},
+        index=pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), []], names=["date", "rank"]),
+    )
+    frames = [empty] * n
+    for k, frame in picks.groupby("weight_set"):
+        frames[k] = frame.set_index(["date", "rank"])[["symbol", "final_score"]].sort_index()
+    return frames
+
+
+async def run_search(db: AsyncSession, search_id: str, start: date, end: date, config: Optional[dict] = None) -> dict:
+    """
+    Run (or resume) search `search_id` over [start, end]. A resumed search
+    must use the config it was started with; evaluations already in its log
+    are not repeated.
+    """
+    path = search_path(search_id)
+    if path is None:
+        raise ValueError("Invalid search id")
+    config = {**DEFAULT_CONFIG, **(config or {}), "start_date": str(start), "end_date": str(end)}
+    if config["objective"] not in OBJECTIVES:
+        raise ValueError(f"Unknown objective. Use one of {list(OBJECTIVES)}")
+    if config["eta"] < 2 or config["n_candidates"] < 1:
+        raise ValueError("eta must be >= 2 and n_candidates >= 1")
+
+    header, done, result = read_search_log(path)
+    if header is None:
+        _append(path, {"type": "search", "config": config, "created_at": datetime.utcnow().isoformat()})
+    elif header["config"] != config:
+        raise ValueError("Search log exists with a different config")
+    if result is not None:
+        return result
+
+    tensor = await load_feature_tensor(db, start, end, config["min_adv"])
+    candidates = sample_candidates(config["n_candidates"], config["seed"])
+    windows = rung_windows(list(tensor.dates.date), len(candidates), config["eta"], config["min_days"])
+    base_params = {k: config[k] for k in ("initial_capital", "fee_bps", "slippage_bps")}
+    objective = config["objective"]
+
+    workers = get_settings().TUNING_WORKERS or os.cpu_count() or 1
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            workers, initializer=_init_worker,
+            initargs=(tensor.feature_history, tensor.price_history, tensor.index_history),
+        )
+    loop = asyncio.get_running_loop()
+    engine = BacktestEngine()
+
+    survivors = list(range(len(candidates)))
+    ranked = survivors
+    try:
+        for rung, (w_start, w_end) in enumerate(windows):
+            if rung == len(windows) - 1 and 0 not in survivors:
+                # Baseline always gets the full-range backtest, as the reference
+                survivors = survivors + [0]
+            pending = [c for c in survivors if (rung, c) not in done]
+            with stage_timer("tuning", f"rung{rung}", search_id=search_id) as st:
+                if pending:
+                    picks = sweep_top10(tensor.window(w_start, w_end), [candidates[c]["weights"] for c in pending])
+                    frames = _top10_frames(picks, len(pending))
+
+                    async def evaluate(c, top10):
+                        params = {**base_params, **candidates[c]["backtest"], "start_date": str(w_start), "end_date": str(w_end)}
+                        started = time.perf_counter()
+                        if pool is not None:
+                            metrics = await loop.run_in_executor(pool, _evaluate_in_worker, params, top10)
+                        else:
+                            outcome = await engine.run_backtest(params, top10, tensor.feature_history,
+                                                                tensor.price_history, tensor.index_history,
+                                                                records=False)
+                            metrics = outcome.get("metrics") or {"error": outcome.get("error")}
+                        return c, metrics, time.perf_counter() - started
+
+                    for next_done in asyncio.as_completed([evaluate(c, f) for c, f in zip(pending, frames)]):
+                        c, metrics, elapsed = await next_done
+                        record = {
+                            "type": "eval", "rung": rung, "candidate": c,
+                            "window": [str(w_start), str(w_end)], "params": candidates[c],
+                            "score": score(metrics, objective), "metrics": metrics,
+                            "elapsed_ms": round(elapsed * 1000, 1),
+                        }
+                        _append(path, record)
+                        done[(rung, c)] = record
+                st.rows = len(pending)
+
+            ranked = sorted(survivors, key=lambda c: _rank_key(done[(rung, c)]), reverse=True)
+            logger.info("Search rung finished", search_id=search_id, rung=rung, window=f"{w_start}..{w_end}",
+                        candidates=len(survivors), evaluated=len(pending),
+                        best=done[(rung, ranked[0])]["score"])
+            if rung < len(windows) - 1:
+                survivors = ranked[:max(1, math.ceil(len(survivors) / config["eta"]))]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    last = len(windows) - 1
+    result = {
+        "type": "result", "search_id": search_id,
+        "best": done[(last, ranked[0])],
+        "baseline": done[(last, 0)],
+        "evaluations": len(done),
+        "finished_at": datetime.utcnow().isoformat(),
+    }
+    _append(path, result)
+    return result
+
+
+def search_status(search_id: str) -> Optional[dict]:
+    """Progress of a search from its log: evaluations per rung and the best point so far."""
+    path = search_path(search_id)
+    if path is None or not os.path.exists(path):
+        return None
+    header, done, result = read_search_log(path)
+    rungs = {}
+    for (rung, _), record in done.items():
+        rungs.setdefault(rung, []).append(record)
+    top_rung = max(rungs) if rungs else None
+    best = max(rungs[top_rung], key=_rank_key) if rungs else None
+    return {
+        "search_id": search_id,
+        "config": header["config"] if header else None,
+        "status": "COMPLETED" if result else "INCOMPLETE", # running, or stopped and resumable
+        "evaluations": len(done),
+        "per_rung": {rung: len(records) for rung, records in sorted(rungs.items())},
+        "best": result["best"] if result else best,
+        "baseline": result["baseline"] if result else None,
+    }
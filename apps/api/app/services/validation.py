@@ -0,0 +1,213 @@
+import asyncio
+from datetime import timedelta
+from typing import Tuple
+
+import structlog
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import PriceDaily, IndexDaily, PriceQuarantine
+from app.utils.metrics import timed_import
+
+logger = structlog.get_logger()
+
+# Import validation: vectorized checks over a whole incoming batch (long frame
+# [symbol, date, *PRICE_COLUMNS] from ingest.normalize_bars / csv_import.parse_chunk)
+# before it reaches prices_daily. Flagged bars go to price_quarantine instead,
+# one row per bar with every reason it failed:
+#   missing         a required value is missing / unparsable
+#   non_positive    a price <= 0 or volume < 0
+#   ohlc            high below open/close/low, or low above open/close/high
+#   zero_volume     no trades (stale quote)
+#   duplicate       an earlier, different bar for the same (symbol, date); the last
+#                   one goes on (exact repeats are just dropped)
+#   off_calendar    a weekend, or a weekday index_daily covers but did not trade
+#   return_outlier  |log return| above clip(SIGMAS x rolling vol, MIN_MOVE, MAX_MOVE),
+#                   widened by sqrt(1 + trading days skipped); a bar that only reverts
+#                   an outlier (one bad print) is not flagged itself. Returns are
+#                   taken over split/dividend-adjusted closes, so a recorded
+#                   action's ex-date is not a move
+# Gaps (trading days with no bar between two of a symbol's bars) have no row to
+# quarantine; they are counted and widen the outlier threshold.
+
+CHECKS = ('missing', 'non_positive', 'ohlc', 'zero_volume', 'duplicate', 'off_calendar', 'return_outlier')
+
+
+def validate_bars(frame, history=None, calendar=None, factors=None) -> Tuple["pd.DataFrame", "pd.DataFrame", dict]:
+    """
+    Split a batch into (clean, flagged, stats). history: stored bars
+    [symbol, date, close] before the batch (seeds the rolling volatility);
+    calendar: sorted index_daily dates around it; factors: the symbols'
+    adjustment_factors rows (adjustments.load_factors). flagged has the
+    frame's columns plus reasons (list) and detail (dict / None).
+    """
+    pd = timed_import("pandas")
+    np = timed_import("numpy")
+    from app.services.adjustments import adjust_prices
+    from app.services.ingest import PRICE_COLUMNS, REQUIRED_COLUMNS
+    settings = get_settings()
+    columns = ['symbol', 'date', *PRICE_COLUMNS]
+
+    df = frame[columns].reset_index(drop=True)
+    exact = df.duplicated(columns, keep='last')
+    df = df.loc[~exact].reset_index(drop=True)
+    dates = pd.to_datetime(df['date'])
+    prices = df[['open', 'high', 'low', 'close']]
+    flags = pd.DataFrame(False, index=df.index, columns=list(CHECKS))
+
+    flags['missing'] = df[REQUIRED_COLUMNS].isna().any(axis=1)
+    flags['non_positive'] = (prices <= 0).any(axis=1) | (df['volume'] < 0)
+    flags['ohlc'] = (df['high'] < prices.max(axis=1)) | (df['low'] > prices.min(axis=1))
+    flags['zero_volume'] = df['volume'] == 0
+    flags['duplicate'] = df.duplicated(['symbol', 'date'], keep='last')
+    cal = pd.DatetimeIndex(pd.to_datetime(list(calendar or []))).unique().sort_values()
+    off = dates.dt.weekday >= 5
+    if len(cal):
+        off |= dates.between(cal[0], cal[-1]) & ~dates.isin(cal)
+    flags['off_calendar'] = off
+
+    # Returns over the bars that passed, seeded with each symbol's stored bars before its first new one
+    good = df.loc[~flags.any(axis=1), ['symbol', 'date', 'close']].assign(row=lambda x: x.index)
+    series = good
+    if history is not None and len(history):
+        hist = pd.DataFrame(history, columns=['symbol', 'date', 'close'])
+        first = df.groupby('symbol')['date'].min()
+        hist = hist.loc[hist['date'].to_numpy() < hist['symbol'].map(first).to_numpy()]
+        series = pd.concat([hist.assign(row=-1), good], ignore_index=True)
+    series = adjust_prices(series.sort_values(['symbol', 'date'], kind='stable').reset_index(drop=True), factors)
+    same = series['symbol'].eq(series['symbol'].shift())
+    close = series['close'].to_numpy(dtype=float)
+    ret = pd.Series(np.log(close / np.roll(close, 1)), index=series.index).where(same)
+
+    gap = pd.Series(0.0, index=series.index)
+    if len(cal):
+        when = pd.to_datetime(series['date'])
+        pos = pd.Series(cal.searchsorted(when), index=series.index)
+        inside = when.between(cal[0], cal[-1])
+        gap = (pos - pos.shift() - 1).where(same & inside & inside.shift(fill_value=False), 0).clip(lower=0)
+    scale = np.sqrt(1 + gap)
+
+    window = max(2, settings.VALIDATION_VOL_WINDOW)
+    daily = ret / scale
+    # Robust scale (1.4826 x median |return| ~ std for normal returns): one bad print
+    # in the window must not widen the threshold enough to hide the next one
+    vol = daily.abs().groupby(series['symbol']).rolling(window, min_periods=max(5, window // 3)).median()
+    vol = 1.4826 * vol.reset_index(level=0, drop=True).sort_index().groupby(series['symbol']).shift()
+    threshold = (settings.VALIDATION_RETURN_SIGMAS * vol).clip(
+        settings.VALIDATION_MIN_MOVE, settings.VALIDATION_MAX_MOVE).fillna(settings.VALIDATION_MAX_MOVE) * scale
+    outlier = ret.abs() > threshold
+    prev = outlier.shift(fill_value=False) & same
+    reverts = prev & (np.sign(ret) != np.sign(ret.shift())) & ((ret + ret.shift()).abs() <= threshold)
+    outlier &= ~reverts & (series['row'] >= 0)
+    rows = series.loc[outlier, 'row'].to_numpy()
+    flags.loc[rows, 'return_outlier'] = True
+
+    bad = flags.any(axis=1)
+    flagged = df.loc[bad].copy()
+    flagged['reasons'] = [[c for c in CHECKS if r[c]] for r in flags.loc[bad].to_dict('records')]
+    detail = pd.Series(None, index=df.index, dtype=object)
+    detail.loc[rows] = [{'return': round(float(r), 6), 'threshold': round(float(t), 6)}
+                        for r, t in zip(ret[outlier], threshold[outlier])]
+    flagged['detail'] = detail.loc[bad]
+
+    new_gaps = gap[series['row'] >= 0]
+    stats = {
+        'checked': len(frame),
+        'exact_duplicates': int(exact.sum()),
+        'flagged': int(bad.sum()),
+        'reasons': {c: int(flags[c].sum()) for c in CHECKS if flags[c].any()},
+        'gap_days': int(new_gaps.sum()),
+        'symbols_with_gaps': int(series.loc[new_gaps.index[new_gaps > 0], 'symbol'].nunique()),
+    }
+    return df.loc[~bad, columns], flagged, stats
+
+
+async def load_validation_context(db: AsyncSession, frame) -> Tuple[list, list, "pd.DataFrame"]:
+    """(history rows, calendar dates, adjustment factors) validate_bars needs for a batch."""
+    from app.services.adjustments import load_factors
+    window = max(2, get_settings().VALIDATION_VOL_WINDOW)
+    start, end = frame['date'].min(), frame['date'].max()
+    # ~window trading days before the batch, with room for holidays
+    cutoff = start - timedelta(days=int(window * 1.6) + 10)
+    calendar = (await db.execute(
+        select(IndexDaily.date).where(IndexDaily.date >= cutoff, IndexDaily.date <= end).order_by(IndexDaily.date)
+    )).scalars().all()
+    symbols = frame['symbol'].unique().tolist()
+    history = (await db.execute(
+        select(PriceDaily.symbol, PriceDaily.date, PriceDaily.close).where(
+            PriceDaily.symbol.in_(symbols), PriceDaily.date >= cutoff, PriceDaily.date < end,
+        )
+    )).all()
+    return history, calendar, await load_factors(db, symbols, after=cutoff)
+
+
+async def validate_batch(db: AsyncSession, frame) -> Tuple["pd.DataFrame", "pd.DataFrame", dict]:
+    """validate_bars with its context loaded from the DB; CPU part in a thread."""
+    if frame.empty:
+        return frame, frame.iloc[0:0], {'checked': 0, 'flagged': 0}
+    history, calendar, factors = await load_validation_context(db, frame)
+    return await asyncio.to_thread(validate_bars, frame, history, calendar, factors)
+
+
+async def quarantine_bars(db: AsyncSession, flagged, source: str) -> int:
+    """
+    Insert validate_bars' flagged rows into price_quarantine, except bars
+    already pending with the same values (re-imports overlap). Does not commit.
+    """
+    pd = timed_import("pandas")
+    from app.services.ingest import PRICE_COLUMNS
+    if flagged.empty:
+        return 0
+    pending = pd.DataFrame((await db.execute(
+        select(PriceQuarantine.symbol, PriceQuarantine.date, *[getattr(PriceQuarantine, c) for c in PRICE_COLUMNS]).where(
+            PriceQuarantine.symbol.in_(flagged['symbol'].unique().tolist()), PriceQuarantine.resolved_at.is_(None),
+            PriceQuarantine.date >= flagged['date'].min(), PriceQuarantine.date <= flagged['date'].max(),
+        )
+    )).all(), columns=['symbol', 'date', *PRICE_COLUMNS])
+    if not pending.empty:
+        key = ['symbol', 'date', *PRICE_COLUMNS]
+        seen = flagged[key].astype({c: float for c in PRICE_COLUMNS}).merge(
+            pending.astype({c: float for c in PRICE_COLUMNS}).drop_duplicates(), on=key, how='left', indicator=True)
+        flagged = flagged.loc[(seen['_merge'] == 'left_only').to_numpy()]
+        if flagged.empty:
+            return 0
+    rows = flagged.astype(object).where(flagged.notna(), None).to_dict('records')
+    await db.execute(insert(PriceQuarantine), [{**r, 'source': source} for r in rows])
+    by_reason = {}
+    for r in rows:
+        for reason in r['reasons']:
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+    logger.warning("Bars quarantined", source=source, bars=len(rows), reasons=by_reason)
+    return len(rows)
+
+
+async def resolve_quarantine(db: AsyncSession, ids, action: str) -> dict:
+    """
+    RELEASE (write into prices_daily as-is, via ingest.write_price_batch) or
+    DISCARD pending quarantined bars. Bars still missing a required value
+    can't be released and stay pending. Commits.
+    """
+    pd = timed_import("pandas")
+    from datetime import datetime
+    from app.services.ingest import PRICE_COLUMNS, REQUIRED_COLUMNS, write_price_batch
+    if action not in ("RELEASE", "DISCARD"):
+        raise ValueError(f"Unknown action {action}")
+    rows = (await db.execute(
+        select(PriceQuarantine).where(PriceQuarantine.id.in_(list(ids)), PriceQuarantine.resolved_at.is_(None))
+        .order_by(PriceQuarantine.id)
+    )).scalars().all()
+    skipped = []
+    if action == "RELEASE":
+        skipped = [q for q in rows if any(getattr(q, c) is None for c in REQUIRED_COLUMNS)]
+        rows = [q for q in rows if q not in skipped]
+        frame = pd.DataFrame([{'symbol': q.symbol, 'date': q.date, **{c: getattr(q, c) for c in PRICE_COLUMNS}}
+                              for q in rows], columns=['symbol', 'date', *PRICE_COLUMNS])
+        # Latest release wins for a (symbol, date) quarantined more than once
+        frame = frame.astype({c: float for c in PRICE_COLUMNS}).drop_duplicates(['symbol', 'date'], keep='last')
+        await write_price_batch(db, frame, "QUARANTINE")
+    now = datetime.utcnow()
+    for q in rows:
+        q.resolved_at, q.resolution = now, "RELEASED" if action == "RELEASE" else "DISCARDED"
+    await db.commit()
+    return {"resolved": len(rows), "skipped": [q.id for q in skipped]}
@@ -0,0 +1,159 @@
+import json
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+import structlog
+from sqlalchemy import select, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import Top10Daily
+from app.utils.cache import get_cache, invalidate_daily_caches, SIGNALS_NS, BACKTEST_NS
+from app.utils.metrics import stage_timer
+
+logger = structlog.get_logger()
+
+# Standard backtest windows shown in the web app (calendar days back from the latest computed date)
+BACKTEST_PRESETS = {
+    "1M": 30,
+    "3M": 91,
+    "6M": 182,
+    "1Y": 365,
+}
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Recursively convert numpy/pandas scalars and dates so json.dumps keeps numbers as numbers."""
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if hasattr(obj, "item"):
+        obj = obj.item()
+    if isinstance(obj, float) and obj != obj:
+        return None
+    return obj
+
+
+async def latest_computed_date(db: AsyncSession) -> Optional[date]:
+    return await db.scalar(select(Top10Daily.date).order_by(desc(Top10Daily.date)).limit(1))
+
+
+async def run_backtest_preset(db: AsyncSession, name: str, end_date: date) -> Dict[str, Any]:
+    """Run a standard window ending at end_date and return a JSON-ready summary."""
+    from app.services.backtest_engine import BacktestEngine
+    from app.services.pipeline import load_backtest_inputs
+
+    settings = get_settings()
+    start_date = end_date - timedelta(days=BACKTEST_PRESETS[name])
+    params = {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "initial_capital": 100_000.0,
+        "fee_bps": float(settings.DEFAULT_FEE_BPS),
+        "slippage_bps": float(settings.DEFAULT_SLIPPAGE_BPS),
+    }
+    summary = {"preset": name, "start_date": start_date, "end_date": end_date}
+    try:
+        df_top, df_feat, price_history, df_index = await load_backtest_inputs(db, start_date, end_date)
+        results = await BacktestEngine().run_backtest(params, df_top, df_feat, price_history, df_index)
+    except ValueError as e:
+        results = {"error": str(e)}
+
+    if "error" in results:
+        summary["error"] = results["error"]
+    else:
+        summary["metrics"] = results["metrics"]
+        summary["equity_curve"] = [
+            {"date": e["date"], "equity": e["equity"], "benchmark_equity": e.get("benchmark_equity")}
+            for e in results["equity_curve"]
+        ]
+    return to_jsonable(summary)
+
+
+async def get_backtest_preset(db: AsyncSession, name: str) -> Optional[Dict[str, Any]]:
+    """Cached preset result for the latest computed date; computed and cached on a miss."""
+    cache = get_cache()
+    key = await cache.key(BACKTEST_NS, "preset", name)
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached
+
+    end_date = await latest_computed_date(db)
+    if end_date is None:
+        return None
+    summary = await run_backtest_preset(db, name, end_date)
+    await cache.set(key, summary)
+    return summary
+
+
+def _snapshot_path(name: str) -> str:
+    path = get_settings().SNAPSHOT_DIR
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, f"{name}.json")
+
+
+async def load_snapshot() -> Optional[Dict[str, Any]]:
+    cache = get_cache()
+    snapshot = await cache.get(await cache.key(SIGNALS_NS, "snapshot", "latest"))
+    if snapshot is not None:
+        return snapshot
+
+    # Cache cold (restart / other replica): fall back to the static file
+    path = _snapshot_path("latest")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+async def warm_caches(db: AsyncSession, target_date: date) -> Dict[str, Any]:
+    """
+    Post-compute stage: render the default responses for target_date into the
+    response cache and write a static JSON snapshot of them.
+    - /signals/top10 for the date
+    - /signals/stock/{symbol} for the top-ranked symbols
+    - standard backtest presets
+    """
+    from app.routers.signals import build_top10, build_stock_scores
+
+    settings = get_settings()
+    cache = get_cache()
+    # Anything cached before this compute (e.g. an empty Top10 for today) is stale
+    await invalidate_daily_caches()
+
+    with stage_timer("warmup", "top10"):
+        top10 = await build_top10(db, target_date, "RISK_ON")
+        top10_json = top10.model_dump(mode='json')
+        await cache.set(await cache.key(SIGNALS_NS, "top10", target_date, "RISK_ON"), top10_json)
+
+    stocks = {}
+    with stage_timer("warmup", "stock_histories") as st:
+        for item in top10.top10[:settings.WARMUP_TOP_SYMBOLS]:
+            history = [h.model_dump(mode='json') for h in await build_stock_scores(db, item.symbol, 30)]
+            await cache.set(await cache.key(SIGNALS_NS, "stock", item.symbol, 30), history)
+            stocks[item.symbol] = history
+        st.rows = len(stocks)
+
+    backtests = {}
+    with stage_timer("warmup", "backtest_presets") as st:
+        for name in BACKTEST_PRESETS:
+            summary = await run_backtest_preset(db, name, target_date)
+            await cache.set(await cache.key(BACKTEST_NS, "preset", name), summary)
+            backtests[name] = summary
+        st.rows = len(backtests)
+
+    snapshot = {
+        "date": target_date.isoformat(),
+        "top10": top10_json,
+        "stocks": stocks,
+        "backtests": backtests,
+    }
+    await cache.set(await cache.key(SIGNALS_NS, "snapshot", "latest"), snapshot)
+    with open(_snapshot_path("latest"), "w") as f:
+        json.dump(snapshot, f)
+
+    return {"message": f"Warmed Top10, {len(stocks)} stock histories, {len(backtests)} backtest presets for {target_date}"}
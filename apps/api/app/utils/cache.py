@@ -0,0 +1,119 @@
+import json
+import time
+from typing import Any, Optional
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+
+# Namespaces (generation-versioned, see ResponseCache)
+SIGNALS_NS = "signals"
+BACKTEST_NS = "backtest"
+
+
+class ResponseCache:
+    """
+    JSON response cache. Uses Redis (Settings.REDIS_URL) when reachable and
+    falls back to a bounded in-process dict otherwise (e.g. Render free plan).
+
+    Keys are namespaced with a generation number; bump_generation(ns) after a
+    daily compute invalidates every key of that namespace at once.
+    """
+
+    def __init__(self, redis_url: Optional[str], default_ttl: int, max_memory_items: int = 2048):
+        self.redis_url = redis_url
+        self.default_ttl = default_ttl
+        self.max_memory_items = max_memory_items
+        self._redis = None
+        self._redis_disabled = not redis_url
+        self._memory = {}  # key -> (expires_at, payload)
+
+    async def _client(self):
+        if self._redis_disabled:
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+                client = aioredis.from_url(self.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+                await client.ping()
+                self._redis = client
+            except Exception as e:
+                logger.warning("Redis unavailable, using in-process response cache", error=str(e))
+                self._redis_disabled = True
+                return None
+        return self._redis
+
+    # Raw string access
+    async def _get_raw(self, key: str) -> Optional[str]:
+        client = await self._client()
+        if client is not None:
+            try:
+                value = await client.get(key)
+                return value.decode() if isinstance(value, bytes) else value
+            except Exception as e:
+                logger.warning("Redis get failed", key=key, error=str(e))
+
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            self._memory.pop(key, None)
+            return None
+        return payload
+
+    async def _set_raw(self, key: str, payload: str, ttl: int):
+        client = await self._client()
+        if client is not None:
+            try:
+                await client.set(key, payload, ex=ttl)
+                return
+            except Exception as e:
+                logger.warning("Redis set failed", key=key, error=str(e))
+
+        if len(self._memory) >= self.max_memory_items:
+            # Drop oldest insert
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = (time.monotonic() + ttl, payload)
+
+    # JSON API
+    async def get(self, key: str) -> Optional[Any]:
+        payload = await self._get_raw(key)
+        return json.loads(payload) if payload is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self._set_raw(key, json.dumps(value, default=str), ttl or self.default_ttl)
+
+    async def generation(self, namespace: str) -> int:
+        value = await self._get_raw(f"{namespace}:gen")
+        return int(value) if value else 0
+
+    async def bump_generation(self, namespace: str) -> int:
+        gen = await self.generation(namespace) + 1
+        # Generation keys outlive the entries they version
+        await self._set_raw(f"{namespace}:gen", str(gen), self.default_ttl * 30)
+        return gen
+
+    async def key(self, namespace: str, *parts) -> str:
+        gen = await self.generation(namespace)
+        return ":".join([namespace, f"v{gen}", *[str(p) for p in parts]])
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = ResponseCache(settings.REDIS_URL, settings.RESPONSE_CACHE_TTL_SECONDS)
+    return _cache
+
+
+async def invalidate_daily_caches() -> None:
+    """Drop every response derived from the daily compute (signals and backtest presets)."""
+    cache = get_cache()
+    await cache.bump_generation(SIGNALS_NS)
+    await cache.bump_generation(BACKTEST_NS)
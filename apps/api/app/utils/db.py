@@ -0,0 +1,37 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def bulk_upsert(db: AsyncSession, model, rows: List[dict], index_elements: Iterable[str],
+                      update_columns: Optional[Iterable[str]] = None, chunk_size: int = 1000) -> int:
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE in chunks (Postgres, sqlite).
+    update_columns defaults to every non-key column present in the rows;
+    pass a subset to leave the other columns of existing rows untouched.
+    Does not commit.
+    """
+    if not rows:
+        return 0
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    index_elements = list(index_elements)
+    if update_columns is None:
+        update_columns = [c for c in rows[0] if c not in index_elements]
+
+    # One statement for all chunks, executed with a parameter list (executemany):
+    # compiled once and cached, unlike a multi-row VALUES built per chunk
+    stmt = insert(getattr(model, '__table__', model))
+    if update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_columns}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    for start in range(0, len(rows), chunk_size):
+        await db.execute(stmt, rows[start:start + chunk_size])
+    return len(rows)
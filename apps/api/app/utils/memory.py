@@ -0,0 +1,44 @@
+import resource
+import sys
+from typing import List, Optional, Sequence
+
+from app.config import get_settings
+
+# Chunked processing for jobs whose working set grows with history x universe
+# (backtests over many years, feature compute over a large universe). The
+# budget only covers that working set; the interpreter, pandas/numpy and the
+# app itself take ~150-200 MB on top.
+#
+# Peak bytes held per loaded price row while a chunk is processed, measured
+# with tracemalloc on seed data (row tuples + long frame + per-symbol frames /
+# panels + joined features). Deliberately on the high side.
+BACKTEST_BYTES_PER_ROW = 1200
+FEATURE_BYTES_PER_ROW = 900
+
+
+def memory_budget() -> Optional[int]:
+    """MEMORY_BUDGET_MB in bytes, None when unbounded."""
+    mb = get_settings().MEMORY_BUDGET_MB
+    return mb * 1024 * 1024 if mb > 0 else None
+
+
+def rows_per_chunk(bytes_per_row: int) -> Optional[int]:
+    """Price rows one chunk may load under the budget, None when unbounded."""
+    budget = memory_budget()
+    if budget is None:
+        return None
+    return max(1, budget // bytes_per_row)
+
+
+def batched(items: Sequence, size: Optional[int]) -> List[Sequence]:
+    """items in consecutive slices of `size` (one slice when size is None)."""
+    if not size or size >= len(items):
+        return [items] if len(items) else []
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set of this process so far (for logs)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
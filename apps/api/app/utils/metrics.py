@@ -0,0 +1,205 @@
+import importlib
+import sys
+import time
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+import structlog
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import event
+
+logger = structlog.get_logger()
+
+# Prometheus metric definitions (default registry)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+)
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of a named stage inside a pipeline (compute, import, backtest)",
+    ["pipeline", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+ROWS_PROCESSED = Counter(
+    "pipeline_rows_processed_total",
+    "Rows processed by a pipeline stage",
+    ["pipeline", "stage"],
+)
+QUEUE_DEPTH = Gauge(
+    "pipeline_queue_depth",
+    "Items waiting in a bounded queue between pipeline stages (ingest)",
+    ["pipeline", "queue"],
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "Database round-trips, attributed to the active pipeline stage",
+    ["pipeline", "stage"],
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured connection pool size")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out of the pool")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections opened beyond the pool size")
+APP_STARTUP = Gauge("app_startup_seconds", "Process start to ready, by phase (import, lifespan)", ["phase"])
+LAZY_IMPORT = Gauge("lazy_import_seconds", "Cost of the first import of a deferred heavy module", ["module"])
+
+# (pipeline, stage) of the stage timer active in the current task, used to attribute DB queries
+_current_stage: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_stage", default=None)
+
+
+class stage_timer:
+    """
+    Time a pipeline stage and report it to Prometheus and the structured log.
+
+    with stage_timer("compute", "load_prices") as st:
+        rows = ...
+        st.rows = len(rows)
+    """
+
+    def __init__(self, pipeline: str, stage: str, **log_context):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.log_context = log_context
+        self.rows = 0
+        self.elapsed = 0.0
+        self._start = 0.0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_stage.set((self.pipeline, self.stage))
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        _current_stage.reset(self._token)
+
+        STAGE_LATENCY.labels(self.pipeline, self.stage).observe(self.elapsed)
+        if self.rows:
+            ROWS_PROCESSED.labels(self.pipeline, self.stage).inc(self.rows)
+
+        logger.info(
+            "Stage finished",
+            pipeline=self.pipeline,
+            stage=self.stage,
+            duration_ms=round(self.elapsed * 1000, 2),
+            rows=self.rows,
+            failed=exc_type is not None,
+            **self.log_context,
+        )
+        return False
+
+
+def record_rows(pipeline: str, stage: str, count: int):
+    """Count rows for a stage without timing it (e.g. inside a per-symbol loop)."""
+    if count:
+        ROWS_PROCESSED.labels(pipeline, stage).inc(count)
+
+
+def timed_import(name: str):
+    """
+    Import a heavy module on first use (pandas, numpy, yfinance) and record
+    how long that first import took. Later calls are a dict lookup.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    LAZY_IMPORT.labels(name).set(elapsed)
+    logger.info("Deferred import", module=name, duration_ms=round(elapsed * 1000, 2))
+    return module
+
+
+def instrument_engine(async_engine):
+    """
+    Count every statement executed through the engine.
+    Queries are labelled with the stage timer active when they were issued.
+    """
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        current = _current_stage.get()
+        pipeline, stage = current if current else ("none", "none")
+        DB_QUERIES.labels(pipeline, stage).inc()
+
+
+def update_pool_metrics(async_engine):
+    """Refresh pool gauges. Called at scrape time."""
+    pool = async_engine.pool
+    # Not every pool class (e.g. NullPool, StaticPool) tracks these
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.set(pool.size())
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, "overflow"):
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def route_template(scope) -> str:
+    """
+    Rebuild the route template from the matched path params
+    (/api/v1/backtest/abc -> /api/v1/backtest/{run_id}).
+    Works regardless of how routers are nested/prefixed.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    for name, value in (scope.get("path_params") or {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency histograms.
+
+    The route template (e.g. /api/v1/backtest/{run_id}) is used as label so
+    path parameters don't explode cardinality. Latency is measured until the
+    response body is complete, so background tasks attached to the response
+    are not counted against the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        start = time.perf_counter()
+        state = {"status": 500, "recorded": False}
+
+        def record():
+            if state["recorded"]:
+                return
+            state["recorded"] = True
+            REQUEST_LATENCY.labels(method, route_template(scope), str(state["status"])).observe(time.perf_counter() - start)
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
@@ -0,0 +1,211 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import structlog
+from fastapi import HTTPException, Request
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_MODE_HEADER = "X-Profile-Mode"
+PROFILE_QUERY = "profile_token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+MODES = ("cprofile", "sample")
+
+# One cProfile session at a time: profiled requests share the event-loop thread,
+# and a second enable() would clobber the first (Python 3.12+ raises instead)
+_cprofile_lock = threading.Lock()
+
+
+def _profile_dir() -> str:
+    path = get_settings().PROFILE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    settings = get_settings()
+    return bool(token) and settings.PROFILING_ENABLED and token in settings.PROFILING_TOKENS
+
+
+def require_admin(request: Request):
+    """Dependency for admin-only endpoints (token in header or query)."""
+    token = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY)
+    if not is_admin_token(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def profile_request(request: Request) -> Optional[Dict[str, str]]:
+    """
+    Dependency: returns a profile spec {id, mode} if the caller asked for profiling
+    with an allow-listed token, else None.
+    Asking with an unknown token is rejected so misconfigured clients notice.
+    """
+    token = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY)
+    if not token:
+        return None
+    if not is_admin_token(token):
+        raise HTTPException(status_code=403, detail="Profiling not allowed")
+
+    mode = request.headers.get(PROFILE_MODE_HEADER) or request.query_params.get("profile_mode") or "cprofile"
+    if mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile mode {mode}. Use one of {MODES}")
+
+    return {"id": uuid.uuid4().hex, "mode": mode}
+
+
+def _acquire_cprofile():
+    if not _cprofile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another cProfile session is running, retry or use profile_mode=sample")
+
+
+def reserve_profile(spec: Optional[Dict[str, str]]):
+    """
+    Take the cProfile slot for a session that starts later (a background task),
+    so a busy slot is a 409 for the request rather than a task that never runs.
+    The profile_session started with this spec releases it; so does release_profile.
+    """
+    if spec is None or spec["mode"] != "cprofile":
+        return
+    _acquire_cprofile()
+    spec["reserved"] = True
+
+
+def release_profile(spec: Optional[Dict[str, str]]):
+    """Give back a reserved slot whose session will not run."""
+    if spec is not None and spec.pop("reserved", False):
+        _cprofile_lock.release()
+
+
+class _StackSampler:
+    """
+    Sample the stack of one thread at a fixed interval and aggregate
+    into flamegraph 'collapsed' format (frame;frame;frame count).
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                stack.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profile_session(spec: Optional[Dict[str, str]], label: str):
+    """
+    Profile the enclosed block if spec is given, else do nothing.
+
+    Profiling is per thread: with async code every coroutine scheduled on the
+    event loop while the block runs is included too. That is fine for
+    diagnosing heavy endpoints (the engines are CPU bound and don't yield),
+    but keep it in mind when reading the output. A cProfile session while
+    another one is running is rejected with 409, unless the spec already holds
+    the slot (see reserve_profile).
+    """
+    if spec is None:
+        yield None
+        return
+
+    profile_id, mode = spec["id"], spec["mode"]
+    settings = get_settings()
+    base = os.path.join(_profile_dir(), profile_id)
+    started = time.perf_counter()
+
+    profiler = None
+    sampler = None
+    if mode == "cprofile":
+        if not spec.get("reserved"):
+            _acquire_cprofile()
+        spec["reserved"] = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        sampler = _StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000.0)
+        sampler.start()
+
+    try:
+        yield profile_id
+    finally:
+        files = []
+        if profiler is not None:
+            profiler.disable()
+            release_profile(spec)
+            profiler.dump_stats(base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+            with open(base + ".txt", "w") as f:
+                f.write(out.getvalue())
+            files = ["prof", "txt"]
+        if sampler is not None:
+            sampler.stop()
+            with open(base + ".collapsed", "w") as f:
+                f.write(sampler.collapsed())
+            files = ["collapsed"]
+
+        meta = {
+            "profile_id": profile_id,
+            "label": label,
+            "mode": mode,
+            "created_at": datetime.utcnow().isoformat(),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "formats": files,
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(meta, f)
+        logger.info("Profile stored", **meta)
+
+
+def list_profiles() -> List[Dict]:
+    path = _profile_dir()
+    profiles = []
+    for name in os.listdir(path):
+        if name.endswith(".json"):
+            with open(os.path.join(path, name)) as f:
+                profiles.append(json.load(f))
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(profile_id: str, fmt: str) -> Optional[str]:
+    # Ids are uuid hex; reject anything else so the id can't escape PROFILE_DIR
+    if not all(c in "0123456789abcdef" for c in profile_id):
+        return None
+    path = os.path.join(_profile_dir(), f"{profile_id}.{fmt}")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,77 @@
+import asyncio
+from collections import OrderedDict, defaultdict
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class ProgressBroker:
+    """
+    In-process fan-out of progress events per job (e.g. a backtest run_id).
+
+    Publishers never block: each subscriber has a bounded queue and a slow
+    consumer loses its oldest pending events. The latest event per job is
+    kept so a late subscriber starts from the current state. A job ends with
+    an event carrying final=True.
+    """
+
+    def __init__(self, max_queue: int = 256, max_jobs: int = 256):
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._latest: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._active: Set[str] = set()
+
+    def start(self, job_id: str):
+        self._active.add(job_id)
+
+    def is_active(self, job_id: str) -> bool:
+        return job_id in self._active
+
+    def latest(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._latest.get(job_id)
+
+    def publish(self, job_id: str, event: Dict[str, Any]):
+        self._latest[job_id] = event
+        self._latest.move_to_end(job_id)
+        while len(self._latest) > self.max_jobs:
+            self._latest.popitem(last=False)
+
+        for queue in self._subscribers.get(job_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+        if event.get("final"):
+            self._active.discard(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Latest event (if any), then every new one until the final event."""
+        queue: asyncio.Queue = asyncio.Queue(self.max_queue)
+        self._subscribers[job_id].add(queue)
+        try:
+            latest = self._latest.get(job_id)
+            if latest is not None:
+                yield latest
+                if latest.get("final"):
+                    return
+            while True:
+                event = await queue.get()
+                yield event
+                if event.get("final"):
+                    return
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+
+_broker: Optional[ProgressBroker] = None
+
+
+def get_broker() -> ProgressBroker:
+    global _broker
+    if _broker is None:
+        _broker = ProgressBroker()
+    return _broker
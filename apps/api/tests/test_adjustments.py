@@ -0,0 +1,124 @@
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import get_settings
+
+@pytest.fixture
+def adjustments(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import adjustments
+    yield adjustments
+    get_settings.cache_clear()
+
+def factors_for(adjustments, symbol, steps):
+    series = adjustments.factor_series(pd.DataFrame(steps, columns=['ex_date', 'factor', 'volume_factor']))
+    return series.assign(symbol=symbol)
+
+def test_action_factors(adjustments):
+    assert adjustments.action_factors('SPLIT', ratio=2.0) == (0.5, 2.0)
+    factor, volume = adjustments.action_factors('DIVIDEND', cash=1.0, prev_close=20.0)
+    assert factor == pytest.approx(0.95) and volume == 1.0
+    with pytest.raises(ValueError):
+        adjustments.action_factors('SPLIT', ratio=0)
+    with pytest.raises(ValueError):
+        adjustments.action_factors('DIVIDEND', cash=25.0, prev_close=20.0)
+    with pytest.raises(ValueError):
+        adjustments.action_factors('MERGER')
+
+def test_factor_series_is_cumulative_backwards(adjustments):
+    series = adjustments.factor_series(pd.DataFrame({
+        'ex_date': [date(2024, 3, 1), date(2024, 1, 2), date(2024, 3, 1)],
+        'factor': [0.5, 0.9, 0.8], 'volume_factor': [2.0, 1.0, 1.0],
+    }))
+    assert series['ex_date'].tolist() == [date(2024, 1, 2), date(2024, 3, 1)]
+    assert series['cumulative'].tolist() == pytest.approx([0.9 * 0.4, 0.4])
+    assert series['volume_cumulative'].tolist() == [2.0, 2.0]
+
+def test_adjust_prices_removes_the_split_jump(adjustments):
+    days = pd.bdate_range("2024-01-01", periods=6)
+    close = np.array([10.0, 10.2, 10.4, 5.3, 5.4, 5.5]) # 2-for-1 on day 3
+    frame = pd.DataFrame({'symbol': 'AAA', 'close': close, 'volume': 100.0}, index=pd.Index(days, name='date'))
+    other = frame.assign(symbol='BBB')
+    frame = pd.concat([frame, other])
+    factors = factors_for(adjustments, 'AAA', [(days[3].date(), 0.5, 2.0)])
+
+    today = adjustments.adjust_prices(frame, factors)
+    aaa = today[today['symbol'] == 'AAA']
+    assert aaa['close'].tolist() == pytest.approx([5.0, 5.1, 5.2, 5.3, 5.4, 5.5])
+    assert aaa['volume'].tolist() == [200.0] * 3 + [100.0] * 3
+    assert today.loc[today['symbol'] == 'BBB', 'close'].tolist() == close.tolist()
+    assert frame['close'].tolist() == close.tolist() * 2 # input untouched
+
+    # In a pre-split date's units nothing before it moves
+    before = adjustments.adjust_prices(frame, factors, as_of=days[2].date())
+    assert before.loc[before['symbol'] == 'AAA', 'close'].tolist() == pytest.approx([10.0, 10.2, 10.4, 10.6, 10.8, 11.0])
+
+    # No factors, no copy
+    assert adjustments.adjust_prices(frame, factors.iloc[0:0]) is frame
+
+def test_to_own_units_inverts_as_of_adjustment(adjustments):
+    days = pd.bdate_range("2024-01-01", periods=4)
+    factors = factors_for(adjustments, 'AAA', [(days[2].date(), 0.5, 2.0)])
+    index = pd.MultiIndex.from_arrays([['AAA'] * 4, days], names=['symbol', 'date'])
+    # ema50 computed on a panel in the last day's units
+    features = pd.DataFrame({'ema50': [5.0, 5.0, 5.0, 5.0], 'atr14_pct': 0.02}, index=index)
+    own = adjustments.to_own_units(features, factors, days[-1].date())
+    assert own['ema50'].tolist() == pytest.approx([10.0, 10.0, 5.0, 5.0])
+    assert own['atr14_pct'].tolist() == [0.02] * 4
+
+@pytest.mark.asyncio
+async def test_yahoo_rebaseline_and_splits_are_not_applied_twice(adjustments, tmp_path, monkeypatch):
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from app.database import Base
+    from app.models import Symbol, PriceDaily, PriceRevision
+    from app.services import data_provider
+    from app.services.pipeline import import_yahoo_prices
+
+    days = pd.bdate_range("2024-06-17", "2024-06-28")
+    ex_date = date(2024, 6, 24) # 2-for-1: traded at 20 before, 10 after
+
+    class FakeYF:
+        def download(self, ticker, start, end, **kwargs):
+            # Close already divided by the split ratio before the ex-date, dividends not applied
+            dates = pd.bdate_range(start, end, inclusive='left', name='Date')
+            return pd.DataFrame({'Open': 10.0, 'High': 10.5, 'Low': 9.5, 'Close': 10.0, 'Adj Close': 9.9,
+                                 'Volume': 1000.0}, index=dates)
+    monkeypatch.setattr(data_provider.YahooFinanceProvider, "__init__", lambda self: setattr(self, "yf", FakeYF()))
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'prices.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        # An older build: auto_adjust=True bars (dividend-adjusted too), the split recorded on top
+        db.add(Symbol(symbol="AAA", name="AAA", is_active=True))
+        db.add_all([PriceDaily(symbol="AAA", date=d.date(), open=9.9, high=10.4, low=9.4, close=9.9, volume=1000)
+                    for d in days])
+        await db.commit()
+        await adjustments.add_corporate_action(db, "AAA", ex_date, "SPLIT", ratio=2.0)
+
+        result = await import_yahoo_prices(db, days=14, end_date=days[-1].date(), rebaseline=True)
+        assert (result["revised"], result["quarantined"]) == (len(days), 0)
+        assert (await db.execute(select(PriceRevision.source))).scalars().all() == ["CORPORATE_ACTION"]
+        assert await db.scalar(select(Symbol.price_source)) == "YAHOO"
+        # The recorded split no longer applies: Yahoo's bars have it already
+        assert (await adjustments.load_factors(db, ["AAA"])).empty
+        with pytest.raises(ValueError):
+            await adjustments.add_corporate_action(db, "AAA", ex_date, "SPLIT", ratio=2.0)
+        await adjustments.add_corporate_action(db, "AAA", ex_date, "DIVIDEND", cash=0.5)
+
+        # A plain re-import of the same (already split-adjusted) bars changes nothing
+        assert (await import_yahoo_prices(db, days=14, end_date=days[-1].date()))["revised"] == 0
+        stored = pd.DataFrame((await db.execute(
+            select(PriceDaily.symbol, PriceDaily.date, PriceDaily.close).order_by(PriceDaily.date)
+        )).all(), columns=['symbol', 'date', 'close'])
+        assert (stored['close'] == 10.0).all()
+        adjusted = adjustments.adjust_prices(stored, await adjustments.load_factors(db, ["AAA"]))
+        before = (stored['date'] < ex_date).to_numpy()
+        # Only the dividend: 10 x (1 - 0.5 / 10) before the ex-date, not another halving
+        assert adjusted.loc[before, 'close'].tolist() == pytest.approx([9.5] * int(before.sum()))
+        assert (adjusted.loc[~before, 'close'] == 10.0).all()
+    await engine.dispose()
@@ -1,12 +1,12 @@
+import asyncio
 import pytest
 import pandas as pd
 import numpy as np
 from datetime import date
 from app.services.backtest_engine import BacktestEngine
+from app.services.performance import performance_metrics, trade_array
 
-@pytest.mark.asyncio
-async def test_backtest_execution():
-    # Setup Data
+def make_inputs():
     dates = pd.date_range(start='2023-01-01', end='2023-02-01', freq='B') # ~23 days
     
     # Stock A: Always goes up
@@ -51,6 +51,12 @@ async def test_backtest_execution():
     # Index
     idx_df = pd.DataFrame({'close': [100]*len(dates)}, index=dates)
     
+    return top_df, f_df, price_history, idx_df
+
+@pytest.mark.asyncio
+async def test_backtest_execution():
+    top_df, f_df, price_history, idx_df = make_inputs()
+    
     # Params
     params = {
         "start_date": '2023-01-02', # Monday
@@ -78,3 +84,173 @@ async def test_backtest_execution():
     sells = [t for t in trades if t['symbol'] == 'B' and t['action'] == 'SELL']
     if len(sells) > 0:
         assert sells[0]['reason'] in ['TREND_STOP', 'ATR_STOP']
+
+@pytest.mark.asyncio
+async def test_backtest_strategy_params():
+    top_df, f_df, price_history, idx_df = make_inputs()
+    params = {
+        "start_date": '2023-01-02',
+        "end_date": '2023-01-31',
+        "initial_capital": 10000.0,
+        "fee_bps": 0,
+        "slippage_bps": 0,
+        "time_stop_days": 3,
+        "top_n": 1,
+    }
+    result = await BacktestEngine().run_backtest(params, top_df, f_df, price_history, idx_df)
+    
+    # Only the rank-1 name is bought, at the full 1/top_n weight
+    buys = [t for t in result['trades'] if t['action'] == 'BUY']
+    assert {t['symbol'] for t in buys} == {'A'}
+    assert buys[0]['qty'] * buys[0]['price'] > 9000
+    
+    # A never hits a price stop, so its exits are the shortened time stop
+    sells = [t for t in result['trades'] if t['action'] == 'SELL']
+    assert sells and all(t['reason'] == 'TIME_STOP' for t in sells)
+
+@pytest.mark.asyncio
+async def test_backtest_extend_from_checkpoint():
+    top_df, f_df, price_history, idx_df = make_inputs()
+    params = {"start_date": '2023-01-02', "end_date": '2023-01-31', "initial_capital": 10000.0, "time_stop_days": 10}
+    engine = BacktestEngine()
+    full = await engine.run_backtest(params, top_df, f_df, price_history, idx_df)
+    
+    first = await engine.run_backtest({**params, "end_date": '2023-01-16'}, top_df, f_df, price_history, idx_df)
+    checkpoint = first['checkpoint']
+    assert checkpoint['last_date'] == '2023-01-16'
+    assert checkpoint['holdings'] # positions carry over
+    
+    # Inputs only need to start at the checkpoint day
+    since = pd.Timestamp(checkpoint['last_date'])
+    rest = await engine.run_backtest(
+        params, top_df[top_df.index.get_level_values('date') >= since], f_df,
+        {s: df[df.index >= since] for s, df in price_history.items()}, idx_df[idx_df.index >= since],
+        checkpoint=checkpoint
+    )
+    assert rest['equity_curve'][0]['date'] > date(2023, 1, 16)
+    assert first['equity_curve'] + rest['equity_curve'] == full['equity_curve']
+    assert first['trades'] + rest['trades'] == full['trades']
+    # The extension's own metrics are the running ones; the rest come from the whole stored curve
+    assert rest['metrics'] == {k: full['metrics'][k] for k in rest['metrics']}
+    curve = first['equity_curve'] + rest['equity_curve']
+    combined = performance_metrics(
+        [e['equity'] for e in curve], trade_array(first['trades'] + rest['trades']), 10000.0,
+        date(2023, 1, 2), date(2023, 1, 31),
+        cash=[e['cash'] for e in curve], benchmark=[e['benchmark_equity'] for e in curve],
+    )
+    assert combined == full['metrics']
+    assert rest['checkpoint'] == full['checkpoint']
+
+@pytest.mark.asyncio
+async def test_backtest_progress_events():
+    top_df, f_df, price_history, idx_df = make_inputs()
+    params = {"start_date": '2023-01-02', "end_date": '2023-01-31', "initial_capital": 10000.0}
+    events = []
+    
+    async def progress(event):
+        events.append(event)
+    
+    result = await BacktestEngine().run_backtest(params, top_df, f_df, price_history, idx_df,
+                                                 progress=progress, progress_every=5)
+    days = len(result['equity_curve'])
+    assert [e['day'] for e in events] == list(range(5, days, 5)) + [days]
+    assert events[-1]['pct'] == 100.0
+    # Deltas add up to the full result
+    assert [p for e in events for p in e['equity_points']] == result['equity_curve']
+    assert [t for e in events for t in e['trades']] == result['trades']
+    assert events[-1]['total_trades'] == result['metrics']['total_trades']
+
+@pytest.mark.asyncio
+async def test_backtest_without_records():
+    top_df, f_df, price_history, idx_df = make_inputs()
+    params = {"start_date": '2023-01-02', "end_date": '2023-01-31', "initial_capital": 10000.0, "time_stop_days": 5}
+    engine = BacktestEngine()
+    full = await engine.run_backtest(params, top_df, f_df, price_history, idx_df)
+    bare = await engine.run_backtest(params, top_df, f_df, price_history, idx_df, records=False)
+    assert 'trades' not in bare and 'equity_curve' not in bare
+    assert bare['metrics'] == full['metrics']
+    assert bare['checkpoint'] == full['checkpoint']
+
+def test_trade_log_grows():
+    from app.services.backtest_engine import TradeLog, BUY
+    log = TradeLog(capacity=2)
+    for day in range(5):
+        log.append(day, 0, BUY, 10, 1.5, 0.1, 0.01, 0)
+    assert len(log) == 5 and log.view()['day'].tolist() == [0, 1, 2, 3, 4]
+
+def make_random_inputs(n_symbols=30, n_days=90, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=n_days)
+    symbols = [f"S{i:02d}" for i in range(n_symbols)]
+    price_history = {}
+    for i, s in enumerate(symbols):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.03, n_days)))
+        df = pd.DataFrame({'open': close * (1 + rng.normal(0, 0.01, n_days)), 'close': close}, index=dates)
+        price_history[s] = df.drop(df.index[rng.choice(n_days, 3, replace=False)]) if i % 5 == 0 else df
+    f_idx = pd.MultiIndex.from_product([dates, symbols], names=['date', 'symbol'])
+    closes = pd.DataFrame({s: price_history[s]['close'] for s in symbols}).reindex(dates).to_numpy()
+    f_df = pd.DataFrame({
+        'ema50': closes.ravel() * rng.uniform(0.85, 1.05, len(f_idx)), # (date, symbol) order
+        'atr14': rng.uniform(0.2, 1.0, len(f_idx)),
+    }, index=f_idx).drop(f_idx[::17])
+    top_df = pd.DataFrame([
+        {'date': d, 'rank': r + 1, 'symbol': s, 'final_score': 1.0}
+        for d in dates for r, s in enumerate(rng.choice(symbols, 10, replace=False))
+    ]).set_index(['date', 'rank'])
+    idx_close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_days)))
+    idx_df = pd.DataFrame({'close': idx_close, 'ema50': idx_close * rng.uniform(0.97, 1.03, n_days)}, index=dates)
+    return top_df, f_df, price_history, idx_df
+
+@pytest.mark.asyncio
+async def test_kernel_backend_matches_numpy():
+    # The kernel is plain Python without numba; with numba it's the compiled path
+    for seed, extra in ((0, {}), (1, {"atr_stop_mult": 1.0, "time_stop_days": 10, "top_n": 6}), (2, {"initial_capital": 3000.0})):
+        inputs = make_random_inputs(seed=seed)
+        params = {"start_date": '2023-01-02', "end_date": '2023-05-05', **extra}
+        a = await BacktestEngine("numpy").run_backtest(params, *inputs)
+        b = await BacktestEngine("kernel").run_backtest(params, *inputs, progress_every=7,
+                                                          progress=lambda e: asyncio.sleep(0))
+        assert len(a['trades']) > 20
+        assert a['trades'] == b['trades']
+        assert a['metrics'] == b['metrics']
+        np.testing.assert_allclose([e['equity'] for e in a['equity_curve']], [e['equity'] for e in b['equity_curve']])
+        assert a['checkpoint']['holdings'] == b['checkpoint']['holdings']
+
+    top_df, f_df, price_history, idx_df = make_inputs()
+    params = {"start_date": '2023-01-02', "end_date": '2023-01-31', "initial_capital": 10000.0}
+    a = await BacktestEngine("numpy").run_backtest(params, top_df, f_df, price_history, idx_df)
+    b = await BacktestEngine("kernel").run_backtest(params, top_df, f_df, price_history, idx_df)
+    assert a['trades'] == b['trades']
+
+@pytest.mark.asyncio
+async def test_engine_reuses_panels_across_top10_histories():
+    top_df, f_df, price_history, idx_df = make_random_inputs()
+    params = {"start_date": '2023-01-02', "end_date": '2023-05-05'}
+    engine = BacktestEngine()
+    first = await engine.run_backtest(params, top_df, f_df, price_history, idx_df)
+    panels = engine._cached[1]
+    shuffled = top_df.assign(symbol=top_df['symbol'].sample(frac=1, random_state=0).to_numpy())
+    second = await engine.run_backtest(params, shuffled, f_df, price_history, idx_df)
+    assert engine._cached[1] is panels
+    assert second == await BacktestEngine().run_backtest(params, shuffled, f_df, price_history, idx_df)
+    assert second['trades'] != first['trades']
+
+def assert_cash_capped_buys(result, fee_rate):
+    buys = [t for t in result['trades'] if t['action'] == 'BUY']
+    assert buys
+    for t in buys:
+        assert t['fee'] == pytest.approx(t['qty'] * t['price'] * fee_rate)
+    assert min(e['cash'] for e in result['equity_curve']) >= 0
+
+@pytest.mark.asyncio
+async def test_cash_capped_buy_pays_fee_on_capped_quantity():
+    # One name, all-in: qty * cost + fee exceeds the cash, so the order is cut down
+    top_df, f_df, price_history, idx_df = make_inputs()
+    params = {"start_date": '2023-01-02', "end_date": '2023-01-31', "initial_capital": 1000.0,
+              "top_n": 1, "fee_bps": 100}
+    a = await BacktestEngine("numpy").run_backtest(params, top_df, f_df, price_history, idx_df)
+    b = await BacktestEngine("kernel").run_backtest(params, top_df, f_df, price_history, idx_df)
+    assert_cash_capped_buys(a, 0.01)
+    assert_cash_capped_buys(b, 0.01)
+    assert a['trades'] == b['trades']
+    np.testing.assert_allclose([e['cash'] for e in a['equity_curve']], [e['cash'] for e in b['equity_curve']])
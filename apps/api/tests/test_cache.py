@@ -0,0 +1,56 @@
+import pytest
+from app.utils.cache import ResponseCache
+
+@pytest.mark.asyncio
+async def test_memory_cache_roundtrip():
+    cache = ResponseCache(None, default_ttl=60)
+    key = await cache.key("signals", "top10", "2024-01-02")
+    assert await cache.get(key) is None
+    
+    await cache.set(key, {"top10": [{"rank": 1, "symbol": "THYAO"}]})
+    assert await cache.get(key) == {"top10": [{"rank": 1, "symbol": "THYAO"}]}
+
+@pytest.mark.asyncio
+async def test_generation_bump_invalidates_namespace():
+    cache = ResponseCache(None, default_ttl=60)
+    old_key = await cache.key("signals", "top10", "2024-01-02")
+    await cache.set(old_key, {"top10": []})
+    other_key = await cache.key("backtest", "preset", "1Y")
+    await cache.set(other_key, {"metrics": {}})
+    
+    await cache.bump_generation("signals")
+    
+    new_key = await cache.key("signals", "top10", "2024-01-02")
+    assert new_key != old_key
+    assert await cache.get(new_key) is None
+    # Other namespaces untouched
+    assert await cache.key("backtest", "preset", "1Y") == other_key
+    assert await cache.get(other_key) == {"metrics": {}}
+
+@pytest.mark.asyncio
+async def test_ttl_expiry():
+    cache = ResponseCache(None, default_ttl=60)
+    await cache.set("k", 1, ttl=-1)
+    assert await cache.get("k") is None
+
+@pytest.mark.asyncio
+async def test_memory_cache_is_bounded():
+    cache = ResponseCache(None, default_ttl=60, max_memory_items=3)
+    for i in range(5):
+        await cache.set(f"k{i}", i)
+        
+    assert await cache.get("k0") is None
+    assert await cache.get("k4") == 4
+    assert len(cache._memory) == 3
+
+@pytest.mark.asyncio
+async def test_invalidate_daily_caches_bumps_signals_and_backtest(monkeypatch):
+    from app.utils import cache as cache_module
+    cache = ResponseCache(None, default_ttl=60)
+    monkeypatch.setattr(cache_module, "_cache", cache)
+    keys = [await cache.key("signals", "top10", "2024-01-02"), await cache.key("backtest", "preset", "1Y")]
+
+    await cache_module.invalidate_daily_caches()
+
+    assert [await cache.key("signals", "top10", "2024-01-02"), await cache.key("backtest", "preset", "1Y")] != keys
+    assert await cache.generation("signals") == await cache.generation("backtest") == 1
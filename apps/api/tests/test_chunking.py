@@ -0,0 +1,56 @@
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import get_settings
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import pipeline
+    yield pipeline
+    get_settings.cache_clear()
+
+def test_rows_per_chunk_follows_budget(pipeline, monkeypatch):
+    from app.utils.memory import rows_per_chunk, batched
+    assert rows_per_chunk(1000) is None
+    monkeypatch.setenv("MEMORY_BUDGET_MB", "10")
+    get_settings.cache_clear()
+    assert rows_per_chunk(1024) == 10 * 1024
+
+    assert batched(list(range(5)), None) == [[0, 1, 2, 3, 4]]
+    assert batched(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+    assert batched([], 2) == []
+
+def test_backtest_windows_chain_on_shared_days(pipeline):
+    calendar = [date(2024, 1, 1) + timedelta(days=i) for i in range(25)]
+    start, end = calendar[0], calendar[-1]
+    assert pipeline.backtest_windows(start, end, calendar, None) == [(start, end)]
+    assert pipeline.backtest_windows(start, end, calendar, 30) == [(start, end)]
+
+    windows = pipeline.backtest_windows(start, end, calendar, 10)
+    assert windows[0][0] == start and windows[-1][1] == end
+    for (_, prev_end), (next_start, _) in zip(windows, windows[1:]):
+        # Each window continues from the previous one's checkpoint day
+        assert next_start == prev_end
+    assert all(calendar.index(b) - calendar.index(a) + 1 <= 10 for a, b in windows)
+
+def test_atr_window_matches_full_computation(pipeline):
+    from app.services.feature_engine import FeatureEngine
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2024-01-01", periods=60)
+    frames = []
+    for sym, n in (("AAA", 60), ("BBB", 45)):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        frames.append(pd.DataFrame({"symbol": sym, "close": close, "high": close * 1.01, "low": close * 0.98},
+                                   index=pd.Index(dates[-n:], name="date")))
+    df = pd.concat(frames)
+    full = FeatureEngine().compute(df, features=["atr14"]).swaplevel().rename_axis(["date", "symbol"])
+
+    # Symbol batches computed separately give the same frame
+    wide = pd.concat([FeatureEngine().compute(f, features=["atr14"])["atr14"].unstack(level=0) for f in frames], axis=1)
+    got = pipeline.atr_window(wide, dates[20].date(), dates[40].date())
+    expected = full.loc[dates[20]:dates[40]].dropna().sort_index()
+    pd.testing.assert_frame_equal(got.sort_index(), expected, check_names=False)
@@ -0,0 +1,56 @@
+import os
+from datetime import date
+import pytest
+from app.config import get_settings
+
+@pytest.fixture
+def csv_import(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import csv_import
+    yield csv_import
+    get_settings.cache_clear()
+
+CSV = (
+    "Date,Symbol,Open,High,Low,Close,Volume\n"
+    "2024-01-02,AAA,10,11,9,10.5,1000\n"
+    "2024-01-02,BBB,20,21,19,20.5,2000\n"
+    "2024-01-03,AAA,10.5,11,10,10.8,1500\n"
+    "2024-01-03,AAA,10.5,11,10,10.9,1600\n" # duplicate, last wins
+    "2024-01-04,AAA,n/a,11,10,10.8,1500\n"
+    "2024-01-04,BBB,20,19,21,20,100\n" # high < low
+    "2024-01-04,ZZZ,1,1,1,1,1\n" # unknown symbol
+    "not-a-date,BBB,20,21,19,20,100\n"
+)
+
+def test_read_header(csv_import, tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text(CSV)
+    assert csv_import.read_header(str(path))[:3] == ['date', 'symbol', 'open']
+    path.write_text("date,symbol,close\n")
+    with pytest.raises(ValueError, match="open"):
+        csv_import.read_header(str(path))
+
+def test_chunks_resume_from_offset(csv_import, tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text(CSV)
+    chunks = list(csv_import.iter_chunks(str(path), 0, 3))
+    assert [data.count(b"\n") for data, _ in chunks] == [3, 3, 2]
+    # Resuming at a committed chunk's end offset yields exactly the remaining chunks
+    assert list(csv_import.iter_chunks(str(path), chunks[0][1], 3)) == chunks[1:]
+    assert chunks[-1][1] == os.path.getsize(path)
+
+def test_parse_chunk_rejects_unfileable_rows(csv_import, tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text(CSV)
+    columns = csv_import.read_header(str(path))
+    data = b"".join(chunk for chunk, _ in csv_import.iter_chunks(str(path), 0, 100))
+
+    frame, n_read, rejected = csv_import.parse_chunk(data, columns, {"AAA", "BBB"})
+    # Unknown symbol and unparsable date; bad values and duplicates are left to validation
+    assert (n_read, rejected) == (8, 2)
+    assert list(frame.columns) == csv_import.CSV_COLUMNS
+    assert len(frame) == 6
+    assert frame['open'].isna().sum() == 1
+    rows = {(r.symbol, r.date): r for r in frame.itertuples()}
+    assert rows[("BBB", date(2024, 1, 2))].turnover_tl == 20.5 * 2000
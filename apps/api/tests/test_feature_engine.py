@@ -59,3 +59,42 @@ def test_insufficient_data():
     if not res.empty:
         # Check that long term features are NaN
         assert np.isnan(res.iloc[-1].get('ema50', np.nan))
+
+def test_compute_only_requested_subgraph(sample_data):
+    from app.services.feature_engine import resolve
+    df, index_df = sample_data
+    fe = FeatureEngine()
+    
+    order = resolve(['atr14_pct'], df.columns)
+    assert order == ['prev_close', 'tr', 'atr14', 'atr14_pct']
+    
+    full = fe.compute_features(df, index_df)
+    partial = fe.compute_features(df, index_df, features=['atr14_pct', 'trend_gate'])
+    assert list(partial.columns) == ['atr14_pct', 'trend_gate']
+    pd.testing.assert_frame_equal(partial, full[['atr14_pct', 'trend_gate']])
+
+def test_lookback_and_unknown_feature(sample_data):
+    df, index_df = sample_data
+    fe = FeatureEngine()
+    
+    assert fe.lookback(['bo_120']) == 119
+    assert fe.lookback(['trend_score']) == 60 # ema50 span + 10 bar lag
+    assert fe.lookback() == 200
+    with pytest.raises(ValueError):
+        fe.compute_features(df, index_df, features=['nope'])
+
+def test_seeded_ema_continues_full_history():
+    dates = pd.bdate_range('2022-01-03', periods=400)
+    rng = np.random.default_rng(5)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, 400)))
+    df = pd.DataFrame({'symbol': 'AAA', 'close': close, 'volume': 1000}, index=pd.Index(dates, name='date'))
+    fe = FeatureEngine()
+    
+    full = fe.compute(df, features=['ema50', 'ema200'])
+    # Only the last 100 bars, EMAs seeded with their value on the bar before
+    seeds = full.xs(dates[299], level='date')
+    window = fe.compute(df.iloc[300:], features=['ema50', 'ema200'], seeds=seeds)
+    
+    np.testing.assert_allclose(window.to_numpy(), full.iloc[300:].to_numpy())
+    assert fe.lookback(['ema200'], ema_warmup=1.5) == 300
+    assert fe.lookback(['ema200', 'rs_6m'], ema_warmup=1.5, seeded=['ema200']) == 126
@@ -0,0 +1,50 @@
+import os
+import pytest
+from datetime import date
+from app.config import get_settings
+from app.services.feature_engine import FEATURE_GRAPH, FeatureNode, definition_hashes
+
+@pytest.fixture
+def feature_store(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import feature_store
+    yield feature_store
+    get_settings.cache_clear()
+
+def test_month_periods(feature_store):
+    periods = feature_store.month_periods(date(2024, 1, 15), date(2024, 3, 1))
+    assert periods == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 31)),
+    ]
+
+def test_definition_hash_changes_node_and_consumers_only(monkeypatch):
+    before = definition_hashes(['hh120', 'bo_120', 'dd60', 'ema50'])
+    node = FEATURE_GRAPH['hh120']
+    monkeypatch.setitem(FEATURE_GRAPH, 'hh120', FeatureNode(node.name, node.deps, 249, node.fn))
+    after = definition_hashes(['hh120', 'bo_120', 'dd60', 'ema50'])
+    
+    assert after['hh120'] != before['hh120']
+    assert after['bo_120'] != before['bo_120']
+    assert after['dd60'] == before['dd60']
+    assert after['ema50'] == before['ema50']
+
+def test_plan_partitions(feature_store):
+    hashes = {'ema50': 'a', 'dd60': 'b'}
+    jan, feb, mar = date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)
+    existing = {
+        ('AAA', jan): ({'ema50': 'a', 'dd60': 'b'}, 'fp1'),
+        ('AAA', feb): ({'ema50': 'a', 'dd60': 'old'}, 'fp2'),
+        ('AAA', mar): ({'ema50': 'a', 'dd60': 'b'}, 'fp3'),
+    }
+    fingerprints = {('AAA', jan): 'fp1', ('AAA', feb): 'fp2', ('AAA', mar): 'changed', ('BBB', jan): 'fp4'}
+    
+    stale = feature_store.plan_partitions(existing, fingerprints, hashes)
+    assert stale == {
+        ('AAA', feb): ['dd60'], # definition change: that column only
+        ('AAA', mar): ['ema50', 'dd60'], # input change
+        ('BBB', jan): ['ema50', 'dd60'], # new partition
+    }
+    assert len(feature_store.plan_partitions(existing, fingerprints, hashes, force=True)) == 4
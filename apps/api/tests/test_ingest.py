@@ -0,0 +1,106 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import get_settings
+
+@pytest.fixture
+def ingest(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import ingest
+    yield ingest
+    get_settings.cache_clear()
+
+def make_bars(n=5, start="2024-01-01"):
+    close = np.linspace(10, 11, n)
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1000.0,
+                         'turnover_tl': close * 1000, 'adj_close': close},
+                        index=pd.DatetimeIndex(pd.bdate_range(start, periods=n), name='Date'))
+
+def test_normalize_bars(ingest):
+    a, b = make_bars(), make_bars(3)
+    b.loc[b.index[1], 'close'] = np.nan
+    b = b.drop(columns=['adj_close'])
+    frame = ingest.normalize_bars({'AAA': a, 'BBB': b})
+    assert list(frame.columns) == ['symbol', 'date', *ingest.PRICE_COLUMNS]
+    # Incomplete bars are kept for validation to quarantine
+    assert frame.groupby('symbol').size().to_dict() == {'AAA': 5, 'BBB': 3}
+    assert frame['close'].isna().sum() == 1
+    assert frame['date'].iloc[0] == pd.Timestamp("2024-01-01").date()
+    assert frame.loc[frame['symbol'] == 'BBB', 'adj_close'].isna().all()
+
+def test_changed_matches_diff_bar_tolerance(ingest):
+    old = pd.Series([10.0, 10.0, np.nan, 10.0])
+    new = pd.Series([10.0000000001, 11.0, 5.0, np.nan])
+    assert ingest._changed(old, new).tolist() == [False, True, True, False]
+
+@pytest.mark.asyncio
+async def test_ingest_stages_overlap_and_report(ingest, monkeypatch):
+    monkeypatch.setenv("IMPORT_FETCH_CONCURRENCY", "4")
+    monkeypatch.setenv("IMPORT_BATCH_SYMBOLS", "3")
+    monkeypatch.setenv("IMPORT_QUEUE_SIZE", "2")
+    get_settings.cache_clear()
+    written = []
+
+    async def fake_write(db, frame, source, log_revisions=True):
+        written.append(sorted(frame['symbol'].unique()))
+        return frame.groupby('symbol').size().to_dict(), 0
+    monkeypatch.setattr(ingest, "write_price_batch", fake_write)
+    async def no_source(db, symbols, source):
+        pass
+    monkeypatch.setattr(ingest, "mark_price_source", no_source)
+    from app.services import validation
+    async def no_context(db, frame):
+        return [], [], None
+    monkeypatch.setattr(validation, "load_validation_context", no_context)
+
+    class Session:
+        commits = 0
+        async def commit(self):
+            self.commits += 1
+        async def rollback(self):
+            pass
+
+    def fetch(symbol):
+        time.sleep(0.05)
+        if symbol == "BAD":
+            raise RuntimeError("timeout")
+        return pd.DataFrame() if symbol == "EMPTY" else make_bars()
+
+    symbols = [f"S{i}" for i in range(12)] + ["BAD", "EMPTY"]
+    db = Session()
+    started = time.perf_counter()
+    result = await ingest.ingest_prices(db, fetch, symbols, source="TEST", pipeline="test_ingest")
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 14 * 0.05 # fetches ran concurrently
+    assert result["added"] == 60 and result["updated_symbols"] == 12
+    assert sorted(s for batch in written for s in batch) == sorted(symbols[:12])
+    assert all(len(batch) <= 3 for batch in written) and db.commits == len(written)
+    assert sorted(result["errors"]) == ["BAD: timeout", "EMPTY: Empty DataFrame"]
+    assert result["stages"]["fetch"]["items"] == 14
+    assert result["stages"]["validate"]["rows"] == 60 and result["quarantined"] == 0
+    assert result["stages"]["write"]["rows"] == 60
+
+@pytest.mark.asyncio
+async def test_fractional_volume_reimport_is_not_a_revision(ingest, tmp_path):
+    from sqlalchemy import select, func
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from app.database import Base
+    from app.models import Symbol, PriceDaily, PriceRevision
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ingest.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    frame = ingest.normalize_bars({'AAA': make_bars(3).assign(volume=[1000.4, 1000.6, 1000.5])})
+    async with AsyncSession(engine) as db:
+        db.add(Symbol(symbol='AAA', name='AAA', is_active=True))
+        assert (await ingest.write_price_batch(db, frame, "TEST"))[0] == {'AAA': 3}
+        await db.commit()
+        assert await ingest.write_price_batch(db, frame, "TEST") == ({}, 0)
+        await db.commit()
+        volumes = (await db.execute(select(PriceDaily.volume).order_by(PriceDaily.date))).scalars().all()
+        assert volumes == [1000, 1001, 1000]
+        assert await db.scalar(select(func.count()).select_from(PriceRevision)) == 0
+    await engine.dispose()
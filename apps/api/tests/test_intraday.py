@@ -0,0 +1,129 @@
+import os
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import get_settings
+
+@pytest.fixture
+def intraday(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import intraday
+    yield intraday
+    get_settings.cache_clear()
+
+SESSION = date(2024, 6, 28)
+
+def make_history(n_sym=30, n_days=200):
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range(end=SESSION, periods=n_days + 1)
+    frames = []
+    for i in range(n_sym):
+        close = 10 * np.exp(np.cumsum(rng.normal(0.001, 0.02, n_days + 1)))
+        frames.append(pd.DataFrame({'symbol': f"S{i:02d}", 'open': close * 0.995, 'high': close * 1.01,
+                                    'low': close * 0.99, 'close': close,
+                                    'volume': rng.integers(10**5, 10**6, n_days + 1).astype(float)}, index=dates))
+    prices = pd.concat(frames).rename_axis('date')
+    index = pd.DataFrame({'close': 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, n_days + 1)))}, index=dates)
+    index['ema50'] = index['close'].ewm(span=50, adjust=False).mean()
+    info = pd.DataFrame({'sector': [f"SEC{i % 5}" for i in range(n_sym)], 'is_active': True},
+                        index=pd.Index([f"S{i:02d}" for i in range(n_sym)], name='symbol'))
+    return prices, index, info
+
+def start_scorer(intraday, prices, index, info):
+    prev = pd.Timestamp(SESSION) - pd.offsets.BDay(1)
+    scorer = intraday.IntradayScorer(SESSION)
+    return scorer.start(prev.date(), prices[prices.index <= prev], index[index.index <= prev], info)
+
+def feed_day(intraday, scorer, prices, index):
+    """The session's daily bars as two half-day bars per symbol (+ the index)."""
+    today = prices[prices.index == pd.Timestamp(SESSION)]
+    for r in today.itertuples():
+        first = intraday.Bar(datetime(2024, 6, 28, 10), r.symbol, r.open, r.high, r.open, r.open, r.volume / 2)
+        second = intraday.Bar(datetime(2024, 6, 28, 17, 45), r.symbol, r.open, r.open, r.low, r.close, r.volume / 2)
+        assert scorer.update(first) and scorer.update(second)
+    level = index['close'].iloc[-1]
+    scorer.update(intraday.Bar(datetime(2024, 6, 28, 17, 45), "XU100", level, level, level, level, 0))
+
+def test_parse_bar(intraday, tmp_path):
+    assert intraday.parse_bar("timestamp,symbol,open,high,low,close,volume") is None
+    assert intraday.parse_bar("\n") is None
+    bar = intraday.parse_bar("2024-06-28T10:15:00,thyao,1,2,0.5,1.5,100\n")
+    assert bar == intraday.Bar(datetime(2024, 6, 28, 10, 15), "THYAO", 1.0, 2.0, 0.5, 1.5, 100.0)
+    with pytest.raises(ValueError):
+        intraday.parse_bar("2024-06-28T10:15:00,THYAO,1,2")
+
+@pytest.mark.asyncio
+async def test_file_replay_feed_and_spec(intraday, tmp_path):
+    path = tmp_path / "bars.csv"
+    path.write_text("timestamp,symbol,open,high,low,close,volume\n"
+                    "2024-06-28T10:00:00,AAA,1,1,1,1,10\n"
+                    "garbage\n"
+                    "2024-06-28T10:15:00,BBB,2,2,2,2,20\n")
+    bars = [b async for b in intraday.FileReplayFeed(str(path)).bars()]
+    assert [b.symbol for b in bars] == ["AAA", "BBB"]
+
+    assert isinstance(intraday.get_bar_feed(f"file:{path}"), intraday.FileReplayFeed)
+    feed = intraday.get_bar_feed("socket:localhost:9100")
+    assert (feed.host, feed.port) == ("localhost", 9100)
+    for spec in ("", "socket:localhost", "kafka:topic"):
+        with pytest.raises(ValueError):
+            intraday.get_bar_feed(spec)
+
+def test_update_folds_bars_into_daily_bar(intraday):
+    prices, index, info = make_history(n_sym=3, n_days=60)
+    scorer = start_scorer(intraday, prices, index, info)
+    Bar = intraday.Bar
+    assert scorer.update(Bar(datetime(2024, 6, 28, 10), "S00", 10, 11, 9.5, 10.5, 100))
+    assert scorer.update(Bar(datetime(2024, 6, 28, 10, 15), "S00", 10.5, 12, 10, 11, 50))
+    assert not scorer.update(Bar(datetime(2024, 6, 28, 10, 15), "S00", 10.5, 12, 10, 11, 50)) # repeat
+    assert not scorer.update(Bar(datetime(2024, 6, 27, 17), "S01", 1, 1, 1, 1, 1))              # other day
+    assert not scorer.update(Bar(datetime(2024, 6, 28, 10), "NOPE", 1, 1, 1, 1, 1))             # unknown
+    assert scorer.bars == {"S00": [10, 12, 9.5, 11, 150]}
+    assert scorer.dirty == {"S00"} and scorer.skipped == 3
+
+def test_refresh_matches_end_of_day_compute(intraday):
+    prices, index, info = make_history()
+    scorer = start_scorer(intraday, prices, index, info)
+    assert len(scorer.features) == 30 # yesterday's rows rank before any bar
+    feed_day(intraday, scorer, prices, index)
+    result = scorer.refresh()
+
+    from app.services.feature_engine import FEATURE_COLUMNS
+    expected = scorer.fe.compute(prices, index, features=FEATURE_COLUMNS, as_of=SESSION)
+    pd.testing.assert_frame_equal(scorer.features.sort_index()[FEATURE_COLUMNS], expected.sort_index(),
+                                  check_exact=False, rtol=1e-12)
+    assert result["provisional"] and result["updated_symbols"] == 30 and result["ranked"] == 30
+    assert result["date"] == "2024-06-28" and result["as_of"] == "2024-06-28T17:45:00"
+    assert [r["rank"] for r in result["top10"]] == list(range(1, len(result["top10"]) + 1))
+    assert not scorer.dirty
+
+def test_refresh_only_touches_changed_symbols(intraday):
+    prices, index, info = make_history()
+    scorer = start_scorer(intraday, prices, index, info)
+    feed_day(intraday, scorer, prices, index)
+    scorer.refresh()
+
+    # One symbol trades again, the index moves 2%: S05 is re-evaluated, the other
+    # symbols' relative strength follows the index without a recompute
+    level = index['close'].iloc[-1] * 1.02
+    bars = prices[prices.index == pd.Timestamp(SESSION)].set_index('symbol')
+    close = bars.loc['S05', 'close'] * 1.01
+    scorer.update(intraday.Bar(datetime(2024, 6, 28, 17, 50), "S05", close, close, close, close, 1000))
+    scorer.update(intraday.Bar(datetime(2024, 6, 28, 17, 50), "XU100", level, level, level, level, 0))
+    result = scorer.refresh()
+    assert result["updated_symbols"] == 1
+
+    moved = prices.copy()
+    today = moved.index == pd.Timestamp(SESSION)
+    s05 = today & (moved['symbol'] == 'S05')
+    moved.loc[s05, 'high'] = np.maximum(moved.loc[s05, 'high'], close)
+    moved.loc[s05, 'close'] = close
+    moved.loc[s05, 'volume'] += 1000
+    index_moved = index.copy()
+    index_moved.iloc[-1, 0] = level
+    from app.services.feature_engine import FEATURE_COLUMNS
+    expected = scorer.fe.compute(moved, index_moved, features=FEATURE_COLUMNS, as_of=SESSION)
+    pd.testing.assert_frame_equal(scorer.features.sort_index()[FEATURE_COLUMNS], expected.sort_index(),
+                                  check_exact=False, rtol=1e-9)
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI, APIRouter
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.utils.metrics import MetricsMiddleware, stage_timer
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_stage_timer_records_duration_and_rows():
+    labels = {'pipeline': 'test', 'stage': 'unit'}
+    before_count = sample('pipeline_stage_duration_seconds_count', labels)
+    before_rows = sample('pipeline_rows_processed_total', labels)
+    
+    with stage_timer('test', 'unit') as st:
+        st.rows = 42
+        
+    assert st.elapsed >= 0
+    assert sample('pipeline_stage_duration_seconds_count', labels) == before_count + 1
+    assert sample('pipeline_rows_processed_total', labels) == before_rows + 42
+
+def test_stage_timer_records_on_failure():
+    labels = {'pipeline': 'test', 'stage': 'failing'}
+    before = sample('pipeline_stage_duration_seconds_count', labels)
+    
+    with pytest.raises(ValueError):
+        with stage_timer('test', 'failing'):
+            raise ValueError("boom")
+            
+    assert sample('pipeline_stage_duration_seconds_count', labels) == before + 1
+
+def test_middleware_uses_route_template():
+    app = FastAPI()
+    router = APIRouter()
+    
+    @router.get("/items/{item_id}")
+    def get_item(item_id: str):
+        return {"id": item_id}
+        
+    app.include_router(router, prefix="/api")
+    app.add_middleware(MetricsMiddleware)
+    
+    labels = {'method': 'GET', 'route': '/api/items/{item_id}', 'status': '200'}
+    before = sample('http_request_duration_seconds_count', labels)
+    
+    client = TestClient(app)
+    assert client.get("/api/items/abc").status_code == 200
+    assert client.get("/api/items/xyz").status_code == 200
+    
+    assert sample('http_request_duration_seconds_count', labels) == before + 2
+
+def test_app_import_defers_heavy_modules():
+    # Cold start must not pay for pandas/numpy/yfinance
+    import os, subprocess, sys
+    code = "import sys, app.main; print(','.join(m for m in ('pandas', 'numpy', 'yfinance') if m in sys.modules))"
+    env = {**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///:memory:")}
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert out.stdout.strip() == ""
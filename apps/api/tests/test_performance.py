@@ -0,0 +1,62 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from app.services.backtest_engine import RunningMetrics
+from app.services.performance import performance_metrics, rolling_ratios, round_trips, trade_array
+
+def make_trades():
+    t = lambda d, sym, action, qty, price, reason="REBALANCE": {
+        "date": date(2024, 1, d), "symbol": sym, "action": action, "qty": qty,
+        "price": price, "fee": 1.0, "reason": reason,
+    }
+    return trade_array([
+        t(1, "AAA", "BUY", 10, 100.0), t(1, "BBB", "BUY", 5, 50.0),
+        t(4, "AAA", "SELL", 10, 110.0, "TREND_STOP"),
+        t(8, "BBB", "SELL", 5, 40.0), t(8, "AAA", "BUY", 10, 105.0),
+        t(15, "AAA", "SELL", 10, 104.0, "ATR_STOP"),
+        t(15, "CCC", "BUY", 3, 10.0), # still open
+    ])
+
+def test_round_trips():
+    trips = round_trips(make_trades())
+    got = sorted(zip(trips["reason"], trips["pnl"].round(2), trips["days"]))
+    assert got == [("ATR_STOP", -12.0, 7), ("REBALANCE", -52.0, 7), ("TREND_STOP", 98.0, 3)]
+
+def test_rolling_ratios_match_pandas():
+    r = np.random.default_rng(0).normal(0.001, 0.01, 200)
+    sharpe, sortino = rolling_ratios(r, 20)
+    s = pd.Series(r).rolling(20)
+    expected = (s.mean() / s.std() * 252 ** 0.5).dropna().to_numpy()
+    np.testing.assert_allclose(sharpe, expected)
+    downside = pd.Series(np.minimum(r, 0) ** 2).rolling(20).mean() ** 0.5
+    np.testing.assert_allclose(sortino, (s.mean() / downside * 252 ** 0.5).dropna().to_numpy())
+    assert len(rolling_ratios(r[:10], 20)[0]) == 0
+
+def test_performance_metrics():
+    rng = np.random.default_rng(1)
+    bench = 1000 * np.cumprod(1 + rng.normal(0, 0.01, 120))
+    bench_ret = bench[1:] / bench[:-1] - 1
+    returns = 0.0002 + 0.5 * bench_ret + rng.normal(0, 0.002, 119)
+    equity = 100_000 * np.concatenate(([1.0], np.cumprod(1 + returns)))
+    cash = equity * 0.25
+    start, end = date(2024, 1, 1), date(2024, 6, 14)
+
+    m = performance_metrics(equity, make_trades(), 100_000, start, end, cash=cash, benchmark=bench, window=30)
+    running = RunningMetrics()
+    for e in equity:
+        running.update(e)
+    for k, v in running.summary(100_000, start, end).items():
+        if k != "total_trades":
+            assert m[k] == v, k
+    beta, alpha = np.polyfit(bench_ret, returns, 1)
+    assert m["beta"] == round(beta, 3)
+    assert m["alpha"] == round(alpha * 252 * 100, 2)
+    assert m["exposure"] == 75.0
+    assert m["round_trips"] == 3 and m["hit_rate"] == round(100 / 3, 2)
+    assert m["pnl_by_reason"]["TREND_STOP"] == {"trades": 1, "pnl": 98.0}
+    assert m["rolling_sharpe"]["window"] == 30
+
+    # No cash / benchmark / trades: those statistics are just absent
+    bare = performance_metrics(equity, trade_array([]), 100_000, start, end)
+    assert bare["exposure"] is None and bare["beta"] is None and bare["hit_rate"] is None
+    assert bare["pnl_by_reason"] == {}
@@ -0,0 +1,114 @@
+import os
+import time
+import pytest
+from app.config import get_settings
+from app.utils import profiling
+
+@pytest.fixture
+def profiling_settings(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    monkeypatch.setenv("PROFILING_TOKENS", '["secret"]')
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_SAMPLE_INTERVAL_MS", "1")
+    get_settings.cache_clear()
+    yield tmp_path
+    get_settings.cache_clear()
+
+def busy(ms):
+    end = time.perf_counter() + ms / 1000.0
+    while time.perf_counter() < end:
+        sum(range(100))
+
+def test_token_allow_list(profiling_settings):
+    assert profiling.is_admin_token("secret")
+    assert not profiling.is_admin_token("other")
+    assert not profiling.is_admin_token(None)
+
+def test_no_spec_is_noop(profiling_settings):
+    with profiling.profile_session(None, "noop") as profile_id:
+        assert profile_id is None
+    assert os.listdir(profiling_settings) == []
+
+def test_cprofile_session_stores_stats(profiling_settings):
+    spec = {"id": "abc123", "mode": "cprofile"}
+    with profiling.profile_session(spec, "unit") as profile_id:
+        busy(5)
+        
+    assert profile_id == "abc123"
+    assert profiling.profile_path("abc123", "prof")
+    with open(profiling.profile_path("abc123", "txt")) as f:
+        assert "busy" in f.read()
+    assert [p["label"] for p in profiling.list_profiles()] == ["unit"]
+
+def test_sampling_session_stores_collapsed_stacks(profiling_settings):
+    spec = {"id": "def456", "mode": "sample"}
+    with profiling.profile_session(spec, "unit"):
+        busy(50)
+        
+    with open(profiling.profile_path("def456", "collapsed")) as f:
+        lines = f.read().splitlines()
+    assert lines
+    assert any("test_profiling:busy" in line for line in lines)
+    # collapsed format: stack followed by a sample count
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+def test_profile_path_rejects_traversal(profiling_settings):
+    assert profiling.profile_path("../etc/passwd", "txt") is None
+
+def test_overlapping_cprofile_session_is_rejected(profiling_settings):
+    from fastapi import HTTPException
+    with profiling.profile_session({"id": "aaa111", "mode": "cprofile"}, "first"):
+        with pytest.raises(HTTPException) as exc:
+            with profiling.profile_session({"id": "bbb222", "mode": "cprofile"}, "second"):
+                pass
+        assert exc.value.status_code == 409
+        # sampling is per session and still allowed
+        with profiling.profile_session({"id": "ccc333", "mode": "sample"}, "third"):
+            busy(5)
+    # released once the first one finished
+    with profiling.profile_session({"id": "ddd444", "mode": "cprofile"}, "fourth"):
+        busy(5)
+    assert profiling.profile_path("ddd444", "prof")
+
+@pytest.mark.asyncio
+async def test_overlapping_profiled_backtests(profiling_settings, monkeypatch):
+    from datetime import date
+    from fastapi import BackgroundTasks, HTTPException, Response
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from app.database import Base
+    from app.models import BacktestRun
+    from app.routers import backtest
+    from app.schemas.backtest import BacktestCreate
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{profiling_settings / 'runs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    jobs = []
+    async def fake_job(run_id, params, checkpoint=None):
+        jobs.append(run_id)
+    monkeypatch.setattr(backtest, "_run_backtest_job", fake_job)
+    params = BacktestCreate(start_date=date(2024, 1, 2), end_date=date(2024, 6, 28))
+
+    async def start(db, spec):
+        tasks = BackgroundTasks()
+        result = await backtest.create_backtest(params, tasks, Response(), db, spec)
+        return result, tasks
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        first, first_tasks = await start(db, {"id": "aaa111", "mode": "cprofile"})
+        # The first job has not run yet: the second request is refused up front
+        with pytest.raises(HTTPException) as exc:
+            await start(db, {"id": "bbb222", "mode": "cprofile"})
+        assert exc.value.status_code == 409
+        runs = (await db.execute(select(BacktestRun.run_id, BacktestRun.status))).all()
+        assert runs == [(first.run_id, "PENDING")]
+
+        await first_tasks()
+        assert jobs == [first.run_id] and profiling.profile_path("aaa111", "prof")
+        # slot released by the finished job
+        third, third_tasks = await start(db, {"id": "ccc333", "mode": "cprofile"})
+        await third_tasks()
+        assert jobs == [first.run_id, third.run_id]
+    await engine.dispose()
@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from app.utils.progress import ProgressBroker
+
+@pytest.mark.asyncio
+async def test_subscribers_get_events_until_final():
+    broker = ProgressBroker()
+    broker.start("run")
+    broker.publish("run", {"pct": 10})
+    
+    async def collect():
+        return [e async for e in broker.subscribe("run")]
+    
+    task = asyncio.create_task(collect())
+    await asyncio.sleep(0) # subscribed, got the latest event
+    broker.publish("run", {"pct": 50})
+    broker.publish("other", {"pct": 99})
+    broker.publish("run", {"pct": 100, "final": True})
+    
+    assert await asyncio.wait_for(task, 1) == [{"pct": 10}, {"pct": 50}, {"pct": 100, "final": True}]
+    assert not broker.is_active("run")
+    
+    # Late subscriber: only the final state
+    assert [e async for e in broker.subscribe("run")] == [{"pct": 100, "final": True}]
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest():
+    broker = ProgressBroker(max_queue=2)
+    stream = broker.subscribe("run")
+    first = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    for pct in (1, 2, 3, 4):
+        broker.publish("run", {"pct": pct})
+    broker.publish("run", {"pct": 5, "final": True})
+    
+    events = [await first] + [e async for e in stream]
+    assert events == [{"pct": 4}, {"pct": 5, "final": True}]
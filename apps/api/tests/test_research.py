@@ -0,0 +1,70 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from app.config import get_settings
+from app.services.feature_engine import FeatureEngine, NORMALIZED_COLUMNS
+from app.services.scoring_engine import ScoringEngine
+
+@pytest.fixture
+def research(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import research
+    yield research
+    get_settings.cache_clear()
+
+def make_day(rng, n=40):
+    symbols = [f"S{i:02d}" for i in range(n)]
+    raw = pd.DataFrame(rng.normal(size=(n, len(NORMALIZED_COLUMNS))), index=symbols, columns=NORMALIZED_COLUMNS)
+    raw.iloc[rng.choice(n, 3, replace=False), 0] = np.nan
+    raw['adv20_tl'] = rng.uniform(0, 2e6, n)
+    raw['trend_gate'] = rng.random(n) > 0.3
+    info = pd.DataFrame({
+        'sector': [None if i % 9 == 0 else f"SEC{i % 4}" for i in range(n)],
+        'is_active': True,
+    }, index=symbols)
+    return raw, info
+
+def test_normalize_tensor_matches_cross_sectional(research):
+    rng = np.random.default_rng(0)
+    days = [make_day(rng)[0] for _ in range(3)]
+    tensor = research.normalize_tensor(np.stack([d[NORMALIZED_COLUMNS].to_numpy() for d in days]))
+    fe = FeatureEngine()
+    for i, day in enumerate(days):
+        expected = fe.normalize_cross_sectional(day)[NORMALIZED_COLUMNS].to_numpy()
+        np.testing.assert_allclose(tensor[i], expected, equal_nan=True)
+
+def test_batched_selection_matches_scoring_engine(research):
+    rng = np.random.default_rng(1)
+    weight_sets = [{}, {'potential': {'rs_6m': 0.5, 'trend_score': 0.0}, 'risk_lambda': {'RISK_ON': 0.1}},
+                   {'risk': {'dd60': 1.0}, 'risk_lambda': {'RISK_OFF': 0.9}}]
+    fe, se = FeatureEngine(), ScoringEngine()
+    days = [make_day(rng) for _ in range(4)]
+    norm = [fe.normalize_cross_sectional(raw) for raw, _ in days]
+    info = days[0][1]
+    sectors = sorted(s for s in info['sector'].dropna().unique())
+    tensor = research.FeatureTensor(
+        dates=pd.bdate_range('2024-01-01', periods=len(days)),
+        symbols=list(info.index),
+        values=np.stack([n[NORMALIZED_COLUMNS].to_numpy() for n in norm]),
+        eligible=np.stack([(raw['adv20_tl'] >= 1e6) & raw['trend_gate'] for raw, _ in days]),
+        risk_on=np.array([True, False, True, False]),
+        sectors=np.array([sectors.index(s) if s else -1 for s in info['sector']]),
+        close=None, feature_history=None, price_history={}, index_history=None,
+    )
+    picks = research.sweep_top10(tensor, weight_sets, chunk_size=2)
+
+    for k, ws in enumerate(weight_sets):
+        for d, risk_on in enumerate(tensor.risk_on):
+            regime = "RISK_ON" if risk_on else "RISK_OFF"
+            scored = se.calculate_scores(norm[d], regime, weights=ws)
+            expected = se.select_top10(scored, info, min_adv=1e6, regime=regime)
+            got = picks[(picks['weight_set'] == k) & (picks['date'] == tensor.dates[d])].sort_values('rank')
+            assert got['symbol'].tolist() == expected['symbol'].tolist()
+            assert got['rank'].tolist() == expected['rank'].tolist()
+            np.testing.assert_allclose(got['final_score'], expected['final_score'])
+
+def test_weight_matrices_reject_unknown_features(research):
+    with pytest.raises(ValueError):
+        research.weight_matrices([{'potential': {'nope': 1.0}}])
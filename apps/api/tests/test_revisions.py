@@ -0,0 +1,33 @@
+import os
+import pytest
+import pandas as pd
+from types import SimpleNamespace
+from app.config import get_settings
+
+@pytest.fixture
+def revisions(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import revisions
+    yield revisions
+    get_settings.cache_clear()
+
+def test_diff_bar(revisions):
+    stored = SimpleNamespace(open=10.0, high=11.0, low=9.0, close=10.5, volume=1000)
+    fetched = pd.Series({'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5000000001, 'volume': 1000.0})
+    assert revisions.diff_bar(stored, fetched) == {}
+    
+    fetched['close'] = 5.25 # 2:1 split adjusted late
+    fetched['volume'] = 2000.0
+    assert revisions.diff_bar(stored, fetched) == {'close': [10.5, 5.25], 'volume': [1000, 2000]}
+    assert revisions.diff_bar(stored, fetched, fields=('open',)) == {}
+
+def test_affected_ranges(revisions):
+    calendar = list(pd.bdate_range('2024-01-01', periods=30).date)
+    ranges = revisions.affected_ranges(
+        [('AAA', calendar[3]), ('AAA', calendar[5]), ('BBB', calendar[28]), (revisions.INDEX_SYMBOL, calendar[0])],
+        calendar, symbol_horizon=10, index_horizon=4
+    )
+    assert ranges['AAA'] == (calendar[3], calendar[15])
+    assert ranges['BBB'] == (calendar[28], calendar[29]) # clipped to the calendar
+    assert ranges[revisions.INDEX_SYMBOL] == (calendar[0], calendar[4])
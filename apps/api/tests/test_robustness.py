@@ -0,0 +1,81 @@
+import os
+from datetime import date
+import pytest
+import numpy as np
+from app.config import get_settings
+from app.services.backtest_engine import RunningMetrics
+
+@pytest.fixture
+def robustness(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import robustness
+    yield robustness
+    get_settings.cache_clear()
+
+def make_equity(n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100_000 * np.cumprod(1 + rng.normal(0.0005, 0.01, n))
+
+def test_path_metrics_match_running_metrics(robustness):
+    equity = make_equity()
+    running = RunningMetrics()
+    for e in equity:
+        running.update(e)
+    expected = running.summary(100_000, date(2024, 1, 1), date(2024, 6, 28))
+    years = (date(2024, 6, 28) - date(2024, 1, 1)).days / 365.25
+
+    got = robustness.path_metrics(np.stack([equity, equity]), 100_000, years)
+    assert round(got["cagr"][1] * 100, 2) == expected["cagr"]
+    assert round(got["max_dd"][1] * 100, 2) == expected["max_dd"]
+    assert round(got["sharpe"][1], 2) == expected["sharpe"]
+
+def test_block_bootstrap_paths(robustness):
+    equity = make_equity(50)
+    returns = equity[1:] / equity[:-1] - 1
+    paths = robustness.block_bootstrap_paths(np.random.default_rng(1), returns, equity[0], 300, block=7)
+    assert paths.shape == (300, 50)
+    assert (paths[:, 0] == equity[0]).all()
+
+    # Resampled returns come in runs of consecutive days (circular)
+    resampled = paths[:, 1:] / paths[:, :-1] - 1
+    pos = np.abs(resampled[:, :, None] - returns[None, None, :]).argmin(axis=2)
+    for block in range(0, 49, 7):
+        run = pos[:, block:block + 7]
+        assert ((np.diff(run, axis=1) % 49) == 1).all()
+
+    # One block of the whole series is a rotation: same final equity
+    whole = robustness.block_bootstrap_paths(np.random.default_rng(2), returns, equity[0], 5, block=49)
+    np.testing.assert_allclose(whole[:, -1], equity[-1])
+
+def test_perturbed_paths(robustness):
+    equity = np.full(10, 100_000.0)
+    opens = np.arange(10, dtype=float)[:, None] + 10 # one symbol, open rises 1/day
+    args = dict(trade_days=np.array([2, 6]), notional=np.array([10_000.0, 10_000.0]),
+                buy_days=np.array([2]), buy_qty=np.array([1000.0]), buy_price=np.array([12.0]),
+                buy_symbol=np.array([0]), opens=opens)
+    rng = np.random.default_rng(0)
+
+    same = robustness.perturbed_paths(rng, equity, 4, entry_shift_days=0, slippage_bps=0, **args)
+    np.testing.assert_array_equal(same, np.broadcast_to(equity, (4, 10)))
+
+    slipped = robustness.perturbed_paths(rng, equity, 200, entry_shift_days=0, slippage_bps=10, **args)
+    assert (slipped[:, :2] == equity[0]).all()
+    assert (slipped[:, 2:] < equity[0]).all()
+    assert (slipped[:, 9] >= equity[0] - 20).all() # at most 10bps of 2 x 10k
+
+    shifted = robustness.perturbed_paths(rng, equity, 200, entry_shift_days=1, slippage_bps=0, **args)
+    # Buying a day later pays 1 more per share, a day earlier 1 less
+    assert set(np.unique(shifted[:, -1])) == {99_000.0, 100_000.0, 101_000.0}
+    late = shifted[:, -1] == 99_000.0
+    assert (shifted[late, 2] == 100_000.0).all() and (shifted[late, 3] == 99_000.0).all()
+
+def test_summarize(robustness):
+    summary = robustness.summarize({
+        "cagr": np.array([-0.1, 0.1, 0.2, 0.3]),
+        "max_dd": np.array([-0.2, -0.1, -0.1, -0.05]),
+        "sharpe": np.array([0.5, 1.0, np.nan, 1.5]),
+    })
+    assert summary["cagr"]["prob_loss"] == 0.25
+    assert summary["cagr"]["p50"] == 15.0
+    assert summary["sharpe"]["mean"] == 1.0
@@ -0,0 +1,51 @@
+import pytest
+import pandas as pd
+import numpy as np
+from app.services import rolling
+from app.services.feature_engine import FeatureEngine
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(7)
+    values = rng.normal(100, 10, size=(300, 6))
+    values[:40, 1] = np.nan # late listing (panel padding)
+    values[rng.random(values.shape) < 0.05] = np.nan # gaps
+    return values
+
+@pytest.mark.parametrize("window,min_periods", [(20, 10), (60, 30), (120, 60), (7, 7)])
+def test_kernels_match_pandas(panel, window, min_periods):
+    expected = pd.DataFrame(panel).rolling(window, min_periods=min_periods)
+    
+    np.testing.assert_allclose(rolling.rolling_max(panel, window, min_periods), expected.max(), equal_nan=True)
+    np.testing.assert_allclose(rolling.rolling_median(panel, window, min_periods, chunk_rows=50), expected.median(), equal_nan=True)
+    np.testing.assert_allclose(rolling.rolling_sum(panel, window, min_periods), expected.sum(), equal_nan=True)
+    np.testing.assert_allclose(rolling.rolling_mean(panel, window, min_periods), expected.mean(), equal_nan=True)
+
+def test_kernels_write_into_out(panel):
+    out = np.empty_like(panel)
+    res = rolling.rolling_max(panel, 20, 10, out=out)
+    assert res is out
+    with pytest.raises(ValueError):
+        rolling.rolling_max(panel, 20, 10, out=np.empty((3, 3)))
+
+def test_many_matches_single_symbol():
+    dates = pd.bdate_range('2023-01-02', periods=150)
+    rng = np.random.default_rng(1)
+    index = pd.DataFrame({'close': np.linspace(100, 120, 150)}, index=dates)
+    frames = []
+    for sym, n in (('AAA', 150), ('BBB', 90)):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        frames.append(pd.DataFrame({
+            'symbol': sym, 'open': close, 'high': close * 1.01, 'low': close * 0.99,
+            'close': close, 'volume': rng.integers(1000, 5000, n)
+        }, index=pd.Index(dates[-n:], name='date')))
+    prices = pd.concat(frames)
+    
+    fe = FeatureEngine()
+    many = fe.compute(prices, index)
+    for sym, frame in prices.groupby('symbol'):
+        single = fe.compute_features(frame.drop(columns='symbol'), index)
+        pd.testing.assert_frame_equal(many.loc[sym], single, check_names=False, check_freq=False)
+    
+    today = fe.compute(prices, index, as_of=dates[-1])
+    assert sorted(today.index) == ['AAA', 'BBB']
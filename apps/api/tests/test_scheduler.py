@@ -0,0 +1,113 @@
+import os
+from datetime import date
+import pytest
+import pytest_asyncio
+from app.config import get_settings
+
+TARGET = date(2024, 6, 28)
+
+@pytest_asyncio.fixture
+async def eod(monkeypatch, tmp_path):
+    """scheduler with its sessions on a throwaway sqlite file and the import / compute stubbed."""
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app import models
+    from app.services import scheduler
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'eod.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(scheduler, "AsyncSessionLocal", sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+
+    calls = []
+
+    async def fake_import(db, days, end_date=None):
+        # Like Yahoo after the close: today's index bar is there when end_date is today
+        calls.append(("import", end_date))
+        if end_date is not None:
+            db.add(models.IndexDaily(date=end_date, close=100.0))
+            await db.commit()
+        return {"message": "imported", "revised": 0}
+
+    async def fake_compute(db, target_date, replace=False):
+        calls.append(("compute", target_date))
+        return {"message": f"Computed for {target_date}"}
+
+    async def hook(db, target_date):
+        calls.append(("hook", target_date))
+        return "warm"
+
+    monkeypatch.setattr(scheduler, "import_yahoo_prices", fake_import)
+    monkeypatch.setattr(scheduler, "compute_for_date", fake_compute)
+    monkeypatch.setattr(scheduler, "POST_COMPUTE_HOOKS", [("warm_cache", hook)])
+    scheduler.calls = calls
+    yield scheduler
+    del scheduler.calls
+    await engine.dispose()
+    get_settings.cache_clear()
+
+async def get_run(scheduler, run_id):
+    from app.models import PipelineRun
+    async with scheduler.AsyncSessionLocal() as db:
+        return await db.get(PipelineRun, run_id)
+
+@pytest.mark.asyncio
+async def test_runs_import_compute_hooks_for_target_date(eod):
+    run_id = await eod.run_end_of_day_pipeline(TARGET)
+    run = await get_run(eod, run_id)
+    assert run.status == "COMPLETED" and run.message == f"Computed for {TARGET}"
+    assert eod.calls == [("import", TARGET), ("compute", TARGET), ("hook", TARGET)]
+    assert [s["stage"] for s in run.stages_json] == ["import", "compute", "warm_cache"]
+    assert all(s["status"] == "COMPLETED" for s in run.stages_json)
+
+@pytest.mark.asyncio
+async def test_already_computed_is_skipped(eod):
+    from app.models import Symbol, Top10Daily
+    async with eod.AsyncSessionLocal() as db:
+        db.add(Symbol(symbol="AAA", name="AAA", is_active=True))
+        db.add(Top10Daily(date=TARGET, rank=1, symbol="AAA", final_score=1.0))
+        await db.commit()
+    run = await get_run(eod, await eod.run_end_of_day_pipeline(TARGET))
+    assert (run.status, run.message) == ("SKIPPED", "Already computed")
+    assert eod.calls == []
+
+    # force recomputes
+    run = await get_run(eod, await eod.run_end_of_day_pipeline(TARGET, force=True))
+    assert run.status == "COMPLETED" and [c for c, _ in eod.calls] == ["import", "compute", "hook"]
+
+@pytest.mark.asyncio
+async def test_no_index_bar_is_skipped(eod, monkeypatch):
+    async def holiday_import(db, days, end_date=None):
+        eod.calls.append(("import", end_date))
+        return {"message": "imported", "revised": 0}
+    monkeypatch.setattr(eod, "import_yahoo_prices", holiday_import)
+    run = await get_run(eod, await eod.run_end_of_day_pipeline(TARGET))
+    assert (run.status, run.message) == ("SKIPPED", "No index data for date (holiday?)")
+    assert eod.calls == [("import", TARGET)]
+
+@pytest.mark.asyncio
+async def test_lock_held_elsewhere_returns_none(eod):
+    async with eod.pipeline_lock() as acquired:
+        assert acquired
+        assert await eod.run_end_of_day_pipeline(TARGET) is None
+    assert eod.calls == []
+
+def test_yahoo_end_date_is_inclusive():
+    import pandas as pd
+    from app.services.data_provider import YahooFinanceProvider
+    requested = []
+
+    class FakeYF:
+        def download(self, ticker, start, end, **kwargs):
+            requested.append(end)
+            dates = pd.date_range(start, end, inclusive='left', name='Date')
+            return pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 10.0}, index=dates)
+
+    provider = YahooFinanceProvider.__new__(YahooFinanceProvider)
+    provider.yf = FakeYF()
+    assert provider.get_index_daily("XU100", date(2024, 6, 24), TARGET).index[-1].date() == TARGET
+    assert provider.get_daily_ohlcv("AAA", date(2024, 6, 24), TARGET).index[-1].date() == TARGET
+    assert requested == [date(2024, 6, 29)] * 2
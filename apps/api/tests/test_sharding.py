@@ -0,0 +1,46 @@
+import os
+from datetime import date
+import json
+import pytest
+import pandas as pd
+from app.config import get_settings
+
+@pytest.fixture
+def sharding(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import sharding
+    yield sharding
+    get_settings.cache_clear()
+
+def test_shard_symbols_partition_is_stable(sharding):
+    symbols = [f"SYM{i}" for i in range(200)]
+    shards = sharding.shard_symbols(symbols, 4)
+    assert sorted(s for shard in shards for s in shard) == sorted(symbols)
+    # Same assignment whatever the input order or the rest of the universe
+    assert sharding.shard_symbols(list(reversed(symbols)), 4) == shards
+    smaller = sharding.shard_symbols(symbols[:50], 4)
+    for shard in smaller:
+        assert any(set(shard) <= set(big) for big in shards)
+
+def test_shard_task_roundtrip(sharding):
+    seeds = pd.DataFrame({"ema_20": [1.0, 2.0, 3.0], "ema_50": [4.0, 5.0, 6.0]}, index=["A", "B", "C"])
+    plan = {
+        "price_start": date(2024, 1, 2), "index_start": date(2023, 6, 1), "cold_start": date(2023, 1, 2),
+        "lookback": 80, "seeds": seeds, "cold_symbols": ["B", "D"],
+    }
+    task = json.loads(json.dumps(sharding.shard_task(date(2024, 6, 28), plan, ["A", "B"], True)))
+    assert task["plan"]["cold_symbols"] == ["B"]
+
+    got = sharding._plan_from_task(task)
+    assert got["price_start"] == date(2024, 1, 2)
+    assert got["cold_start"] == date(2023, 1, 2)
+    pd.testing.assert_frame_equal(got["seeds"].sort_index(), seeds.loc[["A", "B"]])
+
+def test_get_shard_runner(sharding, monkeypatch):
+    assert sharding.get_shard_runner() is None
+    monkeypatch.setenv("COMPUTE_SHARDS", "3")
+    monkeypatch.setenv("COMPUTE_SHARD_MODE", "queue")
+    get_settings.cache_clear()
+    runner = sharding.get_shard_runner()
+    assert isinstance(runner, sharding.QueueShardRunner) and runner.n_shards == 3
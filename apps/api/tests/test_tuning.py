@@ -0,0 +1,52 @@
+import os
+import pytest
+import pandas as pd
+from app.config import get_settings
+
+@pytest.fixture
+def tuning(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    monkeypatch.setenv("TUNING_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    from app.services import tuning
+    yield tuning
+    get_settings.cache_clear()
+
+def test_rung_windows(tuning):
+    calendar = list(pd.bdate_range('2020-01-01', periods=810).date)
+    windows = tuning.rung_windows(calendar, n_candidates=81, eta=3, min_days=20)
+    # 81 -> 27 -> 9 -> 3 candidates, each rung's window 3x longer
+    assert [len(calendar) - calendar.index(s) for s, _ in windows] == [30, 90, 270, 810]
+    assert all(e == calendar[-1] for _, e in windows)
+    assert windows[-1][0] == calendar[0]
+
+    # Windows never go under min_days: fewer rungs instead
+    short = tuning.rung_windows(calendar[:300], n_candidates=81, eta=3, min_days=60)
+    assert [300 - calendar.index(s) for s, _ in short] == [100, 300]
+    assert tuning.rung_windows(calendar[:50], 81, 3, 60) == [(calendar[0], calendar[49])]
+
+def test_sample_candidates(tuning):
+    candidates = tuning.sample_candidates(10, seed=7)
+    assert candidates == tuning.sample_candidates(10, seed=7) # resume regenerates the same points
+    assert candidates[0] == tuning.default_candidate()
+    for c in candidates[1:]:
+        assert abs(sum(c['weights']['potential'].values()) - 1.0) < 1e-3
+        assert c['backtest']['top_n'] in tuning.TOP_N_CHOICES
+
+def test_search_log_roundtrip(tuning):
+    path = tuning.search_path("abc123")
+    assert tuning.search_path("../etc") is None
+    tuning._append(path, {"type": "search", "config": {"seed": 0}})
+    tuning._append(path, {"type": "eval", "rung": 0, "candidate": 3, "score": 1.5})
+    tuning._append(path, {"type": "eval", "rung": 0, "candidate": 4, "score": None})
+    with open(path, "a") as f:
+        f.write('{"type": "eval", "rung": 0, "cand') # killed mid-write
+
+    header, done, result = tuning.read_search_log(path)
+    assert header["config"] == {"seed": 0}
+    assert set(done) == {(0, 3), (0, 4)}
+    assert result is None
+
+    status = tuning.search_status("abc123")
+    assert status["status"] == "INCOMPLETE"
+    assert status["best"]["candidate"] == 3
@@ -0,0 +1,104 @@
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import get_settings
+
+@pytest.fixture
+def validation(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"))
+    get_settings.cache_clear()
+    from app.services import validation
+    yield validation
+    get_settings.cache_clear()
+
+DAYS = pd.bdate_range("2024-01-01", periods=120)
+
+def make_frame(symbols=("AAA", "BBB"), seed=0):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for sym in symbols:
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(DAYS))))
+        parts.append(pd.DataFrame({
+            'symbol': sym, 'date': DAYS.date, 'open': close, 'high': close * 1.01, 'low': close * 0.99,
+            'close': close, 'volume': 1000.0, 'turnover_tl': close * 1000, 'adj_close': close,
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+def reasons(flagged):
+    return {(r.symbol, r.date): r.reasons for r in flagged.itertuples()}
+
+def test_clean_random_walk_passes(validation):
+    clean, flagged, stats = validation.validate_bars(make_frame(), None, list(DAYS.date))
+    assert flagged.empty and len(clean) == 240
+    assert stats['gap_days'] == 0
+
+def test_row_checks(validation):
+    frame = make_frame()
+    frame.loc[3, 'close'] = np.nan
+    frame.loc[4, 'volume'] = 0
+    frame.loc[5, 'high'] = frame.loc[5, 'low'] * 0.5
+    frame.loc[6, 'open'] = -1.0
+    conflicting = frame.iloc[[7]].assign(close=frame.loc[7, 'close'] * 1.01)
+    frame = pd.concat([frame, frame.iloc[[8]], conflicting], ignore_index=True) # exact repeat + conflicting duplicate
+    clean, flagged, stats = validation.validate_bars(frame, None, list(DAYS.date))
+    got = reasons(flagged)
+    assert got[("AAA", DAYS[3].date())] == ['missing']
+    assert got[("AAA", DAYS[4].date())] == ['zero_volume']
+    assert got[("AAA", DAYS[5].date())] == ['ohlc']
+    assert 'non_positive' in got[("AAA", DAYS[6].date())]
+    assert got[("AAA", DAYS[7].date())] == ['duplicate'] # the earlier one; the last goes on
+    assert clean.loc[clean['date'] == DAYS[7].date()].query("symbol == 'AAA'")['close'].item() == conflicting['close'].item()
+    assert stats['exact_duplicates'] == 1 and not clean.duplicated(['symbol', 'date']).any()
+
+def test_calendar_and_gaps(validation):
+    frame = make_frame()
+    saturday = frame.iloc[[0]].assign(date=date(2024, 1, 6))
+    frame = pd.concat([frame.drop(index=[10, 11]), saturday], ignore_index=True)
+    holiday = DAYS[20].date() # a weekday the index did not trade
+    calendar = [d for d in DAYS.date if d != holiday]
+    clean, flagged, stats = validation.validate_bars(frame, None, calendar)
+    assert reasons(flagged) == {("AAA", date(2024, 1, 6)): ['off_calendar'],
+                                ("AAA", holiday): ['off_calendar'], ("BBB", holiday): ['off_calendar']}
+    # AAA misses two trading days (its holiday bar is out of the calendar, not a gap)
+    assert stats['gap_days'] == 2 and stats['symbols_with_gaps'] == 1
+    # Dates past the end of the calendar (index not imported yet) are not judged
+    later = make_frame(("CCC",))
+    assert validation.validate_bars(later, None, list(DAYS.date[:60]))[1].empty
+
+def test_return_outliers_against_rolling_vol(validation):
+    frame = make_frame()
+    aaa = frame.index[frame['symbol'] == 'AAA']
+    frame.loc[aaa[80], ['open', 'high', 'low', 'close']] *= 10 # one unadjusted print
+    frame.loc[aaa[100]:aaa[-1], ['open', 'high', 'low', 'close']] *= 0.5 # a real level shift (unadjusted split)
+    clean, flagged, _ = validation.validate_bars(frame, None, list(DAYS.date))
+    got = reasons(flagged)
+    # The spike and the first bar after the split, not the bar that reverts the spike
+    assert got == {("AAA", DAYS[80].date()): ['return_outlier'], ("AAA", DAYS[100].date()): ['return_outlier']}
+    assert flagged['detail'].iloc[0]['threshold'] >= get_settings().VALIDATION_MIN_MOVE
+
+def test_history_seeds_the_first_new_bar(validation):
+    frame = make_frame(("AAA",))
+    history = frame.iloc[:100][['symbol', 'date', 'close']]
+    batch = frame.iloc[100:].copy()
+    batch.loc[batch.index[0], ['open', 'high', 'low', 'close']] *= 1.5
+    _, flagged, _ = validation.validate_bars(batch, history, list(DAYS.date))
+    assert reasons(flagged) == {("AAA", DAYS[100].date()): ['return_outlier']}
+    # Without history the first bar has no return to judge
+    assert validation.validate_bars(batch, None, list(DAYS.date))[1].empty
+
+def test_recorded_split_is_not_an_outlier(validation):
+    frame = make_frame(("AAA",))
+    frame.loc[100:, ['open', 'high', 'low', 'close']] *= 0.5 # 2:1 split, ex-date DAYS[100]
+    history = frame.iloc[:100][['symbol', 'date', 'close']]
+    batch = frame.iloc[100:]
+    factors = pd.DataFrame({'symbol': ["AAA"], 'ex_date': [DAYS[100].date()], 'cumulative': [0.5],
+                            'volume_cumulative': [2.0]})
+    clean, flagged, _ = validation.validate_bars(batch, history, list(DAYS.date), factors)
+    assert flagged.empty and len(clean) == len(batch)
+    # The ex-date bar is only a move while the split is not recorded
+    assert reasons(validation.validate_bars(batch, history, list(DAYS.date))[1]) == {
+        ("AAA", DAYS[100].date()): ['return_outlier']}
+    # Batches are not adjusted themselves
+    pd.testing.assert_frame_equal(clean.reset_index(drop=True), batch[clean.columns].reset_index(drop=True))
@@ -1,11 +1,11 @@
 'use client'
 
-import { useQuery, useMutation } from '@tanstack/react-query'
+import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card'
 import { Button } from '@/components/ui/button'
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table'
 import api from '@/lib/api'
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
 import Link from 'next/link'
 
 export default function BacktestPage() {
@@ -16,6 +16,8 @@ export default function BacktestPage() {
     })
 
     const [lastRunId, setLastRunId] = useState<string | null>(null)
+    const [progress, setProgress] = useState<any>(null)
+    const queryClient = useQueryClient()
 
     const mutation = useMutation({
         mutationFn: async (data: any) => {
@@ -27,7 +29,7 @@ export default function BacktestPage() {
         }
     })
 
-    // Polling for status if running?
+    // Full result is fetched once; progress streams in while the run is going
     const { data: result } = useQuery({
         queryKey: ['backtest', lastRunId],
         queryFn: async () => {
@@ -36,12 +38,21 @@ export default function BacktestPage() {
             return res.data
         },
         enabled: !!lastRunId,
-        refetchInterval: (query) => {
-            const data = query.state.data as any
-            return (data?.status === 'PENDING' || data?.status === 'RUNNING') ? 1000 : false
-        }
     })
 
+    useEffect(() => {
+        if (!lastRunId) return
+        setProgress(null)
+        const source = new EventSource(`${api.defaults.baseURL}/backtest/${lastRunId}/stream`)
+        source.addEventListener('progress', (e) => setProgress(JSON.parse((e as MessageEvent).data)))
+        source.addEventListener('done', (e) => {
+            setProgress(JSON.parse((e as MessageEvent).data))
+            source.close()
+            queryClient.invalidateQueries({ queryKey: ['backtest', lastRunId] })
+        })
+        return () => source.close()
+    }, [lastRunId, queryClient])
+
     return (
         <div className="space-y-6">
             <h1 className="text-3xl font-bold tracking-tight">Backtest Simulation</h1>
@@ -85,7 +96,7 @@ export default function BacktestPage() {
                 {lastRunId && (
                     <Card>
                         <CardHeader>
-                            <CardTitle>Run Status: {result?.status || 'Loading...'}</CardTitle>
+                            <CardTitle>Run Status: {progress?.status || result?.status || 'Loading...'}</CardTitle>
                         </CardHeader>
                         <CardContent>
                             {result?.status === 'COMPLETED' ? (
@@ -124,7 +135,14 @@ export default function BacktestPage() {
                                     </div>
                                 </div>
                             ) : (
-                                <div>Processing... please wait.</div>
+                                <div className="space-y-2">
+                                    <div>Processing... {progress?.pct ?? 0}%</div>
+                                    {progress?.equity !== undefined && (
+                                        <div className="text-sm text-muted-foreground">
+                                            {progress.date}: equity {Math.round(progress.equity).toLocaleString()}, {progress.total_trades} trades
+                                        </div>
+                                    )}
+                                </div>
                             )}
                         </CardContent>
                     </Card>